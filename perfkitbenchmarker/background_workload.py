@@ -14,16 +14,116 @@
 
 """Module containing classes for background workloads."""
 
+import collections
+import functools
+import json
+import logging
+import math
+import posixpath
 from typing import List
+from absl import flags
+from perfkitbenchmarker import context
+from perfkitbenchmarker import data
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import os_types
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 import six
 
+FLAGS = flags.FLAGS
+
 BACKGROUND_WORKLOADS: List['BaseBackgroundWorkload'] = []
 
 BACKGROUND_IPERF_PORT = 20001
 BACKGROUND_IPERF_SECONDS = 2147483647
 
+BACKGROUND_LOAD_PORT = 20002
+BACKGROUND_LOAD_SCRIPT = 'background_load.py'
+# Unit of the rate of each type of background load.
+BACKGROUND_LOAD_UNITS = {
+    'cpu': 'cores',
+    'memory': 'MB/s',
+    'disk': 'MB/s',
+    'network': 'Mbits/sec',
+}
+BACKGROUND_LOAD_SCHEDULES = ('constant', 'onoff', 'ramp')
+# Highest rate of each type of background load generated by one process. Disk
+# load is always written by a single process.
+_MAX_RATE_PER_WORKER = {
+    'cpu': 1,
+    'memory': 4000,
+    'disk': float('inf'),
+    'network': 10000,
+}
+
+Load = collections.namedtuple('Load', ['type', 'rate', 'schedule'])
+
+
+def ParseLoad(load: str) -> Load:
+  """Parses a background load of the form TYPE:RATE[:SCHEDULE].
+
+  Args:
+    load: The background load.
+
+  Returns:
+    The parsed Load.
+
+  Raises:
+    errors.Config.InvalidValue: if the load is invalid.
+  """
+  parts = load.split(':')
+  if len(parts) == 2:
+    parts.append('constant')
+  try:
+    load_type, rate, schedule = parts
+    rate = float(rate)
+  except ValueError:
+    raise errors.Config.InvalidValue(
+        f'Invalid background load {load!r}. Expected TYPE:RATE[:SCHEDULE].')
+  if load_type not in BACKGROUND_LOAD_UNITS:
+    raise errors.Config.InvalidValue(
+        f'Background load type must be one of {sorted(BACKGROUND_LOAD_UNITS)}, '
+        f'got {load_type!r}.')
+  if schedule not in BACKGROUND_LOAD_SCHEDULES:
+    raise errors.Config.InvalidValue(
+        f'Background load schedule must be one of {BACKGROUND_LOAD_SCHEDULES}, '
+        f'got {schedule!r}.')
+  if rate <= 0:
+    raise errors.Config.InvalidValue(
+        f'Background load rate must be positive, got {rate}.')
+  return Load(load_type, rate, schedule)
+
+
+def GetAchievedRates(status, start_time, end_time, to_runner_time=None):
+  """Computes the achieved and scheduled rates of a load in a time window.
+
+  The window is measured on the clock of PKB while the status is timestamped
+  on the clock of the VM, so the clocks are assumed to agree unless
+  to_runner_time converts the status times.
+
+  Args:
+    status: The JSON lines status file written by background_load.py.
+    start_time: The start of the window, on the clock of PKB.
+    end_time: The end of the window, on the clock of PKB.
+    to_runner_time: Optional function converting a time on the clock of the
+      VM to the clock of PKB.
+
+  Returns:
+    A tuple of the achieved and scheduled rates, or None if the status has
+    fewer than two updates in the window.
+  """
+  updates = [json.loads(line) for line in status.splitlines() if line.strip()]
+  if to_runner_time:
+    for update in updates:
+      update['time'] = to_runner_time(update['time'])
+  updates = [u for u in updates if start_time <= u['time'] <= end_time]
+  if len(updates) < 2:
+    return None
+  first, last = updates[0], updates[-1]
+  duration = last['time'] - first['time']
+  return ((last['done'] - first['done']) / duration,
+          (last['target'] - first['target']) / duration)
+
 
 class AutoRegisterBackgroundWorkloadMeta(type):
   """Metaclass which allows BackgroundWorkloads to be auto-registered."""
@@ -60,6 +160,18 @@ class BaseBackgroundWorkload(
     """Stops the background workload on this VM."""
     pass
 
+  @staticmethod
+  def GetSamples(vm, start_time, end_time):
+    """Returns samples of the load applied by this workload on this VM.
+
+    Args:
+      vm: The VM.
+      start_time: The start of the window to report the load in.
+      end_time: The end of the window to report the load in.
+    """
+    del vm, start_time, end_time  # Unused
+    return []
+
 
 class CpuWorkload(BaseBackgroundWorkload):
   """Workload that runs sysbench in the background."""
@@ -131,3 +243,132 @@ class NetworkWorkload(BaseBackgroundWorkload):
     """Stops the background workload on this VM."""
     vm.RemoteCommand('kill -9 ' + vm.client_pid)
     vm.RemoteCommand('kill -9 ' + vm.server_pid)
+
+
+class RateControlledWorkload(BaseBackgroundWorkload):
+  """Workload that runs scripts/background_load.py for each background load.
+
+  Each load keeps a rate of CPU usage, memory copies, disk writes or network
+  traffic to the next VM of the benchmark, following a schedule, and reports
+  the rate it achieved.
+  """
+
+  EXCLUDED_OS_TYPES = os_types.WINDOWS_OS_TYPES
+
+  @staticmethod
+  def IsEnabled(vm):
+    """Returns true if this background workload is enabled on this VM."""
+    return bool(vm.background_loads)
+
+  @staticmethod
+  def _GetScript(vm):
+    return posixpath.join(vm_util.VM_TMP_DIR, BACKGROUND_LOAD_SCRIPT)
+
+  @staticmethod
+  def _GetStatusFile(vm, index):
+    return posixpath.join(vm_util.VM_TMP_DIR, f'background_load_{index}.json')
+
+  @staticmethod
+  def _GetPeer(vm):
+    """Returns the VM to send network load to: the next one in the spec."""
+    vms = context.GetThreadBenchmarkSpec().vms
+    return vms[(vms.index(vm) + 1) % len(vms)]
+
+  @staticmethod
+  def _PushScript(vm):
+    vm.Install('python3')
+    vm.PushFile(data.ResourcePath(BACKGROUND_LOAD_SCRIPT),
+                RateControlledWorkload._GetScript(vm))
+
+  @staticmethod
+  def Prepare(vm):
+    """Prepares the background workload on this VM."""
+    for load in vm.background_loads:
+      ParseLoad(load)
+    RateControlledWorkload._PushScript(vm)
+
+  @staticmethod
+  def _StartSink(vm):
+    """Starts receiving network load on a VM, unless it already does."""
+    RateControlledWorkload._PushScript(vm)
+    vm.AllowPort(BACKGROUND_LOAD_PORT)
+    # A second sink exits as the port is in use.
+    vm.RemoteCommand(
+        f'nohup python3 {RateControlledWorkload._GetScript(vm)} --load=sink '
+        f'--port={BACKGROUND_LOAD_PORT} &> /dev/null &')
+
+  @staticmethod
+  def Start(vm):
+    """Starts the background workload on this VM."""
+    vm.background_load_pids = []
+    for index, load in enumerate(map(ParseLoad, vm.background_loads)):
+      workers = max(1, math.ceil(load.rate / _MAX_RATE_PER_WORKER[load.type]))
+      cmd = [
+          'python3', RateControlledWorkload._GetScript(vm),
+          f'--load={load.type}', f'--rate={load.rate}',
+          f'--schedule={load.schedule}',
+          f'--period={FLAGS.background_load_period}', f'--workers={workers}',
+          f'--status_file={RateControlledWorkload._GetStatusFile(vm, index)}'
+      ]
+      if load.type == 'disk':
+        scratch_dir = (vm.GetScratchDir() if vm.scratch_disks
+                       else vm_util.VM_TMP_DIR)
+        cmd.append(f'--path={posixpath.join(scratch_dir, "background_load")}')
+      elif load.type == 'network':
+        peer = RateControlledWorkload._GetPeer(vm)
+        RateControlledWorkload._StartSink(peer)
+        cmd += [f'--host={peer.internal_ip}', f'--port={BACKGROUND_LOAD_PORT}']
+      stdout, _ = vm.RemoteCommand(
+          f'nohup {" ".join(cmd)} &> /dev/null & echo $!')
+      vm.background_load_pids.append(stdout.strip())
+
+  @staticmethod
+  def Stop(vm):
+    """Stops the background workload on this VM."""
+    vm.RemoteCommand('kill ' + ' '.join(vm.background_load_pids),
+                     ignore_failure=True)
+    if any(ParseLoad(load).type == 'network' for load in vm.background_loads):
+      RateControlledWorkload._GetPeer(vm).RemoteCommand(
+          # The brackets keep pkill from matching its own shell.
+          'pkill -f "[b]ackground_load.py --load=sink"',
+          ignore_failure=True)
+
+  @staticmethod
+  def GetSamples(vm, start_time, end_time):
+    """Returns the achieved rate of each load on this VM in a time window.
+
+    The status times are converted to the clock of PKB with the offsets
+    measured by --measure_clock_offsets, if any. A load whose status cannot
+    be read, e.g. because it died, is logged and skipped.
+    """
+    # The trace collectors import virtual_machine, which imports this module.
+    # pylint: disable=g-import-not-at-top
+    from perfkitbenchmarker.traces import clock_offset
+    # pylint: enable=g-import-not-at-top
+    samples = []
+    for index, load in enumerate(map(ParseLoad, vm.background_loads)):
+      status, stderr, retcode = vm.RemoteCommandWithReturnCode(
+          'cat ' + RateControlledWorkload._GetStatusFile(vm, index),
+          ignore_failure=True)
+      if retcode:
+        logging.warning('Failed to read the status of background load %s on '
+                        '%s: %s', load, vm.name, stderr)
+        continue
+      rates = GetAchievedRates(
+          status, start_time, end_time,
+          functools.partial(clock_offset.ToRunnerTime, vm))
+      if not rates:
+        logging.warning('Background load %s on %s has no status in the run.',
+                        load, vm.name)
+        continue
+      achieved, scheduled = rates
+      samples.append(sample.Sample(
+          f'background_{load.type}_achieved_rate', achieved,
+          BACKGROUND_LOAD_UNITS[load.type], {
+              'background_vm': vm.name,
+              'background_load_rate': load.rate,
+              'background_load_schedule': load.schedule,
+              'background_load_period': FLAGS.background_load_period,
+              'background_load_scheduled_rate': scheduled,
+          }))
+    return samples
@@ -683,11 +683,13 @@ class BenchmarkSpec(object):
 
     if self.container_registry:
       self.container_registry.Create()
-      for container_spec in six.itervalues(self.container_specs):
-        if container_spec.static_image:
-          continue
-        container_spec.image = self.container_registry.GetOrBuild(
-            container_spec.image)
+      container_specs = [container_spec for container_spec
+                         in six.itervalues(self.container_specs)
+                         if not container_spec.static_image]
+      full_images = self.container_registry.GetOrBuildAll(
+          [container_spec.image for container_spec in container_specs])
+      for container_spec in container_specs:
+        container_spec.image = full_images[container_spec.image]
 
     if self.container_cluster:
       self.container_cluster.Create()
@@ -845,6 +847,15 @@ class BenchmarkSpec(object):
     targets = [(vm.StopBackgroundWorkload, (), {}) for vm in self.vms]
     vm_util.RunParallelThreads(targets, len(targets))
 
+  def GetBackgroundWorkloadSamples(self, start_time, end_time):
+    """Returns samples of the background workload of each VM in a window."""
+    targets = [(vm.GetBackgroundWorkloadSamples, (start_time, end_time), {})
+               for vm in self.vms if vm.background_loads]
+    if not targets:
+      return []
+    return [s for vm_samples in vm_util.RunParallelThreads(
+        targets, len(targets)) for s in vm_samples]
+
   def _IsSafeKeyOrValueCharacter(self, char):
     return char.isalpha() or char.isnumeric() or char == '_'
 
@@ -273,6 +273,10 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
   benchmark config prior to loading it. This allows the config to use
   references to anchors defined in the constants file.
 
+  The parsed config is memoized, so repeated calls for the same benchmark (e.g.
+  one per point of a flag matrix) only parse the YAML once. Every call returns
+  a new copy that the caller is free to modify.
+
   Args:
     benchmark_config: str. The default config in YAML format.
     benchmark_name: str. The name of the benchmark.
@@ -280,6 +284,20 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
   Returns:
     dict. The loaded config.
   """
+  return json.loads(_LoadMinimalConfigJson(benchmark_config, benchmark_name))
+
+
+@functools.lru_cache(maxsize=None)
+def _LoadMinimalConfigJson(benchmark_config, benchmark_name):
+  """Parses a benchmark config and returns it serialized as JSON.
+
+  Args:
+    benchmark_config: str. The default config in YAML format.
+    benchmark_name: str. The name of the benchmark.
+
+  Returns:
+    str. The JSON serialization of the loaded config.
+  """
   yaml_config = []
   yaml_config.append(_LoadConfigConstants())
   yaml_config.append(benchmark_config)
@@ -295,13 +313,11 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
         'Encountered a problem loading the default benchmark config. Please '
         'ensure that all references are defined. Error received:\n%s' % e)
 
-  config = config[benchmark_name]
   # yaml safe_parse parses anchor by reference and return the same
   # object when the same anchor is used multiple times.
-  # Seralize and deserialize to make sure all objects in the dictionary are
-  # unique.
-  config = json.loads(json.dumps(config))
-  return config
+  # Seralize (and later deserialize) to make sure all objects in the
+  # dictionary are unique.
+  return json.dumps(config[benchmark_name])
 
 
 def LoadConfig(benchmark_config, user_config, benchmark_name):
@@ -18,9 +18,12 @@ configuration files.
 """
 
 import contextlib
+import copy
+import json
 import logging
 import os
 
+from absl import flags
 from perfkitbenchmarker import app_service
 from perfkitbenchmarker import container_service
 from perfkitbenchmarker import data_discovery_service
@@ -48,6 +51,11 @@ import six
 _DEFAULT_DISK_COUNT = 1
 _DEFAULT_VM_COUNT = 1
 
+# Maps (spec class, component name, expected OS types, serialized config) to a
+# dict mapping the frozenset of flag names read while decoding that config to a
+# dict mapping flag fingerprints to decoded specs.
+_config_spec_cache = {}
+
 
 class _DpbApplicationListDecoder(option_decoders.ListDecoder):
   """Decodes the list of applications to be enabled on the dpb service."""
@@ -2078,3 +2086,82 @@ class BenchmarkConfigSpec(spec.BaseSpec):
     """
     with flag_util.OverrideFlags(flag_values, self.flags):
       yield
+
+
+def _GetConfigSpecCacheKey(config_spec_class, component_full_name,
+                           expected_os_types, config):
+  """Returns the cache key for a config, or None if it can't be cached."""
+  try:
+    serialized_config = json.dumps(
+        {k: v for k, v in six.iteritems(config) if k != 'flags'},
+        sort_keys=True)
+  except (TypeError, ValueError):
+    return None
+  if expected_os_types is not None:
+    expected_os_types = tuple(expected_os_types)
+  return (config_spec_class, component_full_name, expected_os_types,
+          serialized_config)
+
+
+def _GetFlagsFingerprint(flag_values, config_flags, flag_names):
+  """Fingerprints flags both with and without the config's flags applied."""
+  outer_fingerprint = flag_util.GetFlagsFingerprint(flag_values, flag_names)
+  with flag_util.OverrideFlags(flag_values, config_flags):
+    redirected_fingerprint = flag_util.GetFlagsFingerprint(
+        flag_values, flag_names)
+  return outer_fingerprint, redirected_fingerprint
+
+
+def CreateBenchmarkConfigSpec(config_spec_class, component_full_name,
+                              flag_values, expected_os_types=None, **config):
+  """Creates a benchmark config spec, reusing previously decoded specs.
+
+  Decoding a config is deterministic given the config dict and the flags read
+  while decoding it. The first time a config is decoded the flags it reads are
+  recorded. Later calls with an identical config (ignoring its 'flags' key) and
+  identical values for those flags, such as the points of a flag matrix that
+  only vary benchmark specific flags, get a copy of the cached spec instead of
+  decoding the config again.
+
+  Args:
+    config_spec_class: BenchmarkConfigSpec or a subclass of it.
+    component_full_name: string. Fully qualified name of the benchmark config
+      dict within the config file.
+    flag_values: flags.FlagValues. Runtime flags that may override the config.
+    expected_os_types: Optional series of strings from os_types.ALL.
+    **config: dict mapping config option names to provided values.
+
+  Returns:
+    An instance of config_spec_class. Each call returns a distinct object that
+    the caller is free to modify.
+  """
+  key = _GetConfigSpecCacheKey(config_spec_class, component_full_name,
+                               expected_os_types, config)
+  if key is None or not isinstance(flag_values, flags.FlagValues):
+    return config_spec_class(component_full_name,
+                             expected_os_types=expected_os_types,
+                             flag_values=flag_values, **config)
+
+  config_flags = config.get('flags')
+  specs_by_flag_names = _config_spec_cache.setdefault(key, {})
+  for flag_names, specs_by_fingerprint in six.iteritems(specs_by_flag_names):
+    fingerprint = _GetFlagsFingerprint(flag_values, config_flags, flag_names)
+    if fingerprint in specs_by_fingerprint:
+      config_spec = copy.deepcopy(specs_by_fingerprint[fingerprint])
+      config_spec.flags = config_flags
+      return config_spec
+
+  with flag_util.RecordFlagReads(flag_values) as recorder:
+    config_spec = config_spec_class(component_full_name,
+                                    expected_os_types=expected_os_types,
+                                    flag_values=flag_values, **config)
+  try:
+    cached_spec = copy.deepcopy(config_spec)
+  except Exception:  # pylint: disable=broad-except
+    logging.debug('Unable to cache the config spec for %s.',
+                  component_full_name, exc_info=True)
+    return config_spec
+  flag_names = frozenset(recorder.flag_names)
+  fingerprint = _GetFlagsFingerprint(flag_values, config_flags, flag_names)
+  specs_by_flag_names.setdefault(flag_names, {})[fingerprint] = cached_spec
+  return config_spec
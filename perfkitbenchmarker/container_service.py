@@ -22,20 +22,25 @@ expanded to support first-class container benchmarks.
 
 import collections
 import functools
+import hashlib
 import ipaddress
 import itertools
+import json
+import logging
 import os
 import time
 from typing import Any, Dict, List, Optional
 
 from absl import flags
 import jinja2
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import context
 from perfkitbenchmarker import custom_virtual_machine_spec
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import kubernetes_helper
+from perfkitbenchmarker import kubernetes_informer
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import resource
 from perfkitbenchmarker import sample
@@ -103,6 +108,24 @@ _CONTAINER_CLUSTER_ARCHITECTURE = flags.DEFINE_list(
     'The architecture(s) that the container cluster uses. '
     'Defaults to linux/amd64')
 
+_CONTAINER_BUILD_CACHE = flags.DEFINE_boolean(
+    'container_build_cache', True,
+    'Whether to tag images with a hash of their build context and reuse the '
+    'layers of previous builds through a BuildKit cache stored in the '
+    'registry. If false, images are tagged "latest" and built without a '
+    'cache.')
+
+_CONTAINER_BUILD_PARALLELISM = flags.DEFINE_integer(
+    'container_build_parallelism', None,
+    'Maximum number of container images to build at the same time. Defaults '
+    'to building all the images a benchmark needs at once.')
+
+_K8S_WATCH = flags.DEFINE_boolean(
+    'k8s_watch', False,
+    'Whether to track the state of Kubernetes pods with a single watch per '
+    'cluster (see kubernetes_informer) rather than by polling each pod with '
+    'kubectl. Requires kubectl 1.16 or later.')
+
 _K8S_INGRESS = """
 apiVersion: extensions/v1beta1
 kind: Ingress
@@ -240,12 +263,45 @@ class BaseContainerService(resource.BaseResource):
 
 
 class _ContainerImage(object):
-  """Simple class for tracking container image names and source locations."""
+  """Simple class for tracking container image names and source locations.
+
+  Attributes:
+    name: The PKB name of the image.
+    directory: The build context, containing the Dockerfile.
+    context_size: Total size in bytes of the files in the build context.
+    tag: Tag identifying the contents of the build context, or "latest" if
+      --nocontainer_build_cache.
+  """
 
   def __init__(self, name):
     self.name = name
     self.directory = os.path.dirname(
         data.ResourcePath(os.path.join('docker', self.name, 'Dockerfile')))
+    self.context_size = 0
+    self.tag = 'latest'
+    if _CONTAINER_BUILD_CACHE.value:
+      self.tag = self._HashBuildContext()
+
+  def _HashBuildContext(self):
+    """Returns a hash of every file in the build context and the platforms.
+
+    Any change to the Dockerfile or to a file it may copy into the image
+    changes the hash, and so the tag the image is looked up by.
+    """
+    context_hash = hashlib.sha256()
+    context_hash.update(
+        ','.join(_CONTAINER_CLUSTER_ARCHITECTURE.value).encode())
+    for root, dirs, files in os.walk(self.directory):
+      dirs.sort()
+      for file_name in sorted(files):
+        path = os.path.join(root, file_name)
+        context_hash.update(
+            os.path.relpath(path, self.directory).encode() + b'\0')
+        with open(path, 'rb') as f:
+          contents = f.read()
+        self.context_size += len(contents)
+        context_hash.update(hashlib.sha256(contents).digest())
+    return context_hash.hexdigest()[:16]
 
 
 class ContainerRegistrySpec(spec.BaseSpec):
@@ -319,7 +375,13 @@ class BaseContainerRegistry(resource.BaseResource):
     self.name = registry_spec.name or 'pkb%s' % FLAGS.run_uri
     self.local_build_times = {}
     self.remote_build_times = {}
-    self.metadata.update({'cloud': self.CLOUD})
+    self.image_sizes = {}
+    self.build_context_sizes = {}
+    self.cached_images = set()
+    self.metadata.update({
+        'cloud': self.CLOUD,
+        'container_build_cache': _CONTAINER_BUILD_CACHE.value,
+    })
 
   def _Create(self):
     """Creates the image registry."""
@@ -332,21 +394,31 @@ class BaseContainerRegistry(resource.BaseResource):
   def GetSamples(self):
     """Returns image build related samples."""
     samples = []
-    metadata = self.GetResourceMetadata()
-    for image_name, build_time in self.local_build_times.items():
-      metadata.update({
-          'build_type': 'local',
-          'image': image_name,
-      })
-      samples.append(
-          sample.Sample('Image Build Time', build_time, 'seconds', metadata))
-    for image_name, build_time in self.remote_build_times.items():
-      metadata.update({
-          'build_type': 'remote',
-          'image': image_name,
-      })
-      samples.append(
-          sample.Sample('Image Build Time', build_time, 'seconds', metadata))
+    for build_type, build_times in (('local', self.local_build_times),
+                                    ('remote', self.remote_build_times)):
+      for image_name, build_time in build_times.items():
+        metadata = self.GetResourceMetadata()
+        metadata.update({
+            'build_type': build_type,
+            'image': image_name,
+        })
+        samples.append(
+            sample.Sample('Image Build Time', build_time, 'seconds', metadata))
+        if image_name in self.build_context_sizes:
+          samples.append(
+              sample.Sample('Image Build Context Size',
+                            self.build_context_sizes[image_name], 'bytes',
+                            metadata))
+        if image_name in self.image_sizes:
+          samples.append(
+              sample.Sample('Image Push Size', self.image_sizes[image_name],
+                            'bytes', metadata))
+    # Images already in the registry were not built, so they get no build
+    # time sample that would skew build time statistics.
+    for image_name in sorted(self.cached_images):
+      metadata = self.GetResourceMetadata()
+      metadata['image'] = image_name
+      samples.append(sample.Sample('Image Cache Hit', 1, '', metadata))
     return samples
 
   def GetFullRegistryTag(self, image):
@@ -357,6 +429,14 @@ class BaseContainerRegistry(resource.BaseResource):
     """
     raise NotImplementedError()
 
+  def GetFullImageTag(self, image):
+    """Returns the full name of the image including its tag.
+
+    Args:
+      image: Instance of _ContainerImage.
+    """
+    return '%s:%s' % (self.GetFullRegistryTag(image.name), image.tag)
+
   def PrePush(self, image):
     """Prepares registry to push a given image."""
     pass
@@ -380,19 +460,66 @@ class BaseContainerRegistry(resource.BaseResource):
     Building and pushing done in one command to support multiarch images
     https://github.com/docker/buildx/issues/59
 
+    With --container_build_cache, layers are imported from and exported to a
+    "buildcache" tag of the image's repository, so only the layers affected
+    by a change to the build context are rebuilt.
+
     Args:
       image: Instance of _ContainerImage representing the image to build.
     """
-    full_tag = self.GetFullRegistryTag(image.name)
+    full_tag = self.GetFullImageTag(image)
+    # Use a builder per image so that images can be built concurrently.
+    builder = 'pkb-%s-%s' % (image.name.replace('_', '-'), FLAGS.run_uri)
     # Multiarch images require buildx create
     # https://github.com/docker/build-push-action/issues/302
-    vm_util.IssueCommand(['docker', 'buildx', 'create', '--use'])
-    cmd = ['docker', 'buildx', 'build']
-    if _CONTAINER_CLUSTER_ARCHITECTURE.value:
-      cmd += ['--platform', ','.join(_CONTAINER_CLUSTER_ARCHITECTURE.value)]
-    cmd += ['--no-cache', '--push', '-t', full_tag, image.directory]
-    vm_util.IssueCommand(cmd)
-    vm_util.IssueCommand(['docker', 'buildx', 'stop'])
+    vm_util.IssueCommand(['docker', 'buildx', 'create', '--name', builder])
+    try:
+      cmd = ['docker', 'buildx', 'build', '--builder', builder]
+      if _CONTAINER_CLUSTER_ARCHITECTURE.value:
+        cmd += ['--platform', ','.join(_CONTAINER_CLUSTER_ARCHITECTURE.value)]
+      if _CONTAINER_BUILD_CACHE.value:
+        cache_ref = 'ref=%s:buildcache' % self.GetFullRegistryTag(image.name)
+        cmd += ['--cache-to', 'type=registry,mode=max,' + cache_ref]
+        if not FLAGS.force_container_build:
+          cmd += ['--cache-from', 'type=registry,' + cache_ref]
+      else:
+        cmd += ['--no-cache']
+      cmd += ['--push', '-t', full_tag, image.directory]
+      vm_util.IssueCommand(cmd)
+    finally:
+      vm_util.IssueCommand(['docker', 'buildx', 'rm', builder],
+                           raise_on_failure=False)
+
+  def _GetPushedSize(self, full_tag):
+    """Returns the compressed size of the image's layers in the registry.
+
+    Sums the layers of every platform for multiarch images.
+
+    Args:
+      full_tag: The full name of the image including its tag.
+
+    Returns:
+      The size in bytes, or None if the manifest could not be read.
+    """
+    stdout, _, retcode = vm_util.IssueCommand(
+        ['docker', 'manifest', 'inspect', '-v', full_tag],
+        suppress_warning=True, raise_on_failure=False)
+    if retcode:
+      return None
+    try:
+      manifests = json.loads(stdout)
+    except ValueError:
+      logging.warning('Could not parse the manifest of %s.', full_tag)
+      return None
+    if isinstance(manifests, dict):
+      manifests = [manifests]
+    size = 0
+    for manifest in manifests:
+      schema = manifest.get('SchemaV2Manifest') or manifest.get(
+          'OCIManifest') or {}
+      size += schema.get('config', {}).get('size', 0)
+      size += sum(layer.get('size', 0) for layer in schema.get('layers', []))
+    return size
 
   def GetOrBuild(self, image):
     """Finds the image in the registry or builds it.
@@ -405,15 +532,47 @@ class BaseContainerRegistry(resource.BaseResource):
     Returns:
       The full image name (including the registry).
     """
-    full_image = self.GetFullRegistryTag(image)
     # Log in to the registry to see if image exists
     self.Login()
+    return self._GetOrBuild(_ContainerImage(image))
+
+  def GetOrBuildAll(self, images):
+    """Finds or builds several images concurrently.
+
+    Args:
+      images: list of PKB names of images (strings).
+
+    Returns:
+      A dict mapping each PKB name to the full image name.
+    """
+    if not images:
+      return {}
+    self.Login()
+    images = [_ContainerImage(image) for image in sorted(set(images))]
+    full_images = background_tasks.RunThreaded(
+        self._GetOrBuild, images,
+        max_concurrent_threads=_CONTAINER_BUILD_PARALLELISM.value)
+    return {image.name: full_image
+            for image, full_image in zip(images, full_images)}
+
+  def _GetOrBuild(self, image):
+    """Finds the image in the registry or builds it.
+
+    Args:
+      image: Instance of _ContainerImage.
+
+    Returns:
+      The full image name (including the registry and tag).
+    """
+    full_image = self.GetFullImageTag(image)
     if not FLAGS.force_container_build:
       # manifest inspect inpspects the registry's copy
       inspect_cmd = ['docker', 'manifest', 'inspect', full_image]
       _, _, retcode = vm_util.IssueCommand(
           inspect_cmd, suppress_warning=True, raise_on_failure=False)
       if retcode == 0:
+        logging.info('Found %s in the registry.', full_image)
+        self.cached_images.add(image.name)
         return full_image
     self._Build(image)
     return full_image
@@ -422,9 +581,9 @@ class BaseContainerRegistry(resource.BaseResource):
     """Builds the image and pushes it to the registry if necessary.
 
     Args:
-      image: The PKB name for the image (string).
+      image: Instance of _ContainerImage.
     """
-    image = _ContainerImage(image)
+    self.build_context_sizes[image.name] = image.context_size
     build_start = time.time()
     if not FLAGS.local_container_build:
       try:
@@ -440,6 +599,9 @@ class BaseContainerRegistry(resource.BaseResource):
     build_start = time.time()
     self.LocalBuildAndPush(image)
     self.local_build_times[image.name] = time.time() - build_start
+    pushed_size = self._GetPushedSize(self.GetFullImageTag(image))
+    if pushed_size is not None:
+      self.image_sizes[image.name] = pushed_size
 
 
 @events.benchmark_start.connect
@@ -595,41 +757,51 @@ class KubernetesPod:
     self.ip_address = pod.get('status', {}).get('podIP')
     return pod
 
+  def _HasExited(self, pod: Dict[str, Any]) -> bool:
+    """Returns whether the pod succeeded and raises if it is doomed to fail."""
+    # Inspect the pod's status to determine if it succeeded, has failed, or is
+    # doomed to fail.
+    # https://kubernetes.io/docs/concepts/workloads/pods/pod-lifecycle/
+    status = pod['status']
+    phase = status['phase']
+    if phase == 'Succeeded':
+      return True
+    elif phase == 'Failed':
+      raise FatalContainerException(
+          f"Pod {self.name} failed:\n{yaml.dump(pod['status'])}")
+    for condition in status.get('conditions', []):
+      if (condition['type'] == 'PodScheduled' and
+          condition['status'] == 'False' and
+          condition['reason'] == 'Unschedulable'):
+        # TODO(pclay): Revisit this when we scale clusters.
+        raise FatalContainerException(
+            f"Pod {self.name} failed to schedule:\n{condition['message']}")
+    for container_status in status.get('containerStatuses', []):
+      waiting_status = container_status['state'].get('waiting', {})
+      if waiting_status.get('reason') in [
+          'ErrImagePull', 'ImagePullBackOff'
+      ]:
+        raise FatalContainerException(
+            f'Failed to find container image for {self.name}:\n' +
+            yaml.dump(waiting_status.get('message')))
+    return False
+
   def WaitForExit(self, timeout: int = None) -> Dict[str, Any]:
     """Gets the finished running container."""
+    if _K8S_WATCH.value:
+      pod = kubernetes_informer.GetInformer().WaitFor(
+          kubernetes_informer.PODS, self.name, self._HasExited, timeout)
+      self.ip_address = pod.get('status', {}).get('podIP')
+      return pod
 
     @vm_util.Retry(
         timeout=timeout, retryable_exceptions=(RetriableContainerException,))
     def _WaitForExit():
-      # Inspect the pod's status to determine if it succeeded, has failed, or is
-      # doomed to fail.
-      # https://kubernetes.io/docs/concepts/workloads/pods/pod-lifecycle/
       pod = self._GetPod()
-      status = pod['status']
-      phase = status['phase']
-      if phase == 'Succeeded':
+      if self._HasExited(pod):
         return pod
-      elif phase == 'Failed':
-        raise FatalContainerException(
-            f"Pod {self.name} failed:\n{yaml.dump(pod['status'])}")
-      else:
-        for condition in status.get('conditions', []):
-          if (condition['type'] == 'PodScheduled' and
-              condition['status'] == 'False' and
-              condition['reason'] == 'Unschedulable'):
-            # TODO(pclay): Revisit this when we scale clusters.
-            raise FatalContainerException(
-                f"Pod {self.name} failed to schedule:\n{condition['message']}")
-        for container_status in status.get('containerStatuses', []):
-          waiting_status = container_status['state'].get('waiting', {})
-          if waiting_status.get('reason') in [
-              'ErrImagePull', 'ImagePullBackOff'
-          ]:
-            raise FatalContainerException(
-                f'Failed to find container image for {status.name}:\n' +
-                yaml.dump(waiting_status.get('message')))
-        raise RetriableContainerException(
-            f'Pod phase ({phase}) not in finished phases.')
+      raise RetriableContainerException(
+          f"Pod phase ({pod['status']['phase']}) not in finished phases.")
 
     return _WaitForExit()
 
@@ -670,6 +842,10 @@ class KubernetesContainer(BaseContainer, KubernetesPod):
 
   def _IsReady(self):
     """Returns true if the container has stopped pending."""
+    if _K8S_WATCH.value:
+      pod = kubernetes_informer.GetInformer().Get(kubernetes_informer.PODS,
+                                                  self.name)
+      return pod is not None and pod['status']['phase'] != 'Pending'
     return self._GetPod()['status']['phase'] != 'Pending'
 
 
@@ -768,6 +944,9 @@ class KubernetesCluster(BaseContainerCluster):
     ]
     RunKubectlCommand(run_cmd)
 
+  def _PreDelete(self):
+    kubernetes_informer.StopInformer()
+
   def _Delete(self):
     self._DeleteAllFromDefaultNamespace()
 
@@ -0,0 +1,49 @@
+-- Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+--
+-- Licensed under the Apache License, Version 2.0 (the "License");
+-- you may not use this file except in compliance with the License.
+-- You may obtain a copy of the License at
+--
+--   http://www.apache.org/licenses/LICENSE-2.0
+--
+-- Unless required by applicable law or agreed to in writing, software
+-- distributed under the License is distributed on an "AS IS" BASIS,
+-- WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+-- See the License for the specific language governing permissions and
+-- limitations under the License.
+
+-- Count the responses completed in each second of the unix time and write the
+-- counts of all threads to stdout in CSV format, for merging by PKB.
+local threads = {}
+
+function setup(thread)
+        table.insert(threads, thread)
+end
+
+function init(args)
+        responses = {}
+end
+
+function response(status, headers, body)
+        local second = os.time()
+        responses[second] = (responses[second] or 0) + 1
+end
+
+function done(summary, latency, requests)
+        local totals = {}
+        for _, thread in ipairs(threads) do
+                for second, count in pairs(thread:get("responses")) do
+                        totals[second] = (totals[second] or 0) + count
+                end
+        end
+        local seconds = {}
+        for second in pairs(totals) do
+                table.insert(seconds, second)
+        end
+        table.sort(seconds)
+        io.write("==TIMESERIES==\n")
+        io.write("time,responses\n")
+        for _, second in ipairs(seconds) do
+                io.write(string.format("%d,%d\n", second, totals[second]))
+        end
+end
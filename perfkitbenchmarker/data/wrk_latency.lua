@@ -14,6 +14,27 @@
 
 -- Write stats to stdout in CSV format, for simpler parsing by PKB.
 function done(summary, latency, requests)
+        -- The latency histogram, as the number of requests up to each of a
+        -- series of percentiles, so histograms of clients can be merged.
+        local percentiles = {}
+        for p = 1, 99 do
+                table.insert(percentiles, p)
+        end
+        for _, base in pairs({ 99, 99.9, 99.99 }) do
+                for i = 1, 9 do
+                        table.insert(percentiles, base + i * (100 - base) / 10)
+                end
+        end
+        table.insert(percentiles, 100)
+        io.write("==HISTOGRAM==\n")
+        io.write("latency,requests\n")
+        local previous = 0
+        for _, p in ipairs(percentiles) do
+                local count = math.floor(summary.requests * p / 100 + 0.5)
+                io.write(string.format("%g,%d\n", latency:percentile(p) / 1000,
+                                       count - previous))
+                previous = count
+        end
         io.write("==CSV==\n")
         io.write("variable,value,unit\n")
         for _, p in pairs({ 5, 25, 50, 75, 90, 99, 99.9 }) do
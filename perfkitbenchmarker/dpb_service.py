@@ -22,7 +22,11 @@ the corresponding provider directory as a subclass of BaseDpbService.
 import abc
 import dataclasses
 import datetime
+import json
 import logging
+import posixpath
+import re
+import time
 from typing import Dict, List, Optional, Type
 
 from absl import flags
@@ -64,6 +68,25 @@ flags.DEFINE_list(
     'https://cloud.google.com/dataproc/docs/concepts/configuring-clusters/cluster-properties.'
 )
 
+_JOB_POLL_MIN_INTERVAL = flags.DEFINE_float(
+    'dpb_job_poll_min_interval', 1,
+    'Seconds between the first polls for the completion of an asynchronously '
+    'submitted DPB job. The interval then grows by --dpb_job_poll_backoff up '
+    'to the poll interval of the service, so that short jobs are not timed '
+    'with the granularity of the full poll interval. Only EMR jobs are '
+    'polled this way.', lower_bound=0)
+_JOB_POLL_BACKOFF = flags.DEFINE_float(
+    'dpb_job_poll_backoff', 1.5,
+    'Factor by which the interval between polls for the completion of a DPB '
+    'job grows after each poll. Only EMR jobs are polled this way.',
+    lower_bound=1)
+_UNMANAGED_SERVICE_TIMING = flags.DEFINE_bool(
+    'dpb_unmanaged_service_timing', False,
+    'Whether to time jobs on unmanaged Spark and YARN clusters with the times '
+    'reported by the Spark event log or the YARN ResourceManager rather than '
+    'around the submission command. Falls back to the latter if the service '
+    'times cannot be read.')
+
 FLAGS = flags.FLAGS
 
 # List of supported data processing backend services
@@ -91,6 +114,12 @@ SUCCESS = 'success'
 RUNTIME = 'running_time'
 WAITING = 'pending_time'
 
+# Where unmanaged Spark clusters write the event log of each job.
+SPARK_EVENT_LOG_DIR = '/tmp/pkb/spark-events'
+YARN_RESOURCE_MANAGER_URL = 'http://localhost:8088/ws/v1/cluster/apps'
+_YARN_APPLICATION_RE = re.compile(
+    r'Submitted application (application_\d+_\d+)')
+
 
 class JobNotCompletedError(Exception):
   """Used to signal a job is still running."""
@@ -109,6 +138,9 @@ class JobResult:
   run_time: float
   # Service reported pending time (0 if service does not report).
   pending_time: float = 0
+  # Service reported execution time of each stage of the job, by stage ID
+  # (empty if service does not report).
+  stage_times: Dict[int, float] = dataclasses.field(default_factory=dict)
 
   @property
   def wall_time(self) -> float:
@@ -218,19 +250,36 @@ class BaseDpbService(resource.BaseResource):
     pass
 
   def _WaitForJob(self, job_id, timeout, poll_interval):
+    """Polls for the completion of a job.
+
+    The first polls are --dpb_job_poll_min_interval seconds apart and the
+    interval then grows by --dpb_job_poll_backoff up to poll_interval.
+
+    Args:
+      job_id: The job to wait for.
+      timeout: Seconds to wait for the job.
+      poll_interval: The maximum number of seconds between polls.
 
-    @vm_util.Retry(
-        timeout=timeout,
-        poll_interval=poll_interval,
-        fuzz=0,
-        retryable_exceptions=(JobNotCompletedError,))
-    def Poll():
+    Returns:
+      The JobResult of the job.
+
+    Raises:
+      JobNotCompletedError if the job did not complete within the timeout.
+      JobSubmissionError if job fails.
+    """
+    deadline = time.time() + timeout
+    interval = min(_JOB_POLL_MIN_INTERVAL.value, poll_interval)
+    polls = 0
+    while True:
+      polls += 1
       result = self._GetCompletedJob(job_id)
-      if result is None:
+      if result is not None:
+        logging.info('Job %s completed after %d polls.', job_id, polls)
+        return result
+      if time.time() + interval >= deadline:
         raise JobNotCompletedError('Job {} not complete.'.format(job_id))
-      return result
-
-    return Poll()
+      time.sleep(interval)
+      interval = min(interval * _JOB_POLL_BACKOFF.value, poll_interval)
 
   def _GetCompletedJob(self, job_id: str) -> Optional[JobResult]:
     """Get the job result if it has finished.
@@ -404,6 +453,17 @@ class BaseDpbService(resource.BaseResource):
     raise NotImplementedError(
         f'No jar found for category {job_category} and type {job_type}.')
 
+  def GetSparkConfiguration(self) -> Dict[str, str]:
+    """Returns the Spark configuration that jobs run with by default.
+
+    Used as the baseline when tuning the configuration of Spark jobs.
+
+    Raises:
+      NotImplementedError: The service does not support tuning Spark jobs.
+    """
+    raise NotImplementedError(
+        f'{self.SERVICE_TYPE} does not support tuning Spark jobs.')
+
   def GetClusterCreateTime(self) -> Optional[float]:
     """Returns the cluster creation time.
 
@@ -418,6 +478,70 @@ class BaseDpbService(resource.BaseResource):
     return self.resource_ready_time - self.create_start_time
 
 
+def ParseSparkEventLog(event_log: str) -> Optional[JobResult]:
+  """Times a Spark application by its event log.
+
+  The pending time is from the start of the application to the submission of
+  its first job, which includes acquiring executors. The run time is from the
+  submission of the first job to the completion of the last one.
+
+  Args:
+    event_log: The JSON lines event log written by Spark.
+
+  Returns:
+    The JobResult of the application, or None if no job completed.
+  """
+  app_start = None
+  job_starts = []
+  job_ends = []
+  stage_times = {}
+  for line in event_log.splitlines():
+    if not line.strip():
+      continue
+    event = json.loads(line)
+    event_type = event['Event']
+    if event_type == 'SparkListenerApplicationStart':
+      app_start = event['Timestamp']
+    elif event_type == 'SparkListenerJobStart':
+      job_starts.append(event['Submission Time'])
+    elif event_type == 'SparkListenerJobEnd':
+      job_ends.append(event['Completion Time'])
+    elif event_type == 'SparkListenerStageCompleted':
+      stage = event['Stage Info']
+      if 'Submission Time' in stage and 'Completion Time' in stage:
+        # Later attempts of a stage replace earlier ones.
+        stage_times[stage['Stage ID']] = (
+            stage['Completion Time'] - stage['Submission Time']) / 1000
+  if not job_starts or not job_ends:
+    return None
+  first_job_start = min(job_starts)
+  return JobResult(
+      run_time=(max(job_ends) - first_job_start) / 1000,
+      pending_time=(first_job_start - app_start) / 1000 if app_start else 0,
+      stage_times=stage_times)
+
+
+def ParseYarnApplications(apps: List[Dict[str, int]]) -> JobResult:
+  """Times a job by the YARN applications it ran.
+
+  The pending time is from the submission of the first application to the
+  launch of its ApplicationMaster. The run time is from then until the last
+  application finished.
+
+  Args:
+    apps: The applications as reported by the ResourceManager REST API.
+
+  Returns:
+    The JobResult of the job.
+  """
+  started = min(app['startedTime'] for app in apps)
+  launched = min(app['launchTime'] for app in apps)
+  finished = max(app['finishedTime'] for app in apps)
+  return JobResult(
+      run_time=(finished - launched) / 1000,
+      pending_time=(launched - started) / 1000)
+
+
 class UnmanagedDpbService(BaseDpbService):
   """Object representing an un-managed dpb service."""
 
@@ -547,7 +671,8 @@ class UnmanagedDpbServiceYarnCluster(UnmanagedDpbService):
 
     start_time = datetime.datetime.now()
     try:
-      stdout, _ = self.leader.RobustRemoteCommand(cmd_string, should_log=True)
+      stdout, stderr = self.leader.RobustRemoteCommand(
+          cmd_string, should_log=True)
     except errors.VirtualMachine.RemoteCommandError as e:
       raise JobSubmissionError() from e
     end_time = datetime.datetime.now()
@@ -555,7 +680,31 @@ class UnmanagedDpbServiceYarnCluster(UnmanagedDpbService):
     if job_stdout_file:
       with open(job_stdout_file, 'w') as f:
         f.write(stdout)
-    return JobResult(run_time=(end_time - start_time).total_seconds())
+    result = None
+    if _UNMANAGED_SERVICE_TIMING.value:
+      result = self._GetYarnJobResult(stderr)
+    return result or JobResult(
+        run_time=(end_time - start_time).total_seconds())
+
+  def _GetYarnJobResult(self, output: str) -> Optional[JobResult]:
+    """Times a job by the YARN applications in its output, if possible."""
+    app_ids = _YARN_APPLICATION_RE.findall(output)
+    if not app_ids:
+      logging.warning('No YARN application found in job output. Timing the '
+                      'job by its submission command.')
+      return None
+    try:
+      apps = []
+      for app_id in app_ids:
+        stdout, _ = self.leader.RemoteCommand(
+            f'curl -sf {YARN_RESOURCE_MANAGER_URL}/{app_id}')
+        apps.append(json.loads(stdout)['app'])
+      return ParseYarnApplications(apps)
+    except (errors.VirtualMachine.RemoteCommandError, ValueError,
+            KeyError) as e:
+      logging.warning('Failed to get YARN application times: %s. Timing the '
+                      'job by its submission command.', e)
+      return None
 
   def _Delete(self):
     pass
@@ -604,6 +753,14 @@ class UnmanagedDpbSparkCluster(UnmanagedDpbService):
     spark.ConfigureAndStart(
         self.leader, self.vms['worker_group'], configure_s3=self.cloud == 'AWS')
 
+  def GetSparkConfiguration(self) -> Dict[str, str]:
+    """See base class."""
+    properties = spark.GetClusterConfiguration(
+        self.leader, self.vms['worker_group'] or [self.leader],
+        configure_s3=self.cloud == 'AWS')
+    properties.update(self.GetJobProperties())
+    return properties
+
   def SubmitJob(self,
                 jarfile=None,
                 classname=None,
@@ -617,6 +774,16 @@ class UnmanagedDpbSparkCluster(UnmanagedDpbService):
                 job_type=None,
                 properties=None):
     """Submit a data processing job to the backend."""
+    event_log_dir = None
+    if _UNMANAGED_SERVICE_TIMING.value:
+      event_log_dir, _ = self.leader.RemoteCommand(
+          f'mkdir -p {SPARK_EVENT_LOG_DIR} && '
+          f'mktemp -d -p {SPARK_EVENT_LOG_DIR}')
+      event_log_dir = event_log_dir.strip()
+      properties = dict(properties or {}, **{
+          'spark.eventLog.enabled': 'true',
+          'spark.eventLog.dir': 'file://' + event_log_dir,
+      })
     cmd = self.GetSparkSubmitCommand(
         jarfile=jarfile,
         classname=classname,
@@ -637,7 +804,25 @@ class UnmanagedDpbSparkCluster(UnmanagedDpbService):
     if job_stdout_file:
       with open(job_stdout_file, 'w') as f:
         f.write(stdout)
-    return JobResult(run_time=(end_time - start_time).total_seconds())
+    result = None
+    if event_log_dir:
+      result = self._GetSparkJobResult(event_log_dir)
+    return result or JobResult(
+        run_time=(end_time - start_time).total_seconds())
+
+  def _GetSparkJobResult(self, event_log_dir: str) -> Optional[JobResult]:
+    """Times a job by its Spark event log, if possible."""
+    try:
+      event_log, _ = self.leader.RemoteCommand(
+          'cat ' + posixpath.join(event_log_dir, '*'))
+      result = ParseSparkEventLog(event_log)
+    except (errors.VirtualMachine.RemoteCommandError, ValueError,
+            KeyError) as e:
+      logging.warning('Failed to read Spark event log: %s', e)
+      result = None
+    if not result:
+      logging.warning('Timing the job by its submission command.')
+    return result
 
   def _Delete(self):
     pass
@@ -777,6 +962,10 @@ class KubernetesSparkCluster(BaseDpbService):
     properties.update(super().GetJobProperties())
     return properties
 
+  def GetSparkConfiguration(self) -> Dict[str, str]:
+    """See base class."""
+    return self.GetJobProperties()
+
   def SubmitJob(self,
                 jarfile=None,
                 classname=None,
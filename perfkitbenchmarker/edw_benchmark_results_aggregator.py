@@ -10,7 +10,14 @@ d. Raw wall time for each iteration
 e. Aggregated (average) iteration wall time
 f. Raw geo mean performance for each iteration
 g. Aggregated geo mean performance using the aggregated query performances
+
+Aggregates across iterations (b and g) are computed from an EdwQueryResults, a
+columnar copy of all the query executions of the benchmark, so that they take a
+few vectorized operations rather than a scan of every iteration per query.
 """
+import abc
+import array
+import collections
 import copy
 import enum
 import functools
@@ -47,10 +54,11 @@ def geometric_mean(iterable: List[float]) -> float:
     EdwPerformanceAggregationError: If an invalid performance value was included
       for aggregation.
   """
-  if (not iterable or any(perf <= 0.0 for perf in iterable)):
+  a = np.asarray(iterable, dtype=np.float64)
+  if not a.size or (a <= 0.0).any():
     raise EdwPerformanceAggregationError('Invalid values cannot be aggregated.')
-  a = np.array(iterable)
-  return a.prod() ** (1.0 / len(a))
+  # The product of many values overflows, the sum of their logarithms does not.
+  return float(np.exp(np.log(a).mean()))
 
 
 class EdwQueryExecutionStatus(enum.Enum):
@@ -74,17 +82,23 @@ class EdwQueryPerformance(object):
     query the value is expected to be positive.
     execution_status: An EdwQueryExecutionStatus enum indicating success/failure
     metadata: A dictionary of query execution attributes (job_id, etc.)
+    start_time: The start time of the query in milliseconds since epoch, or -1
+      if unknown.
+    end_time: The end time of the query in milliseconds since epoch, or -1 if
+      unknown.
   """
 
   def __init__(self, query_name: Text, performance: float,
-               metadata: Dict[str, str]):
-    # TODO(user): add query start and query end as attributes.
+               metadata: Dict[str, str], start_time: int = -1,
+               end_time: int = -1):
     self.name = query_name
     self.performance = performance
     self.execution_status = (EdwQueryExecutionStatus.FAILED
                              if performance == -1.0
                              else EdwQueryExecutionStatus.SUCCESSFUL)
     self.metadata = metadata
+    self.start_time = start_time
+    self.end_time = end_time
 
   @classmethod
   def from_json(cls, serialized_performance: str):
@@ -110,7 +124,9 @@ class EdwQueryPerformance(object):
       logging.warning('Query %s failed.', results['query'])
     return cls(query_name=results['query'],
                performance=results['query_wall_time_in_secs'],
-               metadata=metadata)
+               metadata=metadata,
+               start_time=results.get('query_start', -1),
+               end_time=results.get('query_end', -1))
 
   def get_performance_sample(self, metadata: Dict[str, str]) -> sample.Sample:
     """Method to generate a sample for the query performance.
@@ -150,9 +166,19 @@ class EdwQueryPerformance(object):
     return self.execution_status == EdwQueryExecutionStatus.SUCCESSFUL
 
 
-class EdwBaseIterationPerformance(object):
+class EdwBaseIterationPerformance(abc.ABC):
   """Class that represents the performance of an iteration of edw queries."""
 
+  @abc.abstractmethod
+  def get_query_performances(self) -> List[Any]:
+    """Gets all the query executions of the iteration.
+
+    Returns:
+      A list of (stream id, EdwQueryPerformance) tuples. The stream id is None
+      for iterations without streams.
+    """
+    raise NotImplementedError()
+
 
 class EdwPowerIterationPerformance(EdwBaseIterationPerformance):
   """Class that represents the performance of a power iteration of edw queries.
@@ -203,6 +229,15 @@ class EdwPowerIterationPerformance(EdwBaseIterationPerformance):
     if query_performance.is_successful():
       self.successful_count += 1
 
+  def get_query_performances(self) -> List[Any]:
+    """Gets all the query executions of the iteration.
+
+    Returns:
+      A list of (None, EdwQueryPerformance) tuples.
+    """
+    return [(None, query_performance)
+            for query_performance in self.performance.values()]
+
   def has_query_performance(self, query_name: Text) -> bool:
     """Returns whether the query was run at least once in the iteration.
 
@@ -439,6 +474,15 @@ class EdwSimultaneousIterationPerformance(EdwBaseIterationPerformance):
     all_queries_ran = self.performance.keys() == set(expected_queries)
     return all_queries_ran and self.all_queries_succeeded
 
+  def get_query_performances(self) -> List[Any]:
+    """Gets all the query executions of the iteration.
+
+    Returns:
+      A list of (None, EdwQueryPerformance) tuples.
+    """
+    return [(None, query_performance)
+            for query_performance in self.performance.values()]
+
   def has_query_performance(self, query_name: Text) -> bool:
     """Returns whether the query was run at least once in the iteration.
 
@@ -555,6 +599,13 @@ class EdwThroughputIterationPerformance(EdwBaseIterationPerformance):
     self.end_time = iteration_end_time
     self.wall_time = iteration_wall_time
     self.performance = iteration_performance
+    # Executions of each query in all streams, so that looking a query up does
+    # not scan every stream.
+    self._query_performances = {}
+    for stream_performance in iteration_performance.values():
+      for query_name, query_performance in stream_performance.items():
+        self._query_performances.setdefault(query_name,
+                                            []).append(query_performance)
 
   @classmethod
   def from_json(cls, iteration_id: str, serialized_performance: str):
@@ -626,10 +677,7 @@ class EdwThroughputIterationPerformance(EdwBaseIterationPerformance):
     Returns:
       A boolean value indicating if the query was executed in the iteration.
     """
-    for stream in self.performance.values():
-      if query_name in stream:
-        return True
-    return False
+    return query_name in self._query_performances
 
   def is_query_successful(self, query_name: Text) -> bool:
     """Returns whether the query was successful in the iteration.
@@ -640,11 +688,8 @@ class EdwThroughputIterationPerformance(EdwBaseIterationPerformance):
     Returns:
       A boolean value indicating if the query was successful in the iteration.
     """
-    for stream in self.performance.values():
-      if query_name in stream:
-        if not stream[query_name].is_successful():
-          return False
-    return True
+    return all(query_performance.is_successful() for query_performance in
+               self._query_performances.get(query_name, []))
 
   def get_query_performance(self, query_name: Text) -> float:
     """Gets a query's execution performance aggregated across all streams in the current iteration.
@@ -655,10 +700,10 @@ class EdwThroughputIterationPerformance(EdwBaseIterationPerformance):
     Returns:
       A float value set to the query's average completion time in secs.
     """
-    all_performances = []
-    for stream in self.performance.values():
-      if query_name in stream:
-        all_performances.append(stream[query_name].get_performance_value())
+    all_performances = [
+        query_performance.get_performance_value() for query_performance in
+        self._query_performances.get(query_name, [])
+    ]
     if not all_performances:
       return -1.0
     return sum(all_performances) / len(all_performances)
@@ -687,6 +732,16 @@ class EdwThroughputIterationPerformance(EdwBaseIterationPerformance):
         })
     return result
 
+  def get_query_performances(self) -> List[Any]:
+    """Gets all the query executions of the iteration.
+
+    Returns:
+      A list of (stream id, EdwQueryPerformance) tuples.
+    """
+    return [(stream_id, query_performance)
+            for stream_id, stream_performance in self.performance.items()
+            for query_performance in stream_performance.values()]
+
   def get_all_query_performance_samples(
       self, metadata: Dict[str, str]) -> List[sample.Sample]:
     """Gets a list of samples for all queries in all streams of the iteration.
@@ -826,6 +881,138 @@ class EdwThroughputIterationPerformance(EdwBaseIterationPerformance):
                          wall_time_metadata)
 
 
+class EdwQueryResults(object):
+  """Columnar store of the query executions of an edw benchmark.
+
+  Every query execution is a row of parallel numpy arrays: the query, iteration
+  and stream (as indexes into the lists of their names), start and end times,
+  performance, success and metadata (as an index into the list of metadata
+  dictionaries). Aggregating across iterations then takes a few vectorized
+  operations over all rows rather than a Python loop per query and iteration.
+
+  Attributes:
+    queries: A list of query names, indexed by the query column.
+    iterations: A list of iteration ids, indexed by the iteration column.
+    streams: A list of stream ids, indexed by the stream column. Executions of
+      iterations without streams have stream -1.
+    metadata: A list of query execution metadata dictionaries, indexed by the
+      metadata_id column.
+  """
+
+  # Column names to the typecodes of the arrays they are appended to, which
+  # are copied into numpy arrays of the same type without conversion.
+  COLUMNS = collections.OrderedDict([
+      ('query', 'i'),
+      ('iteration', 'i'),
+      ('stream', 'i'),
+      ('start', 'q'),
+      ('end', 'q'),
+      ('performance', 'd'),
+      ('successful', 'b'),
+      ('metadata_id', 'q'),
+  ])
+
+  def __init__(self):
+    self.queries = []
+    self.iterations = []
+    self.streams = []
+    self.metadata = []
+    self._query_indexes = {}
+    self._stream_indexes = {}
+    self._rows = {
+        column: array.array(typecode)
+        for column, typecode in self.COLUMNS.items()
+    }
+    self._arrays = None
+
+  def __len__(self) -> int:
+    return len(self._rows['query'])
+
+  def _get_index(self, indexes: Dict[Text, int], names: List[Text],
+                 name: Text) -> int:
+    if name not in indexes:
+      indexes[name] = len(names)
+      names.append(name)
+    return indexes[name]
+
+  def get_query_index(self, query_name: Text) -> int:
+    """Returns the index of the query in the query column, or -1 if absent."""
+    return self._query_indexes.get(query_name, -1)
+
+  def add_iteration(self, iteration_performance: EdwBaseIterationPerformance):
+    """Adds all the query executions of an iteration.
+
+    Args:
+      iteration_performance: An instance of EdwBaseIterationPerformance. It is
+        copied, so queries added to it later are not included.
+    """
+    iteration = len(self.iterations)
+    self.iterations.append(iteration_performance.id)
+    for stream_id, query_performance in (
+        iteration_performance.get_query_performances()):
+      self._rows['query'].append(self._get_index(
+          self._query_indexes, self.queries, query_performance.name))
+      self._rows['iteration'].append(iteration)
+      self._rows['stream'].append(
+          -1 if stream_id is None else
+          self._get_index(self._stream_indexes, self.streams, stream_id))
+      self._rows['start'].append(query_performance.start_time)
+      self._rows['end'].append(query_performance.end_time)
+      self._rows['performance'].append(query_performance.performance)
+      self._rows['successful'].append(query_performance.is_successful())
+      self._rows['metadata_id'].append(len(self.metadata))
+      self.metadata.append(query_performance.metadata)
+    self._arrays = None
+
+  def get_column(self, column: Text) -> np.ndarray:
+    """Returns a column of all the query executions as a numpy array."""
+    if self._arrays is None:
+      self._arrays = {
+          name: np.frombuffer(rows, dtype=rows.typecode).copy()
+          for name, rows in self._rows.items()
+      }
+      self._arrays['successful'] = self._arrays['successful'].astype(np.bool_)
+    return self._arrays[column]
+
+  def get_query_statuses(self) -> np.ndarray:
+    """Gets the status of each query aggregated across all iterations.
+
+    Returns:
+      A boolean array indexed by query, true for the queries that were executed
+      in every iteration and were successful in every execution.
+    """
+    num_queries = len(self.queries)
+    query = self.get_column('query')
+    executed = np.zeros((len(self.iterations), num_queries), dtype=np.bool_)
+    executed[self.get_column('iteration'), query] = True
+    failures = np.bincount(query[~self.get_column('successful')],
+                           minlength=num_queries)
+    return executed.all(axis=0) & (failures == 0)
+
+  def get_query_execution_times(self, total_iterations: int) -> np.ndarray:
+    """Gets the execution time of each query aggregated across all iterations.
+
+    The execution time of a query in an iteration is the mean across its
+    streams. Those are summed across iterations and divided by the total
+    number of iterations.
+
+    Args:
+      total_iterations: The total number of iterations of the benchmark.
+
+    Returns:
+      A float array indexed by query. Only the values of successful queries are
+      meaningful.
+    """
+    num_queries = len(self.queries)
+    shape = (len(self.iterations), num_queries)
+    keys = self.get_column('iteration') * num_queries + self.get_column('query')
+    sums = np.bincount(keys, weights=self.get_column('performance'),
+                       minlength=shape[0] * shape[1]).reshape(shape)
+    counts = np.bincount(keys, minlength=shape[0] * shape[1]).reshape(shape)
+    means = np.divide(sums, counts, out=np.zeros(shape), where=counts > 0)
+    return means.sum(axis=0) / total_iterations
+
+
 class EdwBenchmarkPerformance(object):
   """Class that represents the performance of an edw benchmark.
 
@@ -841,13 +1028,16 @@ class EdwBenchmarkPerformance(object):
     self.total_iterations = total_iterations
     self.expected_queries = list(expected_queries)
     self.iteration_performances = {}
+    self._results = EdwQueryResults()
+    self._query_statuses = None
+    self._query_execution_times = None
 
   def add_iteration_performance(self, performance: EdwBaseIterationPerformance):
     """Add an iteration's performance to the benchmark results.
 
     Args:
       performance: An instance of EdwBaseIterationPerformance encapsulating the
-        iteration performance details.
+        iteration performance details. Its queries must all have been added.
 
     Raises:
       EdwPerformanceAggregationError: If the iteration has already been added.
@@ -857,6 +1047,24 @@ class EdwBenchmarkPerformance(object):
       raise EdwPerformanceAggregationError('Attempting to aggregate a duplicate'
                                            ' iteration: %s.' % iteration_id)
     self.iteration_performances[iteration_id] = performance
+    self._results.add_iteration(performance)
+    self._query_statuses = None
+    self._query_execution_times = None
+
+  def get_query_results(self) -> EdwQueryResults:
+    """Gets the columnar store of all the query executions of the benchmark."""
+    return self._results
+
+  def _get_query_statuses(self) -> np.ndarray:
+    if self._query_statuses is None:
+      self._query_statuses = self._results.get_query_statuses()
+    return self._query_statuses
+
+  def _get_query_execution_times(self) -> np.ndarray:
+    if self._query_execution_times is None:
+      self._query_execution_times = self._results.get_query_execution_times(
+          self.total_iterations)
+    return self._query_execution_times
 
   def is_successful(self) -> bool:
     """Check a benchmark's success, only if all the iterations succeed."""
@@ -878,12 +1086,11 @@ class EdwBenchmarkPerformance(object):
     Returns:
       A boolean value indicating if the query was successful in the benchmark.
     """
-    for performance in self.iteration_performances.values():
-      if not performance.has_query_performance(query_name):
-        return False
-      if not performance.is_query_successful(query_name):
-        return False
-    return True
+    query = self._results.get_query_index(query_name)
+    if query == -1:
+      # Only vacuously successful if there are no iterations.
+      return not self.iteration_performances
+    return bool(self._get_query_statuses()[query])
 
   def aggregated_query_execution_time(self, query_name: Text) -> float:
     """Gets the execution time of query aggregated across all iterations.
@@ -901,11 +1108,10 @@ class EdwBenchmarkPerformance(object):
     if not self.aggregated_query_status(query_name):
       raise EdwPerformanceAggregationError('Cannot aggregate invalid / failed '
                                            'query ' + query_name)
-    query_performances = [
-        iteration_performance.get_query_performance(query_name)
-        for iteration_performance in self.iteration_performances.values()
-    ]
-    return sum(query_performances) / self.total_iterations
+    query = self._results.get_query_index(query_name)
+    if query == -1:
+      return 0.0
+    return float(self._get_query_execution_times()[query])
 
   def aggregated_query_metadata(self, query_name: Text) -> Dict[str, Any]:
     """Gets the metadata of a query aggregated across all iterations.
@@ -1053,10 +1259,12 @@ class EdwBenchmarkPerformance(object):
     """
     if not self.is_successful():
       raise EdwPerformanceAggregationError('Benchmark contains a failed query.')
-    aggregated_geo_mean = geometric_mean([
-        self.aggregated_query_execution_time(query_name=query)
-        for query in self.expected_queries
-    ])
+    queries = [self._results.get_query_index(query)
+               for query in self.expected_queries]
+    if -1 in queries:
+      raise EdwPerformanceAggregationError('Benchmark is missing a query.')
+    aggregated_geo_mean = geometric_mean(
+        self._get_query_execution_times()[queries])
 
     geomean_metadata = copy.copy(metadata)
     geomean_metadata['intra_query_aggregation_method'] = 'mean'
@@ -90,6 +90,16 @@ The samples' metadata is mutable, and may be updated by the subscriber.
 Sender: the phase. Currently only RUN_PHASE.
 Payload: benchmark_spec (BenchmarkSpec), samples (list of sample.Sample).""")
 
+samples_ready = _events.signal('samples-ready', doc="""
+Signal sent by a benchmark during a phase with samples that are already final,
+so that they are collected (and published with --publish_after_run) before the
+phase returns. Receivers return True if they collected the samples, in which
+case the benchmark must not return them as well. samples_created is not sent
+for these samples, as its receivers add samples of their own once per run.
+
+Sender: the phase. Currently only RUN_PHASE.
+Payload: benchmark_spec (BenchmarkSpec), samples (list of sample.Sample).""")
+
 record_event = _events.signal('record-event', doc="""
 Signal sent when an event is recorded.
 
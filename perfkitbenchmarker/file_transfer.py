@@ -0,0 +1,233 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compressed, resumable bulk file transfers from Linux VMs.
+
+PullFiles copies many files as a single compressed tar archive rather than
+with one scp per file, which suits the large, highly compressible logs that
+benchmarks collect. The archive is built on the VM and streamed over ssh. If
+the stream is interrupted, the next attempt only sends the bytes that have not
+been received yet.
+
+Each transfer returns samples with its duration and the number of bytes that
+were sent.
+"""
+
+import hashlib
+import logging
+import os
+import posixpath
+import tarfile
+import time
+
+from absl import flags
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
+
+FLAGS = flags.FLAGS
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+NONE = 'none'
+
+_COMPRESSION = flags.DEFINE_enum(
+    'file_transfer_compression', GZIP, [GZIP, ZSTD, NONE],
+    'How to compress archives moved by file_transfer. zstd must be '
+    'installable on the VMs and available locally.')
+_RETRIES = flags.DEFINE_integer(
+    'file_transfer_retries', 5,
+    'Number of times an interrupted file_transfer stream is resumed before '
+    'giving up.')
+
+# Compression command run on the VM and the archive's file extension.
+_COMPRESSORS = {
+    GZIP: ('gzip -1', '.tar.gz'),
+    ZSTD: ('zstd -q -1 -T0', '.tar.zst'),
+    NONE: ('cat', '.tar'),
+}
+# Flags for tar to extract an archive.
+_TAR_EXTRACT_FLAGS = {
+    GZIP: '-xzf',
+    ZSTD: '--zstd -xf',
+    NONE: '-xf',
+}
+# Compressions that tarfile can read.
+_TARFILE_COMPRESSIONS = (GZIP, NONE)
+
+
+def _GetArchiveName(vm, paths):
+  """Returns a file name for the archive of paths unique to this transfer."""
+  digest = hashlib.md5('\0'.join(paths).encode('utf-8')).hexdigest()[:10]
+  return 'pkb-pull-%s-%s%s' % (vm.name, digest,
+                               _COMPRESSORS[_COMPRESSION.value][1])
+
+
+def _Transfer(get_offset, send, size):
+  """Sends size bytes, resuming after interruptions.
+
+  Args:
+    get_offset: callable returning the number of bytes already received.
+    send: callable taking an offset that sends the bytes after it.
+    size: int. Total number of bytes to send.
+
+  Returns:
+    The number of attempts it took.
+
+  Raises:
+    RemoteCommandError: If the transfer did not complete after
+      --file_transfer_retries resumed attempts.
+  """
+  attempts = 0
+  while True:
+    offset = get_offset()
+    if offset == size:
+      return attempts
+    if offset > size or attempts > _RETRIES.value:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'File transfer failed with %d of %d bytes received after %d '
+          'attempts.' % (offset, size, attempts))
+    attempts += 1
+    try:
+      send(offset)
+    except errors.VirtualMachine.RemoteCommandError as e:
+      logging.warning('File transfer interrupted with %d of %d bytes received: '
+                      '%s', get_offset(), size, e)
+
+
+def _GetSamples(vm, elapsed, size, uncompressed_size, attempts, metadata):
+  metadata = dict(metadata or {})
+  metadata.update({
+      'file_transfer_vm': vm.name,
+      'file_transfer_compression': _COMPRESSION.value,
+      'file_transfer_uncompressed_bytes': uncompressed_size,
+      'file_transfer_attempts': attempts,
+  })
+  return [
+      sample.Sample('file_transfer_time', elapsed, 'seconds', metadata),
+      sample.Sample('file_transfer_bytes', size, 'bytes', metadata),
+  ]
+
+
+def _IsWithin(path, directory):
+  """Returns whether path resolves to directory or a path inside it."""
+  directory = os.path.realpath(directory)
+  path = os.path.realpath(os.path.join(directory, path))
+  return os.path.commonpath([path, directory]) == directory
+
+
+def _ExtractAll(archive, local_dir):
+  """Extracts an archive pulled from a VM without writing outside local_dir.
+
+  Uses the 'data' extraction filter where tarfile has it. Otherwise every
+  member must be a file, directory or link that resolves inside local_dir.
+
+  Args:
+    archive: tarfile.TarFile. The archive to extract.
+    local_dir: string. The directory to extract the archive to.
+
+  Raises:
+    RemoteCommandError: If a member would be written outside local_dir or is
+      not a regular file, directory or link.
+  """
+  if hasattr(tarfile, 'data_filter'):
+    try:
+      archive.extractall(local_dir, filter='data')
+    except tarfile.FilterError as e:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Refusing to extract archive: %s' % e)
+    return
+  for member in archive.getmembers():
+    if member.issym():
+      link = os.path.join(os.path.dirname(member.name), member.linkname)
+    elif member.islnk():
+      link = member.linkname
+    else:
+      link = member.name
+    if (not (member.isfile() or member.isdir() or member.issym() or
+             member.islnk()) or os.path.isabs(member.name) or
+        not _IsWithin(member.name, local_dir) or
+        os.path.isabs(member.linkname) or not _IsWithin(link, local_dir)):
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Refusing to extract archive member %s.' % member.name)
+  archive.extractall(local_dir)
+
+
+def _InstallCompressor(vm):
+  if _COMPRESSION.value == ZSTD:
+    vm.InstallPackages('zstd')
+
+
+def PullFiles(vm, local_dir, remote_paths, metadata=None):
+  """Copies files from the VM in one compressed archive.
+
+  Files are placed directly in local_dir, like with vm.PullFile.
+
+  Args:
+    vm: The Linux VM to copy the files from.
+    local_dir: string. The local directory to copy the files to.
+    remote_paths: list of strings. Files or directories on the VM. They may
+      contain shell wildcards and are relative to the home directory.
+    metadata: dict. Metadata to add to the samples.
+
+  Returns:
+    A list of sample.Sample objects with the transfer's duration and size.
+  """
+  start_time = time.time()
+  _InstallCompressor(vm)
+  archive_name = _GetArchiveName(vm, remote_paths)
+  remote_archive = posixpath.join(vm_util.VM_TMP_DIR, archive_name)
+  paths = ' '.join(remote_paths)
+  # -C makes tar store every file relative to its own directory.
+  stdout, _ = vm.RemoteCommand(
+      'set -o pipefail; mkdir -p {tmp_dir}; args=""; '
+      'for f in {paths}; do '
+      'args="$args -C $(dirname "$(readlink -f "$f")") $(basename "$f")"; '
+      'done; '
+      'tar -cf - $args | {compress} > {archive}.part && '
+      'mv {archive}.part {archive} && '
+      'du -scbL {paths} | tail -n 1 | cut -f 1 && stat -c %s {archive}'.format(
+          tmp_dir=vm_util.VM_TMP_DIR, paths=paths,
+          compress=_COMPRESSORS[_COMPRESSION.value][0],
+          archive=remote_archive))
+  uncompressed_size, size = [int(line) for line in stdout.split()[-2:]]
+
+  local_archive = vm_util.PrependTempDir(archive_name)
+  if os.path.exists(local_archive):
+    os.remove(local_archive)
+
+  def _GetOffset():
+    return (os.path.getsize(local_archive) if os.path.exists(local_archive)
+            else 0)
+
+  def _Send(offset):
+    vm.RemoteHostStreamCommand(
+        'tail -c +%d %s' % (offset + 1, remote_archive),
+        stdout_path=local_archive)
+
+  try:
+    attempts = _Transfer(_GetOffset, _Send, size)
+    if _COMPRESSION.value in _TARFILE_COMPRESSIONS:
+      with tarfile.open(local_archive) as archive:
+        _ExtractAll(archive, local_dir)
+    else:
+      # GNU tar strips leading slashes and skips members containing '..'.
+      vm_util.IssueCommand(
+          ['tar'] + _TAR_EXTRACT_FLAGS[_COMPRESSION.value].split() +
+          [local_archive, '-C', local_dir])
+  finally:
+    if os.path.exists(local_archive):
+      os.remove(local_archive)
+  vm.RemoteCommand('rm -f %s' % remote_archive)
+  return _GetSamples(vm, time.time() - start_time, size, uncompressed_size,
+                     attempts, metadata)
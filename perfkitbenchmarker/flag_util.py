@@ -15,6 +15,7 @@
 """Utility functions for working with user-supplied flags."""
 
 
+import contextlib
 import logging
 import os
 import re
@@ -284,6 +285,11 @@ class OverrideFlags(object):
     if not self._config_dict:
       return
 
+    with _PauseFlagReadRecording():
+      self._ApplyOverrides()
+
+  def _ApplyOverrides(self):
+    """Applies the overrides, remembering the values they replace."""
     for key, value in six.iteritems(self._config_dict):
       if key not in self._flag_values:
         raise errors.Config.UnrecognizedOption(
@@ -303,9 +309,98 @@ class OverrideFlags(object):
     """Restores flag_values to its original state."""
     if not self._flags_to_reapply:
       return
-    for key, value in six.iteritems(self._flags_to_reapply):
-      self._flag_values[key].value = value
-      self._flag_values[key].present = 0
+    with _PauseFlagReadRecording():
+      for key, value in six.iteritems(self._flags_to_reapply):
+        self._flag_values[key].value = value
+        self._flag_values[key].present = 0
+
+
+@contextlib.contextmanager
+def _PauseFlagReadRecording():
+  """Stops the active RecordFlagReads, if any, from recording in the block."""
+  recorder = RecordFlagReads.active_recorder
+  if recorder:
+    recorder.paused += 1
+  try:
+    yield
+  finally:
+    if recorder:
+      recorder.paused -= 1
+
+
+class RecordFlagReads(object):
+  """Context manager that records which flags are read from flag_values.
+
+  Both attribute reads (flag_values.name) and item reads (flag_values['name'])
+  are recorded, including reads through other references to the same
+  FlagValues object such as the module level FLAGS. Reads made by
+  OverrideFlags itself are not recorded. Recording is not reentrant.
+
+  Attributes:
+    flag_names: set of strings. Names of the flags read within the block.
+    paused: int. Recording is paused while this is nonzero.
+  """
+
+  # The RecordFlagReads that is currently recording, if any.
+  active_recorder = None
+
+  def __init__(self, flag_values):
+    self._flag_values = flag_values
+    self._originals = None
+    self.flag_names = set()
+    self.paused = 0
+
+  def _Record(self, flag_values, name):
+    if flag_values is self._flag_values and not self.paused:
+      self.flag_names.add(name)
+
+  def __enter__(self):
+    """Starts recording flag reads."""
+    assert RecordFlagReads.active_recorder is None, (
+        'Flag reads are already being recorded.')
+    original_getattr = flags.FlagValues.__getattr__
+    original_getitem = flags.FlagValues.__getitem__
+
+    def _RecordingGetAttr(flag_values, name):
+      self._Record(flag_values, name)
+      return original_getattr(flag_values, name)
+
+    def _RecordingGetItem(flag_values, name):
+      self._Record(flag_values, name)
+      return original_getitem(flag_values, name)
+
+    self._originals = original_getattr, original_getitem
+    flags.FlagValues.__getattr__ = _RecordingGetAttr
+    flags.FlagValues.__getitem__ = _RecordingGetItem
+    RecordFlagReads.active_recorder = self
+    return self
+
+  def __exit__(self, *unused_args, **unused_kwargs):
+    """Stops recording flag reads."""
+    flags.FlagValues.__getattr__, flags.FlagValues.__getitem__ = (
+        self._originals)
+    RecordFlagReads.active_recorder = None
+
+
+def GetFlagsFingerprint(flag_values, flag_names):
+  """Returns a hashable summary of the current state of some flags.
+
+  Args:
+    flag_values: flags.FlagValues. The flags to summarize.
+    flag_names: iterable of flag name strings.
+
+  Returns:
+    A tuple with one (name, present, repr(value)) entry per flag name. Two
+    fingerprints compare equal when every flag had the same value and presence.
+  """
+  fingerprint = []
+  for name in sorted(flag_names):
+    if name in flag_values:
+      flag = flag_values[name]
+      fingerprint.append((name, bool(flag.present), repr(flag.value)))
+    else:
+      fingerprint.append((name, None, None))
+  return tuple(fingerprint)
 
 
 class UnitsParser(flags.ArgumentParser):
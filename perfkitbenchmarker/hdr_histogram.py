@@ -0,0 +1,184 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Utilities for reading HdrHistogram interval logs.
+
+Tools such as cassandra-stress write an HdrHistogram
+(https://github.com/HdrHistogram/HdrHistogram) of the values recorded in each
+interval of a run as a line of a log. Unlike the percentiles they print, the
+histograms of concurrent clients can be merged into exact aggregate
+percentiles, and their counts give the throughput of each interval.
+
+Log format:
+https://github.com/HdrHistogram/HdrHistogram/blob/master/src/main/java/org/HdrHistogram/HistogramLogWriter.java
+"""
+
+import base64
+import collections
+import math
+import re
+import struct
+import zlib
+
+# Cookies of the V2 encoding, with the word size bits masked out.
+_ENCODING_COOKIE = 0x1c849303
+_COMPRESSED_ENCODING_COOKIE = 0x1c849304
+_COMPRESSED_HEADER = struct.Struct('>ii')
+# Cookie, payload length, normalizing index offset, significant digits, lowest
+# discernible value, highest trackable value, integer to double ratio.
+_HEADER = struct.Struct('>iiiiqqd')
+# Interval start times smaller than this are relative to the start time of the
+# log rather than seconds since the epoch.
+_MAX_RELATIVE_TIME = 365 * 24 * 3600
+
+Interval = collections.namedtuple(
+    'Interval', ['tag', 'start', 'length', 'histogram'])
+
+
+def _ReadVarint(data, pos):
+  """Reads a ZigZag LEB128-64b9B encoded integer."""
+  value = 0
+  shift = 0
+  while True:
+    byte = data[pos]
+    pos += 1
+    if shift == 56:
+      # The ninth byte uses all of its bits.
+      value |= byte << 56
+      break
+    value |= (byte & 0x7f) << shift
+    if not byte & 0x80:
+      break
+    shift += 7
+  return (value >> 1) ^ -(value & 1), pos
+
+
+def DecodeHistogram(encoded):
+  """Decodes a base64 encoded, compressed histogram.
+
+  Args:
+    encoded: string. The histogram as written in an interval log.
+
+  Returns:
+    Dict of the highest value equivalent to each recorded value to its count.
+
+  Raises:
+    ValueError: if the histogram is not in the V2 encoding.
+  """
+  compressed = base64.b64decode(encoded)
+  cookie, length = _COMPRESSED_HEADER.unpack_from(compressed)
+  if cookie & ~0xf0 != _COMPRESSED_ENCODING_COOKIE:
+    raise ValueError('Unsupported compressed histogram cookie %x.' % cookie)
+  data = zlib.decompress(
+      compressed[_COMPRESSED_HEADER.size:_COMPRESSED_HEADER.size + length])
+  (cookie, payload_length, normalizing_offset, digits, lowest, _,
+   _) = _HEADER.unpack_from(data)
+  if cookie & ~0xf0 != _ENCODING_COOKIE:
+    raise ValueError('Unsupported histogram cookie %x.' % cookie)
+  if normalizing_offset:
+    raise ValueError('Shifted histograms are not supported.')
+
+  sub_bucket_count_magnitude = int(math.ceil(math.log2(2 * 10**digits)))
+  half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+  half_count = 1 << half_count_magnitude
+  unit_magnitude = max(lowest, 1).bit_length() - 1
+
+  def _LowestValue(index):
+    bucket = (index >> half_count_magnitude) - 1
+    sub_bucket = (index & (half_count - 1)) + half_count
+    if bucket < 0:
+      sub_bucket -= half_count
+      bucket = 0
+    return sub_bucket << (bucket + unit_magnitude)
+
+  histogram = {}
+  index = 0
+  pos = _HEADER.size
+  end = _HEADER.size + payload_length
+  while pos < end:
+    count, pos = _ReadVarint(data, pos)
+    if count < 0:
+      # A run of empty buckets.
+      index -= count
+      continue
+    if count:
+      histogram[_LowestValue(index + 1) - 1] = count
+    index += 1
+  return histogram
+
+
+def ParseIntervalLog(log):
+  """Parses an interval log.
+
+  Args:
+    log: string. Contents of the log.
+
+  Returns:
+    List of Intervals, with start times in seconds since the epoch.
+  """
+  start_time = base_time = None
+  intervals = []
+  for line in log.splitlines():
+    line = line.strip()
+    match = re.match(r'#\[(StartTime|BaseTime): ([\d.]+)', line)
+    if match:
+      if match.group(1) == 'StartTime':
+        start_time = float(match.group(2))
+      else:
+        base_time = float(match.group(2))
+      continue
+    if not line or line.startswith('#') or line.startswith('"'):
+      continue
+    fields = line.split(',')
+    tag = None
+    if fields[0].startswith('Tag='):
+      tag = fields.pop(0)[len('Tag='):]
+    start, length = float(fields[0]), float(fields[1])
+    if base_time is not None:
+      start += base_time
+    elif start_time is not None and start < _MAX_RELATIVE_TIME:
+      start += start_time
+    intervals.append(
+        Interval(tag, start, length, DecodeHistogram(fields[3])))
+  return intervals
+
+
+def MergeHistograms(histograms):
+  """Merges histograms into an OrderedDict sorted by value."""
+  merged = collections.Counter()
+  for histogram in histograms:
+    merged.update(histogram)
+  return collections.OrderedDict(sorted(merged.items()))
+
+
+def GetPercentiles(histogram, percentiles):
+  """Returns the values at percentiles of a histogram sorted by value."""
+  total = sum(histogram.values())
+  values = []
+  for percentile in percentiles:
+    # The smallest value at least the percentile of all values are at most.
+    rank = max(int(math.ceil(percentile / 100. * total)), 1)
+    cumulative = 0
+    for value, count in histogram.items():
+      cumulative += count
+      if cumulative >= rank:
+        values.append(value)
+        break
+  return values
+
+
+def GetMean(histogram):
+  """Returns the mean value of a histogram."""
+  return (math.fsum(value * count for value, count in histogram.items()) /
+          sum(histogram.values()))
@@ -0,0 +1,440 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Watch based cache of Kubernetes objects.
+
+An Informer runs one long lived "kubectl get --watch" per kind of object and
+keeps the latest version of every object in memory, so code waiting on pods,
+services or nodes can block on a predicate instead of running kubectl on every
+poll. Changes are seen as soon as the API server reports them.
+
+The informer also records when each pod was scheduled, its image pulled, its
+containers started and the pod ready, which GetPodLatencySamples reports as
+samples.
+"""
+
+import collections
+import datetime
+import json
+import logging
+import subprocess
+import tempfile
+import threading
+import time
+
+from absl import flags
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import sample
+
+FLAGS = flags.FLAGS
+
+PODS = 'pods'
+SERVICES = 'services'
+NODES = 'nodes'
+EVENTS = 'events'
+
+ADDED = 'ADDED'
+MODIFIED = 'MODIFIED'
+DELETED = 'DELETED'
+
+# Seconds to wait before restarting a watch that exited. The delay doubles
+# with every consecutive failure, up to _MAX_RESTART_DELAY.
+_RESTART_DELAY = 1
+_MAX_RESTART_DELAY = 60
+# Consecutive failures of a watch after which it is given up on.
+_MAX_WATCH_FAILURES = 5
+
+PodTimings = collections.namedtuple(
+    'PodTimings', ['created', 'scheduled', 'image_pulled', 'started', 'ready'])
+PodTimings.__doc__ = """When a pod reached each phase.
+
+All times are seconds since the epoch, or None if the phase was not seen. They
+are the timestamps the cluster recorded, so that they do not depend on when
+the informer's watches delivered the changes, with a resolution of a second.
+The time the informer saw the change is used for objects without a timestamp.
+Each time is at least the time of the phases before it.
+
+Attributes:
+  created: The pod was first seen.
+  scheduled: The PodScheduled condition was true.
+  image_pulled: The kubelet reported its image pulled, or already present.
+  started: All of its containers were running.
+  ready: The Ready condition was true.
+"""
+
+# (metric, start phase, end phase) reported by GetPodLatencySamples.
+POD_LATENCY_PHASES = [
+    ('pod_scheduling_latency', 'created', 'scheduled'),
+    ('pod_image_pull_latency', 'scheduled', 'image_pulled'),
+    ('pod_container_start_latency', 'image_pulled', 'started'),
+    ('pod_ready_latency', 'started', 'ready'),
+    ('pod_startup_latency', 'created', 'ready'),
+]
+
+
+class WaitTimeoutError(errors.Error):
+  """Raised when an object does not satisfy a predicate in time."""
+
+
+class WatchError(errors.Error):
+  """Raised when waiting on a kind of object whose watch kept failing."""
+
+
+def _ParseTimestamp(timestamp):
+  """Returns seconds since the epoch of a Kubernetes timestamp or None."""
+  for time_format in ('%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%fZ'):
+    try:
+      return datetime.datetime.strptime(timestamp, time_format).replace(
+          tzinfo=datetime.timezone.utc).timestamp()
+    except (TypeError, ValueError):
+      continue
+  return None
+
+
+def _GetTrueCondition(pod, condition_type):
+  """Returns the pod's condition of condition_type if it is true, or None."""
+  for condition in pod.get('status', {}).get('conditions', []):
+    if condition['type'] == condition_type and condition['status'] == 'True':
+      return condition
+  return None
+
+
+def IsPodReady(pod):
+  """Returns whether the pod's Ready condition is true."""
+  return _GetTrueCondition(pod, 'Ready') is not None
+
+
+def _AreContainersRunning(pod):
+  statuses = pod.get('status', {}).get('containerStatuses', [])
+  return bool(statuses) and all(
+      'running' in status.get('state', {}) for status in statuses)
+
+
+def _GetContainersStartTime(pod):
+  """Returns when the last of the pod's running containers started or None."""
+  start_times = [
+      _ParseTimestamp(status['state']['running'].get('startedAt'))
+      for status in pod['status']['containerStatuses']]
+  return max(start_times) if None not in start_times else None
+
+
+def DecodeJsonStream(lines):
+  """Yields the JSON objects in a stream of lines.
+
+  kubectl prints each watch event as a JSON object that is either on a single
+  line or pretty printed, ending with a line starting with "}".
+
+  Args:
+    lines: iterable of strings.
+
+  Yields:
+    The decoded objects.
+  """
+  buffer = ''
+  for line in lines:
+    buffer += line
+    if not (line.startswith('}') or
+            line.startswith('{') and line.rstrip().endswith('}')):
+      continue
+    try:
+      event = json.loads(buffer)
+    except ValueError:
+      continue
+    buffer = ''
+    yield event
+
+
+class Informer(object):
+  """Caches Kubernetes objects of several kinds from kubectl watches."""
+
+  def __init__(self, kinds=(PODS, SERVICES, NODES, EVENTS)):
+    self.kinds = list(kinds)
+    self._objects = {kind: {} for kind in self.kinds}
+    # Pod name to the pod's uid and the times of the phases it reached.
+    self._pod_phase_times = {}
+    # Kind to the error of a watch that was given up on.
+    self._failures = {}
+    self._condition = threading.Condition()
+    self._processes = {}
+    self._threads = []
+    self._stopped = threading.Event()
+
+  def Start(self):
+    """Starts watching every kind in a background thread."""
+    for kind in self.kinds:
+      thread = threading.Thread(target=self._Watch, args=(kind,),
+                                name='informer-%s' % kind)
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  def Stop(self):
+    """Stops all watches."""
+    self._stopped.set()
+    with self._condition:
+      processes = list(self._processes.values())
+    for process in processes:
+      if process.poll() is None:
+        process.kill()
+    for thread in self._threads:
+      thread.join()
+
+  def _OpenWatch(self, kind, stderr):
+    """Returns a started process whose stdout streams watch events of kind.
+
+    Args:
+      kind: string. Kind of the objects to watch.
+      stderr: file object the process's stderr is written to.
+    """
+    cmd = [FLAGS.kubectl, '--kubeconfig', FLAGS.kubeconfig, 'get', kind,
+           '--watch', '--output-watch-events', '-o', 'json']
+    logging.info('Running: %s', ' '.join(cmd))
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr,
+                            universal_newlines=True)
+
+  def _Watch(self, kind):
+    """Applies watch events of kind until stopped, restarting the watch.
+
+    A watch that exits with an error is restarted with exponential backoff.
+    After _MAX_WATCH_FAILURES consecutive failures without any event, it is
+    given up on and WaitFor raises WatchError for kind.
+
+    Args:
+      kind: string. Kind of the objects to watch.
+    """
+    failures = 0
+    while not self._stopped.is_set():
+      received = False
+      with tempfile.TemporaryFile(mode='w+') as stderr:
+        process = self._OpenWatch(kind, stderr)
+        with self._condition:
+          self._processes[kind] = process
+        if self._stopped.is_set():
+          process.kill()
+        for event in DecodeJsonStream(process.stdout):
+          received = True
+          self._HandleEvent(kind, event)
+        process.wait()
+        stderr.seek(0)
+        error = stderr.read().strip()
+      if self._stopped.is_set():
+        return
+      if received:
+        failures = 0
+      if not process.returncode:
+        logging.info('Watch of %s ended. Restarting it.', kind)
+      else:
+        failures += 1
+        logging.warning('Watch of %s exited with %s: %s', kind,
+                        process.returncode, error)
+        if failures >= _MAX_WATCH_FAILURES:
+          with self._condition:
+            self._failures[kind] = (
+                'Watch of %s failed %d times in a row: %s' %
+                (kind, failures, error))
+            self._condition.notify_all()
+          return
+      self._stopped.wait(
+          min(_RESTART_DELAY * 2**failures, _MAX_RESTART_DELAY))
+
+  def _HandleEvent(self, kind, event):
+    """Applies a watch event to the cache and wakes up waiters."""
+    now = time.time()
+    obj = event['object']
+    name = obj['metadata']['name']
+    with self._condition:
+      if event['type'] == DELETED:
+        self._objects[kind].pop(name, None)
+      else:
+        self._objects[kind][name] = obj
+      if kind == PODS and event['type'] == DELETED:
+        self._pod_phase_times.pop(name, None)
+      elif kind == PODS:
+        self._RecordPodPhases(name, obj, now)
+      elif kind == EVENTS:
+        involved = obj.get('involvedObject', {})
+        if involved.get('kind') == 'Pod' and obj.get('reason') == 'Pulled':
+          self._RecordImagePulled(involved['name'], involved.get('uid'), obj,
+                                  now)
+      self._condition.notify_all()
+
+  def _RecordPodPhases(self, name, pod, now):
+    """Records the phases the pod reached that were not seen before."""
+    times = self._pod_phase_times.get(name)
+    uid = pod['metadata'].get('uid')
+    if times is None or times['uid'] != uid:
+      # A new pod, possibly reusing the name of a deleted one.
+      times = self._pod_phase_times[name] = {'uid': uid}
+    times.setdefault(
+        'created',
+        _ParseTimestamp(pod['metadata'].get('creationTimestamp')) or now)
+    scheduled = _GetTrueCondition(pod, 'PodScheduled')
+    if scheduled is not None:
+      times.setdefault(
+          'scheduled',
+          _ParseTimestamp(scheduled.get('lastTransitionTime')) or now)
+    if _AreContainersRunning(pod):
+      times.setdefault('started', _GetContainersStartTime(pod) or now)
+    ready = _GetTrueCondition(pod, 'Ready')
+    if ready is not None:
+      times.setdefault('ready',
+                       _ParseTimestamp(ready.get('lastTransitionTime')) or now)
+
+  def _RecordImagePulled(self, name, uid, event, now):
+    """Records the time of a Pulled event of a pod.
+
+    Pods with several containers get the time of their last image.
+
+    Args:
+      name: string. Name of the pod.
+      uid: string. uid of the pod.
+      event: dict. The Pulled event.
+      now: float. When the event was received.
+    """
+    times = self._pod_phase_times.get(name)
+    if times is None:
+      times = self._pod_phase_times[name] = {'uid': uid}
+    elif times['uid'] != uid:
+      # The event is about a deleted pod that had the same name.
+      return
+    pulled = (_ParseTimestamp(event.get('lastTimestamp')) or
+              _ParseTimestamp(event.get('eventTime')) or now)
+    times['image_pulled'] = max(times.get('image_pulled', pulled), pulled)
+
+  def Get(self, kind, name):
+    """Returns the latest version of an object or None if it does not exist."""
+    with self._condition:
+      return self._objects[kind].get(name)
+
+  def List(self, kind):
+    """Returns the latest versions of all objects of kind."""
+    with self._condition:
+      return list(self._objects[kind].values())
+
+  def WaitFor(self, kind, name, predicate, timeout=None):
+    """Blocks until an object exists and satisfies predicate.
+
+    Args:
+      kind: string. Kind of the object, e.g. PODS.
+      name: string. Name of the object.
+      predicate: callable taking the object. The wait ends once it returns
+        True. Exceptions it raises are propagated, to stop waiting early.
+      timeout: float. Seconds to wait. Defaults to --default_timeout.
+
+    Returns:
+      The object.
+
+    Raises:
+      WaitTimeoutError: If the object did not satisfy predicate in time.
+      WatchError: If the watch of kind was given up on.
+    """
+    timeout = FLAGS.default_timeout if timeout is None else timeout
+    deadline = time.time() + timeout
+    with self._condition:
+      while True:
+        if kind in self._failures:
+          raise WatchError(self._failures[kind])
+        obj = self._objects[kind].get(name)
+        if obj is not None and predicate(obj):
+          return obj
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          raise WaitTimeoutError(
+              'Timed out after %ss waiting for %s %s.' % (timeout, kind, name))
+        self._condition.wait(remaining)
+
+  def GetPodTimings(self, pod_names=None):
+    """Returns a dict of pod name to PodTimings.
+
+    Timings of a pod are forgotten once it is deleted.
+
+    Args:
+      pod_names: Optional list of pods to return timings for. Defaults to all
+        existing pods seen.
+    """
+    with self._condition:
+      if pod_names is None:
+        pod_names = [name for name, times in self._pod_phase_times.items()
+                     if 'created' in times]
+      return {name: _GetOrderedTimings(name,
+                                       self._pod_phase_times.get(name, {}))
+              for name in pod_names}
+
+  def GetPodLatencySamples(self, pod_names=None, metadata=None):
+    """Returns samples with how long pods took to go through each phase.
+
+    Args:
+      pod_names: Optional list of pods to report. Defaults to all pods seen.
+      metadata: dict. Metadata to add to the samples.
+
+    Returns:
+      A list of sample.Sample objects, one per pod and phase seen.
+    """
+    samples = []
+    for name, timings in sorted(self.GetPodTimings(pod_names).items()):
+      pod_metadata = dict(metadata or {}, pod_name=name)
+      for metric, start, end in POD_LATENCY_PHASES:
+        start_time = getattr(timings, start)
+        end_time = getattr(timings, end)
+        if start_time is not None and end_time is not None:
+          samples.append(sample.Sample(metric, end_time - start_time,
+                                       'seconds', pod_metadata))
+    return samples
+
+
+def _GetOrderedTimings(name, times):
+  """Returns the PodTimings of times, moving phases before earlier ones.
+
+  Timestamps recorded by different components of the cluster can be out of
+  order by clock skew. Such phases are logged and get the time of the phase
+  before them.
+
+  Args:
+    name: string. Name of the pod.
+    times: dict of phase to time.
+  """
+  ordered = {}
+  latest = None
+  for phase in PodTimings._fields:
+    phase_time = times.get(phase)
+    if phase_time is not None and latest is not None and phase_time < latest:
+      logging.warning('Pod %s reached phase %s %.3fs before an earlier phase. '
+                      'Using the time of the earlier phase.', name, phase,
+                      latest - phase_time)
+      phase_time = latest
+    if phase_time is not None:
+      latest = phase_time
+    ordered[phase] = phase_time
+  return PodTimings(**ordered)
+
+
+_informers = {}
+_informers_lock = threading.Lock()
+
+
+def GetInformer():
+  """Returns the started Informer shared by everything using --kubeconfig."""
+  with _informers_lock:
+    if FLAGS.kubeconfig not in _informers:
+      informer = Informer()
+      informer.Start()
+      _informers[FLAGS.kubeconfig] = informer
+    return _informers[FLAGS.kubeconfig]
+
+
+def StopInformer():
+  """Stops the Informer for --kubeconfig if one was started."""
+  with _informers_lock:
+    informer = _informers.pop(FLAGS.kubeconfig, None)
+  if informer:
+    informer.Stop()
@@ -30,6 +30,7 @@ from absl import flags
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import hdr_histogram
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
@@ -146,6 +147,14 @@ flags.DEFINE_string('cassandra_stress_operations', 'insert=1',
                     'run and the ratio of each operation. '
                     'Only valid if --cassandra_stress_command=user.')
 
+flags.DEFINE_boolean('cassandra_stress_hdr_log', False,
+                     'Whether loaders write HdrHistogram interval logs, from '
+                     'which exact latency percentiles across all loaders and '
+                     'their aggregate throughput over time are computed. '
+                     'Requires a cassandra-stress that supports '
+                     '"-log hdrfile=" (Cassandra 3.0 or later). Otherwise the '
+                     'latency percentiles of the loaders are averaged.')
+
 FLAGS = flags.FLAGS
 
 BENCHMARK_NAME = 'cassandra_stress'
@@ -194,6 +203,19 @@ AGGREGATED_METRICS = {'op rate', 'partition rate', 'row rate',
                       'Total partitions', 'Total errors'}
 # Maximum value will be choisen between client vms.
 MAXIMUM_METRICS = {'latency max'}
+# Latency metrics computed from merged HdrHistograms, by percentile.
+HDR_LATENCY_METRICS = collections.OrderedDict([
+    ('latency median', 50),
+    ('latency 95th percentile', 95),
+    ('latency 99th percentile', 99),
+    ('latency 99.9th percentile', 99.9),
+    ('latency max', 100),
+])
+# cassandra-stress tags the histograms of service times, from the start to the
+# end of each operation, with the operation type followed by this suffix.
+HDR_SERVICE_TIME_TAG_SUFFIX = '-st'
+# cassandra-stress records latencies in nanoseconds.
+HDR_VALUES_PER_MS = 1e6
 
 
 def GetConfig(user_config):
@@ -341,6 +363,10 @@ def _ResultFilePath(vm):
                         vm.hostname + '.stress_results.txt')
 
 
+def _HdrFilePath(vm):
+  return posixpath.join(vm_util.VM_TMP_DIR, vm.hostname + '.stress.hdr')
+
+
 def RunTestOnLoader(vm, loader_index, operations_per_vm, data_node_ips,
                     command, user_operations, population_per_vm,
                     population_dist, population_params):
@@ -382,10 +408,13 @@ def RunTestOnLoader(vm, loader_index, operations_per_vm, data_node_ips,
                                               population_params)
   else:
     population_dist = '-pop seq=%s' % population_params
+  log_option = '-log file=%s' % _ResultFilePath(vm)
+  if FLAGS.cassandra_stress_hdr_log:
+    log_option += ' hdrfile=%s interval=1s' % _HdrFilePath(vm)
   vm.RobustRemoteCommand(
       '{cassandra} {command} cl={consistency_level} n={num_keys} '
       '-node {nodes} {schema} {population_dist} '
-      '-log file={result_file} -rate threads={threads} '
+      '{log_option} -rate threads={threads} '
       '-errors retries={retries}'.format(
           cassandra=cassandra.GetCassandraStressPath(vm),
           command=command,
@@ -394,7 +423,7 @@ def RunTestOnLoader(vm, loader_index, operations_per_vm, data_node_ips,
           nodes=','.join(data_node_ips),
           schema=schema_option,
           population_dist=population_dist,
-          result_file=_ResultFilePath(vm),
+          log_option=log_option,
           retries=FLAGS.cassandra_stress_retries,
           threads=FLAGS.num_cassandra_stress_threads))
 
@@ -455,9 +484,95 @@ def CollectResultFile(vm, results):
       results[metric].append(float(value))
 
 
+def CollectHdrLog(vm):
+  """Returns the service time Intervals of the HdrHistogram log on a loader."""
+  log, _ = vm.RemoteCommand('cat ' + _HdrFilePath(vm))
+  intervals = hdr_histogram.ParseIntervalLog(log)
+  return [interval for interval in intervals if interval.tag and
+          interval.tag.endswith(HDR_SERVICE_TIME_TAG_SUFFIX)]
+
+
+def GetHdrLatencies(loader_intervals):
+  """Returns latency metrics from the merged histograms of all loaders.
+
+  Args:
+    loader_intervals: list of lists of service time Intervals, per loader.
+
+  Returns:
+    dict. Latency in milliseconds by metric in RESULTS_METRICS.
+  """
+  histogram = hdr_histogram.MergeHistograms(
+      interval.histogram for intervals in loader_intervals
+      for interval in intervals)
+  if not histogram:
+    return {}
+  latencies = {'latency mean': hdr_histogram.GetMean(histogram)}
+  latencies.update(zip(
+      HDR_LATENCY_METRICS,
+      hdr_histogram.GetPercentiles(histogram,
+                                   HDR_LATENCY_METRICS.values())))
+  return {metric: latency / HDR_VALUES_PER_MS
+          for metric, latency in latencies.items()}
+
+
+def GetHdrThroughput(loader_intervals, metadata):
+  """Returns the aggregate op rate of all loaders over time.
+
+  Operations of each interval are spread evenly over the seconds it overlaps
+  and summed across loaders per second since the epoch. Only the whole
+  seconds all loaders ran throughout are reported, so loaders starting or
+  finishing at different times do not skew the rate.
+
+  Args:
+    loader_intervals: list of lists of service time Intervals, per loader.
+    metadata: dict. Metadata of the samples.
+
+  Returns:
+    List of sample.Sample objects.
+  """
+  loader_intervals = [intervals for intervals in loader_intervals if intervals]
+  if not loader_intervals:
+    return []
+  start = max(math.ceil(min(interval.start for interval in intervals))
+              for intervals in loader_intervals)
+  end = min(math.floor(max(interval.start + interval.length
+                           for interval in intervals))
+            for intervals in loader_intervals)
+  if start >= end:
+    return []
+  ops = collections.defaultdict(float)
+  for intervals in loader_intervals:
+    for interval in intervals:
+      if not interval.length:
+        continue
+      rate = sum(interval.histogram.values()) / interval.length
+      interval_end = interval.start + interval.length
+      for second in range(int(math.floor(interval.start)),
+                          int(math.ceil(interval_end))):
+        overlap = (min(interval_end, second + 1) -
+                   max(interval.start, second))
+        ops[second] += rate * overlap
+  results = []
+  for second in range(int(start), int(end)):
+    results.append(sample.Sample('aggregate op rate', ops[second],
+                                 'operations per second', metadata,
+                                 timestamp=second))
+  results.append(sample.Sample(
+      'aggregate common window op rate',
+      math.fsum(s.value for s in results) / len(results),
+      'operations per second', metadata))
+  results.append(sample.Sample('aggregate common window', end - start,
+                               'seconds', metadata))
+  return results
+
+
 def CollectResults(benchmark_spec, metadata):
   """Collect and parse test results.
 
+  Rates and totals are summed across loaders. With --cassandra_stress_hdr_log
+  latencies are computed from the merged histograms of all loaders, otherwise
+  the latencies of the loaders are averaged.
+
   Args:
     benchmark_spec: The benchmark specification. Contains all data
         that is required to run the benchmark.
@@ -472,9 +587,17 @@ def CollectResults(benchmark_spec, metadata):
   raw_results = collections.defaultdict(list)
   args = [((vm, raw_results), {}) for vm in loader_vms]
   vm_util.RunThreaded(CollectResultFile, args)
+  latencies = {}
+  if FLAGS.cassandra_stress_hdr_log:
+    loader_intervals = vm_util.RunThreaded(CollectHdrLog, loader_vms)
+    latencies = GetHdrLatencies(loader_intervals)
+  metadata = dict(metadata, latency_aggregation=(
+      'merged histograms' if latencies else 'loader average'))
   results = []
   for metric in RESULTS_METRICS:
-    if metric in MAXIMUM_METRICS:
+    if metric in latencies:
+      value = latencies[metric]
+    elif metric in MAXIMUM_METRICS:
       value = max(raw_results[metric])
     else:
       value = math.fsum(raw_results[metric])
@@ -487,6 +610,8 @@ def CollectResults(benchmark_spec, metadata):
     elif metric == 'Total operation time':
       unit = 'seconds'
     results.append(sample.Sample(metric, value, unit, metadata))
+  if latencies:
+    results.extend(GetHdrThroughput(loader_intervals, metadata))
   logging.info('Cassandra results:\n%s', results)
   return results
 
@@ -16,15 +16,19 @@
 
 cp and dd between two attached disks on same vm.
 scp copy across different vms using external networks.
+matrix runs concurrent streams of scp, rsync, tar or dd over ssh between two
+vms for each combination of tool, cipher, compressor and number of streams.
 """
 
 import functools
 import logging
 import posixpath
+import re
 from absl import flags
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
@@ -57,12 +61,31 @@ class CopyThroughputBenchmarkSpec(
     })
     return result
 
-flags.DEFINE_enum('copy_benchmark_mode', 'cp', ['cp', 'dd', 'scp'],
-                  'Runs either cp, dd or scp tests.')
+flags.DEFINE_enum('copy_benchmark_mode', 'cp', ['cp', 'dd', 'scp', 'matrix'],
+                  'Runs either cp, dd, scp or matrix tests.')
 flags.DEFINE_integer('copy_benchmark_single_file_mb', None, 'If set, a '
                      'single file of the specified number of MB is used '
                      'instead of the normal cloud-storage-workload.sh basket '
                      'of files.  Not supported when copy_benchmark_mode is dd')
+flags.DEFINE_boolean('copy_benchmark_direct_io', False,
+                     'Whether dd bypasses the page cache with O_DIRECT when '
+                     'copy_benchmark_mode is dd.')
+flags.DEFINE_list('copy_benchmark_matrix_tools', ['scp', 'rsync', 'tar', 'dd'],
+                  'Tools to copy with in matrix mode. One or more of scp, '
+                  'rsync, tar (piped over ssh) and dd (piped over ssh, '
+                  'bypassing the page cache on both ends with O_DIRECT).')
+flags.DEFINE_list('copy_benchmark_matrix_ciphers', [],
+                  'SSH ciphers to copy with in matrix mode. Defaults to the '
+                  'cipher scp mode uses.')
+flags.DEFINE_list('copy_benchmark_matrix_compressors', ['none'],
+                  'Compressors to copy with in matrix mode. One or more of '
+                  'none, ssh (the compression of ssh itself), gzip and zstd. '
+                  'gzip and zstd are piped, so only apply to tar and dd.')
+flag_util.DEFINE_integerlist(
+    'copy_benchmark_matrix_streams', flag_util.IntegerList([1, 4]),
+    'Numbers of concurrent copy streams in matrix mode. The data files are '
+    'split between the streams, or reused if there are fewer files than '
+    'streams.', module_name=__name__)
 
 FLAGS = flags.FLAGS
 
@@ -83,6 +106,13 @@ BENCHMARK_CONFIG_SPEC_CLASS = CopyThroughputBenchmarkSpec
 # Preferred SCP ciphers, in order of preference:
 CIPHERS = ['aes128-cbc', 'aes128-ctr']
 
+MATRIX_TOOLS = ('scp', 'rsync', 'tar', 'dd')
+MATRIX_COMPRESSORS = ('none', 'ssh', 'gzip', 'zstd')
+# Tools whose data is piped, so can be compressed by a separate process.
+PIPED_TOOLS = ('tar', 'dd')
+PIPED_COMPRESSORS = {'gzip': ('gzip -1', 'gzip -d'),
+                     'zstd': ('zstd -1 -c', 'zstd -d -c')}
+
 DATA_FILE = 'cloud-storage-workload.sh'
 # size of default data
 DEFAULT_DATA_SIZE_IN_MB = 256.1
@@ -98,8 +128,19 @@ def GetConfig(user_config):
         'Flag copy_benchmark_single_file_mb is not supported when flag '
         'copy_benchmark_mode is dd.')
 
+  if FLAGS.copy_benchmark_mode == 'matrix':
+    if not set(FLAGS.copy_benchmark_matrix_tools) <= set(MATRIX_TOOLS):
+      raise errors.Setup.InvalidFlagConfigurationError(
+          'Flag copy_benchmark_matrix_tools must be a list of %s.' %
+          ', '.join(MATRIX_TOOLS))
+    if not (set(FLAGS.copy_benchmark_matrix_compressors) <=
+            set(MATRIX_COMPRESSORS)):
+      raise errors.Setup.InvalidFlagConfigurationError(
+          'Flag copy_benchmark_matrix_compressors must be a list of %s.' %
+          ', '.join(MATRIX_COMPRESSORS))
+
   config = configs.LoadConfig(BENCHMARK_CONFIG, user_config, BENCHMARK_NAME)
-  if FLAGS.copy_benchmark_mode == 'scp':
+  if FLAGS.copy_benchmark_mode in ('scp', 'matrix'):
     config['vm_groups']['default']['vm_count'] = 2
     config['vm_groups']['default']['disk_count'] = 1
   if FLAGS.copy_benchmark_single_file_mb:
@@ -149,6 +190,15 @@ def Prepare(benchmark_spec):
   """
   vms = benchmark_spec.vms
   vm_util.RunThreaded(PreparePrivateKey, vms)
+  if FLAGS.copy_benchmark_mode == 'matrix':
+    packages = []
+    if 'rsync' in FLAGS.copy_benchmark_matrix_tools:
+      packages.append('rsync')
+    if 'zstd' in FLAGS.copy_benchmark_matrix_compressors:
+      packages.append('zstd')
+    if packages:
+      vm_util.RunThreaded(
+          lambda vm: vm.InstallPackages(' '.join(packages)), vms)
 
   args = [((vm, benchmark_spec.config.data_size_in_mb), {})
           for vm in benchmark_spec.vms]
@@ -190,14 +240,18 @@ def RunDd(vms, data_size_in_mb, metadata):
     metadata), as accepted by PerfKitBenchmarkerPublisher.AddSamples.
   """
   vm = vms[0]
+  direct_flags = ''
+  if FLAGS.copy_benchmark_direct_io:
+    direct_flags = ' iflag=direct oflag=direct'
   cmd = ('rm -rf %s/*; sudo sync; sudo sysctl vm.drop_caches=3; '
          'time for i in {0..99}; do dd if=%s/data/file-$i.dat '
-         'of=%s/file-$i.dat bs=262144; done' %
+         'of=%s/file-$i.dat bs=262144%s; done' %
          (vm.GetScratchDir(1), vm.GetScratchDir(0),
-          vm.GetScratchDir(1)))
+          vm.GetScratchDir(1), direct_flags))
   _, res = vm.RemoteCommand(cmd)
   logging.info(res)
   time_used = vm_util.ParseTimeCommandResult(res)
+  metadata = dict(metadata, direct_io=FLAGS.copy_benchmark_direct_io)
   return [sample.Sample('dd throughput', data_size_in_mb / time_used, UNIT,
                         metadata=metadata)]
 
@@ -239,10 +293,221 @@ def RunScp(vms, data_size_in_mb, metadata):
   return result
 
 
+def AssignFilesToStreams(files, num_streams):
+  """Splits files between concurrent copy streams.
+
+  Args:
+    files: list of (name, size in bytes) tuples.
+    num_streams: integer. The number of streams.
+
+  Returns:
+    A list of the lists of files each stream copies. The files are balanced by
+    size if there are at least as many as streams, otherwise stream i copies
+    file i modulo the number of files.
+  """
+  if len(files) < num_streams:
+    return [[files[i % len(files)]] for i in range(num_streams)]
+  streams = [[] for _ in range(num_streams)]
+  sizes = [0] * num_streams
+  for name, size in sorted(files, key=lambda f: (-f[1], f[0])):
+    i = sizes.index(min(sizes))
+    streams[i].append((name, size))
+    sizes[i] += size
+  return streams
+
+
+def MakeStreamCommand(tool, cipher, compressor, source_dir, file_names,
+                      destination):
+  """Returns the command copying files over ssh.
+
+  Args:
+    tool: One of MATRIX_TOOLS.
+    cipher: Name of the SSH cipher to use.
+    compressor: One of MATRIX_COMPRESSORS, valid for the tool.
+    source_dir: The directory of the files on the sending vm.
+    file_names: The names of the files to copy.
+    destination: 'user@host:directory' to copy to.
+
+  Returns:
+    The command to run on the sending vm.
+  """
+  login, target_dir = destination.split(':', 1)
+  options = '-o StrictHostKeyChecking=no -i %s -c %s' % (
+      linux_virtual_machine.REMOTE_KEY_PATH, cipher)
+  if compressor == 'ssh':
+    options += ' -o Compression=yes'
+  ssh = 'ssh ' + options
+  paths = ' '.join(posixpath.join(source_dir, name) for name in file_names)
+  if tool == 'scp':
+    return 'scp %s %s %s/' % (options, paths, destination)
+  if tool == 'rsync':
+    return 'rsync -a --whole-file -e "%s" %s %s/' % (ssh, paths, destination)
+  compress, decompress = PIPED_COMPRESSORS.get(compressor, ('', ''))
+  compress = compress and ' | ' + compress
+  decompress = decompress and decompress + ' | '
+  if tool == 'tar':
+    return 'tar -C %s -cf - %s%s | %s %s "%star -C %s -xf -"' % (
+        source_dir, ' '.join(file_names), compress, ssh, login, decompress,
+        target_dir)
+  # dd
+  return ('for f in %s; do dd if=%s/$f iflag=direct bs=1M status=none%s | '
+          '%s %s "%sdd of=%s/$f oflag=direct iflag=fullblock bs=1M '
+          'status=none" || exit 1; done') % (
+              ' '.join(file_names), source_dir, compress, ssh, login,
+              decompress, target_dir)
+
+
+def _ReadCpuTimes(vm):
+  """Returns the busy and total jiffies of all CPUs of a vm."""
+  stdout, _ = vm.RemoteCommand('head -n 1 /proc/stat')
+  times = [int(t) for t in stdout.split()[1:]]
+  idle = times[3] + (times[4] if len(times) > 4 else 0)  # idle and iowait
+  return sum(times) - idle, sum(times)
+
+
+def _CpuUtilization(before, after):
+  busy = after[0] - before[0]
+  total = after[1] - before[1]
+  return 100.0 * busy / total if total else 0.0
+
+
+def ParseStreamTimes(output, num_streams):
+  """Returns the (start, end) time of each stream from the copy output.
+
+  Raises:
+    errors.Benchmarks.RunError: If a stream did not complete.
+  """
+  times = {}
+  for line in output.splitlines():
+    match = re.match(r'stream (\d+) ([\d.]+) ([\d.]+)$', line.strip())
+    if match:
+      times[int(match.group(1))] = (float(match.group(2)),
+                                    float(match.group(3)))
+  missing = sorted(set(range(num_streams)) - set(times))
+  if missing:
+    raise errors.Benchmarks.RunError(
+        'Copy streams %s did not complete:\n%s' % (missing, output))
+  return [times[i] for i in range(num_streams)]
+
+
+def RunMatrixCombination(sending_vm, receiving_vm, ip_address, files, tool,
+                         cipher, compressor, num_streams, metadata):
+  """Runs concurrent copy streams from sending_vm to receiving_vm.
+
+  Args:
+    sending_vm: The originating VM.
+    receiving_vm: The destination VM.
+    ip_address: The IP address of receiving_vm to copy to.
+    files: list of (name, size in bytes) of the data files on sending_vm.
+    tool: One of MATRIX_TOOLS.
+    cipher: Name of the SSH cipher to use.
+    compressor: One of MATRIX_COMPRESSORS, valid for the tool.
+    num_streams: integer. The number of concurrent streams.
+    metadata: The metadata to attach to the samples.
+
+  Returns:
+    A list of sample.Sample objects with the aggregate throughput, the
+    throughput of each stream and the CPU utilization of both vms.
+  """
+  source_dir = posixpath.join(sending_vm.GetScratchDir(0), 'data')
+  target_dir = posixpath.join(receiving_vm.GetScratchDir(0), 'matrix')
+  streams = AssignFilesToStreams(files, num_streams)
+  stream_commands = []
+  for i, stream_files in enumerate(streams):
+    stream_dir = posixpath.join(target_dir, 'stream-%d' % i)
+    copy = MakeStreamCommand(
+        tool, cipher, compressor, source_dir,
+        [name for name, _ in stream_files],
+        '%s@%s:%s' % (receiving_vm.user_name, ip_address, stream_dir))
+    stream_commands.append(
+        '(start=$(date +%%s.%%N); %s && '
+        'echo "stream %d $start $(date +%%s.%%N)") &' % (copy, i))
+  receiving_vm.RemoteCommand(
+      'rm -rf {0}; mkdir -p {0}/stream-{{0..{1}}}'.format(
+          target_dir, num_streams - 1))
+  vm_util.RunThreaded(
+      lambda vm: vm.RemoteCommand('sudo sync; sudo sysctl vm.drop_caches=3'),
+      [sending_vm, receiving_vm])
+
+  cpu_before = vm_util.RunThreaded(_ReadCpuTimes, [sending_vm, receiving_vm])
+  stdout, _ = sending_vm.RemoteCommand(
+      ' '.join(stream_commands) + ' wait', ignore_failure=True)
+  cpu_after = vm_util.RunThreaded(_ReadCpuTimes, [sending_vm, receiving_vm])
+  receiving_vm.RemoteCommand('rm -rf %s' % target_dir)
+
+  times = ParseStreamTimes(stdout, num_streams)
+  stream_mb = [sum(size for _, size in stream_files) / (1024.0 * 1024.0)
+               for stream_files in streams]
+  metadata = dict(metadata, tool=tool, cipher=cipher, compressor=compressor,
+                  streams=num_streams, total_mb=sum(stream_mb))
+  duration = max(end for _, end in times) - min(start for start, _ in times)
+  results = [sample.Sample('matrix aggregate throughput',
+                           sum(stream_mb) / duration, UNIT, metadata)]
+  for i, (mb, (start, end)) in enumerate(zip(stream_mb, times)):
+    results.append(sample.Sample('matrix stream throughput', mb / (end - start),
+                                 UNIT, dict(metadata, stream=i, stream_mb=mb)))
+  for vm_specifier, before, after in zip(('sending', 'receiving'), cpu_before,
+                                         cpu_after):
+    results.append(sample.Sample(
+        'matrix %s cpu utilization' % vm_specifier,
+        _CpuUtilization(before, after), '%', metadata))
+  return results
+
+
+def RunMatrix(vms, data_size_in_mb, metadata):
+  """Runs copies from vms[0] to vms[1] for each combination of matrix flags.
+
+  The streams of each combination run concurrently and the combinations one
+  after the other. gzip and zstd are only combined with piped tools.
+
+  Args:
+    vms: The vms running the copies.
+    data_size_in_mb: Unused. The size of the copied files is measured.
+    metadata: The metadata to attach to the samples.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  del data_size_in_mb  # unused
+  sending_vm, receiving_vm = vms[:2]
+  stdout, _ = sending_vm.RemoteCommand(
+      "find %s/data -maxdepth 1 -type f -printf '%%f %%s\\n'" %
+      sending_vm.GetScratchDir(0))
+  files = [(name, int(size)) for name, size in
+           (line.split() for line in stdout.splitlines() if line.strip())]
+  ciphers = FLAGS.copy_benchmark_matrix_ciphers or [ChooseSshCipher(vms)]
+  metadata = metadata.copy()
+  for vm_specifier, vm in ('receiving', receiving_vm), ('sending', sending_vm):
+    for k, v in six.iteritems(vm.GetResourceMetadata()):
+      metadata['{0}_{1}'.format(vm_specifier, k)] = v
+
+  ip_addresses = []
+  if vm_util.ShouldRunOnExternalIpAddress():
+    ip_addresses.append((receiving_vm.ip_address, 'external'))
+  if vm_util.ShouldRunOnInternalIpAddress(sending_vm, receiving_vm):
+    ip_addresses.append((receiving_vm.internal_ip, 'internal'))
+
+  results = []
+  for tool in FLAGS.copy_benchmark_matrix_tools:
+    for compressor in FLAGS.copy_benchmark_matrix_compressors:
+      if compressor in PIPED_COMPRESSORS and tool not in PIPED_TOOLS:
+        logging.info('Skipping %s with %s, which is not piped.', compressor,
+                     tool)
+        continue
+      for cipher in ciphers:
+        for num_streams in FLAGS.copy_benchmark_matrix_streams:
+          for ip_address, ip_type in ip_addresses:
+            results.extend(RunMatrixCombination(
+                sending_vm, receiving_vm, ip_address, files, tool, cipher,
+                compressor, num_streams, dict(metadata, ip_type=ip_type)))
+  return results
+
+
 MODE_FUNCTION_DICTIONARY = {
     'cp': RunCp,
     'dd': RunDd,
-    'scp': RunScp}
+    'scp': RunScp,
+    'matrix': RunMatrix}
 
 
 def RunScpSingleDirection(sending_vm, receiving_vm, cipher,
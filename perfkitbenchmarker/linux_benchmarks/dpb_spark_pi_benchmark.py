@@ -112,6 +112,14 @@ def Run(benchmark_spec):
       sample.Sample('wall_time', result.wall_time, 'seconds', metadata))
   results.append(
       sample.Sample('run_time', result.run_time, 'seconds', metadata))
+  if result.pending_time:
+    results.append(
+        sample.Sample('pending_time', result.pending_time, 'seconds',
+                      metadata))
+  for stage_id, stage_time in sorted(result.stage_times.items()):
+    results.append(
+        sample.Sample('stage_run_time', stage_time, 'seconds',
+                      dict(metadata, stage_id=stage_id)))
   return results
 
 
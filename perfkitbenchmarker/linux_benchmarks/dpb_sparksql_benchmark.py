@@ -46,10 +46,11 @@ https://github.com/GoogleCloudPlatform/spark-bigquery-connector.
 
 import json
 import logging
+import math
 import os
 import re
 import time
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from absl import flags
 from perfkitbenchmarker import configs
@@ -60,6 +61,7 @@ from perfkitbenchmarker import sample
 from perfkitbenchmarker import temp_dir
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.dpb_service import BaseDpbService
+from perfkitbenchmarker.linux_packages import spark
 
 BENCHMARK_NAME = 'dpb_sparksql_benchmark'
 
@@ -149,8 +151,32 @@ flags.DEFINE_string(
     'https://github.com/GoogleCloudDataproc/spark-bigquery-connector#properties'
 )
 
+_TUNE = flags.DEFINE_bool(
+    'dpb_sparksql_tune', False,
+    'Before running the benchmark, search for the Spark configuration that '
+    'runs --dpb_sparksql_tune_queries fastest and run the benchmark with it. '
+    'Candidate configurations are eliminated by successive halving: each '
+    'round runs the remaining candidates on a growing prefix of the queries '
+    'and keeps the fastest half. Only supported by unmanaged_spark_cluster '
+    'and kubernetes_spark_cluster.')
+_TUNE_QUERIES = flags.DEFINE_list(
+    'dpb_sparksql_tune_queries', [],
+    'The queries to tune the Spark configuration with, in order. Defaults to '
+    '--dpb_sparksql_order.')
+_TUNE_CANDIDATES = flags.DEFINE_integer(
+    'dpb_sparksql_tune_candidates', 8,
+    'Number of Spark configurations to try, including the default one.',
+    lower_bound=2)
+_TUNE_SEED = flags.DEFINE_integer(
+    'dpb_sparksql_tune_seed', 0,
+    'Seed for sampling the Spark configurations to try.')
+
 FLAGS = flags.FLAGS
 
+# Fraction of the candidate Spark configurations eliminated in each round of
+# tuning is 1 - 1 / _TUNING_ETA.
+_TUNING_ETA = 2
+
 # Creates spark table using pyspark by loading the parquet data.
 # Args:
 # argv[1]: string, The table name in the dataset that this script will create.
@@ -197,6 +223,17 @@ def CheckPrerequisites(benchmark_config):
   if not FLAGS.dpb_sparksql_order:
     raise errors.Config.InvalidValue(
         'You must specify the queries to run with --dpb_sparksql_order')
+  if _TUNE.value:
+    if dpb_service_type not in (dpb_service.UNMANAGED_SPARK_CLUSTER,
+                                dpb_service.KUBERNETES_SPARK_CLUSTER):
+      raise errors.Config.InvalidValue(
+          f'--dpb_sparksql_tune is not supported by {dpb_service_type}.')
+    unknown_queries = (
+        set(_TUNE_QUERIES.value) - set(FLAGS.dpb_sparksql_order))
+    if unknown_queries:
+      raise errors.Config.InvalidValue(
+          f'--dpb_sparksql_tune_queries {sorted(unknown_queries)} are not in '
+          '--dpb_sparksql_order.')
 
 
 def Prepare(benchmark_spec):
@@ -283,25 +320,58 @@ def Run(benchmark_spec):
     Benchmarks.RunError if no query succeeds.
   """
   cluster = benchmark_spec.dpb_service
-  storage_service = cluster.storage_service
   metadata = benchmark_spec.dpb_service.GetMetadata()
 
   metadata['benchmark'] = BENCHMARK_NAMES[FLAGS.dpb_sparksql_query]
 
-  # Run PySpark Spark SQL Runner
-  report_dir = '/'.join([cluster.base_dir, f'report-{int(time.time()*1000)}'])
-  args = [
-      '--sql-scripts',
-      ','.join(benchmark_spec.staged_queries),
-      '--report-dir',
-      report_dir,
-  ]
+  runner_args = _GetRunnerArgs(benchmark_spec)
+  results = []
+  properties = None
+  if _TUNE.value:
+    properties, tuning_samples = _TuneSparkConfiguration(
+        benchmark_spec, runner_args, metadata)
+    results += tuning_samples
+    metadata['spark_tuned_properties'] = json.dumps(properties, sort_keys=True)
+
+  job_result, run_times = _RunQueries(
+      benchmark_spec, runner_args, FLAGS.dpb_sparksql_order, properties)
+  if not run_times:
+    raise errors.Benchmarks.RunError('No query succeeded.')
+
+  for query_id, run_time in run_times.items():
+    metadata_copy = metadata.copy()
+    metadata_copy['query'] = query_id
+    results.append(
+        sample.Sample('sparksql_run_time', run_time, 'seconds', metadata_copy))
+
+  metadata['failing_queries'] = ','.join(
+      sorted(set(FLAGS.dpb_sparksql_order) - set(run_times)))
+
+  results.append(
+      sample.Sample('sparksql_total_wall_time', job_result.wall_time, 'seconds',
+                    metadata))
+  results.append(
+      sample.Sample('sparksql_geomean_run_time',
+                    sample.GeoMean(run_times.values()), 'seconds', metadata))
+  cluster_create_time = cluster.GetClusterCreateTime()
+  if cluster_create_time is not None:
+    results.append(
+        sample.Sample('dpb_cluster_create_time', cluster_create_time, 'seconds',
+                      metadata))
+  return results
+
+
+def _GetRunnerArgs(benchmark_spec) -> List[str]:
+  """Returns the arguments of the Spark SQL runner common to all jobs."""
+  cluster = benchmark_spec.dpb_service
+  args = []
   if FLAGS.dpb_sparksql_database:
     args += ['--database', FLAGS.dpb_sparksql_database]
   table_metadata = _GetTableMetadata(benchmark_spec)
   if table_metadata:
     table_metadata_file = '/'.join([cluster.base_dir, 'metadata.json'])
-    _StageMetadata(table_metadata, storage_service, table_metadata_file)
+    _StageMetadata(table_metadata, cluster.storage_service,
+                   table_metadata_file)
     args += ['--table-metadata', table_metadata_file]
   else:
     # If we don't pass in tables, we must be reading from hive.
@@ -312,6 +382,42 @@ def Run(benchmark_spec):
     args += ['--table-cache', FLAGS.dpb_sparksql_table_cache]
   if FLAGS.dpb_sparksql_simultaneous:
     args += ['--simultaneous', 'True']
+  return args
+
+
+def _RunQueries(
+    benchmark_spec,
+    runner_args: List[str],
+    queries: List[str],
+    properties: Optional[Dict[str, str]] = None
+) -> Tuple[dpb_service.JobResult, Dict[str, float]]:
+  """Runs queries in a single job of the Spark SQL runner.
+
+  Args:
+    benchmark_spec: Spec needed to run the Spark SQL.
+    runner_args: The arguments from _GetRunnerArgs.
+    queries: The IDs of the queries to run.
+    properties: Spark properties to run the job with.
+
+  Returns:
+    The JobResult of the job and the run time of each query that succeeded.
+
+  Raises:
+    JobSubmissionError if the job fails.
+  """
+  cluster = benchmark_spec.dpb_service
+  storage_service = cluster.storage_service
+  staged_queries = dict(
+      zip(FLAGS.dpb_sparksql_order, benchmark_spec.staged_queries))
+
+  # Run PySpark Spark SQL Runner
+  report_dir = '/'.join([cluster.base_dir, f'report-{int(time.time()*1000)}'])
+  args = [
+      '--sql-scripts',
+      ','.join(staged_queries[query] for query in queries),
+      '--report-dir',
+      report_dir,
+  ] + runner_args
   jars = []
   if FLAGS.spark_bigquery_connector:
     jars.append(FLAGS.spark_bigquery_connector)
@@ -319,7 +425,8 @@ def Run(benchmark_spec):
       pyspark_file='/'.join([cluster.base_dir, SPARK_SQL_RUNNER_SCRIPT]),
       job_arguments=args,
       job_jars=jars,
-      job_type=dpb_service.BaseDpbService.PYSPARK_JOB_TYPE)
+      job_type=dpb_service.BaseDpbService.PYSPARK_JOB_TYPE,
+      properties=properties)
 
   # Spark can only write data to directories not files. So do a recursive copy
   # of that directory and then search it for the single JSON file with the
@@ -336,38 +443,105 @@ def Run(benchmark_spec):
   if not report_file:
     raise errors.Benchmarks.RunError('Job report not found.')
 
-  results = []
   run_times = {}
-  passing_queries = set()
   with open(report_file, 'r') as file:
     for line in file:
       result = json.loads(line)
       logging.info('Timing: %s', result)
       query_id = _GetQueryId(result['script'])
       assert query_id
-      passing_queries.add(query_id)
-      metadata_copy = metadata.copy()
-      metadata_copy['query'] = query_id
-      results.append(
-          sample.Sample('sparksql_run_time', result['duration'], 'seconds',
-                        metadata_copy))
       run_times[query_id] = result['duration']
+  return job_result, run_times
 
-  metadata['failing_queries'] = ','.join(
-      sorted(set(FLAGS.dpb_sparksql_order) - passing_queries))
 
-  results.append(
-      sample.Sample('sparksql_total_wall_time', job_result.wall_time, 'seconds',
-                    metadata))
-  results.append(
-      sample.Sample('sparksql_geomean_run_time',
-                    sample.GeoMean(run_times.values()), 'seconds', metadata))
-  cluster_create_time = cluster.GetClusterCreateTime()
-  if cluster_create_time is not None:
-    results.append(
-        sample.Sample('dpb_cluster_create_time', cluster_create_time, 'seconds',
-                      metadata))
-  return results
+def _TuneSparkConfiguration(
+    benchmark_spec, runner_args: List[str], metadata: Dict[str, str]
+) -> Tuple[Dict[str, str], List[sample.Sample]]:
+  """Searches for the Spark configuration that runs queries fastest.
+
+  Candidates from spark.GetTuningCandidates are eliminated by successive
+  halving. Each round runs the remaining candidates on a prefix of
+  --dpb_sparksql_tune_queries, growing to all of them in the last round, and
+  keeps the fastest 1 / _TUNING_ETA of them.
+
+  Args:
+    benchmark_spec: Spec needed to run the Spark SQL.
+    runner_args: The arguments from _GetRunnerArgs.
+    metadata: Metadata for the samples.
+
+  Returns:
+    The best Spark properties and samples of the search.
+  """
+  cluster = benchmark_spec.dpb_service
+  queries = _TUNE_QUERIES.value or FLAGS.dpb_sparksql_order
+  candidates = spark.GetTuningCandidates(cluster.GetSparkConfiguration(),
+                                         _TUNE_CANDIDATES.value,
+                                         _TUNE_SEED.value)
+  samples = []
+  start_time = time.time()
+
+  def Evaluate(candidate, tuning_round, num_queries):
+    """Returns the total run time of a candidate on a prefix of queries."""
+    try:
+      _, run_times = _RunQueries(benchmark_spec, runner_args,
+                                 queries[:num_queries], candidates[candidate])
+    except dpb_service.JobSubmissionError as e:
+      logging.warning('Spark configuration %s failed: %s',
+                      candidates[candidate], e)
+      return math.inf
+    if len(run_times) < num_queries:
+      logging.warning('Spark configuration %s failed queries %s.',
+                      candidates[candidate],
+                      sorted(set(queries[:num_queries]) - set(run_times)))
+      return math.inf
+    run_time = sum(run_times.values())
+    samples.append(
+        sample.Sample(
+            'sparksql_tuning_run_time', run_time, 'seconds',
+            dict(metadata,
+                 tuning_round=tuning_round,
+                 tuning_candidate=candidate,
+                 tuning_queries=','.join(queries[:num_queries]),
+                 spark_properties=json.dumps(candidates[candidate],
+                                             sort_keys=True))))
+    return run_time
+
+  survivors = list(range(len(candidates)))
+  num_rounds = max(1, math.ceil(math.log(len(candidates), _TUNING_ETA)))
+  for tuning_round in range(num_rounds):
+    num_queries = math.ceil(
+        len(queries) / _TUNING_ETA**(num_rounds - 1 - tuning_round))
+    run_times = {
+        candidate: Evaluate(candidate, tuning_round, num_queries)
+        for candidate in survivors
+    }
+    survivors.sort(key=run_times.get)
+    survivors = survivors[:math.ceil(len(survivors) / _TUNING_ETA)]
+  best = survivors[0]
+  best_run_time = run_times[best]
+  if math.isinf(best_run_time):
+    raise errors.Benchmarks.RunError(
+        'All Spark configurations failed while tuning.')
+  # The default configuration may have been eliminated before the last round.
+  if 0 in run_times:
+    baseline_run_time = run_times[0]
+  else:
+    baseline_run_time = Evaluate(0, 'baseline', num_queries)
+
+  tuned_metadata = dict(
+      metadata,
+      tuning_candidates=len(candidates),
+      tuning_queries=','.join(queries),
+      spark_properties=json.dumps(candidates[best], sort_keys=True))
+  samples.append(
+      sample.Sample('sparksql_tuning_time', time.time() - start_time,
+                    'seconds', tuned_metadata))
+  if not math.isinf(baseline_run_time):
+    samples.append(
+        sample.Sample('sparksql_tuning_speedup',
+                      baseline_run_time / best_run_time, '', tuned_metadata))
+  logging.info('Tuned Spark configuration: %s', candidates[best])
+  return candidates[best], samples
 
 
 def _GetTableMetadata(benchmark_spec):
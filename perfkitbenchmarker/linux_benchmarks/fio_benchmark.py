@@ -31,8 +31,10 @@ import jinja2
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import file_transfer
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import steady_state
 from perfkitbenchmarker import units
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import fio
@@ -190,6 +192,40 @@ _DIRECT_IO = flags.DEFINE_boolean(
     'fio_direct', True,
     'Whether to use O_DIRECT to bypass OS cache. This is strongly '
     'recommended, but not supported by all files.')
+_COMPRESSED_LOG_TRANSFER = flags.DEFINE_boolean(
+    'fio_compressed_log_transfer', False,
+    'Whether to copy fio logs back in one compressed archive with '
+    'file_transfer.PullFiles rather than with scp. Adds samples with the '
+    'transfer time and size.')
+_CLIENT_SERVER = flags.DEFINE_boolean(
+    'fio_client_server', False,
+    'Whether to coordinate fio on all VMs using fio\'s client/server mode. '
+    'Each VM runs a fio server and a single fio client on the first VM '
+    'starts every server\'s jobs at the same time, so that they overlap. '
+    'Results aggregated across VMs sum the bandwidth and IOPS each server '
+    'averaged over its own run. Useful with '
+    '--fio_write_against_multiple_clients against shared filesystems. fio '
+    'log collection is not supported in this mode.')
+
+_STEADY_STATE = steady_state.DEFINE_criterion(
+    'fio_steady_state', None,
+    'If set, each fio job stops as soon as this steady state criterion is '
+    'met instead of always running for --fio_runtime, which becomes the '
+    'maximum runtime. Uses fio\'s steadystate option, e.g. iops_slope:0.3%, '
+    'iops:2%, bw_slope:0.5% or bw:1%. Time to steady state and the steady '
+    'state window are reported as samples.')
+_STEADY_STATE_DURATION = flags.DEFINE_integer(
+    'fio_steady_state_duration', 60,
+    'Length, in seconds, of the window over which --fio_steady_state must '
+    'hold.', lower_bound=1)
+_STEADY_STATE_RAMP_TIME = flags.DEFINE_integer(
+    'fio_steady_state_ramp_time', 0,
+    'Seconds at the start of each job to ignore when checking '
+    '--fio_steady_state.', lower_bound=0)
+flags.register_validator(
+    'fio_steady_state',
+    lambda criterion: criterion is None or criterion.metric in ('iops', 'bw'),
+    message='fio can only detect steady state of iops or bw.')
 
 
 FLAGS_IGNORED_FOR_CUSTOM_JOBFILE = {
@@ -541,6 +577,11 @@ def WarnOnBadFlags():
       logging.warning('Fio job file specified. Ignoring options "%s"',
                       ', '.join(ignored_flags))
 
+  if _CLIENT_SERVER.value and any([
+      FLAGS.fio_lat_log, FLAGS.fio_bw_log, FLAGS.fio_iops_log,
+      FLAGS.fio_hist_log]):
+    logging.warning('fio logs are not collected with --fio_client_server.')
+
   if (FLAGS.fio_jobfile is None and
       FLAGS.fio_generate_scenarios and
       not FLAGS.fio_working_set_size and
@@ -630,6 +671,8 @@ def PrepareWithExec(vm, exec_path):
   if FLAGS.fio_write_against_multiple_clients:
     vm.RemoteCommand('sudo rm -rf %s/%s' % (disk.mount_point, vm.name))
     vm.RemoteCommand('sudo mkdir -p %s/%s' % (disk.mount_point, vm.name))
+  if _CLIENT_SERVER.value:
+    fio.StartServer(vm)
 
 
 def Run(benchmark_spec):
@@ -639,6 +682,14 @@ def Run(benchmark_spec):
   vms = benchmark_spec.vms
   samples = []
 
+  if _CLIENT_SERVER.value:
+    samples = RunClientServer(vms, default_job_file_contents)
+    for item in samples:
+      item.metadata['fio_target_mode'] = FLAGS.fio_target_mode
+      item.metadata['fio_fill_size'] = FLAGS.fio_fill_size
+      item.metadata['fio_rng'] = FLAGS.fio_rng
+    return samples
+
   path = REMOTE_JOB_FILE_PATH
   samples_list = vm_util.RunThreaded(
       lambda vm: RunWithExec(vm, fio_exe, path, default_job_file_contents), vms)
@@ -680,31 +731,22 @@ def Run(benchmark_spec):
   return samples
 
 
-def RunWithExec(vm, exec_path, remote_job_file_path, job_file_contents):
-  """Spawn fio and gather the results.
-
-  Args:
-    vm: vm to run the benchmark on.
-    exec_path: string path to the fio executable.
-    remote_job_file_path: path, on the vm, to the location of the job file.
-    job_file_contents: string contents of the fio job file.
-
-  Returns:
-    A list of sample.Sample objects.
-  """
-  logging.info('FIO running on %s', vm)
-
-  disk = vm.scratch_disks[0]
-  mount_point = disk.mount_point
+def _GetMountPoint(vm):
+  """Returns the directory fio should run in on the vm."""
+  mount_point = vm.scratch_disks[0].mount_point
   if FLAGS.fio_write_against_multiple_clients:
-    mount_point = '%s/%s' % (disk.mount_point, vm.name)
+    mount_point = '%s/%s' % (mount_point, vm.name)
     logging.info('FIO mount point changed to %s', mount_point)
+  return mount_point
+
 
+def _GetJobFileString(vm, job_file_contents):
+  """Returns the job file for the vm's first scratch disk."""
   job_file_string = GetOrGenerateJobFileString(
       FLAGS.fio_jobfile,
       FLAGS.fio_generate_scenarios,
       AgainstDevice(),
-      disk,
+      vm.scratch_disks[0],
       FLAGS.fio_io_depths,
       FLAGS.fio_num_jobs,
       FLAGS.fio_working_set_size,
@@ -713,12 +755,124 @@ def RunWithExec(vm, exec_path, remote_job_file_path, job_file_contents):
       _DIRECT_IO.value,
       FLAGS.fio_parameters,
       job_file_contents)
+  if _STEADY_STATE.value:
+    job_file_string = AddGlobalParameters(job_file_string, [
+        'steadystate=%s' % _STEADY_STATE.value,
+        'steadystate_duration=%d' % _STEADY_STATE_DURATION.value,
+        'steadystate_ramp_time=%d' % _STEADY_STATE_RAMP_TIME.value])
+  return job_file_string
+
+
+def _WriteLocalJobFile(vm, job_file_string):
+  """Writes the vm's job file to the temp dir and returns its path."""
   job_file_path = vm_util.PrependTempDir(vm.name + LOCAL_JOB_FILE_SUFFIX)
   with open(job_file_path, 'w') as job_file:
     job_file.write(job_file_string)
     logging.info('Wrote fio job file at %s', job_file_path)
     logging.info(job_file_string)
+  return job_file_path
+
+
+def AddGlobalParameters(job_file_string, parameters):
+  """Adds parameters to the [global] section of a job file.
+
+  Args:
+    job_file_string: string. The contents of a fio job file.
+    parameters: list of "param=value" strings.
+
+  Returns:
+    The job file with the parameters at the start of its [global] section,
+    which is created if the job file does not have one.
+  """
+  parameter_lines = ''.join(parameter + '\n' for parameter in parameters)
+  global_section = re.search(r'^\[global\][ \t]*\n', job_file_string,
+                             re.MULTILINE)
+  if not global_section:
+    return '[global]\n' + parameter_lines + job_file_string
+  return (job_file_string[:global_section.end()] + parameter_lines +
+          job_file_string[global_section.end():])
+
+
+def _GetClientServerJobFilePath(vm):
+  """Returns the path of vm's job file on the vm running the fio client."""
+  return posixpath.join(vm_util.VM_TMP_DIR, vm.name + LOCAL_JOB_FILE_SUFFIX)
+
+
+def RunClientServer(vms, job_file_contents):
+  """Runs fio on all vms at once from a fio client on the first vm.
+
+  Every vm runs a fio server (see PrepareWithExec). The client sends each
+  server its job file and starts all of them together, so that their jobs
+  overlap in time and their results can be summed.
 
+  Args:
+    vms: list of vms running fio servers.
+    job_file_contents: string contents of the fio job file.
+
+  Returns:
+    A list of sample.Sample objects, aggregated across vms as well as per vm.
+  """
+  controller = vms[0]
+  logging.info('FIO client running on %s for %d servers', controller,
+               len(vms))
+
+  def _PushJobFile(vm):
+    if AgainstDevice():
+      target = 'filename=%s' % vm.scratch_disks[0].GetDevicePath()
+    else:
+      target = 'directory=%s' % _GetMountPoint(vm)
+    job_file_string = AddGlobalParameters(
+        _GetJobFileString(vm, job_file_contents),
+        [target, 'random_generator=%s' % FLAGS.fio_rng])
+    remote_job_file_path = _GetClientServerJobFilePath(vm)
+    controller.PushFile(_WriteLocalJobFile(vm, job_file_string),
+                        remote_job_file_path)
+    return job_file_string, remote_job_file_path
+
+  job_files = vm_util.RunThreaded(_PushJobFile, vms)
+  fio_command = fio.GetClientCommand(
+      [(vm.internal_ip, remote_job_file_path)
+       for vm, (_, remote_job_file_path) in zip(vms, job_files)])
+
+  logging.info('FIO Results:')
+  start_time = time.time()
+  stdout, _ = controller.RobustRemoteCommand(
+      fio_command, should_log=True, timeout=FLAGS.fio_command_timeout_sec)
+  end_time = time.time()
+
+  # The client may log connection messages before the json output.
+  fio_json_result = json.loads(stdout[stdout.index('{'):])
+  samples = fio.ParseClientServerResults(job_files[0][0], fio_json_result)
+  # fio identifies each server by the host passed to --client.
+  hosts = [vm.internal_ip for vm in vms]
+  for item in samples:
+    host = item.metadata.get('fio_client_hostname')
+    if host in hosts:
+      item.metadata['machine_instance'] = hosts.index(host)
+  metadata = {'fio_clients': len(vms)}
+  samples.append(sample.Sample('start_time', start_time, 'sec', metadata))
+  samples.append(sample.Sample('end_time', end_time, 'sec', metadata))
+  return samples
+
+
+def RunWithExec(vm, exec_path, remote_job_file_path, job_file_contents):
+  """Spawn fio and gather the results.
+
+  Args:
+    vm: vm to run the benchmark on.
+    exec_path: string path to the fio executable.
+    remote_job_file_path: path, on the vm, to the location of the job file.
+    job_file_contents: string contents of the fio job file.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  logging.info('FIO running on %s', vm)
+
+  disk = vm.scratch_disks[0]
+  mount_point = _GetMountPoint(vm)
+  job_file_string = _GetJobFileString(vm, job_file_contents)
+  job_file_path = _WriteLocalJobFile(vm, job_file_string)
   vm.PushFile(job_file_path, remote_job_file_path)
 
   if AgainstDevice():
@@ -750,8 +904,13 @@ def RunWithExec(vm, exec_path, remote_job_file_path, job_file_contents):
       fio_command, should_log=True, timeout=FLAGS.fio_command_timeout_sec)
   end_time = time.time()
   bin_vals = []
+  transfer_samples = []
   if collect_logs:
-    vm.PullFile(vm_util.GetTempDir(), '%s*.log' % log_file_base)
+    if _COMPRESSED_LOG_TRANSFER.value:
+      transfer_samples = file_transfer.PullFiles(
+          vm, vm_util.GetTempDir(), ['%s*.log' % log_file_base])
+    else:
+      vm.PullFile(vm_util.GetTempDir(), '%s*.log' % log_file_base)
     if FLAGS.fio_hist_log:
       num_logs = int(vm.RemoteCommand(
           'ls %s_clat_hist.*.log | wc -l' % log_file_base)[0])
@@ -765,6 +924,7 @@ def RunWithExec(vm, exec_path, remote_job_file_path, job_file_contents):
       sample.Sample('start_time', start_time, 'sec', samples[0].metadata))
   samples.append(
       sample.Sample('end_time', end_time, 'sec', samples[0].metadata))
+  samples.extend(transfer_samples)
 
   return samples
 
@@ -778,6 +938,10 @@ def Cleanup(benchmark_spec):
   """
   vm = benchmark_spec.vms[0]
   logging.info('FIO Cleanup up on %s', vm)
+  if _CLIENT_SERVER.value:
+    vm_util.RunThreaded(fio.StopServer, benchmark_spec.vms)
+    for server_vm in benchmark_spec.vms:
+      vm.RemoveFile(_GetClientServerJobFilePath(server_vm))
   vm.RemoveFile(REMOTE_JOB_FILE_PATH)
   if not AgainstDevice() and not FLAGS.fio_jobfile:
     # If the user supplies their own job file, then they have to clean
@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import datetime
+import logging
 import os
+import time
 
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import sample
@@ -66,9 +67,14 @@ def Run(benchmark_spec):
   paths = _Paths(vm)
 
   def time_command(command):
-    start = datetime.datetime.now()
-    vm.RemoteCommand(command)
-    return (datetime.datetime.now() - start).total_seconds()
+    """Returns a dict with the wall_time of command and its resource usage."""
+    start_time = time.time()
+    _, _, timing = vm.TimedRemoteCommand(command)
+    if timing is None:
+      logging.warning('Could not time "%s" on the VM. Using the time measured '
+                      'on the runner instead.', command)
+      return {'wall_time': time.time() - start_time}
+    return timing._asdict()
 
   def make(target=''):
     return time_command(
@@ -89,10 +95,11 @@ def Run(benchmark_spec):
   warm_build_time = make()
 
   return [
-      sample.Sample('Untar time', untar_time, 'seconds'),
-      sample.Sample('Cold build time', cold_build_time, 'seconds'),
-      sample.Sample('Clean time', clean_time, 'seconds'),
-      sample.Sample('Warm build time', warm_build_time, 'seconds'),
+      sample.Sample(metric, timing['wall_time'], 'seconds', timing)
+      for metric, timing in (('Untar time', untar_time),
+                             ('Cold build time', cold_build_time),
+                             ('Clean time', clean_time),
+                             ('Warm build time', warm_build_time))
   ]
 
 
@@ -0,0 +1,186 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Records the time it takes Kubernetes pods to start.
+
+Launches many pods at once or at a fixed rate and breaks down the time each
+took to start into scheduling, image pull, container start and readiness, as
+seen by the cluster's kubernetes_informer. Reports the distribution of each
+phase across pods and the rate at which the cluster made pods ready.
+"""
+
+import time
+
+from absl import flags
+from perfkitbenchmarker import configs
+from perfkitbenchmarker import container_service
+from perfkitbenchmarker import kubernetes_informer
+from perfkitbenchmarker import sample
+
+BENCHMARK_NAME = 'kubernetes_pod_startup'
+BENCHMARK_CONFIG = """
+kubernetes_pod_startup:
+  description: >
+      Launch pods on a Kubernetes cluster and record how long each phase of
+      their startup takes. Specify the number of pods with
+      --pod_startup_num_pods.
+  container_specs:
+    pod_startup:
+      image: k8s.gcr.io/pause:3.6
+  container_cluster:
+    type: Kubernetes
+    vm_count: 3
+    vm_spec:
+      AWS:
+        zone: us-east-1a
+        machine_type: m5.xlarge
+      Azure:
+        zone: westus
+        machine_type: Standard_D4s_v3
+      GCP:
+        machine_type: n2-standard-4
+        zone: us-central1-a
+"""
+
+BURST = 'burst'
+RAMP = 'ramp'
+
+_NUM_PODS = flags.DEFINE_integer(
+    'pod_startup_num_pods', 100, 'Number of pods to launch.')
+_MODE = flags.DEFINE_enum(
+    'pod_startup_mode', BURST, [BURST, RAMP],
+    'Whether to create all pods at once (burst) or at '
+    '--pod_startup_pods_per_second (ramp).')
+_PODS_PER_SECOND = flags.DEFINE_integer(
+    'pod_startup_pods_per_second', 10,
+    'Number of pods to create every second with --pod_startup_mode=ramp.')
+_IMAGE_PULL_POLICY = flags.DEFINE_enum(
+    'pod_startup_image_pull_policy', 'Always', ['Always', 'IfNotPresent'],
+    'Image pull policy of the pods. Always includes pulling the image in '
+    'every pod\'s startup.')
+_TIMEOUT = flags.DEFINE_integer(
+    'pod_startup_timeout', 1200,
+    'Seconds to wait for all the pods to become ready.')
+
+FLAGS = flags.FLAGS
+
+_MANIFEST = 'container/kubernetes_pod_startup/pods.yaml.j2'
+_POD_NAME_PREFIX = 'pkb-pod-startup-'
+_PERCENTILES = (50, 90, 99, 100)
+
+
+def GetConfig(user_config):
+  return configs.LoadConfig(BENCHMARK_CONFIG, user_config, BENCHMARK_NAME)
+
+
+def Prepare(unused_benchmark_spec):
+  """Starts watching the cluster so the pods are seen from their creation.
+
+  Args:
+    unused_benchmark_spec: The benchmark specification. Contains all data that
+        is required to run the benchmark.
+  """
+  kubernetes_informer.GetInformer()
+
+
+def _GetBatches(pod_names):
+  """Returns the lists of pods to create, one per second."""
+  if _MODE.value == BURST:
+    return [pod_names]
+  batch_size = _PODS_PER_SECOND.value
+  return [pod_names[i:i + batch_size]
+          for i in range(0, len(pod_names), batch_size)]
+
+
+def _IsReady(pod):
+  if pod['status'].get('phase') == 'Failed':
+    raise container_service.FatalContainerException(
+        'Pod %s failed.' % pod['metadata']['name'])
+  return kubernetes_informer.IsPodReady(pod)
+
+
+def _GetPhaseSamples(pod_timings, metadata):
+  """Returns samples with the distribution of each phase's latency."""
+  samples = []
+  for metric, start, end in kubernetes_informer.POD_LATENCY_PHASES:
+    latencies = [getattr(timings, end) - getattr(timings, start)
+                 for timings in pod_timings
+                 if getattr(timings, start) is not None and
+                 getattr(timings, end) is not None]
+    if not latencies:
+      continue
+    stats = sample.PercentileCalculator(latencies, _PERCENTILES)
+    phase_metadata = dict(metadata, num_pods_with_phase=len(latencies))
+    for stat in ['p%s' % p for p in _PERCENTILES] + ['average', 'stddev']:
+      samples.append(sample.Sample('%s_%s' % (metric, stat), stats[stat],
+                                   'seconds', phase_metadata))
+  return samples
+
+
+def Run(benchmark_spec):
+  """Launches the pods and measures how long they take to become ready.
+
+  Args:
+    benchmark_spec: The benchmark specification. Contains all data that is
+        required to run the benchmark.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  cluster = benchmark_spec.container_cluster
+  image = benchmark_spec.container_specs['pod_startup'].image
+  informer = kubernetes_informer.GetInformer()
+  pod_names = ['%s%d' % (_POD_NAME_PREFIX, i) for i in range(_NUM_PODS.value)]
+  metadata = {
+      'num_pods': _NUM_PODS.value,
+      'pod_startup_mode': _MODE.value,
+      'image': image,
+      'image_pull_policy': _IMAGE_PULL_POLICY.value,
+      'num_nodes': cluster.num_nodes,
+  }
+  if _MODE.value == RAMP:
+    metadata['pods_per_second'] = _PODS_PER_SECOND.value
+
+  start_time = time.time()
+  for i, batch in enumerate(_GetBatches(pod_names)):
+    time.sleep(max(0, start_time + i - time.time()))
+    cluster.ApplyManifest(_MANIFEST, pod_names=batch, image=image,
+                          image_pull_policy=_IMAGE_PULL_POLICY.value)
+  deadline = start_time + _TIMEOUT.value
+  for pod_name in pod_names:
+    informer.WaitFor(kubernetes_informer.PODS, pod_name, _IsReady,
+                     timeout=max(0, deadline - time.time()))
+
+  pod_timings = list(informer.GetPodTimings(pod_names).values())
+  first_created = min(timings.created for timings in pod_timings)
+  last_ready = max(timings.ready for timings in pod_timings)
+  samples = _GetPhaseSamples(pod_timings, metadata)
+  samples.append(sample.Sample('all_pods_ready_time', last_ready - start_time,
+                               'seconds', metadata))
+  samples.append(sample.Sample(
+      'pod_startup_throughput',
+      len(pod_names) / max(last_ready - first_created, 1e-3), 'pods/s',
+      metadata))
+  return samples
+
+
+def Cleanup(unused_benchmark_spec):
+  """Deletes the pods.
+
+  Args:
+    unused_benchmark_spec: The benchmark specification. Contains all data that
+        is required to run the benchmark.
+  """
+  container_service.RunKubectlCommand(
+      ['delete', 'pods', '-l', 'app=pkb-pod-startup', '--wait=false'],
+      raise_on_failure=False)
@@ -0,0 +1,250 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Probes the round trip latency between many pairs of VMs at once.
+
+Unlike the ping benchmark, which reports the summary statistics of 100 pings
+between two VMs, every VM probes all of its peers (or a sampled subset of the
+pairs) concurrently at a configurable rate over ICMP, UDP or TCP. The RTT of
+every probe is reduced on the sending VM to percentiles, a histogram and the
+jitter over time, and only that summary is copied back.
+"""
+
+import collections
+import json
+import logging
+import posixpath
+import random
+
+from absl import flags
+from perfkitbenchmarker import configs
+from perfkitbenchmarker import data
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
+
+FLAGS = flags.FLAGS
+
+_PROTOCOLS = flags.DEFINE_list(
+    'latency_probe_protocols', ['icmp', 'udp'],
+    'Protocols to probe with, run one after the other. One or more of icmp, '
+    'udp and tcp.')
+_RATE = flags.DEFINE_float(
+    'latency_probe_rate', 10, 'Probes per second sent to each peer.',
+    lower_bound=0.1)
+_DURATION = flags.DEFINE_integer(
+    'latency_probe_duration', 60, 'Seconds to probe for, per protocol.',
+    lower_bound=1)
+_JITTER_INTERVAL = flags.DEFINE_integer(
+    'latency_probe_jitter_interval', 10,
+    'Seconds over which each reported jitter value is computed.',
+    lower_bound=1)
+_MAX_PAIRS = flags.DEFINE_integer(
+    'latency_probe_max_pairs', None,
+    'If set, probe only this many randomly sampled ordered pairs of VMs '
+    'instead of all of them.', lower_bound=1)
+_PORT = flags.DEFINE_integer(
+    'latency_probe_port', 20003, 'Port of the UDP and TCP echo servers.')
+
+flags.register_validator(
+    'latency_probe_protocols',
+    lambda protocols: set(protocols) <= {'icmp', 'udp', 'tcp'},
+    'latency_probe_protocols must be a list of icmp, udp and tcp.')
+
+BENCHMARK_NAME = 'latency_probe'
+BENCHMARK_CONFIG = """
+latency_probe:
+  description: Probes the latency between every pair of VMs
+  vm_groups:
+    default:
+      vm_spec: *default_single_core
+      vm_count: 2
+"""
+
+_SCRIPT = 'latency_probe.py'
+_PERCENTILES = ('min', 'p50', 'p90', 'p99', 'p99.9', 'max', 'mean', 'stddev')
+
+
+def GetConfig(user_config):
+  config = configs.LoadConfig(BENCHMARK_CONFIG, user_config, BENCHMARK_NAME)
+  if FLAGS['num_vms'].present:
+    config['vm_groups']['default']['vm_count'] = FLAGS.num_vms
+  return config
+
+
+def _ScriptPath():
+  return posixpath.join(vm_util.VM_TMP_DIR, _SCRIPT)
+
+
+def Prepare(benchmark_spec):
+  """Starts the echo server on every VM.
+
+  Args:
+    benchmark_spec: The benchmark specification. Contains all data that is
+        required to run the benchmark.
+  """
+  vms = benchmark_spec.vms
+  if len(vms) < 2:
+    raise ValueError(
+        f'Latency probe benchmark requires at least two VMs, found {len(vms)}')
+
+  def _Prepare(vm):
+    vm.Install('python3')
+    vm.PushFile(data.ResourcePath(_SCRIPT), _ScriptPath())
+    vm.AllowIcmp()
+    vm.AllowPort(_PORT.value)
+    vm.RemoteCommand(
+        f'nohup python3 {_ScriptPath()} --serve --port={_PORT.value} '
+        '> /dev/null 2>&1 &')
+
+  vm_util.RunThreaded(_Prepare, vms)
+
+
+def GetPairs(vms, max_pairs=None, seed=0):
+  """Returns the ordered pairs of VMs to probe, grouped by sending VM.
+
+  Args:
+    vms: list of VMs.
+    max_pairs: if set, the number of pairs to sample from all of them.
+    seed: seed of the sampling, so that reruns probe the same pairs.
+
+  Returns:
+    OrderedDict of each sending VM to the list of VMs it probes.
+  """
+  pairs = [(sender, receiver) for sender in vms for receiver in vms
+           if sender is not receiver]
+  if max_pairs is not None and max_pairs < len(pairs):
+    chosen = set(random.Random(seed).sample(range(len(pairs)), max_pairs))
+    pairs = [pair for i, pair in enumerate(pairs) if i in chosen]
+  targets = collections.OrderedDict()
+  for sender, receiver in pairs:
+    targets.setdefault(sender, []).append(receiver)
+  return targets
+
+
+def ParseResults(output, sending_vm, receivers, metadata):
+  """Returns samples from the JSON output of the probing script.
+
+  Args:
+    output: stdout of the script.
+    sending_vm: the VM that ran the script.
+    receivers: dict of each probed IP address to its VM.
+    metadata: dict of metadata to add to every sample.
+
+  Returns:
+    A list of samples.
+  """
+  samples = []
+  for ip, summary in json.loads(output).items():
+    receiving_vm = receivers[ip]
+    pair_metadata = dict(
+        metadata,
+        sending_vm=sending_vm.name,
+        receiving_vm=receiving_vm.name,
+        sending_zone=sending_vm.zone,
+        receiving_zone=receiving_vm.zone,
+        probes_sent=summary['sent'],
+        probes_received=summary['received'])
+    samples.append(sample.Sample(
+        'Loss Rate',
+        100. * (summary['sent'] - summary['received']) / summary['sent']
+        if summary['sent'] else 0., '%', pair_metadata))
+    if not summary['received']:
+      continue
+    for statistic in _PERCENTILES:
+      samples.append(sample.Sample(
+          f'{statistic} Latency', summary['rtt'][statistic], 'ms',
+          pair_metadata))
+    samples.append(sample.CreateHistogramSample(
+        collections.OrderedDict(summary['histogram']), 'latency_probe',
+        'rtt', 'ms', pair_metadata, metric='Latency Histogram'))
+    for offset, jitter in summary['jitter']:
+      samples.append(sample.Sample(
+          'Jitter', jitter, 'ms',
+          dict(pair_metadata, jitter_interval_start=offset),
+          timestamp=summary['start_time'] + offset))
+    if summary['jitter']:
+      samples.append(sample.Sample(
+          'Mean Jitter',
+          sum(jitter for _, jitter in summary['jitter']) /
+          len(summary['jitter']), 'ms', pair_metadata))
+  return samples
+
+
+def _Probe(sending_vm, receiving_vms, protocol, ip_type):
+  """Probes the receiving VMs from the sending VM, returning samples.
+
+  Internal IP addresses are only probed when --ip_addresses allows it for the
+  pair, as in the ping benchmark.
+  """
+  if ip_type == vm_util.IpAddressMetadata.EXTERNAL:
+    receivers = {vm.ip_address: vm for vm in receiving_vms}
+  else:
+    receivers = {vm.internal_ip: vm for vm in receiving_vms
+                 if vm_util.ShouldRunOnInternalIpAddress(sending_vm, vm)}
+  if not receivers:
+    return []
+  sudo = 'sudo ' if protocol == 'icmp' else ''
+  stdout, _ = sending_vm.RemoteCommand(
+      f'{sudo}python3 {_ScriptPath()} --protocol={protocol} '
+      f'--targets={",".join(receivers)} --rate={_RATE.value} '
+      f'--duration={_DURATION.value} '
+      f'--jitter_interval={_JITTER_INTERVAL.value} --port={_PORT.value}',
+      timeout=_DURATION.value + 300)
+  metadata = {
+      'ip_type': ip_type,
+      'protocol': protocol,
+      'probe_rate': _RATE.value,
+      'probe_duration': _DURATION.value,
+      'jitter_interval': _JITTER_INTERVAL.value,
+  }
+  return ParseResults(stdout, sending_vm, receivers, metadata)
+
+
+def Run(benchmark_spec):
+  """Probes all pairs of VMs concurrently, once per protocol.
+
+  Args:
+    benchmark_spec: The benchmark specification. Contains all data that is
+        required to run the benchmark.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  pairs = GetPairs(benchmark_spec.vms, _MAX_PAIRS.value)
+  logging.info('Probing %d pairs of VMs.',
+               sum(len(receivers) for receivers in pairs.values()))
+  ip_types = [vm_util.IpAddressMetadata.INTERNAL]
+  if vm_util.ShouldRunOnExternalIpAddress():
+    ip_types.insert(0, vm_util.IpAddressMetadata.EXTERNAL)
+  results = []
+  for protocol in _PROTOCOLS.value:
+    for ip_type in ip_types:
+      args = [((sender, receivers, protocol, ip_type), {})
+              for sender, receivers in pairs.items()]
+      for samples in vm_util.RunThreaded(_Probe, args):
+        results.extend(samples)
+  return results
+
+
+def Cleanup(benchmark_spec):
+  """Stops the echo servers.
+
+  Args:
+    benchmark_spec: The benchmark specification. Contains all data that is
+        required to run the benchmark.
+  """
+  vm_util.RunThreaded(
+      lambda vm: vm.RemoteCommand("pkill -f '[l]atency_probe.py --serve'",
+                                  ignore_failure=True),
+      benchmark_spec.vms)
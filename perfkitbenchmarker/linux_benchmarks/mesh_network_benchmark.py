@@ -20,11 +20,11 @@ and average latency inside mesh network.
 
 
 import logging
-import re
 import threading
 from absl import flags
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import netperf
@@ -55,6 +55,9 @@ mesh_network:
 NETPERF_BENCHMARKSS = ['TCP_RR', 'TCP_STREAM']
 VALUE_INDEX = 1
 RESULT_LOCK = threading.Lock()
+# The result is the last column of each netperf result line.
+_NETPERF_RESULT_PARSER = regex_util.OutputParser(
+    [regex_util.Metric('result', r'(\d+\.\d+)\s+\n')])
 
 
 def GetConfig(user_config):
@@ -120,7 +123,7 @@ def RunNetperf(vm, benchmark_name, servers, result):
   output, _ = vm.RemoteCommand(netperf_cmd)
   logging.info(output)
 
-  match = re.findall(r'(\d+\.\d+)\s+\n', output)
+  match = _NETPERF_RESULT_PARSER.Parse(output)['result']
   value = 0
   expected_num_match = (len(servers) - 1) * FLAGS.num_connections
   if len(match) != expected_num_match:
@@ -129,9 +132,9 @@ def RunNetperf(vm, benchmark_name, servers, result):
         (expected_num_match, len(match)))
   for res in match:
     if benchmark_name == 'TCP_RR':
-      value += 1.0 / float(res) * 1000.0
+      value += 1.0 / res * 1000.0
     else:
-      value += float(res)
+      value += res
   with RESULT_LOCK:
     result[VALUE_INDEX] += value
 
@@ -75,13 +75,26 @@ def _PrepareServer(vm):
     vm.SetReadAhead(FLAGS.mongodb_readahead_kb * 2,
                     [d.GetDevicePath() for d in vm.scratch_disks])
 
-  vm.RemoteCommand('sudo pkill mongod', ignore_failure=True)
+  _StopServer(vm)
+  _StartServer(vm)
 
+
+def _StartServer(vm):
+  """Starts MongoDB on the server.
+
+  With --fork, mongod only returns once the server accepts connections.
+  """
   vm.RemoteCommand(
-      'nohup sudo /usr/bin/mongod --fork --config %s &' %
+      'sudo /usr/bin/mongod --fork --config %s' %
       vm.GetPathToConfig('mongodb_server'))
 
 
+def _StopServer(vm):
+  """Stops MongoDB on the server, waiting for it to flush its data."""
+  vm.RemoteCommand('sudo pkill -x mongod; '
+                   'while pgrep -x mongod > /dev/null; do sleep 1; done')
+
+
 def _PrepareClient(vm):
   """Install YCSB on the client VM."""
   vm.Install('ycsb')
@@ -123,9 +136,12 @@ def Run(benchmark_spec):
   kwargs = {
       'mongodb.url': benchmark_spec.mongodb_url,
       'mongodb.writeConcern': FLAGS.mongodb_writeconcern}
+  dataset_cache = ycsb.DataDirectoryCache(
+      benchmark_spec.vm_groups['workers'], _GetDataDir, _StopServer,
+      _StartServer)
   samples = list(benchmark_spec.executor.LoadAndRun(
       benchmark_spec.vm_groups['clients'],
-      load_kwargs=kwargs, run_kwargs=kwargs))
+      load_kwargs=kwargs, run_kwargs=kwargs, dataset_cache=dataset_cache))
   if FLAGS.mongodb_readahead_kb is not None:
     for s in samples:
       s.metadata['readahdead_kb'] = FLAGS.mongodb_readahead_kb
@@ -78,6 +78,18 @@ flags.DEFINE_integer(
     'If you try to set the MSS lower than 88 bytes, the default MSS will be '
     'used.')
 
+_SYNCHRONIZED_START = flags.DEFINE_bool(
+    'netperf_synchronized_start', False,
+    'With more than one stream, start all netperf processes at once behind a '
+    'barrier, record each stream\'s interim results every '
+    '--netperf_interim_interval seconds and report aggregate throughput over '
+    'the window in which all streams were running, along with the skew '
+    'between the streams\' starts.')
+_INTERIM_INTERVAL = flags.DEFINE_float(
+    'netperf_interim_interval', 1.0,
+    'Seconds between the interim results of each stream with '
+    '--netperf_synchronized_start.', lower_bound=0.1)
+
 ALL_BENCHMARKS = ['TCP_RR', 'TCP_CRR', 'TCP_STREAM', 'UDP_RR', 'UDP_STREAM']
 flags.DEFINE_list('netperf_benchmarks', ALL_BENCHMARKS,
                   'The netperf benchmark(s) to run.')
@@ -119,6 +131,12 @@ REMOTE_SCRIPT = 'netperf_test.py'
 
 PERCENTILES = [50, 90, 99]
 
+# Printed every -D seconds when netperf is built with --enable-demo, e.g.
+# Interim result: 2103.44 10^6bits/s over 1.000 seconds ending at 1650000000.123
+_INTERIM_RESULT_RE = re.compile(
+    r'^Interim result:\s*([\d.]+) \S+/s over ([\d.]+) seconds ending at '
+    r'([\d.]+)', re.MULTILINE)
+
 # By default, Container-Optimized OS (COS) host firewall allows only
 # outgoing connections and incoming SSH connections. To allow incoming
 # connections from VMs running netperf, we need to add iptables rules
@@ -250,6 +268,8 @@ def ParseNetperfOutput(stdout, metadata, benchmark_name,
   """
   # Don't modify the metadata dict that was passed in
   metadata = metadata.copy()
+  # Interim results would break the CSV parsing below.
+  stdout = re.sub(r'^Interim result:.*\n', '', stdout, flags=re.MULTILINE)
 
   # Extract stats from stdout
   # Sample output:
@@ -338,6 +358,89 @@ def ParseNetperfOutput(stdout, metadata, benchmark_name,
   return (throughput_sample, latency_samples, latency_hist)
 
 
+def ParseInterimResults(stdout):
+  """Parses the interim results of a netperf process run with -D.
+
+  Args:
+    stdout: the stdout of the netperf process
+
+  Returns:
+    A list of (start time, end time, throughput) tuples, one per interval.
+  """
+  return [(float(end) - float(duration), float(end), float(value))
+          for value, duration, end in _INTERIM_RESULT_RE.findall(stdout)]
+
+
+def _GetThroughputInWindow(interim_results, window_start, window_end):
+  """Returns the average throughput of a stream between two times."""
+  total = 0.0
+  for start, end, value in interim_results:
+    overlap = min(end, window_end) - max(start, window_start)
+    if overlap > 0:
+      total += value * overlap
+  return total / (window_end - window_start)
+
+
+def _CommonWindowSamples(benchmark_name, stream_results, unit, metadata):
+  """Aggregates the streams' throughput while all of them were running.
+
+  Each stream's own average includes the time before the other streams
+  started or after they finished, so summing those averages misstates the
+  aggregate throughput when streams start at different times. This only counts
+  the window in which all streams overlap.
+
+  Args:
+    benchmark_name: the name of the netperf benchmark
+    stream_results: list of the interim results of each stream, as returned by
+      ParseInterimResults
+    unit: the unit of the throughput
+    metadata: metadata for the samples
+
+  Returns:
+    A list of samples.
+  """
+  stream_results = [results for results in stream_results if results]
+  if len(stream_results) < 2:
+    logging.warning('Too few streams reported interim results to compute '
+                    'the common window.')
+    return []
+  starts = [results[0][0] for results in stream_results]
+  ends = [results[-1][1] for results in stream_results]
+  window_start = max(starts)
+  window_end = min(ends)
+  metadata = dict(metadata, streams_with_interim_results=len(stream_results))
+  samples = [
+      sample.Sample(f'{benchmark_name}_Start_Skew', window_start - min(starts),
+                    'seconds', metadata),
+      sample.Sample(f'{benchmark_name}_Common_Window',
+                    max(window_end - window_start, 0), 'seconds', metadata),
+  ]
+  if window_end <= window_start:
+    logging.warning('netperf streams did not all run at the same time.')
+    return samples
+  throughputs = [
+      _GetThroughputInWindow(results, window_start, window_end)
+      for results in stream_results
+  ]
+  for stat, value in (('total', sum(throughputs)), ('min', min(throughputs)),
+                      ('max', max(throughputs))):
+    samples.append(
+        sample.Sample(f'{benchmark_name}_Throughput_{stat}_common_window',
+                      value, unit, metadata))
+  interval = _INTERIM_INTERVAL.value
+  interval_start = window_start
+  while interval_start < window_end:
+    interval_end = min(interval_start + interval, window_end)
+    samples.append(sample.Sample(
+        f'{benchmark_name}_Interim_Throughput_total',
+        sum(_GetThroughputInWindow(results, interval_start, interval_end)
+            for results in stream_results),
+        unit, dict(metadata, interval=interval_end - interval_start),
+        timestamp=interval_start))
+    interval_start = interval_end
+  return samples
+
+
 def RunNetperf(vm, benchmark_name, server_ip, num_streams):
   """Spawns netperf on a remote VM, parses results.
 
@@ -365,6 +468,8 @@ def RunNetperf(vm, benchmark_name, server_ip, num_streams):
   confidence = (f'-I 99,5 -i {FLAGS.netperf_max_iter},3'
                 if FLAGS.netperf_max_iter else '')
   verbosity = '-v2 ' if enable_latency_histograms else ''
+  synchronized = _SYNCHRONIZED_START.value and num_streams > 1
+  interim = f'-D {_INTERIM_INTERVAL.value} ' if synchronized else ''
 
   remote_cmd_timeout = (
       FLAGS.netperf_test_length * (FLAGS.netperf_max_iter or 1) + 300)
@@ -375,7 +480,7 @@ def RunNetperf(vm, benchmark_name, server_ip, num_streams):
 
   netperf_cmd = (f'{netperf.NETPERF_PATH} '
                  f'-p {{command_port}} '
-                 f'-j {verbosity} '
+                 f'-j {verbosity}{interim}'
                  f'-t {benchmark_name} '
                  f'-H {server_ip} '
                  f'-l {FLAGS.netperf_test_length} {confidence}'
@@ -406,8 +511,6 @@ def RunNetperf(vm, benchmark_name, server_ip, num_streams):
     metadata['netperf_mss_requested'] = FLAGS.netperf_mss
 
   # Run all of the netperf processes and collect their stdout
-  # TODO(dlott): Analyze process start delta of netperf processes on the remote
-  #              machine
 
   # Give the remote script the max possible test length plus 5 minutes to
   # complete
@@ -415,12 +518,19 @@ def RunNetperf(vm, benchmark_name, server_ip, num_streams):
       FLAGS.netperf_test_length * (FLAGS.netperf_max_iter or 1) + 300
   remote_cmd = (f'./{REMOTE_SCRIPT} --netperf_cmd="{netperf_cmd}" '
                 f'--num_streams={num_streams} --port_start={PORT_START}')
+  if synchronized:
+    remote_cmd += ' --barrier'
   remote_stdout, _ = vm.RobustRemoteCommand(remote_cmd, should_log=True,
                                             timeout=remote_cmd_timeout)
 
   # Decode stdouts, stderrs, and return codes from remote command's stdout
   json_out = json.loads(remote_stdout)
   stdouts = json_out[0]
+  if synchronized:
+    metadata['netperf_synchronized_start'] = True
+    metadata['netperf_interim_interval'] = _INTERIM_INTERVAL.value
+    # Time the remote script took to start all the processes.
+    metadata['netperf_process_start_delta'] = json_out[4] - json_out[3]
 
   parsed_output = [ParseNetperfOutput(stdout, metadata, benchmark_name,
                                       enable_latency_histograms)
@@ -456,6 +566,10 @@ def RunNetperf(vm, benchmark_name, server_ip, num_streams):
           sample.Sample(f'{benchmark_name}_Throughput_{stat}',
                         float(value),
                         throughput_unit, metadata))
+    if synchronized:
+      samples.extend(_CommonWindowSamples(
+          benchmark_name, [ParseInterimResults(stdout) for stdout in stdouts],
+          throughput_unit, metadata))
     if enable_latency_histograms:
       # Combine all of the latency histogram dictionaries
       latency_histogram = collections.Counter()
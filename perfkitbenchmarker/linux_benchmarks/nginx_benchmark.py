@@ -17,6 +17,7 @@
 from absl import flags
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import synchronized_start
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import wrk2
 
@@ -54,6 +55,11 @@ flags.DEFINE_boolean('nginx_use_ssl', False,
 flags.DEFINE_integer('nginx_worker_connections', 1024,
                      'The maximum number of simultaneous connections that can '
                      'be opened by a worker process.')
+flags.DEFINE_boolean('nginx_synchronized_start', False,
+                     'Stage wrk2 on all clients and release them at a common '
+                     'time rather than starting each with its own SSH '
+                     'command, and report the start and stop skew of the '
+                     'clients.')
 
 
 def _ValidateLoadConfigs(load_configs):
@@ -193,26 +199,33 @@ def Prepare(benchmark_spec):
 
 def _RunMultiClient(clients, target, rate, connections, duration, threads):
   """Run multiple instances of wrk2 against a single target."""
-  results = []
   num_clients = len(clients)
 
-  def _RunSingleClient(client, client_number):
+  def _RunSingleClient(client):
     """Run wrk2 from a single client."""
-    client_results = list(wrk2.Run(
+    return list(wrk2.Run(
         client, target, rate, connections=connections,
         duration=duration, threads=threads))
-    for result in client_results:
-      result.metadata.update({'client_number': client_number})
-    results.extend(client_results)
 
-  args = [((client, i), {}) for i, client in enumerate(clients)]
-  vm_util.RunThreaded(_RunSingleClient, args)
+  runs = None
+  if FLAGS.nginx_synchronized_start:
+    commands = [wrk2.GetRunCommand(client, target, rate, connections,
+                                   duration, threads=threads)
+                for client in clients]
+    runs = synchronized_start.Run(clients, [cmd for cmd, _ in commands])
+    client_results = [
+        list(wrk2.ParseRunOutput(run.stdout, client_metadata))
+        for run, (_, client_metadata) in zip(runs, commands)]
+  else:
+    client_results = vm_util.RunThreaded(_RunSingleClient, clients)
+  for client_number, client_samples in enumerate(client_results):
+    for result in client_samples:
+      result.metadata.update({'client_number': client_number})
+  results = [result for results in client_results for result in results]
 
   requests = 0
   errors = 0
   max_latency = 0.0
-  # TODO(ehankland): Since wrk2 keeps an HDR histogram of latencies, we should
-  # be able to merge them and compute aggregate percentiles.
 
   for result in results:
     if result.metric == 'requests':
@@ -241,6 +254,9 @@ def _RunMultiClient(clients, target, rate, connections, duration, threads):
       sample.Sample('aggregate error_rate', error_rate, '', metadata),
       sample.Sample('aggregate p100 latency', max_latency, '', metadata)
   ]
+  results += wrk2.AggregateClientSamples(client_results, metadata)
+  if runs:
+    results += synchronized_start.GetSamples(runs, metadata)
   return results
 
 
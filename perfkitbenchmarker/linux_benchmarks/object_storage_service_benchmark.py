@@ -55,6 +55,7 @@ from perfkitbenchmarker import units
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.providers.gcp import gcs
 from perfkitbenchmarker.sample import PercentileCalculator  # noqa
+from perfkitbenchmarker.traces import clock_offset
 import six
 from six.moves import range
 from six.moves import zip
@@ -864,11 +865,15 @@ def ListConsistencyBenchmark(results, metadata, vm, command_builder,
                                    metadata)
 
 
-def LoadWorkerOutput(output):
+def LoadWorkerOutput(output, vms=None):
   """Load output from worker processes to our internal format.
 
   Args:
     output: list of strings. The stdouts of all worker processes.
+    vms: optional list of the VM each worker process ran on. If given, start
+      times are converted from the clock of the VM to the clock of PKB with
+      the clock offsets measured for it, so that the streams of different
+      VMs can be compared.
 
   Returns:
     A tuple of start_time, latency, size. Each of these is a list of
@@ -898,14 +903,18 @@ def LoadWorkerOutput(output):
   latencies = []
   sizes = []
 
-  for worker_out in output:
+  for i, worker_out in enumerate(output):
     json_out = json.loads(worker_out)
 
     for stream in json_out:
       assert len(stream['start_times']) == len(stream['latencies'])
       assert len(stream['latencies']) == len(stream['sizes'])
 
-      start_times.append(np.asarray(stream['start_times'], dtype=np.float64))
+      stream_start_times = np.asarray(stream['start_times'], dtype=np.float64)
+      if vms:
+        stream_start_times = clock_offset.ToRunnerTime(vms[i],
+                                                       stream_start_times)
+      start_times.append(stream_start_times)
       latencies.append(np.asarray(stream['latencies'], dtype=np.float64))
       sizes.append(np.asarray(stream['sizes'], dtype=np.int64))
 
@@ -1061,7 +1070,7 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder,
 
   output = _RunMultiStreamProcesses(vms, command_builder, cmd_args,
                                     streams_per_vm)
-  start_times, latencies, sizes = LoadWorkerOutput(output)
+  start_times, latencies, sizes = LoadWorkerOutput(output, vms)
   if FLAGS.object_storage_worker_output:
     with open(FLAGS.object_storage_worker_output, 'w') as out_file:
       out_file.write(json.dumps(output))
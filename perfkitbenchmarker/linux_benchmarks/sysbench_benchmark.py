@@ -49,10 +49,11 @@ from absl import flags
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import publisher
+from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import sql_engine_utils
+from perfkitbenchmarker import steady_state
 from perfkitbenchmarker import vm_util
-import six
 
 
 FLAGS = flags.FLAGS
@@ -99,6 +100,19 @@ flags.DEFINE_integer('sysbench_post_failover_seconds', 0,
                      'amount of time after failover is complete.  Useful '
                      'for detecting if there are any differences in TPS because'
                      'of failover.')
+_STEADY_STATE = steady_state.DEFINE_criterion(
+    'sysbench_steady_state', None,
+    'If set, report how long the run took to reach this steady state '
+    'criterion, computed from the per interval tps or qps reports. For '
+    'example "tps:5%" or "qps_slope:0.5%".')
+_STEADY_STATE_DURATION = flags.DEFINE_integer(
+    'sysbench_steady_state_duration', 10,
+    'The window, in seconds, over which --sysbench_steady_state must hold.',
+    lower_bound=1)
+flags.register_validator(
+    'sysbench_steady_state',
+    lambda criterion: criterion is None or criterion.metric in ('tps', 'qps'),
+    '--sysbench_steady_state only supports the tps and qps metrics.')
 
 BENCHMARK_DATA = {
     'sysbench-tpcc.tar.gz':
@@ -205,6 +219,19 @@ def GetConfig(user_config):
   return configs.LoadConfig(BENCHMARK_CONFIG, user_config, BENCHMARK_NAME)
 
 
+# Parses the per interval report lines, which start with "[" (it's one line -
+# broken up in the comment to fit):
+# [ 6s ] thds: 16 tps: 650.51 qps: 12938.26 (r/w/o: 9046.18/2592.05/1300.03)
+# lat (ms,99%): 40.37 err/s: 0.00 reconn/s: 0.00
+# Each line is matched once, so its three values are always kept together.
+_INTERVAL_REPORT_REGEX = (r'^\[.*? tps: (?P<tps>\S+) qps: (?P<qps>\S+) '
+                          r'\(.*? lat \(.*?\): (?P<latency>\S+)')
+_INTERVAL_REPORT_PARSER = regex_util.OutputParser([
+    regex_util.Metric(name, _INTERVAL_REPORT_REGEX, group=name)
+    for name in ('tps', 'qps', 'latency')
+], re.MULTILINE)
+
+
 def _ParseSysbenchOutput(sysbench_output):
   """Parses sysbench output.
 
@@ -220,30 +247,14 @@ def _ParseSysbenchOutput(sysbench_output):
     Three arrays, the tps, latency and qps numbers.
 
   """
-  tps_numbers = []
-  latency_numbers = []
-  qps_numbers = []
-
-  sysbench_output_io = six.StringIO(sysbench_output)
-  for line in sysbench_output_io:
-    # parse a line like (it's one line - broken up in the comment to fit):
-    # [ 6s ] thds: 16 tps: 650.51 qps: 12938.26 (r/w/o: 9046.18/2592.05/1300.03)
-    # lat (ms,99%): 40.37 err/s: 0.00 reconn/s: 0.00
-    if re.match(r'^\[', line):
-      match = re.search('tps: (.*?) ', line)
-      tps_numbers.append(float(match.group(1)))
-      match = re.search(r'lat \(.*?\): (.*?) ', line)
-      latency_numbers.append(float(match.group(1)))
-      match = re.search(r'qps: (.*?) \(.*?\) ', line)
-      qps_numbers.append(float(match.group(1)))
-      if line.startswith('SQL statistics:'):
-        break
-
-  return tps_numbers, latency_numbers, qps_numbers
+  values = _INTERVAL_REPORT_PARSER.Parse(sysbench_output)
+  return values['tps'], values['latency'], values['qps']
 
 
 def AddMetricsForSysbenchOutput(
-    sysbench_output, results, metadata, metric_prefix=''):
+    sysbench_output, results, metadata, metric_prefix='',
+    steady_state_criterion=None, report_interval=None,
+    steady_state_duration=None):
   """Parses sysbench output.
 
   Extract relevant TPS and latency numbers, and populate the final result
@@ -257,6 +268,12 @@ def AddMetricsForSysbenchOutput(
     results: The dictionary to store results based on sysbench output.
     metadata: The metadata to be passed along to the Samples class.
     metric_prefix:  An optional prefix to append to each metric generated.
+    steady_state_criterion: An optional steady_state.Criterion on tps or qps.
+      If set, samples describing when it was met are added.
+    report_interval: The interval, in seconds, between sysbench's reports.
+      Required with steady_state_criterion.
+    steady_state_duration: The window, in seconds, over which
+      steady_state_criterion must hold. Required with steady_state_criterion.
   """
   tps_numbers, latency_numbers, qps_numbers = (
       _ParseSysbenchOutput(sysbench_output))
@@ -280,6 +297,15 @@ def AddMetricsForSysbenchOutput(
   results.append(latency_sample)
   results.append(qps_sample)
 
+  if steady_state_criterion:
+    values = {'tps': tps_numbers, 'qps': qps_numbers}
+    state = steady_state.Detect(
+        steady_state_criterion, values[steady_state_criterion.metric],
+        report_interval, steady_state_duration)
+    results.extend(steady_state.GetSamples(
+        state, steady_state_criterion, metric_prefix=metric_prefix,
+        unit=steady_state_criterion.metric, metadata=metadata))
+
 
 # TODO(chunla) Move this to engine specific module
 def _GetSysbenchConnectionParameter(client_vm_query_tools):
@@ -457,7 +483,11 @@ def _RunSysbench(
                                     sysbench_thread_count)
 
   logging.info('\n Parsing Sysbench Results...\n')
-  AddMetricsForSysbenchOutput(stdout, results, metadata)
+  AddMetricsForSysbenchOutput(
+      stdout, results, metadata,
+      steady_state_criterion=_STEADY_STATE.value,
+      report_interval=FLAGS.sysbench_report_interval,
+      steady_state_duration=_STEADY_STATE_DURATION.value)
 
   return results
 
@@ -20,7 +20,8 @@ This is close to HTTP-RR:
   * The server does very little work.
 
 Doubles connections up to a fixed count, reports single connection latency and
-maximum error-free throughput.
+maximum error-free throughput. With multiple client VMs, each runs wrk with the
+connection count and the results are aggregated across them.
 
 `wrk` is a scalable web load generator.
 `tomcat` is a popular Java web server.
@@ -110,13 +111,14 @@ def Prepare(benchmark_spec):
         required to run the benchmark.
   """
   tomcat_vm = benchmark_spec.vm_groups['server'][0]
-  wrk_vm = benchmark_spec.vm_groups['client'][0]
+  wrk_vms = benchmark_spec.vm_groups['client']
 
   tomcat_vm.AllowPort(tomcat.TOMCAT_HTTP_PORT)
 
   vm_util.RunThreaded((lambda f: f()),
-                      [functools.partial(_PrepareServer, tomcat_vm),
-                       functools.partial(_PrepareClient, wrk_vm)])
+                      [functools.partial(_PrepareServer, tomcat_vm)] +
+                      [functools.partial(_PrepareClient, wrk_vm)
+                       for wrk_vm in wrk_vms])
 
 
 def Run(benchmark_spec):
@@ -130,7 +132,7 @@ def Run(benchmark_spec):
     A list of sample.Sample objects.
   """
   tomcat_vm = benchmark_spec.vm_groups['server'][0]
-  wrk_vm = benchmark_spec.vm_groups['client'][0]
+  wrk_vms = benchmark_spec.vm_groups['client']
 
   samples = []
   errors = 0
@@ -143,14 +145,19 @@ def Run(benchmark_spec):
                               tomcat.TOMCAT_HTTP_PORT),
       SAMPLE_PAGE_PATH)
 
+  def _RunWrk(connections, duration):
+    """Runs wrk on all clients at once and aggregates the results."""
+    return wrk.AggregateResults(vm_util.RunThreaded(
+        lambda vm: list(wrk.Run(vm, connections=connections, target=target,
+                                duration=duration)), wrk_vms))
+
   logging.info('Warming up for %ds', WARM_UP_DURATION)
-  list(wrk.Run(wrk_vm, connections=1, target=target, duration=WARM_UP_DURATION))
+  _RunWrk(connections=1, duration=WARM_UP_DURATION)
 
   all_by_metric = []
 
   while connections <= max_connections:
-    run_samples = list(wrk.Run(wrk_vm, connections=connections, target=target,
-                               duration=duration))
+    run_samples = _RunWrk(connections=connections, duration=duration)
 
     by_metric = {i.metric: i for i in run_samples}
     errors = by_metric['errors'].value
@@ -20,12 +20,15 @@ import csv
 import io
 import json
 import logging
+import math
+import posixpath
 import time
 from absl import flags
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import steady_state
 from perfkitbenchmarker import vm_util
 
 FIO_DIR = '%s/fio' % linux_packages.INSTALL_DIR
@@ -51,6 +54,16 @@ FIO_HIST_LOG_PARSER_PATCH = 'fiologparser_hist.patch'
 FIO_HIST_LOG_PARSER_PATH = '%s/tools/hist' % FIO_DIR
 FIO_HIST_LOG_PARSER = 'fiologparser_hist.py'
 
+# fio client/server mode.
+SERVER_PORT = 8765
+SERVER_PID_FILE = posixpath.join(vm_util.VM_TMP_DIR, 'fio_server.pid')
+# fio adds an entry summing every client's first job to client_stats. It mixes
+# jobs when the job file has more than one, so it is ignored in favor of
+# merging the jobs by name.
+ALL_CLIENTS_JOB_NAME = 'All clients'
+CLIENT_LATENCY_PERCENTILES = (1, 5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 95,
+                              99, 99.5, 99.9, 99.95, 99.99)
+
 
 def GetFioExec():
   return 'sudo {path}'.format(path=FIO_PATH)
@@ -76,6 +89,48 @@ def _Install(vm):
              patch=FIO_HIST_LOG_PARSER_PATCH))
 
 
+def StartServer(vm):
+  """Starts a fio server in the background so that a fio client can drive it.
+
+  Args:
+    vm: The VM to start the server on. fio must already be installed.
+  """
+  vm.AllowPort(SERVER_PORT)
+  vm.RemoteCommand('sudo {path} --server --daemonize={pid_file}'.format(
+      path=FIO_PATH, pid_file=SERVER_PID_FILE))
+
+
+def StopServer(vm):
+  """Stops the fio server started by StartServer, if it is running."""
+  vm.RemoteCommand(
+      'if [ -f {pid_file} ]; then sudo kill $(cat {pid_file}); '
+      'sudo rm -f {pid_file}; fi'.format(pid_file=SERVER_PID_FILE),
+      ignore_failure=True)
+
+
+def GetClientCommand(job_files_by_host):
+  """Returns a fio client command that runs job files on fio servers.
+
+  The client sends each server its job file and the servers start their jobs
+  together, so every server's jobs run over the same time window. The output
+  includes latency histograms (json+) so latencies can be merged across
+  servers.
+
+  Args:
+    job_files_by_host: list of (host, job file path) tuples. The job file paths
+      are paths on the VM running the client.
+
+  Returns:
+    string. The fio command.
+  """
+  client_args = ' '.join(
+      '--client={host},{port} {job_file}'.format(
+          host=host, port=SERVER_PORT, job_file=job_file)
+      for host, job_file in job_files_by_host)
+  return 'sudo {path} --output-format=json+ {client_args}'.format(
+      path=FIO_PATH, client_args=client_args)
+
+
 def YumInstall(vm):
   """Installs the fio package on the VM."""
   vm.InstallPackages('libaio-devel libaio bc zlib-devel')
@@ -254,6 +309,8 @@ def ParseResults(job_file, fio_json_result, base_metadata=None,
         samples.append(
             sample.Sample('%s:iops' % metric_name,
                           job[mode]['iops'], '', parameters, timestamp))
+    if 'steadystate' in job:
+      samples += _ParseSteadyState(job, parameters)
     if log_file_base and bin_vals:
       # Parse histograms
       aggregates = collections.defaultdict(collections.Counter)
@@ -271,6 +328,165 @@ def ParseResults(job_file, fio_json_result, base_metadata=None,
   return samples
 
 
+def _GetClatSection(mode_result):
+  """Returns (clat section, divisor converting its values to usec)."""
+  if 'clat_ns' in mode_result:
+    return mode_result['clat_ns'], 1000.0
+  return mode_result['clat'], 1.0
+
+
+def _MergeClientLatencies(mode_results):
+  """Merges the completion latencies of one job across fio clients.
+
+  Args:
+    mode_results: list of per client fio json+ results for one data direction
+      of one job.
+
+  Returns:
+    A list of (statistic name, value in usec) tuples. Percentiles are computed
+    from the merged latency histograms, so they are exact up to fio's bucket
+    resolution. They are omitted if any client did not report histogram bins.
+  """
+  count = 0
+  total = 0.0
+  sum_of_squares = 0.0
+  bins = collections.Counter()
+  has_bins = True
+  minimum = None
+  maximum = None
+  for mode_result in mode_results:
+    clat_section, divisor = _GetClatSection(mode_result)
+    n = clat_section.get('N', mode_result.get('total_ios', 0))
+    mean = clat_section['mean'] / divisor
+    stddev = clat_section['stddev'] / divisor
+    count += n
+    total += n * mean
+    sum_of_squares += n * (stddev ** 2 + mean ** 2)
+    clat_min = clat_section['min'] / divisor
+    clat_max = clat_section['max'] / divisor
+    minimum = clat_min if minimum is None else min(minimum, clat_min)
+    maximum = clat_max if maximum is None else max(maximum, clat_max)
+    if 'bins' in clat_section:
+      for value, bin_count in clat_section['bins'].items():
+        bins[float(value) / divisor] += bin_count
+    else:
+      has_bins = False
+  mean = total / count if count else 0.0
+  stddev = math.sqrt(max(sum_of_squares / count - mean ** 2, 0)) if count else 0
+  statistics = [('min', minimum), ('max', maximum), ('mean', mean),
+                ('stddev', stddev)]
+  if not has_bins or not bins:
+    return statistics
+  bin_total = sum(bins.values())
+  sorted_bins = sorted(bins.items())
+  bin_index = 0
+  cumulative = sorted_bins[0][1]
+  for percentile in CLIENT_LATENCY_PERCENTILES:
+    while (cumulative < percentile / 100.0 * bin_total and
+           bin_index + 1 < len(sorted_bins)):
+      bin_index += 1
+      cumulative += sorted_bins[bin_index][1]
+    statistics.append(('p%s' % percentile, sorted_bins[bin_index][0]))
+  return statistics
+
+
+def ParseClientServerResults(job_file, fio_json_result, base_metadata=None):
+  """Parses the output of a fio client driving several fio servers.
+
+  Args:
+    job_file: The contents of the fio job file. Every server runs the same jobs
+      so any server's job file can be used.
+    fio_json_result: Fio client results in json+ format.
+    base_metadata: Extra metadata to annotate the samples with.
+
+  Returns:
+    A list of sample.Sample objects. Samples for each server's jobs have a
+    'fio_client_hostname' metadata key. Samples aggregated across servers have
+    'fio_clients' set to the number of servers and sum the bandwidth and IOPS
+    each server averaged over its own run.
+  """
+  base_metadata = base_metadata or {}
+  jobs_by_host = collections.OrderedDict()
+  jobs_by_name = collections.OrderedDict()
+  for job in fio_json_result['client_stats']:
+    if job['jobname'] == ALL_CLIENTS_JOB_NAME:
+      continue
+    jobs_by_host.setdefault(job['hostname'], []).append(job)
+    jobs_by_name.setdefault(job['jobname'], []).append(job)
+
+  samples = []
+  for hostname, jobs in jobs_by_host.items():
+    metadata = dict(base_metadata, fio_client_hostname=hostname)
+    samples.extend(ParseResults(job_file, {'jobs': jobs}, metadata))
+
+  timestamp = time.time()
+  parameter_metadata = ParseJobFile(job_file) if job_file else {}
+  for job_name, jobs in jobs_by_name.items():
+    parameters = {'fio_job': job_name, 'fio_clients': len(jobs)}
+    parameters.update(parameter_metadata.get(job_name, {}))
+    parameters.update(base_metadata)
+    for mode in DATA_DIRECTION.values():
+      mode_results = [job[mode] for job in jobs if job[mode]['io_bytes']]
+      if not mode_results:
+        continue
+      metric_name = '%s:%s' % (job_name, mode)
+      samples.append(sample.Sample(
+          '%s:bandwidth' % metric_name,
+          sum(mode_result['bw'] for mode_result in mode_results), 'KB/s',
+          parameters, timestamp))
+      samples.append(sample.Sample(
+          '%s:iops' % metric_name,
+          sum(mode_result['iops'] for mode_result in mode_results), '',
+          parameters, timestamp))
+      lat_statistics = _MergeClientLatencies(mode_results)
+      lat_metadata = dict(parameters, **dict(lat_statistics))
+      samples.append(sample.Sample(
+          '%s:latency' % metric_name, dict(lat_statistics)['mean'], 'usec',
+          lat_metadata, timestamp))
+      for stat_name, stat_val in lat_statistics:
+        samples.append(sample.Sample(
+            '%s:latency:%s' % (metric_name, stat_name), stat_val, 'usec',
+            parameters, timestamp))
+  for s in samples:
+    s.metadata['fio_version'] = GIT_TAG
+  return samples
+
+
+def _ParseSteadyState(job, parameters):
+  """Returns samples for the steadystate section of a fio job's results.
+
+  Args:
+    job: dict. The fio json results of a job run with the steadystate option.
+    parameters: dict. Metadata for the job's samples.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  steady_state_result = job['steadystate']
+  # fio reports the configured criterion, e.g. "iops_slope:0.300000%", as
+  # "ss" and the value measured over the last window as "criterion".
+  criterion = steady_state.CriterionParser().parse(
+      steady_state_result['ss'].lower())
+  duration = steady_state_result['duration']
+  # A job that attains steady state stops right away, so the end of the
+  # steady state window is the job's runtime.
+  runtime_ms = job.get('job_runtime') or max(
+      job[mode]['runtime'] for mode in DATA_DIRECTION.values())
+  attained = bool(steady_state_result['attained'])
+  mean = steady_state_result.get('data', {}).get(criterion.metric + '_mean')
+  result = steady_state.SteadyState(
+      attained=attained,
+      time_to_steady_state=runtime_ms / 1000.0 if attained else None,
+      window_start=runtime_ms / 1000.0 - duration if attained else None,
+      window_end=runtime_ms / 1000.0 if attained else None,
+      mean=mean)
+  return steady_state.GetSamples(
+      result, criterion, metric_prefix='%s:' % job['jobname'],
+      unit='KB/s' if criterion.metric == 'bw' else '',
+      metadata=dict(parameters,
+                    steady_state_measured=steady_state_result['criterion']))
+
+
 def ComputeHistogramBinVals(vm, log_file):
   """Calculate bin values for histogram.
 
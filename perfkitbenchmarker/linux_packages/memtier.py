@@ -28,6 +28,7 @@ from absl import flags
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 
@@ -688,6 +689,18 @@ class MemtierResult:
     return samples
 
 
+# Lines of the 'Request Latency Distribution' section, e.g. "SET 0.071 5.00",
+# giving the percentage of requests of a type completed within a latency.
+_HISTOGRAM_LINE_REGEX = (r'^[ \t]*(?P<type>SET|GET)[ \t]+(?P<msec>\S+)[ \t]+'
+                         r'(?P<percent>\S+)[ \t]*$')
+_HISTOGRAM_PARSER = regex_util.OutputParser([
+    regex_util.Metric('type', _HISTOGRAM_LINE_REGEX, group='type',
+                      conversion=str),
+    regex_util.Metric('msec', _HISTOGRAM_LINE_REGEX, group='msec'),
+    regex_util.Metric('percent', _HISTOGRAM_LINE_REGEX, group='percent'),
+], re.MULTILINE)
+
+
 def _ParseHistogram(
     memtier_results: Text) -> Tuple[MemtierHistogram, MemtierHistogram]:
   """Parses the 'Request Latency Distribution' section of memtier output."""
@@ -700,12 +713,15 @@ def _ParseHistogram(
   last_total_sets = 0
   approx_total_gets = total_requests - approx_total_sets
   last_total_gets = 0
-  for raw_line in memtier_results.splitlines():
-    line = raw_line.strip()
-    last_total_sets = _ParseLine(r'^SET', line, approx_total_sets,
-                                 last_total_sets, set_histogram)
-    last_total_gets = _ParseLine(r'^GET', line, approx_total_gets,
-                                 last_total_gets, get_histogram)
+  for record in _HISTOGRAM_PARSER.ParseRecords(memtier_results):
+    if record['type'] == 'SET':
+      last_total_sets = _AddBucket(record['msec'], record['percent'],
+                                   approx_total_sets, last_total_sets,
+                                   set_histogram)
+    else:
+      last_total_gets = _AddBucket(record['msec'], record['percent'],
+                                   approx_total_gets, last_total_gets,
+                                   get_histogram)
   return set_histogram, get_histogram
 
 
@@ -755,17 +771,17 @@ def _ParseTotalThroughputAndLatency(
   raise errors.Benchmarks.RunError('No "Totals" line in memtier output.')
 
 
-def _ParseLine(pattern: str, line: str, approx_total: int, last_total: int,
-               histogram: MemtierHistogram) -> float:
-  """Helper function to parse an output line."""
-  if not re.match(pattern, line):
-    return last_total
+def _AddBucket(msec: float, percent: float, approx_total: int,
+               last_total: float, histogram: MemtierHistogram) -> float:
+  """Adds the requests of a histogram line to histogram.
 
-  _, msec, percent = line.split()
-  counts = _ConvertPercentToAbsolute(approx_total, float(percent))
+  Returns:
+    The approximate number of requests up to this line.
+  """
+  counts = _ConvertPercentToAbsolute(approx_total, percent)
   bucket_counts = int(round(counts - last_total))
   if bucket_counts > 0:
-    histogram.append({'microsec': float(msec) * 1000, 'count': bucket_counts})
+    histogram.append({'microsec': msec * 1000, 'count': bucket_counts})
   return counts
 
 
@@ -17,11 +17,13 @@ For documentation of Spark Stalanone clusters, see:
 https://spark.apache.org/docs/latest/spark-standalone.html
 """
 import functools
+import itertools
 import logging
 import os
 import posixpath
+import random
 import time
-from typing import Dict
+from typing import Dict, List
 
 from absl import flags
 from packaging import version
@@ -99,6 +101,16 @@ SPARK_MEMORY_FRACTION = 0.9
 SPARK_DRIVER_MEMORY = 'spark.driver.memory'
 SPARK_WORKER_MEMORY = 'spark.executor.memory'
 SPARK_WORKER_VCPUS = 'spark.executor.cores'
+SPARK_WORKER_INSTANCES = 'spark.executor.instances'
+SPARK_K8S_EXECUTOR_CORES = 'spark.kubernetes.executor.request.cores'
+
+# Values searched by GetTuningCandidates.
+TUNING_EXECUTORS_PER_WORKER = (1, 2, 4)
+TUNING_SHUFFLE_PARTITIONS_PER_CORE = (1, 2, 4)
+TUNING_OFF_HEAP_FRACTION = (0, 0.2)
+TUNING_ADAPTIVE_EXECUTION = (True, False)
+TUNING_SERIALIZER = ('org.apache.spark.serializer.KryoSerializer',
+                     'org.apache.spark.serializer.JavaSerializer')
 
 
 def GetConfiguration(driver_memory_mb: int,
@@ -111,7 +123,7 @@ def GetConfiguration(driver_memory_mb: int,
       SPARK_DRIVER_MEMORY: f'{driver_memory_mb}m',
       SPARK_WORKER_MEMORY: f'{worker_memory_mb}m',
       SPARK_WORKER_VCPUS: str(worker_cores),
-      'spark.executor.instances': str(num_workers),
+      SPARK_WORKER_INSTANCES: str(num_workers),
       # Tell spark not to run job if it can't schedule all workers. This would
       # silently degrade performance.
       'spark.scheduler.minRegisteredResourcesRatio': '1'
@@ -128,25 +140,87 @@ def GetConfiguration(driver_memory_mb: int,
   return conf
 
 
-def _RenderConfig(vm,
-                  leader,
-                  workers,
-                  memory_fraction=SPARK_MEMORY_FRACTION,
-                  configure_s3=False):
-  """Load Spark Condfiguration on VM."""
+def GetTuningCandidates(conf: Dict[str, str],
+                        num_candidates: int,
+                        seed: int = 0) -> List[Dict[str, str]]:
+  """Samples Spark configurations to try in place of a baseline one.
+
+  The candidates vary the number of executors per worker (keeping the cores and
+  memory of each worker), the shuffle partitions per core, the fraction of
+  executor memory moved off-heap, adaptive query execution and the serializer.
+
+  Args:
+    conf: The baseline configuration, as returned by GetConfiguration.
+    num_candidates: The maximum number of candidates to return.
+    seed: Seed for sampling the candidates.
+
+  Returns:
+    A list of property overrides, starting with the baseline's (no overrides).
+  """
+  worker_cores = int(conf[SPARK_WORKER_VCPUS])
+  worker_memory_mb = int(conf[SPARK_WORKER_MEMORY].rstrip('m'))
+  num_workers = int(conf[SPARK_WORKER_INSTANCES])
+  space = list(itertools.product(
+      [n for n in TUNING_EXECUTORS_PER_WORKER if worker_cores % n == 0],
+      TUNING_SHUFFLE_PARTITIONS_PER_CORE, TUNING_OFF_HEAP_FRACTION,
+      TUNING_ADAPTIVE_EXECUTION, TUNING_SERIALIZER))
+  random.Random(seed).shuffle(space)
+  candidates = [{}]
+  for (executors_per_worker, partitions_per_core, off_heap_fraction, adaptive,
+       serializer) in space[:num_candidates - 1]:
+    executor_memory_mb = worker_memory_mb // executors_per_worker
+    off_heap_mb = int(executor_memory_mb * off_heap_fraction)
+    candidate = {
+        SPARK_WORKER_VCPUS: str(worker_cores // executors_per_worker),
+        SPARK_WORKER_INSTANCES: str(num_workers * executors_per_worker),
+        SPARK_WORKER_MEMORY: f'{executor_memory_mb - off_heap_mb}m',
+        'spark.memory.offHeap.enabled': str(bool(off_heap_mb)).lower(),
+        'spark.memory.offHeap.size': f'{off_heap_mb}m',
+        'spark.sql.shuffle.partitions': str(
+            worker_cores * num_workers * partitions_per_core),
+        'spark.sql.adaptive.enabled': str(adaptive).lower(),
+        'spark.serializer': serializer,
+    }
+    if SPARK_K8S_EXECUTOR_CORES in conf:
+      # Fit all of the executors in the cores requested for one.
+      candidate[SPARK_K8S_EXECUTOR_CORES] = str(
+          round(float(conf[SPARK_K8S_EXECUTOR_CORES]) / executors_per_worker,
+                2))
+    candidates.append(candidate)
+  return candidates
+
+
+def GetClusterConfiguration(leader,
+                            workers,
+                            memory_fraction=SPARK_MEMORY_FRACTION,
+                            configure_s3=False) -> Dict[str, str]:
+  """Calculate Spark configuration of a Spark Standalone cluster."""
   # Use first worker to get worker configuration
   worker = workers[0]
   worker_cores = worker.NumCpusForBenchmark()
   worker_memory_mb = int((worker.total_memory_kb / 1024) * memory_fraction)
   driver_memory_mb = int((leader.total_memory_kb / 1024) * memory_fraction)
 
-  spark_conf = GetConfiguration(
+  return GetConfiguration(
       driver_memory_mb=driver_memory_mb,
       worker_memory_mb=worker_memory_mb,
       worker_cores=worker_cores,
       num_workers=len(workers),
       configure_s3=configure_s3)
 
+
+def _RenderConfig(vm,
+                  leader,
+                  workers,
+                  memory_fraction=SPARK_MEMORY_FRACTION,
+                  configure_s3=False):
+  """Load Spark Condfiguration on VM."""
+  worker = workers[0]
+  worker_cores = worker.NumCpusForBenchmark()
+  spark_conf = GetClusterConfiguration(
+      leader, workers, memory_fraction=memory_fraction,
+      configure_s3=configure_s3)
+
   if vm.scratch_disks:
     # TODO(pclay): support multiple scratch disks. A current suboptimal
     # workaround is RAID0 local_ssds with --num_striped_disks.
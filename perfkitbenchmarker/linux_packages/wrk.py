@@ -19,8 +19,11 @@ WRK is an extremely scalable HTTP benchmarking tool.
 https://github.com/wg/wrk
 """
 
+import collections
 import csv
+import json
 import posixpath
+import numpy as np
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import sample
 import six
@@ -39,6 +42,12 @@ _TIMEOUT = '10s'
 # WRK always outputs a free text report. _LUA_SCRIPT_NAME (above)
 # writes this prefix before the CSV output begins.
 _CSV_PREFIX = '==CSV==\n'
+# ...and this one before the latency histogram, which precedes the CSV output.
+_HISTOGRAM_PREFIX = '==HISTOGRAM==\n'
+# Percentiles reported by _LUA_SCRIPT_NAME.
+_PERCENTILES = 5, 25, 50, 75, 90, 99, 99.9
+# Metrics of a run that are summed across clients.
+_SUMMED_METRICS = 'bytes transferred', 'errors', 'requests', 'throughput'
 
 
 def _Install(vm):
@@ -81,6 +90,88 @@ def _ParseOutput(output_text):
     yield row['variable'], float(row['value']), row['unit']
 
 
+def _ParseHistogram(output_text):
+  """Parses the latency histogram written by _LUA_SCRIPT_NAME.
+
+  Returns:
+    OrderedDict of latency in ms to the number of requests, or None if there
+    is no histogram in the output.
+  """
+  if _HISTOGRAM_PREFIX not in output_text:
+    return None
+  csv_fp = six.StringIO(
+      output_text.split(_HISTOGRAM_PREFIX, 1)[1].split(_CSV_PREFIX, 1)[0])
+  histogram = collections.OrderedDict()
+  for row in csv.DictReader(csv_fp):
+    latency = float(row['latency'])
+    histogram[latency] = histogram.get(latency, 0) + int(row['requests'])
+  return histogram
+
+
+def GetHistogram(samples):
+  """Returns the latency histogram of a run from its samples, or None."""
+  for s in samples:
+    if s.metric == 'latency histogram':
+      return {float(latency): count for latency, count in
+              json.loads(s.metadata['histogram']).items()}
+  return None
+
+
+def MergeHistograms(histograms):
+  """Merges latency histograms into an OrderedDict sorted by latency."""
+  merged = collections.Counter()
+  for histogram in histograms:
+    merged.update(histogram)
+  return collections.OrderedDict(
+      (latency, count) for latency, count in sorted(merged.items()) if count)
+
+
+def HistogramPercentiles(histogram, percentiles):
+  """Returns the latencies at percentiles of a histogram."""
+  latencies = np.array(list(histogram.keys()), dtype=float)
+  cumulative = np.cumsum(list(histogram.values()))
+  indices = np.searchsorted(
+      cumulative, np.array(percentiles) / 100. * cumulative[-1])
+  return [float(latencies[min(i, len(latencies) - 1)]) for i in indices]
+
+
+def AggregateResults(client_samples):
+  """Aggregates the samples of concurrent runs from multiple clients.
+
+  Args:
+    client_samples: list of lists of samples, as returned by Run.
+
+  Returns:
+    List of samples with the metrics of Run. Counts and throughput are summed
+    and latencies are computed from the merged histograms. The histogram of
+    each client only holds the latencies at the 127 percentiles written by
+    wrk_latency.lua, so the merged percentiles are approximations, flagged by
+    the approximate_latency_percentiles metadata.
+  """
+  if len(client_samples) == 1:
+    return list(client_samples[0])
+  metadata = dict(client_samples[0][0].metadata)
+  metadata['connections'] = sum(
+      samples[0].metadata['connections'] for samples in client_samples)
+  metadata['clients'] = len(client_samples)
+  metadata['approximate_latency_percentiles'] = True
+  histogram = MergeHistograms(
+      GetHistogram(samples) for samples in client_samples)
+  results = []
+  for percentile, latency in zip(
+      _PERCENTILES, HistogramPercentiles(histogram, _PERCENTILES)):
+    results.append(sample.Sample('p{0:g} latency'.format(percentile), latency,
+                                 'ms', metadata))
+  for metric in _SUMMED_METRICS:
+    values = [s for samples in client_samples
+              for s in samples if s.metric == metric]
+    results.append(sample.Sample(metric, sum(s.value for s in values),
+                                 values[0].unit, metadata))
+  results.append(sample.CreateHistogramSample(
+      histogram, 'wrk', 'latency', 'ms', metadata, metric='latency histogram'))
+  return results
+
+
 def Run(vm, target, connections=1, duration=60):
   """Runs wrk against a given target.
 
@@ -101,8 +192,13 @@ def Run(vm, target, connections=1, duration=60):
              script=_LUA_SCRIPT_PATH, target=target,
              duration=duration, timeout=_TIMEOUT)
   stdout, _ = vm.RemoteCommand(cmd)
+  metadata = {'connections': connections,
+              'threads': threads,
+              'duration': duration}
   for variable, value, unit in _ParseOutput(stdout):
-    yield sample.Sample(variable, value, unit,
-                        metadata={'connections': connections,
-                                  'threads': threads,
-                                  'duration': duration})
+    yield sample.Sample(variable, value, unit, metadata=dict(metadata))
+  histogram = _ParseHistogram(stdout)
+  if histogram:
+    yield sample.CreateHistogramSample(
+        histogram, 'wrk', 'latency', 'ms', dict(metadata),
+        metric='latency histogram')
@@ -17,18 +17,27 @@
 wrk2 is a fork of wrk, supporting improved latency stats and fixed throughput.
 """
 
+import collections
 import posixpath
 import re
 
 from absl import flags
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.linux_packages import wrk
 
 WRK2_URL = ('https://github.com/giltene/wrk2/archive/'
             'c4250acb6921c13f8dccfc162d894bd7135a2979.tar.gz')
 WRK2_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'wrk2')
 WRK2_PATH = posixpath.join(WRK2_DIR, 'wrk')
 
+# Script writing the number of responses completed in each second.
+_LUA_SCRIPT_NAME = 'wrk2_timeseries.lua'
+_LUA_SCRIPT_PATH = posixpath.join(WRK2_DIR, _LUA_SCRIPT_NAME)
+_TIMESERIES_PREFIX = '==TIMESERIES==\ntime,responses\n'
+# Percentiles aggregated across clients from their merged histograms.
+_AGGREGATE_PERCENTILES = 50, 75, 90, 99, 99.9, 99.99, 99.999
+
 FLAGS = flags.FLAGS
 
 flags.DEFINE_bool('wrk2_corrected_latency', True,
@@ -38,6 +47,11 @@ flags.DEFINE_bool('wrk2_corrected_latency', True,
                   'throughput configured for the run.\n'
                   'If False, response latency is the time that actual '
                   'transmission of a request occured.')
+flags.DEFINE_bool('wrk2_throughput_timeseries', False,
+                  'Whether to count the responses completed in each second, '
+                  'to report per second throughput. This costs a Lua call '
+                  'per response, which may lower the highest rate wrk2 can '
+                  'sustain. Ignored if wrk2 is run with another script.')
 
 
 def _Install(vm):
@@ -49,6 +63,7 @@ def _Install(vm):
        'curl -L {1} | tar -xzf - -C {0} --strip-components 1').format(
            WRK2_DIR, WRK2_URL))
   vm.RemoteCommand('make -C {}'.format(WRK2_DIR))
+  vm.PushDataFile(_LUA_SCRIPT_NAME, _LUA_SCRIPT_PATH)
 
 
 def YumInstall(vm):
@@ -118,9 +133,105 @@ def _ParseOutput(output_text):
     raise ValueError('More than 10% of requests failed.')
 
 
-def Run(vm, target, rate, connections=1, duration=60, script_path=None,
-        threads=None):
-  """Runs wrk against a given target.
+def _ParseHistogram(output_text):
+  """Parses the latency histogram from the detailed percentile spectrum.
+
+  Each row of the spectrum holds the total number of requests with latencies
+  up to its value, so the difference to the previous row is the number of
+  requests in the histogram bucket of the value.
+
+  Args:
+    output_text: str. Output for wrk2
+
+  Returns:
+    OrderedDict of latency in ms to the number of requests, or None if the
+    spectrum cannot be found.
+  """
+  m = re.search(
+      r'Detailed Percentile spectrum:\n.*\n\n((?:\s*[\d.]+\s+[\d.]+\s+\d+'
+      r'\s+\S+\n)+)', output_text)
+  if not m:
+    return None
+  histogram = collections.OrderedDict()
+  previous_count = 0
+  for line in m.group(1).splitlines():
+    value, _, total_count, _ = line.split()
+    count = int(total_count) - previous_count
+    previous_count = int(total_count)
+    if count:
+      histogram[float(value)] = histogram.get(float(value), 0) + count
+  return histogram
+
+
+def _ParseTimeseries(output_text):
+  """Parses the responses per second written by _LUA_SCRIPT_NAME.
+
+  Returns:
+    List of (unix time in seconds, responses) tuples.
+  """
+  if _TIMESERIES_PREFIX not in output_text:
+    return []
+  timeseries = []
+  for line in output_text.split(_TIMESERIES_PREFIX, 1)[1].splitlines():
+    if not line.strip():
+      break
+    second, responses = line.split(',')
+    timeseries.append((int(second), int(responses)))
+  return timeseries
+
+
+def AggregateClientSamples(client_samples, metadata):
+  """Aggregates the latency and throughput of concurrent runs of clients.
+
+  Latency percentiles are computed from the merged histograms of the clients.
+  Throughput is summed per second over the seconds all clients ran
+  throughout, so clients starting or finishing at different times do not
+  skew it.
+
+  Args:
+    client_samples: list of lists of samples, as returned by Run.
+    metadata: dict. Metadata of the aggregate samples.
+
+  Returns:
+    List of sample.Sample objects.
+  """
+  samples = []
+  histograms = [wrk.GetHistogram(s) for s in client_samples]
+  if all(histograms):
+    histogram = wrk.MergeHistograms(histograms)
+    for percentile, latency in zip(
+        _AGGREGATE_PERCENTILES,
+        wrk.HistogramPercentiles(histogram, _AGGREGATE_PERCENTILES)):
+      samples.append(sample.Sample(
+          'aggregate p{0:g} latency'.format(percentile), latency, 'ms',
+          metadata))
+
+  timeseries = [{s.timestamp: s.value for s in client if s.metric ==
+                 'throughput'} for client in client_samples]
+  if not all(timeseries):
+    return samples
+  # The first and last seconds of each client are partial.
+  start = max(min(series) for series in timeseries) + 1
+  end = min(max(series) for series in timeseries) - 1
+  if start > end:
+    return samples
+  totals = []
+  for second in range(int(start), int(end) + 1):
+    total = sum(series.get(second, 0) for series in timeseries)
+    totals.append(total)
+    samples.append(sample.Sample('aggregate throughput', total,
+                                 'requests/sec', metadata, timestamp=second))
+  samples.append(sample.Sample('aggregate common window throughput',
+                               sum(totals) / len(totals), 'requests/sec',
+                               metadata))
+  samples.append(sample.Sample('aggregate common window', len(totals),
+                               'seconds', metadata))
+  return samples
+
+
+def GetRunCommand(vm, target, rate, connections=1, duration=60,
+                  script_path=None, threads=None):
+  """Returns the command running wrk against a given target.
 
   Args:
     vm: Virtual machine.
@@ -128,10 +239,12 @@ def Run(vm, target, rate, connections=1, duration=60, script_path=None,
     rate: int. Target request rate, in QPS.
     connections: Number of concurrent connections.
     duration: Duration of the test, in seconds.
-    script_path: If specified, a lua script to execute.
+    script_path: If specified, a lua script to execute. Otherwise the
+      responses per second are counted if --wrk2_throughput_timeseries.
     threads: Number of threads. Defaults to min(connections, num_cores).
-  Yields:
-    sample.Sample objects with results.
+  Returns:
+    A tuple of the command and the metadata of the samples parsed from its
+    output with ParseRunOutput.
   """
   if threads is None:
     threads = min(connections, vm.NumCpusForBenchmark())
@@ -145,14 +258,58 @@ def Run(vm, target, rate, connections=1, duration=60, script_path=None,
              rate=rate, duration=duration,
              corrected=(
                  'latency' if FLAGS.wrk2_corrected_latency else 'u_latency'))
+  if not script_path and FLAGS.wrk2_throughput_timeseries:
+    script_path = _LUA_SCRIPT_PATH
   if script_path:
     cmd += ' --script ' + script_path
   cmd += ' ' + target
-  stdout, _ = vm.RemoteCommand(cmd)
+  metadata = {'connections': connections,
+              'threads': threads,
+              'duration': duration,
+              'target_rate': rate,
+              'corrected': False}
+  return cmd, metadata
+
+
+def ParseRunOutput(stdout, metadata):
+  """Parses the output of a command from GetRunCommand.
+
+  Args:
+    stdout: str. Output of wrk2.
+    metadata: dict. Metadata returned by GetRunCommand.
+  Yields:
+    sample.Sample objects with results.
+  """
   for variable, value, unit in _ParseOutput(stdout):
-    yield sample.Sample(variable, value, unit,
-                        metadata={'connections': connections,
-                                  'threads': threads,
-                                  'duration': duration,
-                                  'target_rate': rate,
-                                  'corrected': False})
+    yield sample.Sample(variable, value, unit, metadata=dict(metadata))
+  histogram = _ParseHistogram(stdout)
+  if histogram:
+    yield sample.CreateHistogramSample(
+        histogram, 'wrk2', 'latency', 'ms', dict(metadata),
+        metric='latency histogram')
+  for second, responses in _ParseTimeseries(stdout):
+    yield sample.Sample('throughput', responses, 'requests/sec',
+                        dict(metadata), timestamp=second)
+
+
+def Run(vm, target, rate, connections=1, duration=60, script_path=None,
+        threads=None):
+  """Runs wrk against a given target.
+
+  Args:
+    vm: Virtual machine.
+    target: URL to fetch.
+    rate: int. Target request rate, in QPS.
+    connections: Number of concurrent connections.
+    duration: Duration of the test, in seconds.
+    script_path: If specified, a lua script to execute. Otherwise the
+      responses per second are counted if --wrk2_throughput_timeseries.
+    threads: Number of threads. Defaults to min(connections, num_cores).
+  Yields:
+    sample.Sample objects with results.
+  """
+  cmd, metadata = GetRunCommand(vm, target, rate, connections, duration,
+                                script_path, threads)
+  stdout, _ = vm.RemoteCommand(cmd)
+  for result in ParseRunOutput(stdout, metadata):
+    yield result
@@ -40,6 +40,7 @@ import bisect
 import collections
 import copy
 import csv
+import hashlib
 import itertools
 import json
 import logging
@@ -50,10 +51,13 @@ import posixpath
 import re
 import time
 from absl import flags
+from perfkitbenchmarker import context
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import object_storage_service
+from perfkitbenchmarker import providers
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import maven
@@ -215,6 +219,31 @@ _INCOMPLETE_LOADING_METRIC = flags.DEFINE_string(
 _ERROR_RATE_THRESHOLD = flags.DEFINE_float(
     'ycsb_max_error_rate', 1.00, 'The maximum error rate allowed for the run. '
     'By default, this allows any number of errors.')
+_DATASET_CACHE_BUCKET = flags.DEFINE_string(
+    'ycsb_dataset_cache_bucket', None,
+    'Object storage bucket, optionally followed by a path, in which to cache '
+    'loaded datasets. Benchmarks that support it restore a dataset cached by '
+    'an earlier run with the same database and load parameters instead of '
+    'running the load stage, and cache the dataset after loading otherwise.')
+_PUBLISH_INCREMENTALLY = flags.DEFINE_boolean(
+    'ycsb_publish_incrementally', False,
+    'Whether to send the samples of each run of a staircase load to the sample '
+    'collector as soon as it completes rather than return them once all runs '
+    'complete, so that they are kept if a later run fails and published right '
+    'away with --publish_after_run. Benchmarks do not add their own metadata '
+    'to samples sent this way, and they do not go through samples_created, so '
+    'receivers of it such as trace collectors and --collect_meminfo only add '
+    'their samples to those Run returns.')
+_CHECKPOINT_STAIRCASE = flags.DEFINE_boolean(
+    'ycsb_checkpoint_staircase', True,
+    'Whether to record each completed run of a staircase load in the run '
+    'directory, so that rerunning a failed benchmark with the same --run_uri '
+    'resumes the staircase at the first incomplete run.')
+
+# Load parameters that determine the loaded dataset, besides the database and
+# the workload file. insertorder determines the distribution of the keys.
+_DATASET_PARAMETERS = ('recordcount', 'fieldcount', 'fieldlength',
+                       'insertorder')
 
 # Default loading thread count for non-batching backends.
 DEFAULT_PRELOAD_THREADS = 32
@@ -943,6 +972,210 @@ def _CreateSamples(ycsb_result, include_histogram=False, **kwargs):
                             average_latency, 'ms', timeseries_meta)
 
 
+class DataDirectoryCache(object):
+  """Caches datasets as tarballs of database data directories.
+
+  The data directory of each database server is stored as one object in
+  --ycsb_dataset_cache_bucket, named after the dataset key and the number of
+  servers, so datasets are only restored onto clusters of the same size. The
+  database is stopped while its data directories are archived or replaced.
+
+  Attributes:
+    vms: list of database server VMs.
+    get_data_dir: function returning the data directory of a server VM.
+    stop: function stopping the database on a server VM.
+    start: function starting the database on a server VM.
+    bucket: the bucket, optionally followed by a path, to cache datasets in.
+  """
+
+  def __init__(self, vms, get_data_dir, stop, start, bucket=None):
+    self.vms = vms
+    self.get_data_dir = get_data_dir
+    self.stop = stop
+    self.start = start
+    self.bucket = bucket or _DATASET_CACHE_BUCKET.value
+    self._service = None
+
+  def _GetService(self):
+    """Returns the object storage service, preparing the VMs to use it."""
+    if not self._service:
+      providers.LoadProvider(FLAGS.cloud)
+      service = object_storage_service.GetObjectStorageClass(FLAGS.cloud)()
+      service.PrepareService(FLAGS.object_storage_region)
+      vm_util.RunThreaded(service.PrepareVM, self.vms)
+      self._service = service
+    return self._service
+
+  def Prepare(self):
+    """Prepares the object storage service and the VMs to use it."""
+    self._GetService()
+
+  def _ObjectName(self, index):
+    return '{0}-of-{1}.tar.gz'.format(index, len(self.vms))
+
+  def _StagingDir(self, vm):
+    return posixpath.join(vm.GetScratchDir(), 'ycsb-dataset-cache')
+
+  def Restore(self, key):
+    """Replaces the data of the servers with a cached dataset.
+
+    Args:
+      key: str. Key of the dataset, see YCSBExecutor.GetDatasetKey.
+
+    Returns:
+      Whether the dataset was cached and has been restored. The data of the
+      servers is left untouched otherwise.
+    """
+    service = self._GetService()
+
+    def _Download(index):
+      vm = self.vms[index]
+      staging_dir = self._StagingDir(vm)
+      url = service.MakeRemoteCliDownloadUrl(
+          self.bucket, posixpath.join(key, self._ObjectName(index)))
+      _, _, retcode = vm.RemoteCommandWithReturnCode(
+          'mkdir -p {0} && {1}'.format(
+              staging_dir, service.GenerateCliDownloadFileCommand(
+                  url, posixpath.join(staging_dir, self._ObjectName(index)))),
+          ignore_failure=True)
+      return retcode == 0
+
+    if not all(vm_util.RunThreaded(_Download, list(range(len(self.vms))))):
+      logging.info('Dataset %s is not cached in %s.', key, self.bucket)
+      vm_util.RunThreaded(
+          lambda vm: vm.RemoteCommand('rm -rf ' + self._StagingDir(vm)),
+          self.vms)
+      return False
+
+    def _Extract(index):
+      vm = self.vms[index]
+      data_dir = self.get_data_dir(vm)
+      self.stop(vm)
+      vm.RemoteCommand(
+          'sudo rm -rf {0} && sudo mkdir -p {0} && sudo tar xzf {1} -C {0} && '
+          'rm -rf {2}'.format(
+              data_dir,
+              posixpath.join(self._StagingDir(vm), self._ObjectName(index)),
+              self._StagingDir(vm)))
+      self.start(vm)
+
+    vm_util.RunThreaded(_Extract, list(range(len(self.vms))))
+    return True
+
+  def Save(self, key):
+    """Caches the data of the servers as a dataset.
+
+    Args:
+      key: str. Key of the dataset, see YCSBExecutor.GetDatasetKey.
+    """
+    service = self._GetService()
+
+    def _Upload(index):
+      vm = self.vms[index]
+      staging_dir = self._StagingDir(vm)
+      self.stop(vm)
+      vm.RemoteCommand(
+          'mkdir -p {0} && sudo tar czf {1} -C {2} .'.format(
+              staging_dir,
+              posixpath.join(staging_dir, self._ObjectName(index)),
+              self.get_data_dir(vm)))
+      self.start(vm)
+      service.CLIUploadDirectory(vm, staging_dir, [self._ObjectName(index)],
+                                 posixpath.join(self.bucket, key))
+      vm.RemoteCommand('sudo rm -rf ' + staging_dir)
+
+    vm_util.RunThreaded(_Upload, list(range(len(self.vms))))
+
+
+class StaircaseCheckpoint(object):
+  """Records the completed runs of a staircase load in a file.
+
+  Runs are recorded in the order they complete, with the parameters they ran
+  with, their overall throughput (from which a dynamic load picks the next
+  target) and their samples, unless those were already sent to the sample
+  collector. Replaying a checkpoint returns the recorded runs one by one for as
+  long as their parameters match the runs being started, so an interrupted
+  staircase is resumed at its first incomplete run.
+
+  Attributes:
+    path: Path of the checkpoint file.
+    runs: List of dicts describing the recorded runs.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.runs = []
+    self._next_run = 0
+    if os.path.exists(path):
+      with open(path) as f:
+        self.runs = json.load(f)
+      logging.info('Resuming staircase load after %d completed runs in %s.',
+                   len(self.runs), path)
+
+  @staticmethod
+  def _Normalize(value):
+    return json.loads(json.dumps(value, sort_keys=True, default=str))
+
+  def Replay(self, parameters):
+    """Returns the next recorded run if it ran with these parameters.
+
+    Args:
+      parameters: dict. YCSB parameters of the run being started.
+
+    Returns:
+      A (throughput, samples) tuple of the recorded run, or None if the run has
+      not completed before. Later recorded runs are then discarded.
+    """
+    if (self._next_run < len(self.runs) and
+        self.runs[self._next_run]['parameters'] == self._Normalize(parameters)):
+      run = self.runs[self._next_run]
+      self._next_run += 1
+      return run['throughput'], [sample.Sample(*s) for s in run['samples']]
+    del self.runs[self._next_run:]
+    return None
+
+  def Record(self, parameters, throughput, samples):
+    """Records a completed run.
+
+    Args:
+      parameters: dict. YCSB parameters of the run.
+      throughput: float. Overall throughput of the run.
+      samples: list of sample.Sample objects to return if the run is replayed.
+    """
+    self.runs.append({
+        'parameters': self._Normalize(parameters),
+        'throughput': throughput,
+        'samples': self._Normalize([list(s) for s in samples]),
+    })
+    self._next_run = len(self.runs)
+    temp_path = self.path + '.tmp'
+    with open(temp_path, 'w') as f:
+      json.dump(self.runs, f)
+    os.replace(temp_path, self.path)
+
+  def Remove(self):
+    """Removes the checkpoint file once the staircase load has completed."""
+    if os.path.exists(self.path):
+      os.remove(self.path)
+
+
+def _GetStaircaseCheckpoint():
+  """Returns the checkpoint of the current benchmark's staircase load."""
+  spec = context.GetThreadBenchmarkSpec()
+  name = 'ycsb_staircase_{0}.json'.format(spec.uid if spec else 'checkpoint')
+  return StaircaseCheckpoint(vm_util.PrependTempDir(name))
+
+
+def _SendIncrementalSamples(samples):
+  """Sends samples to the sample collector, returning whether it took them."""
+  if not _PUBLISH_INCREMENTALLY.value:
+    return False
+  responses = events.samples_ready.send(
+      events.RUN_PHASE, benchmark_spec=context.GetThreadBenchmarkSpec(),
+      samples=samples)
+  return any(collected for _, collected in responses)
+
+
 class YCSBExecutor(object):
   """Load data and run benchmarks using YCSB.
 
@@ -1035,6 +1268,46 @@ class YCSBExecutor(object):
         command, should_log=FLAGS.ycsb_log_remote_command_output)
     return ParseResults(str(stderr + stdout), self.measurement_type)
 
+  def _SetLoadDefaults(self, kwargs):
+    """Sets the load parameters that have defaults from flags."""
+    kwargs.setdefault('threads', self._default_preload_threads)
+    if FLAGS.ycsb_record_count:
+      kwargs.setdefault('recordcount', FLAGS.ycsb_record_count)
+    if FLAGS.ycsb_field_count:
+      kwargs.setdefault('fieldcount', FLAGS.ycsb_field_count)
+    if FLAGS.ycsb_field_length:
+      kwargs.setdefault('fieldlength', FLAGS.ycsb_field_length)
+
+  def GetDatasetKey(self, workload_file, load_kwargs=None):
+    """Returns a key identifying the dataset loaded with a workload.
+
+    Loads with the same database, workload file contents, record count, field
+    count, field length and insert order load the same dataset.
+
+    Args:
+      workload_file: YCSB Workload file the dataset is loaded with.
+      load_kwargs: dict. Additional arguments passed to the load stage.
+
+    Returns:
+      str. The database followed by a hash of the dataset parameters.
+    """
+    kwargs = dict(load_kwargs or {})
+    self._SetLoadDefaults(kwargs)
+    with open(workload_file) as fp:
+      contents = fp.read()
+    # In order of precedence on the YCSB command line.
+    parameters = _ParseWorkload(contents)
+    parameters.update(self.parameters)
+    parameters.update(kwargs)
+    parameters.update(pv.split('=', 1) for pv in FLAGS.ycsb_load_parameters)
+    dataset = {'database': self.database,
+               'workload': hashlib.sha256(contents.encode()).hexdigest()}
+    for parameter in _DATASET_PARAMETERS:
+      dataset[parameter] = str(parameters.get(parameter))
+    digest = hashlib.sha256(
+        json.dumps(dataset, sort_keys=True).encode()).hexdigest()
+    return '{0}-{1}'.format(self.database, digest[:16])
+
   def _LoadThreaded(self, vms, workload_file, **kwargs):
     """Runs "Load" in parallel for each VM in VMs.
 
@@ -1050,13 +1323,7 @@ class YCSBExecutor(object):
     """
     results = []
 
-    kwargs.setdefault('threads', self._default_preload_threads)
-    if FLAGS.ycsb_record_count:
-      kwargs.setdefault('recordcount', FLAGS.ycsb_record_count)
-    if FLAGS.ycsb_field_count:
-      kwargs.setdefault('fieldcount', FLAGS.ycsb_field_count)
-    if FLAGS.ycsb_field_length:
-      kwargs.setdefault('fieldlength', FLAGS.ycsb_field_length)
+    self._SetLoadDefaults(kwargs)
 
     with open(workload_file) as fp:
       workload_meta = _ParseWorkload(fp.read())
@@ -1219,6 +1486,10 @@ class YCSBExecutor(object):
     A staircase load is applied for each workload file, for each entry in
     ycsb_threads_per_client.
 
+    Each completed run is recorded in a StaircaseCheckpoint with
+    --ycsb_checkpoint_staircase, and its samples are sent to the sample
+    collector right away with --ycsb_publish_incrementally.
+
     Args:
       vms: List of VirtualMachine objects to generate load from.
       workloads: List of workload file names.
@@ -1226,10 +1497,13 @@ class YCSBExecutor(object):
       options.
 
     Returns:
-      List of sample.Sample objects.
+      List of sample.Sample objects, excluding those sent to the sample
+      collector.
     """
     all_results = []
     parameters = {}
+    checkpoint = (_GetStaircaseCheckpoint() if _CHECKPOINT_STAIRCASE.value
+                  else None)
     for workload_index, workload_file in enumerate(workloads):
       if FLAGS.ycsb_operation_count:
         parameters = {'operationcount': FLAGS.ycsb_operation_count}
@@ -1286,6 +1560,9 @@ class YCSBExecutor(object):
           if is_sustained:
             parameters['maxexecutiontime'] = (
                 FLAGS.ycsb_dynamic_load_sustain_timelimit)
+          replayed = checkpoint and checkpoint.Replay(parameters)
+          if replayed:
+            return replayed + (True,)
           start = time.time()
           results = self._RunThreaded(vms, **parameters)
           events.record_event.send(
@@ -1296,9 +1573,10 @@ class YCSBExecutor(object):
           client_meta.update(clients=len(vms) * client_count,
                              threads_per_client_vm=client_count)
 
+          run_samples = []
           if FLAGS.ycsb_include_individual_results and len(results) > 1:
             for i, result in enumerate(results):
-              all_results.extend(_CreateSamples(
+              run_samples.extend(_CreateSamples(
                   result,
                   result_type='individual',
                   result_index=i,
@@ -1313,26 +1591,36 @@ class YCSBExecutor(object):
                 results, self.measurement_type, parsed_hdr)
           else:
             combined = _CombineResults(results, self.measurement_type, {})
-          run_samples = list(_CreateSamples(
+          combined_samples = list(_CreateSamples(
               combined, result_type='combined',
               include_histogram=FLAGS.ycsb_histogram,
               **client_meta))
+          run_samples.extend(combined_samples)
 
           overall_throughput = 0
-          for s in run_samples:
+          for s in combined_samples:
             if s.metric == 'overall Throughput':
               overall_throughput += s.value
-          return overall_throughput, run_samples
+          return overall_throughput, run_samples, False
+
+        def _CompleteRun(throughput, run_samples, replayed):
+          """Collects the samples of the run that just completed."""
+          if not replayed:
+            if _SendIncrementalSamples(run_samples):
+              run_samples = []
+            if checkpoint:
+              checkpoint.Record(parameters, throughput, run_samples)
+          all_results.extend(run_samples)
 
-        target_throughput, run_samples = _DoRunStairCaseLoad(
+        target_throughput, run_samples, replayed = _DoRunStairCaseLoad(
             client_count, target_qps_per_vm, workload_meta)
+        _CompleteRun(target_throughput, run_samples, replayed)
 
         # Uses 5 * unthrottled throughput as starting point.
         target_throughput *= 5
-        all_results.extend(run_samples)
         is_sustained = False
         while FLAGS.ycsb_dynamic_load:
-          actual_throughput, run_samples = _DoRunStairCaseLoad(
+          actual_throughput, run_samples, replayed = _DoRunStairCaseLoad(
               client_count,
               target_throughput // len(vms),
               workload_meta,
@@ -1341,12 +1629,14 @@ class YCSBExecutor(object):
               actual_throughput / target_throughput)
           for s in run_samples:
             s.metadata['sustained'] = is_sustained
-          all_results.extend(run_samples)
+          _CompleteRun(actual_throughput, run_samples, replayed)
           target_throughput = self._GetRunLoadTarget(
               actual_throughput, is_sustained)
           if target_throughput is None:
             break
 
+    if checkpoint:
+      checkpoint.Remove()
     return all_results
 
   def CombineHdrHistogramLogFiles(self, hdr_files_dir, vms):
@@ -1392,10 +1682,25 @@ class YCSBExecutor(object):
       hdrhistograms[grouptype.lower()] = hdrhistogram
     return hdrhistograms
 
-  def Load(self, vms, workloads=None, load_kwargs=None):
-    """Load data using YCSB."""
+  def Load(self, vms, workloads=None, load_kwargs=None, dataset_cache=None):
+    """Load data using YCSB.
+
+    Args:
+      vms: List of virtual machines. VMs to use to generate load.
+      workloads: List of strings. Workload files to use. If unspecified,
+        _GetWorkloadFileList() is used.
+      load_kwargs: dict. Additional arguments to pass to the load stage.
+      dataset_cache: Optional DataDirectoryCache. If given and
+        --ycsb_dataset_cache_bucket is set, the dataset is restored from the
+        cache instead of loaded if it was cached, and cached after loading
+        otherwise.
+
+    Returns:
+      List of sample.Sample objects.
+    """
     workloads = workloads or _GetWorkloadFileList()
     load_samples = []
+    cache_samples = []
     assert workloads, 'no workloads'
 
     def _HasInsertFailures(result_samples):
@@ -1405,12 +1710,38 @@ class YCSBExecutor(object):
       return False
 
     if FLAGS.ycsb_reload_database or not self.loaded:
-      load_samples += list(self._LoadThreaded(
-          vms, workloads[0], **(load_kwargs or {})))
-      if (_SHOULD_FAIL_ON_INCOMPLETE_LOADING.value and
-          _HasInsertFailures(load_samples)):
-        raise errors.Benchmarks.RunError(
-            'There are insert failures, so the table loading is incomplete')
+      dataset_key = None
+      if dataset_cache and _DATASET_CACHE_BUCKET.value:
+        dataset_key = self.GetDatasetKey(workloads[0], load_kwargs)
+      cache_metadata = {'ycsb_dataset_key': dataset_key}
+      restored = False
+      if dataset_key:
+        # Setting up the bucket and the VMs is not part of either time.
+        dataset_cache.Prepare()
+        start = time.time()
+        restored = dataset_cache.Restore(dataset_key)
+      if restored:
+        cache_samples.append(sample.Sample(
+            'dataset_restore_time', time.time() - start, 'seconds',
+            cache_metadata))
+      else:
+        # Nor is looking up a dataset that is not cached.
+        start = time.time()
+        load_samples += list(self._LoadThreaded(
+            vms, workloads[0], **(load_kwargs or {})))
+        if (_SHOULD_FAIL_ON_INCOMPLETE_LOADING.value and
+            _HasInsertFailures(load_samples)):
+          raise errors.Benchmarks.RunError(
+              'There are insert failures, so the table loading is incomplete')
+        if dataset_key:
+          cache_samples.append(sample.Sample(
+              'dataset_load_time', time.time() - start, 'seconds',
+              cache_metadata))
+          start = time.time()
+          dataset_cache.Save(dataset_key)
+          cache_samples.append(sample.Sample(
+              'dataset_snapshot_time', time.time() - start, 'seconds',
+              cache_metadata))
 
       self.loaded = True
     if FLAGS.ycsb_sleep_after_load_in_sec > 0:
@@ -1418,9 +1749,9 @@ class YCSBExecutor(object):
                    FLAGS.ycsb_sleep_after_load_in_sec)
       time.sleep(FLAGS.ycsb_sleep_after_load_in_sec)
     if FLAGS.ycsb_load_samples:
-      return load_samples
+      return load_samples + cache_samples
     else:
-      return []
+      return cache_samples
 
   def Run(self, vms, workloads=None, run_kwargs=None):
     """Runs each workload/client count combination."""
@@ -1435,7 +1766,8 @@ class YCSBExecutor(object):
             'sleep_after_load_in_sec'] = FLAGS.ycsb_sleep_after_load_in_sec
     return samples
 
-  def LoadAndRun(self, vms, workloads=None, load_kwargs=None, run_kwargs=None):
+  def LoadAndRun(self, vms, workloads=None, load_kwargs=None, run_kwargs=None,
+                 dataset_cache=None):
     """Load data using YCSB, then run each workload/client count combination.
 
     Loads data using the workload defined by 'workloads', then
@@ -1451,13 +1783,16 @@ class YCSBExecutor(object):
         _GetWorkloadFileList() is used.
       load_kwargs: dict. Additional arguments to pass to the load stage.
       run_kwargs: dict. Additional arguments to pass to the run stage.
+      dataset_cache: Optional DataDirectoryCache to restore the dataset from,
+        see Load.
     Returns:
       List of sample.Sample objects.
     """
     load_samples = []
     if not FLAGS.ycsb_skip_load_stage:
       load_samples = self.Load(vms, workloads=workloads,
-                               load_kwargs=load_kwargs)
+                               load_kwargs=load_kwargs,
+                               dataset_cache=dataset_cache)
     run_samples = []
     if not FLAGS.ycsb_skip_run_stage:
       run_samples = self.Run(vms, workloads=workloads,
@@ -29,11 +29,13 @@ for you.
 import abc
 import collections
 import copy
+import json
 import logging
 import os
 import pipes
 import posixpath
 import re
+import subprocess
 import threading
 import time
 from typing import Dict, Set
@@ -44,6 +46,7 @@ from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import log_util
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import virtual_machine
@@ -72,6 +75,17 @@ EXECUTE_COMMAND = 'execute_command.py'
 # then copies the stdout and stderr, exiting with the status of the command run
 # by EXECUTE_COMMAND.
 WAIT_FOR_COMMAND = 'wait_for_command.py'
+# TIMED_COMMAND runs a command, then appends a line starting with
+# TIMED_COMMAND_MARKER and its resource usage as JSON to stderr.
+TIMED_COMMAND = 'timed_command.py'
+TIMED_COMMAND_MARKER = 'PKB_COMMAND_TIMING:'
+
+# Resource usage of a command measured on the VM by TIMED_COMMAND. Times are in
+# seconds. The I/O bytes are None if the kernel does not account them.
+CommandTiming = collections.namedtuple('CommandTiming', [
+    'wall_time', 'user_time', 'system_time', 'max_rss_kb',
+    'voluntary_context_switches', 'involuntary_context_switches',
+    'read_bytes', 'write_bytes'])
 
 _DEFAULT_DISK_FS_TYPE = 'ext4'
 _DEFAULT_DISK_MOUNT_OPTIONS = 'discard'
@@ -181,6 +195,25 @@ _DISABLE_YUM_CRON = flags.DEFINE_boolean(
 RETRYABLE_SSH_RETCODE = 255
 
 
+def ParseCommandTiming(stderr):
+  """Separates the timing written by TIMED_COMMAND from a command's stderr.
+
+  Args:
+    stderr: The stderr of TIMED_COMMAND.
+
+  Returns:
+    A tuple of the stderr of the command and its CommandTiming, or None if
+    stderr contains no timing.
+  """
+  head, marker, tail = stderr.rpartition(TIMED_COMMAND_MARKER)
+  if not marker:
+    return stderr, None
+  # TIMED_COMMAND separates the timing from the output with a newline.
+  if head.endswith('\n'):
+    head = head[:-1]
+  return head, CommandTiming(**json.loads(tail))
+
+
 class CpuVulnerabilities:
   """The 3 different vulnerablity statuses from vm.cpu_vulernabilities.
 
@@ -319,7 +352,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
         # Python3 is needed for RobustRemoteCommands
         self.Install('python3')
 
-        for f in (EXECUTE_COMMAND, WAIT_FOR_COMMAND):
+        for f in (EXECUTE_COMMAND, WAIT_FOR_COMMAND, TIMED_COMMAND):
           remote_path = os.path.join(vm_util.VM_TMP_DIR, os.path.basename(f))
           if os.path.basename(remote_path):
             self.RemoteCommand('sudo rm -f ' + remote_path)
@@ -419,6 +452,32 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                         'Wrapper script log:\n%s', stdout)
       raise
 
+  def TimedRemoteCommand(self, command, **kwargs):
+    """Runs a command on the VM, measuring its resource usage on the VM.
+
+    Unlike timing RemoteCommand on the runner, the elapsed time excludes SSH
+    connection setup and network latency.
+
+    Args:
+      command: The command to run.
+      **kwargs: Keyword arguments passed to RemoteCommand.
+
+    Returns:
+      A tuple of stdout, stderr and the CommandTiming of the command, which is
+      None if the command could not be timed.
+
+    Raises:
+      RemoteCommandError: If there was a problem establishing the connection, or
+          the command fails.
+    """
+    self._SetupRobustCommand()
+    timed_path = os.path.join(vm_util.VM_TMP_DIR, TIMED_COMMAND)
+    if not isinstance(command, str):
+      command = ' '.join(command)
+    stdout, stderr = self.RemoteCommand(
+        'python3 %s %s' % (timed_path, pipes.quote(command)), **kwargs)
+    return (stdout,) + ParseCommandTiming(stderr)
+
   def SetupRemoteFirewall(self):
     """Sets up IP table configurations on the VM."""
     self.RemoteHostCommand('sudo iptables -A INPUT -j ACCEPT')
@@ -1032,14 +1091,15 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       else:
         ssh_cmd.append(command)
 
-      for _ in range(retries):
-        stdout, stderr, retcode = vm_util.IssueCommand(
-            ssh_cmd, force_info_log=should_log,
-            suppress_warning=suppress_warning,
-            timeout=timeout, raise_on_failure=False)
-        # Retry on 255 because this indicates an SSH failure
-        if retcode != RETRYABLE_SSH_RETCODE:
-          break
+      with log_util.GetThreadLogContext().ExtendShard(vm=self.name):
+        for _ in range(retries):
+          stdout, stderr, retcode = vm_util.IssueCommand(
+              ssh_cmd, force_info_log=should_log,
+              suppress_warning=suppress_warning,
+              timeout=timeout, raise_on_failure=False)
+          # Retry on 255 because this indicates an SSH failure
+          if retcode != RETRYABLE_SSH_RETCODE:
+            break
     finally:
       if login_shell:
         self._pseudo_tty_lock.release()
@@ -1073,6 +1133,78 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """
     return self.RemoteHostCommandWithReturnCode(*args, **kwargs)[:2]
 
+  def _GetSshCommand(self, command):
+    """Returns the ssh command line running a command on the VM."""
+    user_host = '%s@%s' % (self.user_name, self.GetConnectionIp())
+    ssh_cmd = ['ssh', '-p', str(self.ssh_port), user_host]
+    ssh_private_key = (self.ssh_private_key if self.is_static else
+                       vm_util.GetPrivateKeyPath())
+    ssh_cmd.extend(vm_util.GetSshOptions(ssh_private_key))
+    ssh_cmd.append(command)
+    return ssh_cmd
+
+  def StartRemoteHostCommand(self, command):
+    """Starts a command on the VM, with its stdin and stdout piped to PKB.
+
+    Unlike RemoteHostCommand, this returns as soon as the connection is
+    started, so PKB can talk to the command over a single connection. The
+    caller must close stdin and wait for the process.
+
+    Args:
+      command: A valid bash command.
+
+    Returns:
+      The subprocess.Popen of the ssh process, with unbuffered binary stdin
+      and stdout pipes and stderr discarded.
+    """
+    ssh_cmd = self._GetSshCommand(command)
+    logging.info('Running: %s', ' '.join(ssh_cmd))
+    return subprocess.Popen(ssh_cmd, bufsize=0, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+
+  def RemoteHostStreamCommand(self, command, stdin_path=None, stdin_offset=0,
+                              stdout_path=None, timeout=None):
+    """Runs a command on the VM, streaming local files to or from it.
+
+    Unlike RemoteHostCommand, the command's input and output are neither
+    buffered in memory nor decoded, so it can move large binary files.
+
+    Args:
+      command: A valid bash command.
+      stdin_path: Optional local file to use as the command's stdin.
+      stdin_offset: Offset in stdin_path to start reading from.
+      stdout_path: Optional local file the command's stdout is appended to.
+      timeout: The timeout for the command in seconds.
+
+    Raises:
+      RemoteCommandError: If the command fails or times out.
+    """
+    ssh_cmd = self._GetSshCommand(command)
+    logging.info('Running: %s', ' '.join(ssh_cmd))
+    stdin = open(stdin_path, 'rb') if stdin_path else subprocess.DEVNULL
+    stdout = open(stdout_path, 'ab') if stdout_path else subprocess.DEVNULL
+    try:
+      if stdin_path:
+        stdin.seek(stdin_offset)
+      process = subprocess.Popen(ssh_cmd, stdin=stdin, stdout=stdout,
+                                 stderr=subprocess.PIPE)
+      try:
+        _, stderr = process.communicate(timeout=timeout)
+      except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+    finally:
+      if stdin_path:
+        stdin.close()
+      if stdout_path:
+        stdout.close()
+    if process.returncode:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Got non-zero return code (%s) executing %s\nSTDERR: %s' %
+          (process.returncode, command,
+           stderr.decode('ascii', 'ignore')))
+
   def _CheckRebootability(self):
     if not self.IS_REBOOTABLE:
       raise errors.VirtualMachine.VirtualMachineError(
@@ -13,8 +13,17 @@
 # limitations under the License.
 """Utilities related to loggers and logging."""
 
+import atexit
 from contextlib import contextmanager
+import glob
+import gzip
+import json
 import logging
+from logging import handlers as logging_handlers
+import multiprocessing.util
+import os
+import queue
+import re
 import sys
 import threading
 
@@ -35,6 +44,17 @@ LOG_LEVELS = {
     ERROR: logging.ERROR
 }
 
+# Keys of ThreadLogContext.ExtendShard.
+BENCHMARK = 'benchmark'
+VM = 'vm'
+
+INDEX_FILE_NAME = 'index.json'
+
+# Listener writing the messages queued by ConfigureLogging(async_logging=True)
+# and the handler queuing them.
+_listener = None
+_queue_handler = None
+
 
 class ThreadLogContext(object):
   """Per-thread context for log message prefix labels."""
@@ -47,14 +67,21 @@ class ThreadLogContext(object):
     """
     if thread_log_context:
       self._label_list = thread_log_context._label_list[:]
+      self._shard_keys = thread_log_context._shard_keys
     else:
       self._label_list = []
+      self._shard_keys = {}
     self._RecalculateLabel()
 
   @property
   def label(self):
     return self._label
 
+  @property
+  def shard_keys(self):
+    """Dict of the keys (BENCHMARK, VM) used to pick a record's log shard."""
+    return self._shard_keys
+
   def _RecalculateLabel(self):
     """Recalculate the string label used to to prepend log messages.
 
@@ -79,6 +106,21 @@ class ThreadLogContext(object):
     self._label_list.pop()
     self._RecalculateLabel()
 
+  @contextmanager
+  def ExtendShard(self, **shard_keys):
+    """Sets keys used by ShardedFileHandler to route log messages.
+
+    Args:
+      **shard_keys: Values of BENCHMARK or VM for messages logged within the
+        context.
+    """
+    previous_shard_keys = self._shard_keys
+    self._shard_keys = dict(previous_shard_keys, **shard_keys)
+    try:
+      yield
+    finally:
+      self._shard_keys = previous_shard_keys
+
 
 class _ThreadData(threading.local):
   def __init__(self):
@@ -109,20 +151,170 @@ def GetThreadLogContext():
 class PkbLogFilter(logging.Filter):
   """Filter that injects a thread's ThreadLogContext label into log messages.
 
-  Sets the LogRecord's pkb_label attribute with the ThreadLogContext label.
+  Sets the LogRecord's pkb_label attribute with the ThreadLogContext label and
+  its pkb_benchmark and pkb_vm attributes with the ThreadLogContext shard keys.
   """
   def filter(self, record):
-    record.pkb_label = GetThreadLogContext().label
+    context = GetThreadLogContext()
+    record.pkb_label = context.label
+    record.pkb_benchmark = context.shard_keys.get(BENCHMARK, '')
+    record.pkb_vm = context.shard_keys.get(VM, '')
     return True
 
 
+def _ShardName(name):
+  return re.sub(r'[^\w.-]', '_', name)
+
+
+class ShardedFileHandler(logging.Handler):
+  """Writes log messages to one file per benchmark and VM.
+
+  Messages are routed by the pkb_benchmark and pkb_vm attributes set by
+  PkbLogFilter to <directory>/<benchmark>/<vm>.log. Messages logged outside
+  of a benchmark or VM go to a shard named "pkb". An index of the shards of
+  every benchmark and VM is kept in <directory>/index.json; see ReadVmLog.
+
+  Each message is flushed as it is written, so that the shards of forked
+  processes, such as those of --run_processes, which exit without closing
+  their handlers, are complete. A forked process writes its own shards and
+  index, suffixed with its process ID, rather than sharing the files of its
+  parent.
+  """
+
+  def __init__(self, directory, compress=False):
+    """Initializes the handler.
+
+    Args:
+      directory: Directory to write the shards and the index to.
+      compress: Whether to gzip the shards.
+    """
+    super(ShardedFileHandler, self).__init__()
+    self.directory = directory
+    self.compress = compress
+    self._streams = {}
+    self._index = {BENCHMARK: {}, VM: {}}
+    self._creator_pid = self._pid = os.getpid()
+    self._inherited_streams = []
+
+  def _Suffix(self):
+    """Returns the suffix of the files of this process."""
+    return '' if self._pid == self._creator_pid else '.%d' % self._pid
+
+  def _CheckFork(self):
+    """Drops the shards of the parent process in a forked process."""
+    if self._pid == os.getpid():
+      return
+    # Closing the streams of the parent would write gzip trailers into its
+    # shards, so they are only kept from being garbage collected.
+    self._inherited_streams.extend(self._streams.values())
+    self._streams = {}
+    self._index = {BENCHMARK: {}, VM: {}}
+    self._pid = os.getpid()
+    # Processes started by multiprocessing run its finalizers before they
+    # exit with os._exit, which skips atexit.
+    multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+
+  def _GetStream(self, benchmark, vm):
+    """Returns the stream of a shard, opening it on first use."""
+    key = (benchmark, vm)
+    if key not in self._streams:
+      path = os.path.join(_ShardName(benchmark),
+                          _ShardName(vm) + self._Suffix() + '.log')
+      if self.compress:
+        path += '.gz'
+      os.makedirs(os.path.join(self.directory, _ShardName(benchmark)),
+                  exist_ok=True)
+      full_path = os.path.join(self.directory, path)
+      if self.compress:
+        self._streams[key] = gzip.open(full_path, 'at')
+      else:
+        self._streams[key] = open(full_path, 'a')
+      self._index[BENCHMARK].setdefault(benchmark, []).append(path)
+      self._index[VM].setdefault(vm, []).append(path)
+      self._WriteIndex()
+    return self._streams[key]
+
+  def _WriteIndex(self):
+    """Writes the index of the shards of this process."""
+    name, ext = os.path.splitext(INDEX_FILE_NAME)
+    path = os.path.join(self.directory, name + self._Suffix() + ext)
+    with open(path, 'w') as f:
+      json.dump(self._index, f, indent=2, sort_keys=True)
+
+  def emit(self, record):
+    try:
+      self._CheckFork()
+      stream = self._GetStream(getattr(record, 'pkb_benchmark', '') or 'pkb',
+                               getattr(record, 'pkb_vm', '') or 'pkb')
+      stream.write(self.format(record) + '\n')
+      stream.flush()
+    except Exception:  # pylint: disable=broad-except
+      self.handleError(record)
+
+  def flush(self):
+    with self.lock:
+      self._CheckFork()
+      for stream in self._streams.values():
+        stream.flush()
+
+  def close(self):
+    with self.lock:
+      self._CheckFork()
+      for stream in self._streams.values():
+        stream.close()
+      self._streams = {}
+    super(ShardedFileHandler, self).close()
+
+
+def _ReadShard(path):
+  """Returns the contents of a shard."""
+  if not path.endswith('.gz'):
+    with open(path) as f:
+      return f.read()
+  lines = []
+  with gzip.open(path, 'rt') as f:
+    try:
+      for line in f:
+        lines.append(line)
+    except EOFError:
+      # The shard of a process that exited without closing it has no gzip
+      # trailer, but every message was flushed.
+      pass
+  return ''.join(lines)
+
+
+def ReadVmLog(directory, vm):
+  """Returns the messages logged while running commands on a VM.
+
+  Args:
+    directory: Directory of a ShardedFileHandler.
+    vm: Name of the VM.
+
+  Returns:
+    The contents of the VM's shards, one benchmark after another, starting
+    with those of the process that created the handler.
+  """
+  name, ext = os.path.splitext(INDEX_FILE_NAME)
+  index_paths = sorted(
+      glob.glob(os.path.join(directory, name + '*' + ext)),
+      key=lambda path: (os.path.basename(path) != INDEX_FILE_NAME, path))
+  contents = []
+  for index_path in index_paths:
+    with open(index_path) as f:
+      index = json.load(f)
+    for path in index[VM].get(vm, []):
+      contents.append(_ReadShard(os.path.join(directory, path)))
+  return ''.join(contents)
+
+
 def ConfigureBasicLogging():
   """Initializes basic python logging before a log file is available."""
   logging.basicConfig(format='%(levelname)-8s %(message)s', level=logging.INFO)
 
 
 def ConfigureLogging(stderr_log_level, log_path, run_uri,
-                     file_log_level=logging.DEBUG):
+                     file_log_level=logging.DEBUG, async_logging=False,
+                     shard_directory=None, compress_shards=False):
   """Configure logging.
 
   Note that this will destroy existing logging configuration!
@@ -136,7 +328,16 @@ def ConfigureLogging(stderr_log_level, log_path, run_uri,
       labels.
     file_log_level: Messages at this level and above are written to the log
       file.
+    async_logging: Whether logging threads only queue messages, which a single
+      background thread formats and writes. This keeps threads from waiting
+      on each other's writes.
+    shard_directory: Optional directory to also write messages to, split by
+      benchmark and VM. See ShardedFileHandler.
+    compress_shards: Whether to gzip the files in shard_directory.
   """
+  global _listener, _queue_handler
+  StopAsyncLogging()
+
   # Build the format strings for the stderr and log file message formatters.
   stderr_format = ('%(asctime)s {} %(threadName)s %(pkb_label)s'
                    '%(levelname)-8s %(message)s').format(run_uri)
@@ -157,22 +358,75 @@ def ConfigureLogging(stderr_log_level, log_path, run_uri,
   # ThreadLogContext of other threads started through vm_util.RunThreaded.
   SetThreadLogContext(ThreadLogContext())
 
+  handlers = []
   # Add handler to output to stderr.
   handler = logging.StreamHandler()
-  handler.addFilter(PkbLogFilter())
   handler.setLevel(stderr_log_level)
   if colorlog is not None and sys.stderr.isatty():
     formatter = colorlog.ColoredFormatter(stderr_color_format, reset=True)
     handler.setFormatter(formatter)
   else:
     handler.setFormatter(logging.Formatter(stderr_format))
-  logger.addHandler(handler)
+  handlers.append(handler)
 
   # Add handler for output to log file.
-  logging.info('Verbose logging to: %s', log_path)
   handler = logging.FileHandler(filename=log_path)
-  handler.addFilter(PkbLogFilter())
   handler.setLevel(file_log_level)
   handler.setFormatter(logging.Formatter(file_format))
-  logger.addHandler(handler)
+  handlers.append(handler)
+
+  if shard_directory:
+    handler = ShardedFileHandler(shard_directory, compress=compress_shards)
+    handler.setLevel(file_log_level)
+    handler.setFormatter(logging.Formatter(file_format))
+    handlers.append(handler)
+
+  if async_logging:
+    # The filter reads the logging thread's context, so it runs before the
+    # message is queued.
+    _queue_handler = logging_handlers.QueueHandler(queue.Queue())
+    _queue_handler.addFilter(PkbLogFilter())
+    logger.addHandler(_queue_handler)
+    _listener = logging_handlers.QueueListener(
+        _queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+  else:
+    for handler in handlers:
+      handler.addFilter(PkbLogFilter())
+      logger.addHandler(handler)
+  logging.info('Verbose logging to: %s', log_path)
+  if shard_directory:
+    logging.info('Logs by benchmark and VM in: %s', shard_directory)
   logging.getLogger('requests').setLevel(logging.ERROR)
+
+
+def _LogSynchronouslyInChild():
+  """Makes a forked process write its messages, as it has no listener."""
+  global _listener, _queue_handler
+  if _listener is None:
+    return
+  logger = logging.getLogger()
+  logger.removeHandler(_queue_handler)
+  for handler in _listener.handlers:
+    handler.addFilter(PkbLogFilter())
+    logger.addHandler(handler)
+  _listener = None
+  _queue_handler = None
+
+
+os.register_at_fork(after_in_child=_LogSynchronouslyInChild)
+
+
+@atexit.register
+def StopAsyncLogging():
+  """Writes the queued messages and stops the async logging thread."""
+  global _listener, _queue_handler
+  if _listener is None:
+    return
+  listener = _listener
+  _listener = None
+  logging.getLogger().removeHandler(_queue_handler)
+  _queue_handler = None
+  listener.stop()
+  for handler in listener.handlers:
+    handler.close()
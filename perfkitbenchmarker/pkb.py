@@ -111,6 +111,7 @@ import six
 from six.moves import zip
 
 LOG_FILE_NAME = 'pkb.log'
+LOG_SHARDS_DIR_NAME = 'logs'
 COMPLETION_STATUS_FILE_NAME = 'completion_statuses.json'
 REQUIRED_INFO = ['scratch_disk', 'num_machines']
 REQUIRED_EXECUTABLES = frozenset(['ssh', 'ssh-keygen', 'scp', 'openssl'])
@@ -183,6 +184,11 @@ _FREEZE_PATH = flags.DEFINE_string('freeze', None,
                                    'Path to freeze resources to.')
 _COLLECT_MEMINFO = flags.DEFINE_bool('collect_meminfo', False,
                                      'Whether to collect /proc/meminfo stats.')
+_CACHE_CONFIG_SPECS = flags.DEFINE_bool(
+    'cache_config_specs', True,
+    'Whether to reuse decoded benchmark config specs between benchmark runs '
+    'with identical configs (e.g. the points of a flag matrix that only vary '
+    'benchmark specific flags) instead of decoding each config again.')
 
 
 def GetCurrentUser():
@@ -211,6 +217,17 @@ flags.DEFINE_enum(
 flags.DEFINE_enum(
     'file_log_level', log_util.DEBUG, list(log_util.LOG_LEVELS.keys()),
     'Anything logged at this level or higher will be written to the log file.')
+_ASYNC_LOGGING = flags.DEFINE_boolean(
+    'async_logging', True,
+    'Whether threads queue log messages for a single background thread to '
+    'write, rather than each writing them to stderr and the log file.')
+_LOG_SHARDS = flags.DEFINE_boolean(
+    'log_shards', False,
+    'Whether to also write the log split into one file per benchmark and VM '
+    'under the "logs" directory of the run\'s temporary directory, with an '
+    'index of the files of each VM.')
+_COMPRESS_LOG_SHARDS = flags.DEFINE_boolean(
+    'compress_log_shards', True, 'Whether to gzip the --log_shards files.')
 flags.DEFINE_integer('duration_in_seconds', None,
                      'duration of benchmarks. '
                      '(only valid for mesh_benchmark)')
@@ -642,8 +659,13 @@ def _CreateBenchmarkSpecs():
     config_spec_class = getattr(
         benchmark_module, 'BENCHMARK_CONFIG_SPEC_CLASS',
         benchmark_config_spec.BenchmarkConfigSpec)
-    config = config_spec_class(name, expected_os_types=expected_os_types,
-                               flag_values=FLAGS, **config_dict)
+    if _CACHE_CONFIG_SPECS.value:
+      config = benchmark_config_spec.CreateBenchmarkConfigSpec(
+          config_spec_class, name, FLAGS, expected_os_types=expected_os_types,
+          **config_dict)
+    else:
+      config = config_spec_class(name, expected_os_types=expected_os_types,
+                                 flag_values=FLAGS, **config_dict)
 
     # Assign a unique ID to each benchmark run. This differs even between two
     # runs of the same benchmark within a single PKB run.
@@ -853,13 +875,29 @@ def DoRunPhase(spec, collector, timer):
     else:
       return run_number >= FLAGS.run_stage_iterations
 
+  def _CollectReadySamples(unused_sender, benchmark_spec, samples):
+    """Collects samples the benchmark finished before its Run returned."""
+    if benchmark_spec is not spec:
+      return False
+    if FLAGS.run_stage_time or FLAGS.run_stage_iterations:
+      for s in samples:
+        s.metadata['run_number'] = run_number
+    collector.AddSamples(samples, spec.name, spec)
+    if FLAGS.publish_after_run:
+      collector.PublishSamples()
+    return True
+
   while True:
     samples = []
     logging.info('Running benchmark %s', spec.name)
     events.before_phase.send(events.RUN_PHASE, benchmark_spec=spec)
+    events.samples_ready.connect(_CollectReadySamples, events.RUN_PHASE,
+                                 weak=False)
     try:
+      run_start_time = time.time()
       with timer.Measure('Benchmark Run'):
         samples = spec.BenchmarkRun(spec)
+      run_stop_time = time.time()
     except Exception:
       consecutive_failures += 1
       if consecutive_failures > FLAGS.run_stage_retries:
@@ -868,7 +906,12 @@ def DoRunPhase(spec, collector, timer):
                         consecutive_failures)
     else:
       consecutive_failures = 0
+      # Report the background load applied while the benchmark ran. This is
+      # outside of the try so that it cannot fail and retry the run.
+      samples.extend(
+          spec.GetBackgroundWorkloadSamples(run_start_time, run_stop_time))
     finally:
+      events.samples_ready.disconnect(_CollectReadySamples)
       events.after_phase.send(events.RUN_PHASE, benchmark_spec=spec)
     if FLAGS.run_stage_time or FLAGS.run_stage_iterations:
       for s in samples:
@@ -1021,7 +1064,8 @@ def RunBenchmark(spec, collector):
       spec.name, spec.sequence_number, spec.total_benchmarks)
   context.SetThreadBenchmarkSpec(spec)
   log_context = log_util.GetThreadLogContext()
-  with log_context.ExtendLabel(label_extension):
+  with log_context.ExtendLabel(label_extension), log_context.ExtendShard(
+      benchmark='%s_%d' % (spec.name, spec.sequence_number)):
     with spec.RedirectGlobalFlags():
       end_to_end_timer = timing_util.IntervalTimer()
       detailed_timer = timing_util.IntervalTimer()
@@ -1390,7 +1434,11 @@ def SetUpPKB():
         stderr_log_level=log_util.LOG_LEVELS[FLAGS.log_level],
         log_path=vm_util.PrependTempDir(LOG_FILE_NAME),
         run_uri=FLAGS.run_uri,
-        file_log_level=log_util.LOG_LEVELS[FLAGS.file_log_level])
+        file_log_level=log_util.LOG_LEVELS[FLAGS.file_log_level],
+        async_logging=_ASYNC_LOGGING.value,
+        shard_directory=(vm_util.PrependTempDir(LOG_SHARDS_DIR_NAME)
+                         if _LOG_SHARDS.value else None),
+        compress_shards=_COMPRESS_LOG_SHARDS.value)
   logging.info('PerfKitBenchmarker version: %s', version.VERSION)
 
   # Translate deprecated flags and log all provided flag values.
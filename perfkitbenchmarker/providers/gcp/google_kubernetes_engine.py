@@ -75,7 +75,7 @@ class GoogleContainerRegistry(container_service.BaseContainerRegistry):
 
   def RemoteBuild(self, image):
     """Build the image remotely."""
-    full_tag = self.GetFullRegistryTag(image.name)
+    full_tag = self.GetFullImageTag(image)
     build_cmd = util.GcloudCommand(self, 'builds', 'submit', '--tag', full_tag,
                                    image.directory)
     del build_cmd.flags['zone']
@@ -14,8 +14,11 @@
 
 """Utilities for extracting benchmark results using regular expression."""
 
+import collections
 import re
 
+from perfkitbenchmarker import sample
+
 _IPV4_REGEX = r'[0-9]+(?:\.[0-9]+){3}'
 
 # From https://docs.python.org/2/library/re.html#simulating-scanf.
@@ -109,6 +112,132 @@ def ExtractIpv4Addresses(text):
   return match
 
 
+class Metric(collections.namedtuple(
+    'Metric', ['name', 'regex', 'unit', 'group', 'conversion'])):
+  """A metric extracted by an OutputParser.
+
+  Attributes:
+    name: string. Name of the metric.
+    regex: string. Regular expression matching the metric.
+    unit: string. Unit of the metric's samples.
+    group: int or string. Group containing the value. Use 0 for the whole
+      match.
+    conversion: callable applied to the matched string. Defaults to float.
+  """
+
+  def __new__(cls, name, regex, unit='', group=1, conversion=float):
+    return super(Metric, cls).__new__(cls, name, regex, unit, group,
+                                      conversion)
+
+
+class OutputParser(object):
+  """Extracts many metrics from benchmark output in a single pass.
+
+  Benchmarks declare their metrics once, typically at module level. The
+  regexes of all metrics are compiled into one alternation when the parser is
+  created, so the output is scanned once however many metrics it has, rather
+  than once per metric or with a search per metric on every line.
+
+  Matches do not overlap. Metrics reported together, e.g. on the same line,
+  are declared with the same regex and different groups: the regex is then
+  matched once and all of their values come from the same match, so they stay
+  aligned. Named groups must be unique across the regexes, and numbered
+  backreferences cannot be used as the groups are renumbered.
+  """
+
+  def __init__(self, metrics, flags=0):
+    """Compiles the parser.
+
+    Args:
+      metrics: list of Metrics.
+      flags: int. Flags to compile the regexes with.
+
+    Raises:
+      ValueError: if metric names are not unique.
+    """
+    self.metrics = list(metrics)
+    names = [metric.name for metric in self.metrics]
+    if len(set(names)) != len(names):
+      raise ValueError('Metric names must be unique: %s' % names)
+    regexes = list(collections.OrderedDict.fromkeys(
+        metric.regex for metric in self.metrics))
+    self._regex = re.compile(
+        '|'.join('(%s)' % regex for regex in regexes), flags)
+    # Index of the group enclosing each regex in the combined regex.
+    outer_groups = {}
+    index = 1
+    for regex in regexes:
+      outer_groups[regex] = index
+      index += re.compile(regex, flags).groups + 1
+    # Maps the index of each enclosing group to the metrics of its regex and
+    # the index of their group in the combined regex.
+    self._metric_groups = collections.defaultdict(list)
+    for metric in self.metrics:
+      outer = outer_groups[metric.regex]
+      if isinstance(metric.group, int):
+        group = outer + metric.group
+      else:
+        group = self._regex.groupindex[metric.group]
+      self._metric_groups[outer].append((metric, group))
+
+  def ParseRecords(self, text):
+    """Extracts the values of the metrics of each match in text.
+
+    Args:
+      text: string. Text to search.
+    Returns:
+      A list of a dict per match, in the order they appear in text, mapping
+      the name of each metric of the matched regex to its converted value.
+    """
+    records = []
+    for match in self._regex.finditer(text):
+      # The enclosing group of a regex closes after the groups it contains.
+      records.append({
+          metric.name: metric.conversion(match.group(group))
+          for metric, group in self._metric_groups[match.lastindex]
+      })
+    return records
+
+  def Parse(self, text):
+    """Extracts the values of every metric in text.
+
+    Args:
+      text: string. Text to search.
+    Returns:
+      A dict mapping each metric name to the list of its converted values in
+      the order they appear in text. Metrics without matches map to an empty
+      list.
+    """
+    values = {metric.name: [] for metric in self.metrics}
+    for record in self.ParseRecords(text):
+      for name, value in record.items():
+        values[name].append(value)
+    return values
+
+  def ParseSamples(self, text, metadata=None):
+    """Returns a sample for every metric match in text.
+
+    Args:
+      text: string. Text to search.
+      metadata: dict. Metadata for the samples.
+    Returns:
+      A list of sample.Sample objects, grouped by metric in the order the
+      metrics were declared.
+    Raises:
+      NoMatchError: when a metric does not match text.
+    """
+    values = self.Parse(text)
+    samples = []
+    for metric in self.metrics:
+      if not values[metric.name]:
+        raise NoMatchError('No match for metric "{0}" pattern "{1}"'.format(
+            metric.name, metric.regex))
+      samples.extend(
+          sample.Sample(metric.name, value, metric.unit, metadata or {})
+          for value in values[metric.name])
+    return samples
+
+
 def ExtractAllMatches(regex, text, flags=0):
   """Extracts all matches from a regular expression matched within 'text'.
 
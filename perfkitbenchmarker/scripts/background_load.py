@@ -0,0 +1,225 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generates a rate-controlled background load until killed.
+
+Loads:
+  cpu: keeps --rate cores busy, in core-seconds per second.
+  memory: copies --rate MB/s between buffers larger than the CPU caches.
+  disk: writes --rate MB/s to --path, syncing each block to the device.
+  network: sends --rate Mbit/s over TCP to --host, which runs the sink.
+  sink: receives and discards the network load of other VMs.
+
+The rate follows --schedule: constant, onoff (on for the first half of every
+--period seconds, off for the second) or ramp (from 0 to --rate over --period
+seconds, then constant). The load is split between --workers processes, each
+of which does work in small units until it catches up with the amount the
+schedule called for so far (forgiving more than a second of backlog), then
+sleeps. Every --status_interval seconds a
+JSON line with the time and the cumulative amounts done and called for is
+appended to --status_file, from which achieved rates can be computed.
+
+*Runs on the guest VM. Supports Python 3.x.*
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+# Seconds between checks of the schedule by each worker.
+_TICK = 0.01
+# Seconds of work a worker that fell behind may catch up on. Larger backlogs
+# are dropped rather than done in a burst, but still count as called for.
+_MAX_BACKLOG = 1
+_CPU_UNIT = 0.001
+_MEMORY_BUFFER_BYTES = 256 * 1024 * 1024
+_BLOCK_BYTES = 1024 * 1024
+_NETWORK_BLOCK_BYTES = 64 * 1024
+
+
+def Rate(schedule, rate, period, elapsed):
+  """Returns the rate called for by the schedule at a time."""
+  if schedule == 'onoff':
+    return rate if elapsed % period < period / 2 else 0
+  if schedule == 'ramp':
+    return rate * min(elapsed / period, 1)
+  return rate
+
+
+def _Cpu(args):
+  del args
+
+  def Work():
+    end = time.perf_counter() + _CPU_UNIT
+    while time.perf_counter() < end:
+      pass
+    return _CPU_UNIT
+
+  return Work
+
+
+def _Memory(args):
+  del args
+  source = memoryview(bytearray(_MEMORY_BUFFER_BYTES))
+  destination = memoryview(bytearray(_MEMORY_BUFFER_BYTES))
+  offsets = iter(range(0, sys.maxsize))
+
+  def Work():
+    offset = next(offsets) * _BLOCK_BYTES % _MEMORY_BUFFER_BYTES
+    destination[offset:offset + _BLOCK_BYTES] = (
+        source[offset:offset + _BLOCK_BYTES])
+    return _BLOCK_BYTES / 1e6
+
+  return Work
+
+
+def _Disk(args):
+  path = '%s.%d' % (args.path, os.getpid())
+  fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+  os.unlink(path)
+  block = os.urandom(_BLOCK_BYTES)
+  num_blocks = args.file_size_mb * 1024 * 1024 // _BLOCK_BYTES
+  offsets = iter(range(0, sys.maxsize))
+
+  def Work():
+    os.pwrite(fd, block, next(offsets) % num_blocks * _BLOCK_BYTES)
+    os.fdatasync(fd)
+    return _BLOCK_BYTES / 1e6
+
+  return Work
+
+
+def _Network(args):
+  deadline = time.time() + 60
+  while True:
+    try:
+      sock = socket.create_connection((args.host, args.port))
+      break
+    except OSError:
+      # The sink may not be up yet.
+      if time.time() > deadline:
+        raise
+      time.sleep(1)
+  block = os.urandom(_NETWORK_BLOCK_BYTES)
+
+  def Work():
+    sock.sendall(block)
+    return _NETWORK_BLOCK_BYTES * 8 / 1e6
+
+  return Work
+
+
+LOADS = {
+    'cpu': _Cpu,
+    'memory': _Memory,
+    'disk': _Disk,
+    'network': _Network,
+}
+
+
+def RunWorker(work, rate, schedule, period, done, target):
+  """Does work at the scheduled rate, updating the shared counters."""
+  start = last = time.time()
+  backlog = 0.0
+  while True:
+    now = time.time()
+    called_for = Rate(schedule, rate, period, now - start) * (now - last)
+    last = now
+    target.value += called_for
+    backlog = min(backlog + called_for, rate * _MAX_BACKLOG)
+    while backlog > 0:
+      amount = work()
+      backlog -= amount
+      done.value += amount
+    time.sleep(_TICK)
+
+
+def _Worker(args, rate, done, target):
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+  RunWorker(LOADS[args.load](args), rate, args.schedule, args.period, done,
+            target)
+
+
+def _Sink(port):
+  server = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+  server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  server.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+  server.bind(('', port))
+  server.listen(16)
+  while True:
+    conn, _ = server.accept()
+    multiprocessing.Process(target=_Drain, args=(conn,), daemon=True).start()
+    conn.close()
+
+
+def _Drain(conn):
+  while conn.recv(_NETWORK_BLOCK_BYTES):
+    pass
+
+
+def _Exit(signum, frame):
+  del frame
+  signal.signal(signum, signal.SIG_IGN)
+  sys.exit(0)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--load', choices=sorted(LOADS) + ['sink'],
+                      required=True)
+  parser.add_argument('--rate', type=float, default=0)
+  parser.add_argument('--schedule', choices=['constant', 'onoff', 'ramp'],
+                      default='constant')
+  parser.add_argument('--period', type=float, default=60)
+  parser.add_argument('--workers', type=int, default=1)
+  parser.add_argument('--status_file')
+  parser.add_argument('--status_interval', type=float, default=1)
+  parser.add_argument('--path', default='/tmp/background_load')
+  parser.add_argument('--file_size_mb', type=int, default=1024)
+  parser.add_argument('--host')
+  parser.add_argument('--port', type=int, default=20002)
+  args = parser.parse_args()
+  # Daemonic workers are terminated when the main process exits.
+  signal.signal(signal.SIGTERM, _Exit)
+
+  if args.load == 'sink':
+    _Sink(args.port)
+    return
+
+  counters = []
+  for _ in range(args.workers):
+    done = multiprocessing.Value('d', 0, lock=False)
+    target = multiprocessing.Value('d', 0, lock=False)
+    multiprocessing.Process(
+        target=_Worker, args=(args, args.rate / args.workers, done, target),
+        daemon=True).start()
+    counters.append((done, target))
+  with open(args.status_file, 'a') as status_file:
+    while True:
+      status_file.write(json.dumps({
+          'time': time.time(),
+          'done': sum(done.value for done, _ in counters),
+          'target': sum(target.value for _, target in counters),
+      }) + '\n')
+      status_file.flush()
+      time.sleep(args.status_interval)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs a command with bash once released at a common time.
+
+Creates --release_file with a .ready suffix to signal that the command is
+staged, then waits for --release_file to hold a release time in seconds since
+the epoch, sleeps until that time and runs the command, which inherits stdin,
+stdout and stderr. Once it exits, a line starting with MARKER followed by a
+JSON object with the release time and the times the command started and
+stopped is appended to stderr. This script exits with the status of the
+command, or TIMEOUT_STATUS if it is not released within --timeout seconds.
+
+*Runs on the guest VM. Supports Python 3.x.*
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+MARKER = 'PKB_BARRIER_START:'
+TIMEOUT_STATUS = 124
+READY_SUFFIX = '.ready'
+# Seconds between checks of the release file.
+_POLL_INTERVAL = 0.005
+
+
+def WaitForRelease(release_file, timeout):
+  """Returns the release time written to the file, or None on timeout."""
+  deadline = time.time() + timeout
+  while True:
+    try:
+      with open(release_file) as f:
+        return float(f.read())
+    except (OSError, ValueError):
+      # Not released yet. The file is renamed into place once written.
+      pass
+    if time.time() > deadline:
+      return None
+    time.sleep(_POLL_INTERVAL)
+
+
+def Run(command, release_time):
+  """Runs the command at the release time.
+
+  Returns:
+    The exit status of the command and the times it started and stopped.
+  """
+  delay = release_time - time.time()
+  if delay > 0:
+    time.sleep(delay)
+  start_time = time.time()
+  pid = os.spawnv(os.P_NOWAIT, '/bin/bash', ['bash', '-c', command])
+  _, status = os.waitpid(pid, 0)
+  stop_time = time.time()
+  if os.WIFSIGNALED(status):
+    status = 128 + os.WTERMSIG(status)
+  else:
+    status = os.WEXITSTATUS(status)
+  return status, start_time, stop_time
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--release_file', required=True,
+                      help='File the release time is written to.')
+  parser.add_argument('--timeout', type=float, default=600,
+                      help='Seconds to wait to be released.')
+  parser.add_argument('command', help='Command to run with bash -c.')
+  args = parser.parse_args()
+  ready_file = args.release_file + READY_SUFFIX
+  with open(ready_file, 'w'):
+    pass
+  try:
+    release_time = WaitForRelease(args.release_file, args.timeout)
+    if release_time is None:
+      sys.stderr.write('Not released within %g seconds.\n' % args.timeout)
+      return TIMEOUT_STATUS
+    status, start_time, stop_time = Run(args.command, release_time)
+  finally:
+    for path in (ready_file, args.release_file):
+      if os.path.exists(path):
+        os.remove(path)
+  sys.stderr.write('\n%s %s\n' % (MARKER, json.dumps({
+      'release_time': release_time,
+      'start_time': start_time,
+      'stop_time': stop_time,
+  })))
+  return status
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,43 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Answers each line read from stdin with the time of this machine.
+
+PKB writes a line whenever it wants to read the clock of the VM and records
+the times it sent the line and received the answer, as an NTP client does
+with the packets it exchanges with a server. Each answer is the time in
+seconds since the epoch, written as soon as the line is read. Exits once
+stdin is closed.
+
+*Runs on the guest VM. Supports Python 3.x.*
+"""
+
+import sys
+import time
+
+
+def Serve(stdin, stdout):
+  """Answers each line of stdin with the time until stdin is closed."""
+  while stdin.readline():
+    stdout.write('%r\n' % time.time())
+    stdout.flush()
+
+
+def main():
+  Serve(sys.stdin, sys.stdout)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,277 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Probes the round trip latency to many hosts at once.
+
+With --serve, echoes UDP datagrams and TCP streams on --port until killed.
+
+Otherwise sends --rate probes per second to each of --targets concurrently for
+--duration seconds, over ICMP echo (which needs root for a raw socket) or UDP
+or TCP to another instance of this script serving on the targets. The RTT of
+every probe is kept in memory and only a JSON summary per target is printed:
+percentiles, a histogram with two significant digits and the jitter, the mean
+absolute difference between consecutive RTTs, over each --jitter_interval
+seconds.
+
+*Runs on the guest VM. Supports Python 3.x.*
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+ICMP = 'icmp'
+UDP = 'udp'
+TCP = 'tcp'
+
+PERCENTILES = 50, 90, 99, 99.9
+# Sequence number followed by padding.
+_PROBE = struct.Struct('!I28x')
+_ICMP_HEADER = struct.Struct('!BBHHH')
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+# Seconds to wait for replies to the last probes.
+_GRACE = 1.0
+
+
+def _Checksum(data):
+  if len(data) % 2:
+    data += b'\x00'
+  total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+  total = (total >> 16) + (total & 0xffff)
+  total += total >> 16
+  return ~total & 0xffff
+
+
+class _Prober(object):
+  """Probes one target, recording the send time and RTT of each probe."""
+
+  def __init__(self, target, protocol, port, identifier):
+    self.target = target
+    self.protocol = protocol
+    self.identifier = identifier
+    self.send_times = []
+    self.rtts = {}
+    if protocol == ICMP:
+      self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW,
+                                socket.IPPROTO_ICMP)
+    elif protocol == UDP:
+      self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+      self.sock.connect((target, port))
+    else:
+      self.sock = socket.create_connection((target, port))
+      self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    self.sock.settimeout(0.1)
+
+  def _Packet(self, seq):
+    if self.protocol != ICMP:
+      return _PROBE.pack(seq)
+    payload = _PROBE.pack(seq)
+    header = _ICMP_HEADER.pack(_ICMP_ECHO_REQUEST, 0, 0, self.identifier,
+                               seq & 0xffff)
+    checksum = _Checksum(header + payload)
+    return _ICMP_HEADER.pack(_ICMP_ECHO_REQUEST, 0, checksum, self.identifier,
+                             seq & 0xffff) + payload
+
+  def Send(self, start, rate, duration):
+    """Sends probes at the rate, on schedule regardless of replies."""
+    count = int(rate * duration)
+    for seq in range(count):
+      delay = start + seq / rate - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+      self.send_times.append(time.perf_counter())
+      if self.protocol == ICMP:
+        self.sock.sendto(self._Packet(seq), (self.target, 0))
+      else:
+        self.sock.sendall(self._Packet(seq))
+
+  def _Receive(self, buffer):
+    """Returns the sequence numbers of the probes in a received packet."""
+    if self.protocol == ICMP:
+      data, (source, _) = self.sock.recvfrom(1024)
+      header = (data[0] & 0xf) * 4
+      kind, _, _, identifier, _ = _ICMP_HEADER.unpack_from(data, header)
+      if (source != self.target or kind != _ICMP_ECHO_REPLY or
+          identifier != self.identifier):
+        return []
+      return [_PROBE.unpack_from(data, header + _ICMP_HEADER.size)[0]]
+    data = self.sock.recv(65536)
+    if not data:
+      raise EOFError()
+    if self.protocol == UDP:
+      return [_PROBE.unpack_from(data)[0]]
+    # TCP replies may be split or coalesced.
+    buffer.extend(data)
+    seqs = []
+    while len(buffer) >= _PROBE.size:
+      seqs.append(_PROBE.unpack_from(buffer)[0])
+      del buffer[:_PROBE.size]
+    return seqs
+
+  def Receive(self, deadline):
+    """Records replies until the deadline."""
+    buffer = bytearray()
+    while time.perf_counter() < deadline:
+      try:
+        seqs = self._Receive(buffer)
+      except socket.timeout:
+        continue
+      except EOFError:
+        return
+      now = time.perf_counter()
+      for seq in seqs:
+        if seq < len(self.send_times) and seq not in self.rtts:
+          self.rtts[seq] = (now - self.send_times[seq]) * 1000
+
+
+def _Percentile(sorted_values, percentile):
+  """Returns the nearest-rank percentile of sorted values."""
+  rank = int(math.ceil(percentile / 100. * len(sorted_values)))
+  return sorted_values[max(rank, 1) - 1]
+
+
+def _Bucket(rtt):
+  """Rounds an RTT up to two significant digits."""
+  if rtt <= 0:
+    return 0.0
+  scale = 10 ** (math.floor(math.log10(rtt)) - 1)
+  return round(math.ceil(rtt / scale) * scale, 12)
+
+
+def Summarize(send_times, rtts, jitter_interval):
+  """Reduces the RTTs of one target to a summary.
+
+  Args:
+    send_times: list of the send time of each probe, in seconds.
+    rtts: dict of the sequence number of each answered probe to its RTT in ms.
+    jitter_interval: seconds over which to compute each jitter value.
+
+  Returns:
+    Dict of the number of probes sent and answered, RTT statistics in ms, a
+    histogram of RTTs as [bucket upper bound, count] pairs and the jitter as
+    [seconds since the first probe, jitter] pairs.
+  """
+  summary = {'sent': len(send_times), 'received': len(rtts)}
+  if not rtts:
+    return summary
+  values = sorted(rtts.values())
+  mean = sum(values) / len(values)
+  summary['rtt'] = {
+      'min': values[0],
+      'max': values[-1],
+      'mean': mean,
+      'stddev': math.sqrt(sum((v - mean) ** 2 for v in values) / len(values)),
+  }
+  for percentile in PERCENTILES:
+    summary['rtt']['p%g' % percentile] = _Percentile(values, percentile)
+  histogram = {}
+  for value in values:
+    bucket = _Bucket(value)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+  summary['histogram'] = sorted(histogram.items())
+  jitter = {}
+  previous = None
+  for seq in sorted(rtts):
+    if previous is not None and previous[0] == seq - 1:
+      interval = int((send_times[seq] - send_times[0]) // jitter_interval)
+      jitter.setdefault(interval, []).append(abs(rtts[seq] - previous[1]))
+    previous = seq, rtts[seq]
+  summary['jitter'] = [[interval * jitter_interval, sum(diffs) / len(diffs)]
+                       for interval, diffs in sorted(jitter.items())]
+  return summary
+
+
+def Probe(targets, protocol, port, rate, duration, jitter_interval):
+  """Probes all targets concurrently and returns their summaries."""
+  probers = [_Prober(target, protocol, port, (os.getpid() + i) & 0xffff)
+             for i, target in enumerate(targets)]
+  start = time.perf_counter() + 0.1
+  start_time = time.time() + 0.1
+  deadline = start + duration + _GRACE
+  threads = []
+  for prober in probers:
+    threads.append(threading.Thread(target=prober.Send,
+                                    args=(start, rate, duration)))
+    threads.append(threading.Thread(target=prober.Receive, args=(deadline,)))
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  results = {}
+  for prober in probers:
+    summary = Summarize(prober.send_times, prober.rtts, jitter_interval)
+    summary['start_time'] = start_time
+    results[prober.target] = summary
+  return results
+
+
+def _Echo(conn):
+  with conn:
+    while True:
+      data = conn.recv(65536)
+      if not data:
+        return
+      conn.sendall(data)
+
+
+def Serve(port):
+  """Echoes UDP datagrams and TCP streams on the port."""
+  udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  udp.bind(('', port))
+
+  def _EchoUdp():
+    while True:
+      data, address = udp.recvfrom(65536)
+      udp.sendto(data, address)
+
+  threading.Thread(target=_EchoUdp, daemon=True).start()
+  tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  tcp.bind(('', port))
+  tcp.listen(128)
+  while True:
+    conn, _ = tcp.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    threading.Thread(target=_Echo, args=(conn,), daemon=True).start()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--serve', action='store_true')
+  parser.add_argument('--port', type=int, default=20003)
+  parser.add_argument('--targets', default='',
+                      help='Comma separated IP addresses to probe.')
+  parser.add_argument('--protocol', choices=[ICMP, UDP, TCP], default=ICMP)
+  parser.add_argument('--rate', type=float, default=10,
+                      help='Probes per second to each target.')
+  parser.add_argument('--duration', type=float, default=60)
+  parser.add_argument('--jitter_interval', type=float, default=10)
+  args = parser.parse_args()
+  if args.serve:
+    Serve(args.port)
+    return 0
+  json.dump(Probe(args.targets.split(','), args.protocol, args.port,
+                  args.rate, args.duration, args.jitter_interval), sys.stdout)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
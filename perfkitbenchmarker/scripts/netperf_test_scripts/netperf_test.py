@@ -31,6 +31,11 @@ flags.DEFINE_string('netperf_cmd', None,
 flags.DEFINE_integer('port_start', None,
                      'Starting port for netperf command and data ports')
 
+flags.DEFINE_boolean('barrier', False,
+                     'Start all netperf processes, then release them at once '
+                     'so that the streams start as close together as '
+                     'possible.')
+
 
 def Main():
   # Parse command-line flags
@@ -59,20 +64,31 @@ def Main():
     command_port = port_start + i * 2
     data_port = port_start + i * 2 + 1
     cmd = netperf_cmd.format(command_port=command_port, data_port=data_port)
+    if FLAGS.barrier:
+      # Block each process until a line is written to its stdin.
+      cmd = 'read -r _; exec ' + cmd
     processes[i] = subprocess.Popen(
         cmd,
+        stdin=subprocess.PIPE if FLAGS.barrier else None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         shell=True,
         universal_newlines=True)
   end_starting_processes = time.time()
+  barrier_release_time = None
+  if FLAGS.barrier:
+    barrier_release_time = time.time()
+    for process in processes:
+      process.stdin.write('\n')
+      process.stdin.flush()
   # Wait for all of the netperf processes to finish and save their return codes
   for i, process in enumerate(processes):
     stdouts[i], stderrs[i] = process.communicate()
     return_codes[i] = process.returncode
   # Dump the stdouts, stderrs, and return_codes to stdout in json form
   print(json.dumps((stdouts, stderrs, return_codes,
-                    begin_starting_processes, end_starting_processes)))
+                    begin_starting_processes, end_starting_processes,
+                    barrier_release_time)))
 
 if __name__ == '__main__':
   sys.exit(Main())
@@ -0,0 +1,365 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Summarizes the TCP and UDP flows of a pcap file.
+
+Reads a capture written by "tcpdump -w" one packet at a time and prints a JSON
+summary of its largest flows: throughput overall and per interval,
+retransmitted segments, RTT estimates, advertised windows and packet sizes.
+Only packet headers are needed, so it works on captures taken with a small
+snaplen.
+
+RTTs are the time between a data segment and the first ACK covering it, so
+they are only meaningful for flows sent by the host the capture was taken on.
+Retransmitted segments are not used for RTT estimates (Karn's algorithm).
+
+*Runs on the guest VM. Supports Python 3.x.*
+"""
+
+import argparse
+import collections
+import json
+import socket
+import struct
+import sys
+
+# Magic number of the file header: (byte order, timestamp resolution).
+_PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86dd
+_ETHERTYPE_VLAN = (0x8100, 0x88a8)
+
+TCP = 6
+UDP = 17
+_PROTOCOL_NAMES = {TCP: 'tcp', UDP: 'udp'}
+
+_TCP_SYN = 0x02
+_TCP_ACK = 0x10
+_TCP_OPTION_END = 0
+_TCP_OPTION_NOP = 1
+_TCP_OPTION_WINDOW_SCALE = 3
+
+# RTTs are counted in buckets of this many seconds.
+_RTT_RESOLUTION = 1e-5
+
+_SEQ_MODULO = 1 << 32
+
+Packet = collections.namedtuple('Packet', [
+    'protocol', 'src', 'sport', 'dst', 'dport', 'payload_length', 'seq',
+    'ack', 'flags', 'window', 'window_scale'
+])
+
+
+def ReadPackets(f):
+  """Yields the packets of a pcap file without reading all of it.
+
+  Stops at the first truncated packet, which is what a capture ends with when
+  tcpdump is killed.
+
+  Args:
+    f: binary file object positioned at the start of the capture.
+
+  Yields:
+    (timestamp in seconds, link type, captured bytes, length on the wire)
+
+  Raises:
+    ValueError: If f is not a pcap file.
+  """
+  header = f.read(24)
+  if len(header) < 24 or header[:4] not in _PCAP_MAGIC:
+    raise ValueError('Not a pcap file.')
+  byte_order, resolution = _PCAP_MAGIC[header[:4]]
+  link_type = struct.unpack(byte_order + 'I', header[20:24])[0] & 0xffff
+  record_header = struct.Struct(byte_order + 'IIII')
+  while True:
+    record = f.read(record_header.size)
+    if len(record) < record_header.size:
+      return
+    seconds, fraction, captured_length, length = record_header.unpack(record)
+    data = f.read(captured_length)
+    if len(data) < captured_length:
+      return
+    yield seconds + fraction * resolution, link_type, data, length
+
+
+def _GetNetworkLayer(link_type, data):
+  """Returns the ethertype and offset of the network layer header."""
+  if link_type == LINKTYPE_ETHERNET:
+    offset = 14
+    ethertype = struct.unpack_from('!H', data, 12)[0]
+    while ethertype in _ETHERTYPE_VLAN:
+      ethertype = struct.unpack_from('!H', data, offset + 2)[0]
+      offset += 4
+    return ethertype, offset
+  if link_type == LINKTYPE_LINUX_SLL:
+    return struct.unpack_from('!H', data, 14)[0], 16
+  if link_type == LINKTYPE_LINUX_SLL2:
+    return struct.unpack_from('!H', data, 0)[0], 20
+  if link_type == LINKTYPE_RAW:
+    return {4: _ETHERTYPE_IPV4, 6: _ETHERTYPE_IPV6}.get(data[0] >> 4), 0
+  return None, 0
+
+
+def _GetWindowScale(data, offset, end):
+  """Returns the window scale option in the TCP options at data[offset:end]."""
+  while offset < end:
+    kind = data[offset]
+    if kind == _TCP_OPTION_END:
+      break
+    if kind == _TCP_OPTION_NOP:
+      offset += 1
+      continue
+    if offset + 1 >= end or data[offset + 1] < 2:
+      break
+    if kind == _TCP_OPTION_WINDOW_SCALE and offset + 2 < end:
+      return min(data[offset + 2], 14)
+    offset += data[offset + 1]
+  return None
+
+
+def ParsePacket(link_type, data):
+  """Returns the Packet in a captured frame, or None if not TCP or UDP."""
+  try:
+    ethertype, offset = _GetNetworkLayer(link_type, data)
+    if ethertype == _ETHERTYPE_IPV4:
+      header_length = (data[offset] & 0xf) * 4
+      total_length, = struct.unpack_from('!H', data, offset + 2)
+      protocol = data[offset + 9]
+      src = socket.inet_ntop(socket.AF_INET, data[offset + 12:offset + 16])
+      dst = socket.inet_ntop(socket.AF_INET, data[offset + 16:offset + 20])
+      ip_payload_length = total_length - header_length
+      offset += header_length
+    elif ethertype == _ETHERTYPE_IPV6:
+      ip_payload_length, protocol = struct.unpack_from('!HB', data, offset + 4)
+      src = socket.inet_ntop(socket.AF_INET6, data[offset + 8:offset + 24])
+      dst = socket.inet_ntop(socket.AF_INET6, data[offset + 24:offset + 40])
+      offset += 40
+    else:
+      return None
+    if protocol == TCP:
+      sport, dport, seq, ack, data_offset, flags, window = struct.unpack_from(
+          '!HHIIBBH', data, offset)
+      tcp_header_length = (data_offset >> 4) * 4
+      window_scale = None
+      if flags & _TCP_SYN:
+        window_scale = _GetWindowScale(
+            data, offset + 20, min(offset + tcp_header_length, len(data)))
+      return Packet('tcp', src, sport, dst, dport,
+                    ip_payload_length - tcp_header_length, seq, ack, flags,
+                    window, window_scale)
+    if protocol == UDP:
+      sport, dport, udp_length = struct.unpack_from('!HHH', data, offset)
+      return Packet('udp', src, sport, dst, dport, udp_length - 8, None, None,
+                    0, None, None)
+  except (struct.error, IndexError, ValueError):
+    pass
+  return None
+
+
+def _Unwrap(seq, reference):
+  """Returns the unwrapped sequence number closest to reference."""
+  return reference + (seq - reference + (_SEQ_MODULO >> 1)) % _SEQ_MODULO - (
+      _SEQ_MODULO >> 1)
+
+
+def _Percentiles(counts, percentiles):
+  """Returns the nearest rank percentiles of a Counter of values."""
+  total = sum(counts.values())
+  results = {}
+  items = sorted(counts.items())
+  for percentile in percentiles:
+    rank = max(1, -(-total * percentile // 100))
+    seen = 0
+    for value, count in items:
+      seen += count
+      if seen >= rank:
+        results['p%s' % percentile] = value
+        break
+  results['min'] = items[0][0]
+  results['max'] = items[-1][0]
+  results['avg'] = sum(value * count for value, count in items) / total
+  return results
+
+
+class _Flow(object):
+  """Statistics of the packets sent one way between two ports."""
+
+  def __init__(self, packet, timestamp):
+    self.packet = packet
+    self.first = timestamp
+    self.last = timestamp
+    self.packets = 0
+    self.bytes = 0
+    self.payload_bytes = 0
+    self.interval_bytes = collections.Counter()
+    self.sizes = collections.Counter()
+    self.retransmits = 0
+    self.rtts = collections.Counter()
+    self.window_scale = None
+    self.windows = collections.Counter()
+    # Unwrapped sequence number following the highest byte sent.
+    self.highest_end = None
+    # End sequence number to send time of segments not yet acknowledged.
+    self.unacked = collections.OrderedDict()
+
+  def AddPacket(self, packet, timestamp, length, interval_index):
+    """Updates the statistics with a packet of the flow."""
+    self.last = timestamp
+    self.packets += 1
+    self.bytes += length
+    self.payload_bytes += max(packet.payload_length, 0)
+    self.interval_bytes[interval_index] += length
+    self.sizes[length] += 1
+    if packet.protocol != 'tcp':
+      return
+    if packet.flags & _TCP_SYN:
+      self.window_scale = packet.window_scale
+    else:
+      self.windows[packet.window << (self.window_scale or 0)] += 1
+    if self.highest_end is None:
+      self.highest_end = packet.seq
+    seq = _Unwrap(packet.seq, self.highest_end)
+    # SYN and FIN use a sequence number too.
+    end = seq + max(packet.payload_length, 0) + bool(packet.flags & _TCP_SYN)
+    if end == seq:
+      return
+    if seq < self.highest_end:
+      self.retransmits += 1
+      # Karn's algorithm: an ACK may be for either transmission.
+      for pending_end in [e for e in self.unacked if e > seq]:
+        del self.unacked[pending_end]
+    else:
+      self.unacked[end] = timestamp
+    self.highest_end = max(self.highest_end, end)
+
+  def AddAck(self, ack, timestamp):
+    """Records an ACK sent in the reverse direction for an RTT estimate."""
+    if self.highest_end is None:
+      return
+    ack = _Unwrap(ack, self.highest_end)
+    sent = None
+    while self.unacked:
+      end, send_time = next(iter(self.unacked.items()))
+      if end > ack:
+        break
+      sent = send_time
+      del self.unacked[end]
+    if sent is not None:
+      self.rtts[round((timestamp - sent) / _RTT_RESOLUTION)] += 1
+
+  def Summarize(self, start, interval):
+    """Returns a JSON serializable summary of the flow."""
+    duration = self.last - self.first
+    summary = {
+        'protocol': self.packet.protocol,
+        'src': self.packet.src,
+        'sport': self.packet.sport,
+        'dst': self.packet.dst,
+        'dport': self.packet.dport,
+        'first': self.first,
+        'last': self.last,
+        'packets': self.packets,
+        'bytes': self.bytes,
+        'payload_bytes': self.payload_bytes,
+        'throughput_bps': self.bytes * 8 / duration if duration else None,
+        'packet_size': _Percentiles(self.sizes, (50, 90, 99)),
+    }
+    first_interval = min(self.interval_bytes)
+    summary['interval_start'] = start + first_interval * interval
+    summary['interval_throughput_bps'] = [
+        self.interval_bytes[i] * 8 / interval
+        for i in range(first_interval, max(self.interval_bytes) + 1)
+    ]
+    if self.packet.protocol == 'tcp':
+      summary['retransmits'] = self.retransmits
+      if self.windows:
+        summary['window'] = _Percentiles(self.windows, (50,))
+      if self.rtts:
+        rtt = _Percentiles(self.rtts, (50, 90, 99))
+        summary['rtt_ms'] = {
+            stat: value * _RTT_RESOLUTION * 1000 for stat, value in rtt.items()
+        }
+        summary['rtt_ms']['count'] = sum(self.rtts.values())
+    return summary
+
+
+def Summarize(f, interval=1.0, max_flows=10):
+  """Returns a summary of the flows in a pcap file.
+
+  Args:
+    f: binary file object positioned at the start of the capture.
+    interval: seconds over which to report throughput.
+    max_flows: number of flows to report, those with the most bytes.
+
+  Returns:
+    A JSON serializable dict.
+  """
+  flows = {}
+  start = None
+  num_packets = 0
+  for timestamp, link_type, data, length in ReadPackets(f):
+    num_packets += 1
+    if start is None:
+      start = timestamp
+    packet = ParsePacket(link_type, data)
+    if packet is None:
+      continue
+    key = (packet.protocol, packet.src, packet.sport, packet.dst, packet.dport)
+    if key not in flows:
+      flows[key] = _Flow(packet, timestamp)
+    flows[key].AddPacket(packet, timestamp, length,
+                         int((timestamp - start) // interval))
+    if packet.protocol == 'tcp' and packet.flags & _TCP_ACK:
+      reverse = flows.get(
+          (packet.protocol, packet.dst, packet.dport, packet.src, packet.sport))
+      if reverse:
+        reverse.AddAck(packet.ack, timestamp)
+  largest = sorted(flows.values(), key=lambda flow: flow.bytes,
+                   reverse=True)[:max_flows]
+  return {
+      'start': start,
+      'interval': interval,
+      'packets': num_packets,
+      'flows': len(flows),
+      'largest_flows': [flow.Summarize(start, interval) for flow in largest],
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('pcap', help='Capture to summarize.')
+  parser.add_argument('--interval', type=float, default=1.0,
+                      help='Seconds over which to report throughput.')
+  parser.add_argument('--max_flows', type=int, default=10,
+                      help='Number of flows to report.')
+  args = parser.parse_args()
+  with open(args.pcap, 'rb') as f:
+    summary = Summarize(f, args.interval, args.max_flows)
+  json.dump(summary, sys.stdout)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
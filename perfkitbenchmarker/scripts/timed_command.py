@@ -0,0 +1,84 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs a command with bash, measuring its resource usage.
+
+The command inherits stdin, stdout and stderr. Once it exits, a line starting
+with MARKER followed by a JSON object is appended to stderr, with the elapsed
+time of the command on the monotonic clock, the user and system CPU time, max
+RSS and context switches of the command and the processes it waited for, and
+the bytes they read from and wrote to storage. This script exits with the
+status of the command.
+
+*Runs on the guest VM. Supports Python 3.x.*
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+MARKER = 'PKB_COMMAND_TIMING:'
+
+
+def _ReadIo():
+  """Returns the I/O counters of this process and its reaped children."""
+  try:
+    with open('/proc/self/io') as f:
+      return {key: int(value)
+              for key, value in (line.split(':') for line in f)}
+  except OSError:
+    return {}
+
+
+def Run(command):
+  """Runs the command, returning its exit status and resource usage."""
+  io_before = _ReadIo()
+  start = time.monotonic()
+  pid = os.spawnv(os.P_NOWAIT, '/bin/bash', ['bash', '-c', command])
+  _, status, rusage = os.wait4(pid, 0)
+  wall_time = time.monotonic() - start
+  io_after = _ReadIo()
+  if os.WIFSIGNALED(status):
+    status = 128 + os.WTERMSIG(status)
+  else:
+    status = os.WEXITSTATUS(status)
+  timing = {
+      'wall_time': wall_time,
+      'user_time': rusage.ru_utime,
+      'system_time': rusage.ru_stime,
+      'max_rss_kb': rusage.ru_maxrss,
+      'voluntary_context_switches': rusage.ru_nvcsw,
+      'involuntary_context_switches': rusage.ru_nivcsw,
+      'read_bytes': None,
+      'write_bytes': None,
+  }
+  for key in ('read_bytes', 'write_bytes'):
+    if key in io_before and key in io_after:
+      timing[key] = io_after[key] - io_before[key]
+  return status, timing
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('command', help='Command to run with bash -c.')
+  args = parser.parse_args()
+  status, timing = Run(args.command)
+  sys.stderr.write('\n%s %s\n' % (MARKER, json.dumps(timing)))
+  return status
+
+
+if __name__ == '__main__':
+  sys.exit(main())
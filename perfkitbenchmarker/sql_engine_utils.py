@@ -15,7 +15,7 @@
 """Utilities to support multiple engines."""
 import abc
 import logging
-import timeit
+import time
 from typing import Dict, List, Any, Tuple, Union, Optional
 
 from perfkitbenchmarker import sample
@@ -94,18 +94,23 @@ class ISQLQueryTools(metaclass=abc.ABCMeta):
                 query: str,
                 is_explain: bool = False,
                 suppress_stdout: bool = False) -> Tuple[Any, Any, str]:
-    """Time a query.."""
+    """Time a query on the client VM."""
     if is_explain:
       query = self.GetExplainPrefix() + query
 
-    start = timeit.default_timer()
-    stdout_, error_ = self.IssueSqlCommand(
+    start_time = time.time()
+    stdout_, error_, timing = self.IssueSqlCommand(
         query,
         database_name=database_name,
         suppress_stdout=suppress_stdout,
-        timeout=60*30)
-    end = timeit.default_timer()
-    run_time = str(end - start)
+        timeout=60*30,
+        timed=True)
+    if timing is None:
+      logging.warning('Could not time the query on the client VM. Using the '
+                      'time measured on the runner instead.')
+      run_time = str(time.time() - start_time)
+    else:
+      run_time = str(timing.wall_time)
     if error_:
       logging.info('Quries finished with error %s', error_)
       run_time = '-1'
@@ -156,8 +161,13 @@ class ISQLQueryTools(metaclass=abc.ABCMeta):
                       timeout: Optional[int] = None,
                       ignore_failure: bool = False,
                       suppress_warning: bool = False,
-                      suppress_stdout: bool = False):
-    """Issue Sql Command."""
+                      suppress_stdout: bool = False,
+                      timed: bool = False):
+    """Issue Sql Command.
+
+    If timed, the command is run by vm.TimedRemoteCommand and its CommandTiming
+    is returned after stdout and stderr.
+    """
     command_string = None
     # Get the command to issue base on type
     if isinstance(command, dict):
@@ -179,7 +189,9 @@ class ISQLQueryTools(metaclass=abc.ABCMeta):
     if suppress_stdout:
       command_string = command_string + ' >/dev/null 2>&1'
 
-    return self.vm.RemoteCommand(
+    remote_command = (self.vm.TimedRemoteCommand if timed
+                      else self.vm.RemoteCommand)
+    return remote_command(
         command_string, timeout=timeout, ignore_failure=ignore_failure,
         suppress_warning=suppress_warning)
 
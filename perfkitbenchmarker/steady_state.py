@@ -0,0 +1,212 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Steady state detection for time based benchmarks.
+
+A steady state criterion is written the same way as fio's steadystate option:
+"<metric>[_slope]:<threshold>[%]". For example "iops_slope:0.3%" is met once
+the least squares slope of IOPS over the trailing window is at most 0.3% of
+their mean per second, and "tps:5%" is met once every TPS value in the window
+is within 5% of their mean.
+
+Benchmarks that support early termination natively (fio) pass the criterion
+through. Others (sysbench, YCSB) can run Detect over their interval output to
+report how long they took to reach steady state.
+"""
+
+import collections
+import re
+
+from absl import flags
+from perfkitbenchmarker import sample
+
+FLAGS = flags.FLAGS
+
+SLOPE = 'slope'
+DEVIATION = 'deviation'
+
+_CRITERION_REGEX = re.compile(
+    r'^(?P<metric>[a-z_]+?)(?P<slope>_slope)?:'
+    r'(?P<threshold>\d+(\.\d*)?|\.\d+)(?P<percent>%)?$')
+
+
+class Criterion(collections.namedtuple(
+    'Criterion', ['metric', 'kind', 'threshold', 'percent'])):
+  """A steady state criterion.
+
+  Attributes:
+    metric: string. The name of the metric to watch, e.g. 'iops' or 'tps'.
+    kind: SLOPE or DEVIATION.
+    threshold: float. Maximum allowed slope (per second) or deviation.
+    percent: bool. Whether threshold is a percentage of the window's mean.
+  """
+
+  def __str__(self):
+    return '%s%s:%g%s' % (self.metric, '_slope' if self.kind == SLOPE else '',
+                          self.threshold, '%' if self.percent else '')
+
+
+SteadyState = collections.namedtuple(
+    'SteadyState', ['attained', 'time_to_steady_state', 'window_start',
+                    'window_end', 'mean'])
+SteadyState.__doc__ = """The outcome of watching a metric for steady state.
+
+Attributes:
+  attained: bool. Whether the criterion was met.
+  time_to_steady_state: float or None. Seconds from the start of the run until
+    the criterion was met.
+  window_start: float or None. Start of the steady state window, in seconds
+    from the start of the run.
+  window_end: float or None. End of the steady state window.
+  mean: float or None. Mean of the metric over the steady state window.
+"""
+
+
+class CriterionParser(flags.ArgumentParser):
+  """Parses a steady state criterion string into a Criterion."""
+
+  syntactic_help = ('<metric>[_slope]:<threshold>[%]. Ex: iops_slope:0.3%')
+
+  def parse(self, inp):
+    """Parses a criterion.
+
+    Args:
+      inp: string or Criterion.
+
+    Returns:
+      A Criterion.
+
+    Raises:
+      ValueError: If inp is not a valid criterion.
+    """
+    if isinstance(inp, Criterion):
+      return inp
+    match = _CRITERION_REGEX.match(inp)
+    if not match:
+      raise ValueError('Invalid steady state criterion %s. Expected %s' %
+                       (inp, self.syntactic_help))
+    return Criterion(
+        metric=match.group('metric'),
+        kind=SLOPE if match.group('slope') else DEVIATION,
+        threshold=float(match.group('threshold')),
+        percent=bool(match.group('percent')))
+
+  def flag_type(self):
+    return 'steady state criterion'
+
+
+class CriterionSerializer(flags.ArgumentSerializer):
+
+  def serialize(self, criterion):
+    return str(criterion)
+
+
+def DEFINE_criterion(name,
+                     default,
+                     help,  # pylint: disable=redefined-builtin
+                     flag_values=FLAGS,
+                     **kwargs):
+  """Registers a flag whose value is a steady state Criterion (or None)."""
+  return flags.DEFINE(CriterionParser(), name, default, help, flag_values,
+                      CriterionSerializer(), **kwargs)
+
+
+def _Slope(times, values):
+  """Returns the least squares slope of values over times."""
+  count = len(values)
+  mean_time = sum(times) / count
+  mean_value = sum(values) / count
+  numerator = sum((t - mean_time) * (v - mean_value)
+                  for t, v in zip(times, values))
+  denominator = sum((t - mean_time) ** 2 for t in times)
+  return numerator / denominator if denominator else 0.0
+
+
+def _IsSteady(criterion, times, values):
+  """Returns whether the window of values meets the criterion."""
+  mean = sum(values) / len(values)
+  limit = criterion.threshold
+  if criterion.percent:
+    limit = abs(mean) * criterion.threshold / 100.0
+  if criterion.kind == SLOPE:
+    return abs(_Slope(times, values)) <= limit
+  return max(abs(value - mean) for value in values) <= limit
+
+
+def Detect(criterion, values, interval, duration, ramp_time=0):
+  """Finds the first window over which values meet the criterion.
+
+  Args:
+    criterion: Criterion.
+    values: list of floats, the metric sampled every interval seconds starting
+      at interval seconds into the run (the usual shape of per interval
+      reports such as sysbench's --report-interval).
+    interval: float. Seconds between values.
+    duration: float. Length of the window, in seconds, over which the criterion
+      must hold.
+    ramp_time: float. Seconds at the start of the run to ignore.
+
+  Returns:
+    A SteadyState.
+  """
+  window_size = max(int(round(duration / interval)), 2)
+  first_index = int(ramp_time / interval)
+  times = [interval * (i + 1) for i in range(len(values))]
+  for end in range(first_index + window_size, len(values) + 1):
+    window_values = values[end - window_size:end]
+    window_times = times[end - window_size:end]
+    if _IsSteady(criterion, window_times, window_values):
+      return SteadyState(
+          attained=True,
+          time_to_steady_state=window_times[-1],
+          window_start=window_times[0] - interval,
+          window_end=window_times[-1],
+          mean=sum(window_values) / len(window_values))
+  return SteadyState(attained=False, time_to_steady_state=None,
+                     window_start=None, window_end=None, mean=None)
+
+
+def GetSamples(steady_state, criterion, metric_prefix='', unit='',
+               metadata=None):
+  """Returns samples describing a SteadyState.
+
+  Args:
+    steady_state: SteadyState.
+    criterion: Criterion the steady state was detected with.
+    metric_prefix: string. Prefix for the metric names.
+    unit: string. Unit of the watched metric.
+    metadata: dict. Metadata to add to the samples.
+
+  Returns:
+    A list of sample.Sample objects. Time to steady state and the window are
+    only reported if steady state was attained.
+  """
+  metadata = dict(metadata or {})
+  metadata['steady_state_criterion'] = str(criterion)
+  samples = [sample.Sample(metric_prefix + 'steady_state_attained',
+                           int(steady_state.attained), '', metadata)]
+  if not steady_state.attained:
+    return samples
+  samples += [
+      sample.Sample(metric_prefix + 'time_to_steady_state',
+                    steady_state.time_to_steady_state, 'seconds', metadata),
+      sample.Sample(metric_prefix + 'steady_state_window_start',
+                    steady_state.window_start, 'seconds', metadata),
+      sample.Sample(metric_prefix + 'steady_state_window_end',
+                    steady_state.window_end, 'seconds', metadata),
+  ]
+  if steady_state.mean is not None:
+    samples.append(sample.Sample(
+        '%ssteady_state_%s' % (metric_prefix, criterion.metric),
+        steady_state.mean, unit, metadata))
+  return samples
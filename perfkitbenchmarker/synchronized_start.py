@@ -0,0 +1,187 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Starts the clients of a multi-client benchmark at a common time.
+
+Starting each client with its own SSH command staggers the clients by the
+time it takes to connect to each VM, which grows with the number of VMs and
+varies between runs. Run instead stages every command under
+scripts/barrier_start.py, which waits to be released, and only once all of
+them are waiting writes a common release time to them. The clients then
+start at the same time, up to the scheduling and clock differences of the
+VMs. The start and stop skew actually achieved are reported as samples.
+"""
+
+import collections
+import json
+import posixpath
+import shlex
+import time
+import uuid
+
+from perfkitbenchmarker import data
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.scripts import barrier_start
+
+_SCRIPT = 'barrier_start.py'
+# Seconds the staged commands wait to be released.
+_STAGE_TIMEOUT = 600
+# Seconds added to the time it took to run a command on the slowest VM when
+# choosing the release time, so that every VM is released before it.
+DEFAULT_RELEASE_MARGIN = 1.0
+
+# The output of a command and the times, in seconds since the epoch on the
+# clock of its VM, it was released at and started and stopped.
+ClientRun = collections.namedtuple(
+    'ClientRun',
+    ['stdout', 'stderr', 'release_time', 'start_time', 'stop_time'])
+
+
+def _ScriptPath():
+  return posixpath.join(vm_util.VM_TMP_DIR, _SCRIPT)
+
+
+def _Stage(vm):
+  """Pushes the script, returning the seconds a command on the VM takes."""
+  vm.Install('python3')
+  vm.PushFile(data.ResourcePath(_SCRIPT), _ScriptPath())
+  start = time.time()
+  vm.RemoteCommand('true')
+  return time.time() - start
+
+
+def ParseOutput(stdout, stderr):
+  """Separates the times written by the script from a command's stderr.
+
+  Args:
+    stdout: stdout of the script.
+    stderr: stderr of the script.
+
+  Returns:
+    A ClientRun.
+
+  Raises:
+    ValueError: if stderr contains no times.
+  """
+  head, marker, tail = stderr.rpartition(barrier_start.MARKER)
+  if not marker:
+    raise ValueError('No barrier start times in stderr:\n' + stderr)
+  if head.endswith('\n'):
+    head = head[:-1]
+  times = json.loads(tail)
+  return ClientRun(stdout, head, times['release_time'], times['start_time'],
+                   times['stop_time'])
+
+
+def Run(vms, commands, timeout=None,
+        release_margin=DEFAULT_RELEASE_MARGIN):
+  """Runs commands on VMs, starting all of them at a common time.
+
+  Args:
+    vms: list of VMs, one per command. A VM may be listed more than once to
+      run several of the commands.
+    commands: list of commands to run with bash.
+    timeout: seconds to wait for each command once it is released, or None
+      to wait indefinitely.
+    release_margin: seconds added to the time it took to run a command on the
+      slowest VM when choosing the release time.
+
+  Returns:
+    List of a ClientRun per command.
+
+  Raises:
+    errors.VmUtil.ThreadException: if a command failed or was not staged in
+      time.
+  """
+  if len(vms) != len(commands):
+    raise ValueError(f'Got {len(commands)} commands for {len(vms)} VMs.')
+  unique_vms = list({id(vm): vm for vm in vms}.values())
+  latency = max(vm_util.RunThreaded(_Stage, unique_vms))
+  barrier = 'pkb_barrier_' + uuid.uuid4().hex[:8]
+  release_files = [posixpath.join(vm_util.VM_TMP_DIR, f'{barrier}_{i}')
+                   for i in range(len(commands))]
+  files_per_vm = collections.OrderedDict((id(vm), (vm, []))
+                                         for vm in unique_vms)
+  for vm, release_file in zip(vms, release_files):
+    files_per_vm[id(vm)][1].append(release_file)
+
+  def _RunCommand(vm, command, release_file):
+    stdout, stderr = vm.RemoteCommand(
+        f'python3 {_ScriptPath()} --release_file={release_file} '
+        f'--timeout={_STAGE_TIMEOUT} {shlex.quote(command)}',
+        timeout=None if timeout is None else timeout + _STAGE_TIMEOUT)
+    return ParseOutput(stdout, stderr)
+
+  def _WaitUntilStaged(vm, files):
+    ready = ' && '.join(
+        f'[ -e {f}{barrier_start.READY_SUFFIX} ]' for f in files)
+    vm.RemoteCommand(
+        f"timeout {_STAGE_TIMEOUT} sh -c 'until {ready}; do sleep 0.01; done'")
+
+  def _Release(vm, files, release_time):
+    # Renamed into place so the script never reads a partial write.
+    vm.RemoteCommand(' && '.join(
+        f'echo {release_time:.6f} > {f}.tmp && mv {f}.tmp {f}' for f in files))
+
+  def _ReleaseAll():
+    vm_util.RunThreaded(
+        _WaitUntilStaged, [(args, {}) for args in files_per_vm.values()])
+    release_time = time.time() + latency + release_margin
+    vm_util.RunThreaded(
+        _Release, [((vm, files, release_time), {})
+                   for vm, files in files_per_vm.values()])
+
+  # Every command blocks until released, so all of them and the release must
+  # run concurrently.
+  target_arg_tuples = [(_RunCommand, args, {})
+                       for args in zip(vms, commands, release_files)]
+  target_arg_tuples.append((_ReleaseAll, (), {}))
+  return vm_util.RunParallelThreads(
+      target_arg_tuples, max_concurrency=len(target_arg_tuples))[:-1]
+
+
+def GetWindow(runs):
+  """Returns the start and stop times of the window all runs ran throughout.
+
+  The start is after the stop if the runs did not overlap.
+  """
+  return (max(run.start_time for run in runs),
+          min(run.stop_time for run in runs))
+
+
+def GetSamples(runs, metadata):
+  """Returns samples of how closely the runs started and stopped together.
+
+  Args:
+    runs: list of ClientRuns, as returned by Run.
+    metadata: dict. Metadata of the samples.
+
+  Returns:
+    List of sample.Sample objects.
+  """
+  metadata = dict(metadata, num_clients=len(runs))
+  starts = [run.start_time for run in runs]
+  stops = [run.stop_time for run in runs]
+  start, stop = GetWindow(runs)
+  return [
+      sample.Sample('start skew', max(starts) - min(starts), 'seconds',
+                    metadata),
+      sample.Sample('stop skew', max(stops) - min(stops), 'seconds', metadata),
+      sample.Sample('release delay',
+                    max(run.start_time - run.release_time for run in runs),
+                    'seconds', metadata),
+      sample.Sample('common window', max(stop - start, 0), 'seconds',
+                    metadata),
+  ]
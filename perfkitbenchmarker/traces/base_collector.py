@@ -24,9 +24,11 @@ import threading
 import time
 import uuid
 from absl import flags
+import numpy as np
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.traces import clock_offset
 import six
 
 FLAGS = flags.FLAGS
@@ -43,6 +45,24 @@ def Register(parsed_flags):
   del parsed_flags  # unused
 
 
+def Downsample(values, factor):
+  """Averages each run of factor consecutive rows of an array.
+
+  Args:
+    values: array whose first axis is time.
+    factor: int. Number of rows averaged into each output row. The last output
+      row averages whatever rows remain.
+
+  Returns:
+    A tuple of (starts, averages), where starts holds the index of the first
+    row averaged into each output row.
+  """
+  starts = np.arange(0, len(values), factor)
+  counts = np.diff(np.append(starts, len(values)))
+  sums = np.add.reduceat(values, starts, axis=0)
+  return starts, sums / counts.reshape((-1,) + (1,) * (sums.ndim - 1))
+
+
 class BaseCollector(object):
   """Object representing a Base Collector.
 
@@ -67,6 +87,7 @@ class BaseCollector(object):
     self._lock = threading.Lock()
     self._pid_files = {}
     self._role_mapping = {}  # mapping vm role to output file
+    self._role_vms = {}  # mapping vm role to vm
     self._start_time = 0
 
     if not os.path.isdir(self.output_directory):
@@ -115,6 +136,7 @@ class BaseCollector(object):
     try:
       vm.PullFile(self.output_directory, file_name)
       self._role_mapping[vm_role] = file_name
+      self._role_vms[vm_role] = vm
     except errors.VirtualMachine.RemoteCommandError as ex:
       logging.exception('Failed fetching collector result from %s.', vm.name)
       raise ex
@@ -161,6 +183,13 @@ class BaseCollector(object):
     vm_util.RunThreaded(self._StopOnVm, args)
     return
 
+  def _ToRunnerTime(self, role, timestamps):
+    """Converts timestamps recorded on the VM of a role to the PKB clock."""
+    vm = self._role_vms.get(role)
+    if vm is None:
+      return timestamps
+    return clock_offset.ToRunnerTime(vm, timestamps)
+
   @abc.abstractmethod
   def Analyze(self, sender, benchmark_spec, samples):
     """Analyze collector file and record samples."""
@@ -0,0 +1,258 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the offset of the clock of each VM from the clock of PKB.
+
+Timestamps recorded on different VMs, such as the start times of object
+storage streams or the reports of dstat and mpstat, are compared with each
+other and with the times of events recorded by PKB, which assumes the clocks
+agree. With --measure_clock_offsets, the clock of each VM is read over a
+single SSH connection at the start and end of each run, as an NTP client
+exchanges packets with a server: PKB records the times it asked for and got
+each reading, and the reading with the shortest round trip gives the offset
+of the VM clock, to within half that round trip. The offsets and the drift
+between them are published with the samples of the run, and ToRunnerTime
+converts timestamps recorded on a VM to the clock of PKB. The offsets of a
+run are forgotten when the next run starts, so each run is corrected and
+reported with its own measurements.
+"""
+
+import collections
+import logging
+import posixpath
+import threading
+import time
+
+from absl import flags
+from perfkitbenchmarker import data
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
+from perfkitbenchmarker import os_types
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
+
+flags.DEFINE_boolean('measure_clock_offsets', False,
+                     'Measure the offset of the clock of each VM from the '
+                     'clock of PKB at the start and end of each run, '
+                     'publish them with the drift between them and correct '
+                     'the timestamps of dstat, mpstat, sar and object '
+                     'storage streams with them.')
+flags.DEFINE_integer('clock_offset_exchanges', 16,
+                     'Number of times the clock of each VM is read per '
+                     'measurement. The reading with the shortest round trip '
+                     'is used.', lower_bound=1)
+FLAGS = flags.FLAGS
+
+_SCRIPT = 'clock_exchange.py'
+# Seconds a measurement may take before its connection is killed.
+_TIMEOUT = 60
+
+# An offset measured at timestamp, in seconds since the epoch on the clock of
+# PKB. offset is the seconds the VM clock was ahead of the clock of PKB, and
+# delay the round trip of the reading it was computed from, so the error of
+# offset is at most half of delay.
+ClockOffset = collections.namedtuple(
+    'ClockOffset', ['timestamp', 'offset', 'delay'])
+
+_lock = threading.Lock()
+# VM name to the list of its ClockOffsets, oldest first.
+_offsets = collections.defaultdict(list)
+
+
+def _ScriptPath():
+  return posixpath.join(vm_util.VM_TMP_DIR, _SCRIPT)
+
+
+def ComputeOffset(exchanges):
+  """Returns the ClockOffset of the exchange with the shortest round trip.
+
+  Args:
+    exchanges: list of (send, remote, receive) tuples of the local time a
+      reading of the remote clock was asked for, the reading and the local
+      time it was received.
+  """
+  send, remote, receive = min(exchanges, key=lambda e: e[2] - e[0])
+  midpoint = (send + receive) / 2
+  return ClockOffset(midpoint, remote - midpoint, receive - send)
+
+
+def Measure(vm, exchanges):
+  """Measures the offset of the clock of a VM.
+
+  Args:
+    vm: the Linux VM.
+    exchanges: int. Number of times to read the clock of the VM.
+
+  Returns:
+    A ClockOffset.
+
+  Raises:
+    errors.VirtualMachine.RemoteCommandError: if the connection closed
+      before all readings were received.
+  """
+  vm.Install('python3')
+  vm.PushFile(data.ResourcePath(_SCRIPT), _ScriptPath())
+  process = vm.StartRemoteHostCommand(f'python3 -u {_ScriptPath()}')
+  timer = threading.Timer(_TIMEOUT, process.kill)
+  timer.start()
+  results = []
+  try:
+    for _ in range(exchanges):
+      send = time.time()
+      try:
+        process.stdin.write(b'\n')
+      except BrokenPipeError:
+        line = b''
+      else:
+        line = process.stdout.readline()
+      receive = time.time()
+      if not line:
+        raise errors.VirtualMachine.RemoteCommandError(
+            f'Clock exchange with {vm.name} closed after {len(results)} '
+            'readings.')
+      results.append((send, float(line), receive))
+  finally:
+    timer.cancel()
+    process.stdin.close()
+    process.wait()
+  return ComputeOffset(results)
+
+
+def Record(vm, offset):
+  """Records a ClockOffset measured for a VM."""
+  with _lock:
+    _offsets[vm.name].append(offset)
+
+
+def Clear(vms):
+  """Forgets the ClockOffsets recorded for VMs."""
+  with _lock:
+    for vm in vms:
+      _offsets.pop(vm.name, None)
+
+
+def GetOffsets(vm):
+  """Returns the ClockOffsets recorded for a VM, oldest first."""
+  with _lock:
+    return list(_offsets.get(vm.name, []))
+
+
+def GetDrift(vm):
+  """Returns the seconds the VM clock gained per second, or None.
+
+  The drift is computed from the oldest and newest offsets recorded for the
+  VM, so it is None unless two were measured at different times.
+  """
+  offsets = GetOffsets(vm)
+  if len(offsets) < 2 or offsets[-1].timestamp == offsets[0].timestamp:
+    return None
+  return ((offsets[-1].offset - offsets[0].offset) /
+          (offsets[-1].timestamp - offsets[0].timestamp))
+
+
+def GetOffset(vm, timestamp):
+  """Returns the seconds the VM clock was ahead of the clock of PKB.
+
+  The offset at the timestamp is interpolated, or extrapolated, linearly
+  from the oldest offset recorded for the VM with its drift. The timestamp
+  may be on either clock, as the difference is far too small to matter.
+
+  Args:
+    vm: the VM.
+    timestamp: float or numpy array of seconds since the epoch.
+
+  Returns:
+    The offset, of the same shape as timestamp. 0 if no offset was recorded
+    for the VM.
+  """
+  offsets = GetOffsets(vm)
+  if not offsets:
+    return timestamp * 0.
+  drift = GetDrift(vm) or 0.
+  return offsets[0].offset + drift * (timestamp - offsets[0].timestamp)
+
+
+def ToRunnerTime(vm, timestamp):
+  """Converts a timestamp recorded on a VM to the clock of PKB.
+
+  Args:
+    vm: the VM.
+    timestamp: float or numpy array of seconds since the epoch on the clock
+      of the VM.
+
+  Returns:
+    The timestamp on the clock of PKB, of the same shape as timestamp.
+  """
+  return timestamp - GetOffset(vm, timestamp)
+
+
+def GetSamples(vm):
+  """Returns samples of the offsets recorded for a VM and their drift."""
+  metadata = {'vm_name': vm.name}
+  samples = []
+  offsets = GetOffsets(vm)
+  for i, offset in enumerate(offsets):
+    samples.append(sample.Sample(
+        'Clock Offset', offset.offset * 1000, 'ms',
+        dict(metadata, measurement=i, round_trip_delay_ms=offset.delay * 1000,
+             clock_offset_exchanges=FLAGS.clock_offset_exchanges),
+        timestamp=offset.timestamp))
+  drift = GetDrift(vm)
+  if drift is not None:
+    samples.append(sample.Sample(
+        'Clock Drift', drift * 1e6, 'ppm',
+        dict(metadata, drift_interval=(offsets[-1].timestamp -
+                                       offsets[0].timestamp))))
+  return samples
+
+
+def _MeasureOnVm(vm):
+  try:
+    Record(vm, Measure(vm, FLAGS.clock_offset_exchanges))
+  except (errors.VirtualMachine.RemoteCommandError, OSError,
+          ValueError) as e:
+    logging.warning('Failed to measure the clock offset of %s: %s', vm.name,
+                    e)
+
+
+def MeasureAll(sender, benchmark_spec):
+  """Measures and records the clock offset of every Linux VM."""
+  del sender  # unused
+  vms = [vm for vm in benchmark_spec.vms
+         if vm.OS_TYPE not in os_types.WINDOWS_OS_TYPES]
+  if vms:
+    vm_util.RunThreaded(_MeasureOnVm, vms)
+
+
+def MeasureAllAtStart(sender, benchmark_spec):
+  """Forgets the offsets of the previous run and measures every Linux VM."""
+  Clear(benchmark_spec.vms)
+  MeasureAll(sender, benchmark_spec)
+
+
+def AddSamples(sender, benchmark_spec, samples):
+  """Adds the clock offset samples of every VM to samples."""
+  del sender  # unused
+  for vm in benchmark_spec.vms:
+    samples.extend(GetSamples(vm))
+
+
+def Register(parsed_flags):
+  """Registers the clock offset measurements if enabled."""
+  if not parsed_flags.measure_clock_offsets:
+    return
+  events.before_phase.connect(MeasureAllAtStart, events.RUN_PHASE,
+                              weak=False)
+  events.after_phase.connect(MeasureAll, events.RUN_PHASE, weak=False)
+  events.samples_created.connect(AddSamples, events.RUN_PHASE, weak=False)
@@ -123,6 +123,8 @@ class _DStatCollector(base_collector.BaseCollector):
                              os.path.basename(file)), 'r') as f:
         fp = iter(f)
         labels, out = dstat.ParseCsvFile(fp)
+        # Events are recorded on the clock of PKB.
+        out[:, 0] = self._ToRunnerTime(role, out[:, 0])
         vm_util.RunThreaded(
             _AnalyzeEvent,
             [((role, labels, out, e), {}) for e in events.TracingEvent.events])
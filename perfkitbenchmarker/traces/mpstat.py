@@ -18,6 +18,8 @@ Samples are reported in the form of mpstat_{metric} or mpstat_avg_{metric}.
 mpstat_{metric} is the reported {metric} for the given mpstat_interval and
 mpstat_count for a specific cpu. The cpu id is reported in the sample metadata.
 mpstat_avg_{metric} is the average of {metric} over all cpus.
+The averages are reported over the whole run and over the time range of each
+tracing event, in which case the event is reported in the sample metadata.
 Currently, only aggregated statistics are reported. Specifically, intr/s, %usr,
 %nice, %sys, %iowait, %irq, %soft, %steal, %guest, %idle. Individual stats can
 be added later if needed.
@@ -45,13 +47,16 @@ For more details, see https://linux.die.net/man/1/mpstat.
 """
 
 
+import collections
 import datetime
+import functools
 import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from absl import flags
+import numpy as np
 from perfkitbenchmarker import events
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
@@ -83,6 +88,11 @@ _MPSTAT_PUBLISH_PER_INTERVAL_SAMPLES = flags.DEFINE_boolean(
     'mpstat_publish_per_interval_samples', False,
     'Whether to publish a separate mpstat statistics sample '
     'for each interval. If True, --mpstat_publish must be True.')
+_MPSTAT_PER_INTERVAL_DOWNSAMPLE = flags.DEFINE_integer(
+    'mpstat_per_interval_downsample', 1,
+    'Number of consecutive mpstat intervals averaged into each per interval '
+    'sample. Only applicable when --mpstat_publish_per_interval_samples is '
+    'True.', lower_bound=1)
 
 FLAGS = flags.FLAGS
 
@@ -128,39 +138,34 @@ def _ParseStartTime(output: str) -> float:
   return start_datetime.timestamp()
 
 
-def _GetCPUMetrics(host_stats):
-  """Generate list of metrics that we want to publish.
+class _CPUStats(
+    collections.namedtuple('_CPUStats', [
+        'metrics', 'cpu_ids', 'load', 'interrupt_cpu_ids', 'interrupts'])):
+  """Columnar view of the reports of one mpstat host.
 
-  Args:
-    host_stats: List of mpstat reports.
-
-  Returns:
-    List of metrics that we want to publish.
+  Attributes:
+    metrics: names of the CPU utilization metrics, e.g. 'usr' or 'idle'.
+    cpu_ids: ids of the CPUs in load; -1 is the average over all CPUs.
+    load: array of shape (reports, CPUs, metrics) of utilization percentages.
+    interrupt_cpu_ids: ids of the CPUs in interrupts; -1 is the sum over all
+      CPUs.
+    interrupts: array of shape (reports, CPUs) of interrupts/sec, or None if
+      mpstat did not report the sum of interrupts.
   """
-  cpu_metrics = []
-  for cpu_metric in host_stats[0]['cpu-load'][0]:
-    # we don't want to generate a sample for cpu - cpu_id.
-    if cpu_metric == 'cpu':
-      continue
-    cpu_metrics.append(cpu_metric)
-  return cpu_metrics
 
 
-def _GetCPUAverageMetrics(
-    host_stats: List[Dict[str, Any]],
-    number_of_cpus: int,
-    metadata: Dict[str, Any],
-    timestamp: Optional[float] = None):
-  """Get average metrics for all CPUs.
+def _CPUId(cpu: str) -> int:
+  return -1 if cpu == 'all' else int(cpu)
+
+
+def _LoadCPUStats(host_stats: List[Dict[str, Any]]) -> _CPUStats:
+  """Loads mpstat reports into arrays.
 
   Args:
     host_stats: List of mpstat reports.
-    number_of_cpus: how many CPUs are being used.
-    metadata: metadata of the sample.
-    timestamp: timestamp of the sample.
 
   Returns:
-    List of samples - containing the average metrics for all CPUs.
+    _CPUStats of the reports.
 
   input data:
   [
@@ -173,43 +178,60 @@ def _GetCPUAverageMetrics(
         {"cpu": "0", "usr": 100.00, "nice": 0.00, "sys": 0.00, "iowait": 0.00,
         "irq": 0.00, "soft": 0.00, "steal": 0.00, "guest": 0.00, "gnice": 0.00,
         "idle": 0.00},
-        {"cpu": "1", "usr": 100.00, "nice": 0.00, "sys": 0.00, "iowait": 0.00,
-        "irq": 0.00, "soft": 0.00, "steal": 0.00, "guest": 0.00, "gnice": 0.00,
-        "idle": 0.00}
-      ]
-      ...
-    }, {
-      "timestamp": "22:05:31",
-      "cpu-load": [
-        {"cpu": "-1", "usr": 100.00, "nice": 0.00, "sys": 0.00, "iowait": 0.00,
-        "irq": 0.00, "soft": 0.00, "steal": 0.00, "guest": 0.00, "gnice": 0.00,
-        "idle": 0.00},
-        {"cpu": "0", "usr": 100.00, "nice": 0.00, "sys": 0.00, "iowait": 0.00,
-        "irq": 0.00, "soft": 0.00, "steal": 0.00, "guest": 0.00, "gnice": 0.00,
-        "idle": 0.00},
-        {"cpu": "1", "usr": 100.00, "nice": 0.00, "sys": 0.00, "iowait": 0.00,
-        "irq": 0.00, "soft": 0.00, "steal": 0.00, "guest": 0.00, "gnice": 0.00,
-        "idle": 0.00}
-      ]
+        ...
+      ],
+      "sum-interrupts": [
+        {"cpu": "all", "intr": 274.77},
+        {"cpu": "0", "intr": 264.27},
+        ...
+      ],
       ...
-    }
+    },
+    ...
   ]
   """
+  metrics = [metric for metric in host_stats[0]['cpu-load'][0]
+             if metric != 'cpu']
+  cpu_ids = [_CPUId(cpu['cpu']) for cpu in host_stats[0]['cpu-load']]
+  load = np.array(
+      [[[cpu[metric] for metric in metrics] for cpu in report['cpu-load']]
+       for report in host_stats], dtype=float)
+  interrupt_cpu_ids = []
+  interrupts = None
+  if 'sum-interrupts' in host_stats[0]:
+    interrupt_cpu_ids = [
+        _CPUId(cpu['cpu']) for cpu in host_stats[0]['sum-interrupts']]
+    interrupts = np.array(
+        [[cpu['intr'] for cpu in report['sum-interrupts']]
+         for report in host_stats], dtype=float)
+  return _CPUStats(metrics, cpu_ids, load, interrupt_cpu_ids, interrupts)
+
+
+def _GetCPUAverageMetrics(
+    stats: _CPUStats,
+    reports: Any,
+    metadata: Dict[str, Any],
+    timestamp: Optional[float] = None) -> List[sample.Sample]:
+  """Get average metrics for all CPUs.
+
+  Args:
+    stats: _CPUStats of the reports.
+    reports: index of the reports to average, e.g. a boolean mask.
+    metadata: metadata of the sample.
+    timestamp: timestamp of the sample.
+
+  Returns:
+    List of samples - containing the average metrics for all CPUs.
+  """
   samples = []
-  cpu_metrics = _GetCPUMetrics(host_stats)
-  for cpu_id in range(-1, number_of_cpus):
-    for cpu_metric in cpu_metrics:
-      measurements = []
-      for report in host_stats:
-        value = report['cpu-load'][cpu_id + 1][cpu_metric]
-        measurements.append(value)
-      average = sum(measurements) / len(measurements)
-      metric_name = 'mpstat_avg_' + cpu_metric
+  averages = stats.load[reports].mean(axis=0)
+  for cpu_index, cpu_id in enumerate(stats.cpu_ids):
+    for metric_index, cpu_metric in enumerate(stats.metrics):
       meta = metadata.copy()
       meta['mpstat_cpu_id'] = cpu_id
       samples.append(sample.Sample(
-          metric=metric_name,
-          value=average,
+          metric='mpstat_avg_' + cpu_metric,
+          value=float(averages[cpu_index, metric_index]),
           unit='%',
           metadata=meta,
           timestamp=timestamp))
@@ -217,55 +239,31 @@ def _GetCPUAverageMetrics(
 
 
 def _GetCPUAverageInterruptions(
-    host_stats: List[Dict[str, Any]],
-    number_of_cpus: int,
+    stats: _CPUStats,
+    reports: Any,
     metadata: Dict[str, Any],
-    timestamp: Optional[float] = None):
+    timestamp: Optional[float] = None) -> List[sample.Sample]:
   """Get average interruption for all CPUs.
 
   Args:
-    host_stats: List of mpstat reports.
-    number_of_cpus: how many CPUs are being used.
+    stats: _CPUStats of the reports.
+    reports: index of the reports to average, e.g. a boolean mask.
     metadata: metadata of the sample.
     timestamp: timestamp of the sample.
 
   Returns:
-    List of samples - containing the average metrics for all CPUs.
-
-  input data:
-  [
-    {
-      "timestamp": "22:05:29",
-      "sum-interrupts": [
-        {"cpu": "all", "intr": 274.77},
-        {"cpu": "0", "intr": 264.27},
-        {"cpu": "1", "intr": 15.45}
-      ],
-      ...
-    }, {
-      "timestamp": "22:05:31",
-      "sum-interrupts": [
-        {"cpu": "all", "intr": 273.75},
-        {"cpu": "0", "intr": 264.73},
-        {"cpu": "1", "intr": 13.30}
-      ],
-      ...
-    }
-  ]
+    List of samples - containing the average interruptions for all CPUs.
   """
+  if stats.interrupts is None:
+    return []
   samples = []
-  for cpu_id in range(number_of_cpus+1):
-    measurements = []
-    for report in host_stats:
-      value = report['sum-interrupts'][cpu_id]['intr']
-      measurements.append(value)
-    average = sum(measurements)/len(measurements)
-    metric_name = 'mpstat_avg_intr'
+  averages = stats.interrupts[reports].mean(axis=0)
+  for cpu_index, cpu_id in enumerate(stats.interrupt_cpu_ids):
     meta = metadata.copy()
-    meta['mpstat_cpu_id'] = cpu_id-1
+    meta['mpstat_cpu_id'] = cpu_id
     samples.append(sample.Sample(
-        metric=metric_name,
-        value=average,
+        metric='mpstat_avg_intr',
+        value=float(averages[cpu_index]),
         unit='interrupts/sec',
         metadata=meta,
         timestamp=timestamp))
@@ -273,18 +271,20 @@ def _GetCPUAverageInterruptions(
 
 
 def _GetPerIntervalSamples(
-    host_stats: List[Dict[str, Any]],
+    stats: _CPUStats,
     metadata: Dict[str, Any],
-    start_timestamp: int,
-    interval: int) -> List[sample.Sample]:
+    start_timestamp: float,
+    interval: int,
+    downsample: int = 1) -> List[sample.Sample]:
   """Generate samples for all CPU related metrics in every run of mpstat.
 
   Args:
-    host_stats: List of mpstat reports.
+    stats: _CPUStats of the reports.
     metadata: metadata of the sample.
     start_timestamp: a unix timestamp representing the start of the first
       reporting period.
     interval: the interval between mpstat reports
+    downsample: number of consecutive reports averaged into each sample.
 
   Returns:
     a list of samples to publish
@@ -294,23 +294,59 @@ def _GetPerIntervalSamples(
   guarantee correct behavior if mpstat is run for more than 1 day.
   """
   samples = []
-  cpu_metrics = _GetCPUMetrics(host_stats)
-  for ordinal, host_stat in enumerate(host_stats):
-    sample_timestamp = start_timestamp + (ordinal * interval)
-    for cpu_metric in cpu_metrics:
-      for cpu in host_stat['cpu-load']:
-        metric_name = 'mpstat_avg_' + cpu_metric
-        cpu_id = int(cpu['cpu'])
-        metric_value = cpu[cpu_metric]
+  starts, loads = base_collector.Downsample(stats.load, downsample)
+  for ordinal, (start, load) in enumerate(zip(starts, loads)):
+    sample_timestamp = start_timestamp + (start * interval)
+    for metric_index, cpu_metric in enumerate(stats.metrics):
+      for cpu_index, cpu_id in enumerate(stats.cpu_ids):
         meta = metadata.copy()
         meta['mpstat_cpu_id'] = cpu_id
         meta['ordinal'] = ordinal
+        if downsample > 1:
+          meta['mpstat_per_interval_downsample'] = downsample
         samples.append(sample.Sample(
-            metric=metric_name,
-            value=metric_value,
+            metric='mpstat_avg_' + cpu_metric,
+            value=float(load[cpu_index, metric_index]),
             unit='%',
             metadata=meta,
-            timestamp=sample_timestamp))
+            timestamp=float(sample_timestamp)))
+  return samples
+
+
+def _GetEventSamples(
+    stats: _CPUStats,
+    metadata: Dict[str, Any],
+    start_timestamp: float,
+    interval: int,
+    tracing_events: List[events.TracingEvent]) -> List[sample.Sample]:
+  """Generate average samples over the reports during each tracing event.
+
+  Args:
+    stats: _CPUStats of the reports.
+    metadata: metadata of the sample.
+    start_timestamp: a unix timestamp of the first report.
+    interval: the interval between mpstat reports
+    tracing_events: events whose time ranges to average over.
+
+  Returns:
+    a list of samples to publish
+  """
+  samples = []
+  timestamps = start_timestamp + np.arange(len(stats.load)) * interval
+  for event in tracing_events:
+    reports = ((timestamps > event.start_timestamp) &
+               (timestamps <= event.end_timestamp))
+    # Skip events during which mpstat did not report.
+    if not reports.any():
+      continue
+    meta = metadata.copy()
+    meta.update(event.metadata)
+    meta['event'] = event.event
+    meta['sender'] = event.sender
+    samples += _GetCPUAverageMetrics(stats, reports, meta,
+                                     event.start_timestamp)
+    samples += _GetCPUAverageInterruptions(stats, reports, meta,
+                                           event.start_timestamp)
   return samples
 
 
@@ -319,6 +355,9 @@ def _MpstatResults(
     output: Dict[str, Any],
     interval: int,
     per_interval_samples: bool = False,
+    per_interval_downsample: int = 1,
+    tracing_events: Optional[List[events.TracingEvent]] = None,
+    to_runner_time: Optional[Callable[[float], float]] = None,
     ):
   """Parses and appends mpstat results to the samples list.
 
@@ -326,39 +365,55 @@ def _MpstatResults(
     metadata: metadata of the sample.
     output: output of mpstat in JSON format
     interval: the interval between mpstat reports; required if
-      per_interval_samples is True
+      per_interval_samples is True or there are tracing_events
     per_interval_samples: whether a sample per interval should be published
+    per_interval_downsample: number of consecutive intervals averaged into
+      each per interval sample.
+    tracing_events: events to additionally publish average samples for.
+    to_runner_time: converts the time of the first report, recorded on the
+      clock of the VM, to the clock of PKB the tracing events are recorded on.
 
   Returns:
     List of samples.
   """
   start_timestamp = _ParseStartTime(output)
+  if to_runner_time:
+    start_timestamp = to_runner_time(start_timestamp)
   samples = []
   hosts = output['sysstat']['hosts']
 
   for host in hosts:
-    host_stats = host['statistics']
-    number_of_cpus = host['number-of-cpus']
+    stats = _LoadCPUStats(host['statistics'])
     metadata['nodename'] = host['nodename']
+    all_reports = slice(None)
 
     samples += _GetCPUAverageMetrics(
-        host_stats,
-        number_of_cpus,
+        stats,
+        all_reports,
         metadata,
         start_timestamp)
 
     samples += _GetCPUAverageInterruptions(
-        host_stats,
-        number_of_cpus,
+        stats,
+        all_reports,
         metadata,
         start_timestamp)
 
     if per_interval_samples:
       samples += _GetPerIntervalSamples(
-          host_stats,
+          stats,
+          metadata,
+          start_timestamp,
+          interval,
+          per_interval_downsample)
+
+    if tracing_events:
+      samples += _GetEventSamples(
+          stats,
           metadata,
           start_timestamp,
-          interval)
+          interval,
+          tracing_events)
 
   return samples
 
@@ -373,9 +428,11 @@ class MpstatCollector(base_collector.BaseCollector):
       self,
       interval=None,
       output_directory=None,
-      per_interval_samples=False):
+      per_interval_samples=False,
+      per_interval_downsample=1):
     super().__init__(interval, output_directory=output_directory)
     self.per_interval_samples = per_interval_samples
+    self.per_interval_downsample = per_interval_downsample
 
   def _CollectorName(self):
     return 'mpstat'
@@ -421,6 +478,9 @@ class MpstatCollector(base_collector.BaseCollector):
                 output,
                 self.interval,
                 per_interval_samples=self.per_interval_samples,
+                per_interval_downsample=self.per_interval_downsample,
+                tracing_events=events.TracingEvent.events,
+                to_runner_time=functools.partial(self._ToRunnerTime, role),
                 ))
 
     vm_util.RunThreaded(
@@ -436,7 +496,8 @@ def Register(parsed_flags):
 
   collector = MpstatCollector(
       interval=parsed_flags.mpstat_interval,
-      per_interval_samples=parsed_flags.mpstat_publish_per_interval_samples)
+      per_interval_samples=parsed_flags.mpstat_publish_per_interval_samples,
+      per_interval_downsample=parsed_flags.mpstat_per_interval_downsample)
   events.before_phase.connect(collector.Start, events.RUN_PHASE, weak=False)
   events.after_phase.connect(collector.Stop, events.RUN_PHASE, weak=False)
   if parsed_flags.mpstat_publish:
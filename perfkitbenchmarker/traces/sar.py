@@ -14,9 +14,13 @@
 """Records cpu performance counters during benchmark runs using sar."""
 
 
+import collections
+import datetime
+import functools
 import logging
 import os
 from absl import flags
+import numpy as np
 from perfkitbenchmarker import events
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
@@ -41,10 +45,103 @@ flags.DEFINE_string(
     'Default: run temporary directory.')
 flags.DEFINE_boolean('sar_publish', True,
                      'Whether to publish average sar statistics.')
+flags.DEFINE_boolean(
+    'sar_publish_per_interval_samples', True,
+    'Whether to publish a steal sample for each sar report in addition to '
+    'the averages. Only applicable when --sar_publish is specified.')
+flags.DEFINE_integer(
+    'sar_per_interval_downsample', 1,
+    'Number of consecutive sar reports averaged into each per interval '
+    'sample.', lower_bound=1)
 FLAGS = flags.FLAGS
 
 
-def _AddStealResults(metadata, output, samples):
+_SAR_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d')
+
+
+class _SarTable(
+    collections.namedtuple('_SarTable', [
+        'columns', 'timestamps', 'values', 'average'])):
+  """Columnar view of the CPU utilization reported by sar.
+
+  Attributes:
+    columns: names of the reported statistics, e.g. '%user' or '%steal'.
+    timestamps: array of the unix time of each report, or None if the date of
+      the reports could not be parsed.
+    values: array of shape (reports, columns) of the reported statistics.
+    average: array of the statistics on the Average line, or None.
+  """
+
+
+def _SecondsOfDay(fields):
+  """Returns the seconds since midnight of a report's time fields."""
+  hours, minutes, seconds = (int(part) for part in fields[0].split(':'))
+  if len(fields) > 1:
+    hours = hours % 12 + (12 if fields[1] == 'PM' else 0)
+  return hours * 3600 + minutes * 60 + seconds
+
+
+def _ParseDate(output):
+  """Returns the unix time of the midnight UTC starting the sar reports."""
+  for field in output.split('\n', 1)[0].split():
+    for date_format in _SAR_DATE_FORMATS:
+      try:
+        date = datetime.datetime.strptime(field, date_format)
+      except ValueError:
+        continue
+      return date.replace(tzinfo=datetime.timezone.utc).timestamp()
+  return None
+
+
+def _ParseSarOutput(output):
+  """Loads the reports of sar -u into a _SarTable.
+
+  Statistics are located by the column names of the header, so both the 12 and
+  24 hour time formats are supported. Reports are assumed to be printed in UTC.
+
+  Args:
+    output: the output of sar.
+
+  Returns:
+    _SarTable of the reports.
+  """
+  columns = None
+  times = []
+  rows = []
+  average = None
+  for line in output.splitlines():
+    fields = line.split()
+    if not fields or fields[0] == 'Linux':
+      continue
+    if 'CPU' in fields:
+      columns = fields[fields.index('CPU') + 1:]
+      if not times:
+        # The header carries the time sar started at, on the reported date.
+        times.append(_SecondsOfDay(fields[:fields.index('CPU')]))
+      continue
+    if columns is None or len(fields) <= len(columns):
+      continue
+    if fields[0] == 'Average:':
+      average = fields[-len(columns):]
+    else:
+      times.append(_SecondsOfDay(fields[:-len(columns) - 1]))
+      rows.append(fields[-len(columns):])
+  values = np.array(rows, dtype=float).reshape((len(rows), len(columns or [])))
+  if average is not None:
+    average = np.array(average, dtype=float)
+  timestamps = None
+  date = _ParseDate(output)
+  if date is not None:
+    times = np.array(times, dtype=float)
+    # Reports continuing past midnight restart at time 0.
+    days = np.cumsum(np.diff(times) < 0)
+    timestamps = date + times[1:] + days * 24 * 60 * 60
+  return _SarTable(columns, timestamps, values, average)
+
+
+def _AddStealResults(metadata, output, samples, per_interval_samples=True,
+                     per_interval_downsample=1, tracing_events=None,
+                     to_runner_time=None):
   """Appends average Steal Time %'s to the samples list.
 
   Sample data e.g.
@@ -61,29 +158,57 @@ def _AddStealResults(metadata, output, samples):
     metadata: metadata of the sample.
     output: the output of the stress-ng benchmark.
     samples: list of samples to return.
+    per_interval_samples: whether to append a steal sample per report.
+    per_interval_downsample: number of consecutive reports averaged into each
+      steal sample.
+    tracing_events: events to additionally append average steal samples for.
+    to_runner_time: converts the times of the reports, recorded on the clock
+      of the VM, to the clock of PKB the tracing events are recorded on.
   """
-  output_lines = output.splitlines()
-
-  for line in output_lines:
-    line_split = line.split()
-    if not line_split:
-      continue
-    if line_split[0] == 'Linux':
-      continue
-    if line_split[-2] == '%steal':
-      continue
-    if line_split[0] == 'Average:':
-      metric = 'average_steal'
-    else:
-      metric = 'steal'
-    value = float(line_split[-2])  # parse %steal time
+  table = _ParseSarOutput(output)
+  if table.columns is None:
+    return
+  if table.timestamps is not None and to_runner_time:
+    table = table._replace(timestamps=to_runner_time(table.timestamps))
+  steal = table.columns.index('%steal')
+  user = table.columns.index('%user')
 
-    my_metadata = {'user_percent': float(line_split[3])}
+  def _Sample(metric, values, timestamp=None, extra_metadata=None):
+    my_metadata = {'user_percent': float(values[user])}
     my_metadata.update(metadata)
+    my_metadata.update(extra_metadata or {})
+    return sample.Sample(metric=metric, value=float(values[steal]), unit='%',
+                         metadata=my_metadata, timestamp=timestamp)
 
-    samples.append(
-        sample.Sample(
-            metric=metric, value=value, unit='%', metadata=my_metadata))
+  if per_interval_samples and len(table.values):
+    starts, values = base_collector.Downsample(table.values,
+                                               per_interval_downsample)
+    extra_metadata = None
+    if per_interval_downsample > 1:
+      extra_metadata = {'sar_per_interval_downsample': per_interval_downsample}
+    for start, row in zip(starts, values):
+      timestamp = None
+      if table.timestamps is not None:
+        timestamp = float(table.timestamps[start])
+      samples.append(_Sample('steal', row, timestamp, extra_metadata))
+
+  if table.average is not None:
+    samples.append(_Sample('average_steal', table.average))
+
+  if table.timestamps is None:
+    return
+  for event in tracing_events or []:
+    reports = ((table.timestamps > event.start_timestamp) &
+               (table.timestamps <= event.end_timestamp))
+    # Skip events during which sar did not report.
+    if not reports.any():
+      continue
+    event_metadata = dict(event.metadata)
+    event_metadata['event'] = event.event
+    event_metadata['sender'] = event.sender
+    samples.append(_Sample('average_steal',
+                           table.values[reports].mean(axis=0),
+                           event.start_timestamp, event_metadata))
 
 
 class _SarCollector(base_collector.BaseCollector):
@@ -99,7 +224,9 @@ class _SarCollector(base_collector.BaseCollector):
     vm.InstallPackages('sysstat')
 
   def _CollectorRunCommand(self, vm, collector_file):
-    cmd = ('sar -u {sar_interval} {sar_samples} > {output} 2>&1 & '
+    # Reports are printed in UTC with dates that can be parsed unambiguously.
+    cmd = ('export S_TIME_FORMAT=ISO TZ=UTC; '
+           'sar -u {sar_interval} {sar_samples} > {output} 2>&1 & '
            'echo $!').format(
                output=collector_file,
                sar_interval=FLAGS.sar_interval,
@@ -120,7 +247,12 @@ class _SarCollector(base_collector.BaseCollector):
             'sar_interval': self.interval,
             'role': role,
         }
-        _AddStealResults(metadata, output, samples)
+        _AddStealResults(
+            metadata, output, samples,
+            per_interval_samples=FLAGS.sar_publish_per_interval_samples,
+            per_interval_downsample=FLAGS.sar_per_interval_downsample,
+            tracing_events=events.TracingEvent.events,
+            to_runner_time=functools.partial(self._ToRunnerTime, role))
 
     vm_util.RunThreaded(
         _Analyze, [((k, w), {}) for k, w in six.iteritems(self._role_mapping)])
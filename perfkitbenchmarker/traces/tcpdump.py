@@ -17,10 +17,23 @@ Tcpdump is run in the background before the Run phase, the pcap file is copied
 to the current run's temp directory with a name like
 pkb-<machine_name>-<benchmark>-<UUID>-tcpdump.stdout that can be read in with
 "tcpdump -r <filename>"
+
+With --tcpdump_summary, the capture is summarized by scripts/pcap_summary.py
+into samples for its largest flows. Summarizing on the VM only copies the
+summary back rather than the capture.
 """
 
+import json
+import logging
+import os
+import posixpath
+
 from absl import flags
+from perfkitbenchmarker import data
 from perfkitbenchmarker import events
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.scripts import pcap_summary
 from perfkitbenchmarker.traces import base_collector
 
 flags.DEFINE_boolean(
@@ -37,8 +50,28 @@ flags.DEFINE_integer(
     'tcpdump_packet_count', None, 'Number of packets to collect. Default '
     'is to collect all packets in the run phase')
 
+SUMMARY_ON_VM = 'vm'
+SUMMARY_ON_RUNNER = 'runner'
+
+_SUMMARY = flags.DEFINE_enum(
+    'tcpdump_summary', None, [SUMMARY_ON_VM, SUMMARY_ON_RUNNER],
+    'Where to summarize the capture into samples of its largest flows: on the '
+    'VM, copying back only the summary, or on the runner after copying back '
+    'the capture. By default the capture is copied back without a summary.')
+_SUMMARY_INTERVAL = flags.DEFINE_float(
+    'tcpdump_summary_interval', 1.0,
+    'Seconds over which to report the throughput of each flow.')
+_SUMMARY_MAX_FLOWS = flags.DEFINE_integer(
+    'tcpdump_summary_max_flows', 10,
+    'Number of flows to report samples for, those with the most bytes.')
+_KEEP_PCAP = flags.DEFINE_boolean(
+    'tcpdump_keep_pcap', False,
+    'Whether to also copy back the capture with --tcpdump_summary=vm.')
+
 FLAGS = flags.FLAGS
 
+_SUMMARY_SCRIPT = 'pcap_summary.py'
+
 
 def _PortFilter(ports):
   """Returns the port filter suitable for tcpdump.
@@ -64,10 +97,19 @@ class _TcpdumpCollector(base_collector.BaseCollector):
                ignore_ports=None,
                include_ports=None,
                snaplen=None,
-               packet_count=None):
+               packet_count=None,
+               summary=None,
+               summary_interval=1.0,
+               summary_max_flows=10,
+               keep_pcap=False):
     super(_TcpdumpCollector, self).__init__(None, None)
     self.snaplen = snaplen
     self.packet_count = packet_count
+    self.summary = summary
+    self.summary_interval = summary_interval
+    self.summary_max_flows = summary_max_flows
+    self.keep_pcap = keep_pcap
+    self._summaries = {}  # mapping vm role to capture summary
     if include_ports:
       self.filter = _PortFilter(include_ports)
     elif ignore_ports:
@@ -111,6 +153,112 @@ class _TcpdumpCollector(base_collector.BaseCollector):
     cmd.extend(['>', '/dev/null', '2>&1', '&', 'echo $!'])
     return ' '.join(cmd)
 
+  def _StopOnVm(self, vm, vm_role):
+    """See base class.
+
+    Also summarizes the capture with --tcpdump_summary.
+
+    Args:
+      vm: The VM to stop tcpdump on.
+      vm_role: The role of the VM in the benchmark, e.g. "default_0".
+    """
+    if self.summary != SUMMARY_ON_VM:
+      super(_TcpdumpCollector, self)._StopOnVm(vm, vm_role)
+      if self.summary == SUMMARY_ON_RUNNER and vm_role in self._role_mapping:
+        pcap_path = os.path.join(
+            self.output_directory,
+            os.path.basename(self._role_mapping[vm_role]))
+        with open(pcap_path, 'rb') as f:
+          self._SaveSummary(vm_role, pcap_path, pcap_summary.Summarize(
+              f, self.summary_interval, self.summary_max_flows))
+      return
+    if vm.name not in self._pid_files:
+      logging.warning('No collector PID for %s', vm.name)
+      return
+    with self._lock:
+      pid, pcap_file = self._pid_files.pop(vm.name)
+    vm.RemoteCommand(self._KillCommand(pid), ignore_failure=True)
+    vm.Install('python3')
+    script = posixpath.join(vm_util.VM_TMP_DIR, _SUMMARY_SCRIPT)
+    vm.PushFile(data.ResourcePath(_SUMMARY_SCRIPT), script)
+    stdout, _ = vm.RemoteCommand(
+        'python3 {script} --interval {interval} --max_flows {max_flows} '
+        '{pcap}'.format(script=script, interval=self.summary_interval,
+                        max_flows=self.summary_max_flows, pcap=pcap_file))
+    self._SaveSummary(vm_role, pcap_file, json.loads(stdout))
+    if self.keep_pcap:
+      vm.PullFile(self.output_directory, pcap_file)
+      self._role_mapping[vm_role] = pcap_file
+
+  def _SaveSummary(self, vm_role, pcap_file, summary):
+    """Keeps the summary for Analyze and writes it next to the captures."""
+    self._summaries[vm_role] = summary
+    summary_path = os.path.join(
+        self.output_directory,
+        os.path.splitext(os.path.basename(pcap_file))[0] + '-summary.json')
+    with open(summary_path, 'w') as f:
+      json.dump(summary, f)
+
+  def Analyze(self, sender, benchmark_spec, samples):
+    """Adds samples for the largest flows of each capture.
+
+    Args:
+      sender: event sender for collecting stats.
+      benchmark_spec: benchmark_spec of this run.
+      samples: samples to add stats to.
+    """
+    del sender, benchmark_spec  # unused
+    for role, summary in sorted(self._summaries.items()):
+      samples.extend(_SummarySamples(summary, {
+          'event': 'tcpdump',
+          'sender': 'run',
+          'role': role,
+      }))
+
+
+def _SummarySamples(summary, metadata):
+  """Returns samples for each flow of a pcap_summary summary.
+
+  Args:
+    summary: dict returned by pcap_summary.Summarize.
+    metadata: dict of metadata to add to the samples.
+
+  Returns:
+    List of samples.
+  """
+  samples = []
+  for flow in summary['largest_flows']:
+    flow_metadata = dict(
+        metadata, protocol=flow['protocol'], src=flow['src'],
+        sport=flow['sport'], dst=flow['dst'], dport=flow['dport'],
+        packets=flow['packets'])
+    values = [('bytes', flow['bytes'], 'bytes')]
+    if flow['throughput_bps'] is not None:
+      values.append(('throughput', flow['throughput_bps'] / 1e6, 'Mbits/sec'))
+    for stat in ('p50', 'p90', 'p99', 'avg'):
+      values.append(
+          ('packet_size_' + stat, flow['packet_size'][stat], 'bytes'))
+    if 'retransmits' in flow:
+      values.append(('retransmits', flow['retransmits'], 'count'))
+    if 'window' in flow:
+      for stat in ('min', 'avg', 'max'):
+        values.append(('window_' + stat, flow['window'][stat], 'bytes'))
+    for metric, value, unit in values:
+      samples.append(sample.Sample('tcpdump_flow_' + metric, value, unit,
+                                   flow_metadata))
+    if 'rtt_ms' in flow:
+      rtt_metadata = dict(flow_metadata, rtt_count=flow['rtt_ms']['count'])
+      for stat in ('min', 'p50', 'p90', 'p99', 'avg'):
+        samples.append(sample.Sample('tcpdump_flow_rtt_' + stat,
+                                     flow['rtt_ms'][stat], 'ms', rtt_metadata))
+    interval_metadata = dict(flow_metadata, interval=summary['interval'])
+    for index, throughput in enumerate(flow['interval_throughput_bps']):
+      samples.append(sample.Sample(
+          'tcpdump_flow_interval_throughput', throughput / 1e6, 'Mbits/sec',
+          interval_metadata,
+          timestamp=flow['interval_start'] + index * summary['interval']))
+  return samples
+
 
 def _CreateCollector(parsed_flags):
   """Creates a _TcpdumpCollector from flags."""
@@ -118,7 +266,11 @@ def _CreateCollector(parsed_flags):
       ignore_ports=parsed_flags.tcpdump_ignore_ports,
       include_ports=parsed_flags.tcpdump_include_ports,
       snaplen=parsed_flags.tcpdump_snaplen,
-      packet_count=parsed_flags.tcpdump_packet_count)
+      packet_count=parsed_flags.tcpdump_packet_count,
+      summary=parsed_flags.tcpdump_summary,
+      summary_interval=parsed_flags.tcpdump_summary_interval,
+      summary_max_flows=parsed_flags.tcpdump_summary_max_flows,
+      keep_pcap=parsed_flags.tcpdump_keep_pcap)
 
 
 def Register(parsed_flags):
@@ -128,3 +280,6 @@ def Register(parsed_flags):
   collector = _CreateCollector(parsed_flags)
   events.before_phase.connect(collector.Start, events.RUN_PHASE, weak=False)
   events.after_phase.connect(collector.Stop, events.RUN_PHASE, weak=False)
+  if parsed_flags.tcpdump_summary:
+    events.samples_created.connect(
+        collector.Analyze, events.RUN_PHASE, weak=False)
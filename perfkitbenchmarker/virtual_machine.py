@@ -170,6 +170,8 @@ class BaseVmSpec(spec.BaseSpec):
         background network traffic during the benchmark.
     background_network_ip_type: The IP address type (INTERNAL or
         EXTERNAL) to use for generating background network workload.
+    background_loads: List of rate-controlled background loads, as
+        TYPE:RATE[:SCHEDULE], to generate during the benchmark.
     disable_interrupt_moderation: If true, disables interrupt moderation.
     disable_rss: = If true, disables rss.
     vm_metadata: = Additional metadata for the VM.
@@ -189,6 +191,7 @@ class BaseVmSpec(spec.BaseSpec):
     self.background_cpu_threads = None
     self.background_network_mbits_per_sec = None
     self.background_network_ip_type = None
+    self.background_loads = None
     self.disable_interrupt_moderation = None
     self.disable_rss = None
     self.vm_metadata: Dict[str, Any] = None
@@ -226,6 +229,8 @@ class BaseVmSpec(spec.BaseSpec):
     if flag_values['background_network_ip_type'].present:
       config_values['background_network_ip_type'] = (
           flag_values.background_network_ip_type)
+    if flag_values['background_loads'].present:
+      config_values['background_loads'] = flag_values.background_loads
     if flag_values['dedicated_hosts'].present:
       config_values['use_dedicated_host'] = flag_values.dedicated_hosts
     if flag_values['num_vms_per_host'].present:
@@ -291,6 +296,9 @@ class BaseVmSpec(spec.BaseSpec):
                              vm_util.IpAddressSubset.INTERNAL]}),
         'background_cpu_threads': (option_decoders.IntDecoder, {
             'none_ok': True, 'default': None}),
+        'background_loads': (option_decoders.ListDecoder, {
+            'item_decoder': option_decoders.StringDecoder(),
+            'default': []}),
         'vm_metadata': (option_decoders.ListDecoder, {
             'item_decoder': option_decoders.StringDecoder(),
             'default': []})})
@@ -860,6 +868,14 @@ class BaseOsMixin(six.with_metaclass(abc.ABCMeta, object)):
           raise NotImplementedError()
         workload.Stop(self)
 
+  def GetBackgroundWorkloadSamples(self, start_time, end_time):
+    """Returns samples of the background workload in a time window."""
+    samples = []
+    for workload in background_workload.BACKGROUND_WORKLOADS:
+      if workload.IsEnabled(self):
+        samples.extend(workload.GetSamples(self, start_time, end_time))
+    return samples
+
   def PrepareBackgroundWorkload(self):
     """Prepare for the background workload."""
     for workload in background_workload.BACKGROUND_WORKLOADS:
@@ -1019,6 +1035,8 @@ class BaseVirtualMachine(BaseOsMixin, resource.BaseResource):
       usage while running the benchmark.
     background_network_ip_type: Type of IP address to use for generating
       background network workload
+    background_loads: List of rate-controlled background loads to generate
+      while running the benchmark.
     vm_group: The VM group this VM is associated with, if applicable.
   """
 
@@ -1065,6 +1083,7 @@ class BaseVirtualMachine(BaseOsMixin, resource.BaseResource):
     self.background_network_mbits_per_sec = (
         vm_spec.background_network_mbits_per_sec)
     self.background_network_ip_type = vm_spec.background_network_ip_type
+    self.background_loads = vm_spec.background_loads
     self.use_dedicated_host = None
     self.num_vms_per_host = None
 
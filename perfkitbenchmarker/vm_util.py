@@ -80,6 +80,18 @@ flags.DEFINE_integer('background_network_mbits_per_sec', None,
                      'Number of megabits per second of background '
                      'network traffic to generate during the run phase '
                      'of the benchmark')
+flags.DEFINE_list('background_loads', [],
+                  'Rate-controlled background loads to generate during the '
+                  'run phase of the benchmark, as TYPE:RATE[:SCHEDULE]. TYPE '
+                  'is cpu (RATE in cores), memory (MB/s copied), disk (MB/s '
+                  'written) or network (Mbits/sec sent to the next VM). '
+                  'SCHEDULE is constant (default), onoff or ramp. The rate '
+                  'achieved by each load during the run is reported as a '
+                  'sample.')
+flags.DEFINE_float('background_load_period', 60,
+                   'Seconds of each on/off cycle of onoff background loads, '
+                   'and of the ramp of ramp background loads.',
+                   lower_bound=1)
 flags.DEFINE_boolean('simulate_maintenance', False,
                      'Whether to simulate VM maintenance during the benchmark. '
                      'This requires both benchmark and provider support.')
@@ -116,6 +128,12 @@ flags.DEFINE_integer('ssh_server_alive_count_max', 10,
                      'Value for ssh -o ServerAliveCountMax. Use with '
                      '--ssh_server_alive_interval to configure how long to '
                      'wait for unresponsive servers.')
+_LOG_COMMAND_OUTPUT_MAX_LENGTH = flags.DEFINE_integer(
+    'log_command_output_max_length', None,
+    'Maximum number of characters of the stdout and of the stderr of each '
+    'command to log. The middle of longer outputs is left out of the log, but '
+    'not out of the output returned to the caller. Defaults to logging the '
+    'whole output.', lower_bound=0)
 
 
 class IpAddressSubset(object):
@@ -301,6 +319,18 @@ def _ReadIssueCommandOutput(tf_out, tf_err):
   return stdout, stderr
 
 
+def _TruncateForLog(output: str) -> str:
+  """Returns the output shortened to --log_command_output_max_length."""
+  max_length = _LOG_COMMAND_OUTPUT_MAX_LENGTH.value
+  if max_length is None or len(output) <= max_length:
+    return output
+  head_length = max_length // 2
+  tail_length = max_length - head_length
+  return '%s\n[... %d characters not logged ...]\n%s' % (
+      output[:head_length], len(output) - max_length,
+      output[len(output) - tail_length:])
+
+
 def IssueCommand(
     cmd: Iterable[str],
     force_info_log: bool = False,
@@ -414,7 +444,8 @@ def IssueCommand(
       timing_output = tf_timing.read().rstrip('\n')
 
   debug_text = ('Ran: {%s}\nReturnCode:%s%s\nSTDOUT: %s\nSTDERR: %s' %
-                (full_cmd, process.returncode, timing_output, stdout, stderr))
+                (full_cmd, process.returncode, timing_output,
+                 _TruncateForLog(stdout), _TruncateForLog(stderr)))
   if force_info_log or (process.returncode and not suppress_warning):
     logging.info(debug_text)
   else:
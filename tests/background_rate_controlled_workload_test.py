@@ -0,0 +1,143 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the rate-controlled background workload."""
+
+import json
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import background_workload
+from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
+from perfkitbenchmarker.scripts import background_load
+from perfkitbenchmarker.traces import clock_offset
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+_STATUS = '\n'.join(
+    json.dumps({'time': t, 'done': 2 * t, 'target': 3 * t})
+    for t in range(10)) + '\n'
+
+
+class RateControlledWorkloadTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(RateControlledWorkloadTest, self).setUp()
+    self.vms = [
+        mock.Mock(internal_ip='10.0.0.%d' % i, scratch_disks=[],
+                  background_loads=[]) for i in range(2)
+    ]
+    for vm in self.vms:
+      vm.name = 'vm%d' % self.vms.index(vm)
+      vm.RemoteCommand.return_value = ('123\n', '')
+    self.enter_context(mock.patch.object(
+        context, 'GetThreadBenchmarkSpec',
+        return_value=mock.Mock(vms=self.vms)))
+    self.workload = background_workload.RateControlledWorkload
+
+  def testParseLoad(self):
+    self.assertEqual(background_workload.ParseLoad('cpu:1.5'),
+                     ('cpu', 1.5, 'constant'))
+    self.assertEqual(background_workload.ParseLoad('disk:100:onoff'),
+                     ('disk', 100, 'onoff'))
+    for load in ('cpu', 'gpu:1', 'cpu:x', 'cpu:-1', 'cpu:1:sometimes'):
+      with self.assertRaises(errors.Config.InvalidValue):
+        background_workload.ParseLoad(load)
+
+  def testGetAchievedRates(self):
+    self.assertEqual(background_workload.GetAchievedRates(_STATUS, 2.5, 7),
+                     (2, 3))
+    self.assertIsNone(background_workload.GetAchievedRates(_STATUS, 3.5, 4))
+
+  def testStart(self):
+    vm, peer = self.vms
+    vm.background_loads = ['cpu:1.5:ramp', 'network:100']
+    self.workload.Start(vm)
+
+    self.assertEqual(vm.background_load_pids, ['123', '123'])
+    cpu_cmd = vm.RemoteCommand.call_args_list[0][0][0]
+    self.assertIn('--load=cpu --rate=1.5 --schedule=ramp --period=60.0 '
+                  '--workers=2 ', cpu_cmd)
+    network_cmd = vm.RemoteCommand.call_args_list[1][0][0]
+    self.assertIn('--load=network --rate=100.0', network_cmd)
+    self.assertIn('--host=10.0.0.1 --port=20002', network_cmd)
+    peer.AllowPort.assert_called_once_with(20002)
+    self.assertIn('--load=sink', peer.RemoteCommand.call_args[0][0])
+
+  def testStartWorkers(self):
+    vm = self.vms[0]
+    vm.background_loads = ['cpu:1.5', 'memory:9000', 'disk:100000',
+                           'network:100']
+    self.workload.Start(vm)
+
+    workers = [call[0][0].split('--workers=')[1].split()[0]
+               for call in vm.RemoteCommand.call_args_list]
+    self.assertEqual(workers, ['2', '3', '1', '1'])
+
+  def testGetSamples(self):
+    vm = self.vms[0]
+    vm.background_loads = ['memory:3']
+    vm.RemoteCommandWithReturnCode.return_value = (_STATUS, '', 0)
+
+    samples = self.workload.GetSamples(vm, 0, 9)
+
+    self.assertEqual(len(samples), 1)
+    self.assertEqual(samples[0].metric, 'background_memory_achieved_rate')
+    self.assertEqual(samples[0].value, 2)
+    self.assertEqual(samples[0].unit, 'MB/s')
+    self.assertEqual(samples[0].metadata['background_load_scheduled_rate'], 3)
+    self.assertEqual(samples[0].metadata['background_vm'], 'vm0')
+
+  def testGetSamplesSkipsUnreadableStatus(self):
+    vm = self.vms[0]
+    vm.background_loads = ['memory:3', 'cpu:1']
+    vm.RemoteCommandWithReturnCode.side_effect = [
+        ('', 'No such file or directory', 1), (_STATUS, '', 0)]
+
+    samples = self.workload.GetSamples(vm, 0, 9)
+
+    self.assertEqual([s.metric for s in samples],
+                     ['background_cpu_achieved_rate'])
+    for call in vm.RemoteCommandWithReturnCode.call_args_list:
+      self.assertTrue(call[1]['ignore_failure'])
+
+  def testGetSamplesConvertsToRunnerTime(self):
+    vm = self.vms[0]
+    vm.background_loads = ['memory:3']
+    vm.RemoteCommandWithReturnCode.return_value = (_STATUS, '', 0)
+    # The VM clock is 5 seconds ahead, so its status covers 0 to 4 on the
+    # clock of PKB.
+    self.enter_context(mock.patch.object(
+        clock_offset, 'GetOffset', return_value=5))
+
+    self.assertEqual(len(self.workload.GetSamples(vm, 0, 4)), 1)
+    self.assertEqual(self.workload.GetSamples(vm, 5, 9), [])
+
+  def testGetAchievedRatesConvertsTimes(self):
+    self.assertEqual(
+        background_workload.GetAchievedRates(_STATUS, 0, 1, lambda t: t - 8),
+        (2, 3))
+
+  def testScheduleRates(self):
+    self.assertEqual(background_load.Rate('constant', 10, 20, 15), 10)
+    self.assertEqual(background_load.Rate('onoff', 10, 20, 5), 10)
+    self.assertEqual(background_load.Rate('onoff', 10, 20, 15), 0)
+    self.assertEqual(background_load.Rate('ramp', 10, 20, 5), 2.5)
+    self.assertEqual(background_load.Rate('ramp', 10, 20, 50), 10)
+
+
+if __name__ == '__main__':
+  unittest.main()
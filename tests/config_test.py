@@ -80,6 +80,13 @@ class ConfigsTestCase(unittest.TestCase):
     self.assertIsInstance(
         configs.LoadMinimalConfig(VALID_CONFIG, CONFIG_NAME), dict)
 
+  def testLoadMinimalConfigReturnsCopies(self):
+    config = configs.LoadMinimalConfig(CONFIG_A, CONFIG_NAME)
+    config['flags']['flag1'] = 'modified'
+    self.assertEqual(
+        configs.LoadMinimalConfig(CONFIG_A, CONFIG_NAME)['flags']['flag1'],
+        'old_value')
+
   def testWrongName(self):
     with self.assertRaises(KeyError):
       configs.LoadMinimalConfig(VALID_CONFIG, INVALID_NAME)
@@ -504,5 +504,52 @@ class BenchmarkConfigSpecTestCase(pkb_common_test_case.PkbCommonTestCase):
                           virtual_machine.BaseVmSpec)
 
 
+class CreateBenchmarkConfigSpecTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(CreateBenchmarkConfigSpecTestCase, self).setUp()
+    self.enter_context(
+        mock.patch.dict(benchmark_config_spec._config_spec_cache, clear=True))
+    self._spec_class = benchmark_config_spec.BenchmarkConfigSpec
+    self._kwargs = {'vm_groups': {'default': {'cloud': providers.GCP,
+                                              'os_type': os_types.UBUNTU1804,
+                                              'vm_spec': _GCP_AWS_VM_CONFIG}}}
+    self._init = mock.patch.object(
+        self._spec_class, '__init__', autospec=True,
+        side_effect=self._spec_class.__init__).start()
+    self.addCleanup(mock.patch.stopall)
+
+  def _CreateSpec(self, **kwargs):
+    return benchmark_config_spec.CreateBenchmarkConfigSpec(
+        self._spec_class, _COMPONENT, FLAGS, **kwargs)
+
+  def testReusesSpecForUnreadFlags(self):
+    first = self._CreateSpec(flags={'num_vms': 1}, **self._kwargs)
+    second = self._CreateSpec(flags={'num_vms': 2}, **self._kwargs)
+    self.assertEqual(self._init.call_count, 1)
+    self.assertIsNot(first, second)
+    self.assertIsNot(first.vm_groups['default'], second.vm_groups['default'])
+    self.assertEqual(second.flags, {'num_vms': 2})
+    self.assertEqual(second.vm_groups['default'].cloud, 'GCP')
+
+  def testDecodesAgainForReadFlags(self):
+    self._CreateSpec(flags={'cloud': providers.GCP}, **self._kwargs)
+    result = self._CreateSpec(flags={'cloud': providers.AWS}, **self._kwargs)
+    self.assertEqual(self._init.call_count, 2)
+    self.assertIsInstance(result.vm_groups['default'].vm_spec,
+                          virtual_machine.BaseVmSpec)
+
+  def testDecodesAgainForDifferentConfig(self):
+    self._CreateSpec(**self._kwargs)
+    result = self._CreateSpec(description='Different.', **self._kwargs)
+    self.assertEqual(self._init.call_count, 2)
+    self.assertEqual(result.description, 'Different.')
+
+  def testCachedSpecIsNotModified(self):
+    self._CreateSpec(**self._kwargs).vm_groups['default'].vm_count = 5
+    result = self._CreateSpec(**self._kwargs)
+    self.assertEqual(self._init.call_count, 1)
+    self.assertEqual(result.vm_groups['default'].vm_count, 1)
+
 if __name__ == '__main__':
   unittest.main()
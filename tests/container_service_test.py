@@ -0,0 +1,156 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the container registry in perfkitbenchmarker.container_service."""
+
+import json
+import os
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import container_service
+from perfkitbenchmarker import data
+from perfkitbenchmarker import vm_util
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+_MANIFEST = {
+    'SchemaV2Manifest': {
+        'config': {'size': 100},
+        'layers': [{'size': 1000}, {'size': 2000}],
+    }
+}
+
+
+class FakeRegistry(container_service.BaseContainerRegistry):
+  """A registry with images in "registry.example.com/pkb"."""
+
+  CLOUD = 'Fake'
+
+  def GetFullRegistryTag(self, image):
+    return 'registry.example.com/pkb/' + image
+
+  def Login(self):
+    pass
+
+
+class FakeDocker(object):
+  """Answers docker commands, with a registry containing existing_tags."""
+
+  def __init__(self, existing_tags=()):
+    self.existing_tags = set(existing_tags)
+    self.commands = []
+
+  def IssueCommand(self, cmd, **kwargs):
+    del kwargs
+    self.commands.append(cmd)
+    if cmd[:3] == ['docker', 'manifest', 'inspect']:
+      if cmd[-1] not in self.existing_tags:
+        return '', 'no such manifest', 1
+      return json.dumps(_MANIFEST), '', 0
+    if cmd[:3] == ['docker', 'buildx', 'build']:
+      self.existing_tags.add(cmd[cmd.index('-t') + 1])
+    return '', '', 0
+
+  def GetCommands(self, prefix):
+    return [cmd for cmd in self.commands if cmd[:len(prefix)] == prefix]
+
+
+class ContainerRegistryTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(ContainerRegistryTest, self).setUp()
+    FLAGS.run_uri = '123'
+    FLAGS.local_container_build = True
+    self.docker_dir = self.create_tempdir()
+    for image in ('image_a', 'image_b'):
+      self.docker_dir.create_file(
+          os.path.join(image, 'Dockerfile'), 'FROM ubuntu\nCOPY run.sh /\n')
+      self.docker_dir.create_file(os.path.join(image, 'run.sh'), image)
+    self.enter_context(mock.patch.object(
+        data, 'ResourcePath',
+        side_effect=lambda path: os.path.join(self.docker_dir.full_path,
+                                              os.path.relpath(path, 'docker'))))
+    self.registry = FakeRegistry(mock.Mock(zone=None, project=None, name=None))
+
+  def _Tag(self, image):
+    # pylint: disable=protected-access
+    return container_service._ContainerImage(image).tag
+
+  def testTagChangesWithBuildContext(self):
+    tag = self._Tag('image_a')
+    self.assertEqual(tag, self._Tag('image_a'))
+    self.assertNotEqual(tag, self._Tag('image_b'))
+    with open(os.path.join(self.docker_dir.full_path, 'image_a', 'run.sh'),
+              'a') as f:
+      f.write('\n')
+    self.assertNotEqual(tag, self._Tag('image_a'))
+
+  def testTagIsLatestWithoutCache(self):
+    FLAGS.container_build_cache = False
+    self.assertEqual(self._Tag('image_a'), 'latest')
+
+  def testGetOrBuildAll(self):
+    existing_tag = 'registry.example.com/pkb/image_a:' + self._Tag('image_a')
+    docker = FakeDocker([existing_tag])
+    self.enter_context(mock.patch.object(vm_util, 'IssueCommand',
+                                         side_effect=docker.IssueCommand))
+
+    images = self.registry.GetOrBuildAll(['image_a', 'image_b', 'image_a'])
+
+    new_tag = 'registry.example.com/pkb/image_b:' + self._Tag('image_b')
+    self.assertEqual(images, {'image_a': existing_tag, 'image_b': new_tag})
+    self.assertEqual(docker.GetCommands(['docker', 'buildx', 'build']), [[
+        'docker', 'buildx', 'build', '--builder', 'pkb-image-b-123',
+        '--platform', 'linux/amd64', '--cache-to',
+        'type=registry,mode=max,'
+        'ref=registry.example.com/pkb/image_b:buildcache',
+        '--cache-from',
+        'type=registry,ref=registry.example.com/pkb/image_b:buildcache',
+        '--push', '-t', new_tag,
+        os.path.join(self.docker_dir.full_path, 'image_b')
+    ]])
+    self.assertEqual(docker.GetCommands(['docker', 'buildx', 'rm']),
+                     [['docker', 'buildx', 'rm', 'pkb-image-b-123']])
+
+    samples = {(s.metric, s.metadata['image']): s
+               for s in self.registry.GetSamples()}
+    self.assertEqual(samples['Image Cache Hit', 'image_a'].value, 1)
+    self.assertNotIn(('Image Build Time', 'image_a'), samples)
+    self.assertEqual(
+        samples['Image Build Time', 'image_b'].metadata['build_type'], 'local')
+    self.assertEqual(samples['Image Push Size', 'image_b'].value, 3100)
+    self.assertEqual(samples['Image Build Context Size', 'image_b'].value,
+                     len('FROM ubuntu\nCOPY run.sh /\n') + len('image_b'))
+
+  def testForceBuildSkipsCacheImport(self):
+    FLAGS.force_container_build = True
+    docker = FakeDocker()
+    self.enter_context(mock.patch.object(vm_util, 'IssueCommand',
+                                         side_effect=docker.IssueCommand))
+
+    self.registry.GetOrBuild('image_a')
+
+    self.assertEqual(docker.GetCommands(['docker', 'manifest', 'inspect']),
+                     [['docker', 'manifest', 'inspect', '-v',
+                       'registry.example.com/pkb/image_a:' +
+                       self._Tag('image_a')]])
+    build_cmd, = docker.GetCommands(['docker', 'buildx', 'build'])
+    self.assertIn('--cache-to', build_cmd)
+    self.assertNotIn('--cache-from', build_cmd)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,105 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.dpb_service."""
+
+import json
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import dpb_service
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+_SPARK_EVENT_LOG = '\n'.join(json.dumps(event) for event in [
+    {'Event': 'SparkListenerLogStart', 'Spark Version': '3.1.2'},
+    {'Event': 'SparkListenerApplicationStart', 'Timestamp': 1000},
+    {'Event': 'SparkListenerJobStart', 'Job ID': 0, 'Submission Time': 3000},
+    {'Event': 'SparkListenerStageCompleted',
+     'Stage Info': {'Stage ID': 0, 'Submission Time': 3100,
+                    'Completion Time': 4600}},
+    {'Event': 'SparkListenerJobEnd', 'Job ID': 0, 'Completion Time': 4700},
+    {'Event': 'SparkListenerJobStart', 'Job ID': 1, 'Submission Time': 4800},
+    {'Event': 'SparkListenerStageCompleted',
+     'Stage Info': {'Stage ID': 1, 'Submission Time': 4800,
+                    'Completion Time': 5000}},
+    {'Event': 'SparkListenerJobEnd', 'Job ID': 1, 'Completion Time': 5500},
+    {'Event': 'SparkListenerApplicationEnd', 'Timestamp': 6000},
+]) + '\n'
+
+
+class FakeDpbService(dpb_service.BaseDpbService):
+
+  CLOUD = 'Fake'
+  SERVICE_TYPE = 'fake'
+
+  def SubmitJob(self, *args, **kwargs):
+    pass
+
+  def _Create(self):
+    pass
+
+  def _Delete(self):
+    pass
+
+
+class DpbServiceTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(DpbServiceTest, self).setUp()
+    FLAGS.run_uri = '123'
+    self.service = FakeDpbService(
+        mock.Mock(static_dpb_service_instance=None, version='1'))
+
+  @mock.patch('time.time', return_value=0)
+  @mock.patch('time.sleep')
+  def testWaitForJobBacksOff(self, mock_sleep, _):
+    result = dpb_service.JobResult(run_time=1)
+    self.service._GetCompletedJob = mock.Mock(
+        side_effect=[None] * 5 + [result])
+
+    self.assertEqual(self.service._WaitForJob('job', 100, 3), result)
+
+    self.assertEqual([c[0][0] for c in mock_sleep.call_args_list],
+                     [1, 1.5, 2.25, 3, 3])
+
+  @mock.patch('time.time', side_effect=[0, 0, 10])
+  @mock.patch('time.sleep')
+  def testWaitForJobTimesOut(self, *_):
+    self.service._GetCompletedJob = mock.Mock(return_value=None)
+    with self.assertRaises(dpb_service.JobNotCompletedError):
+      self.service._WaitForJob('job', 10, 5)
+
+  def testParseSparkEventLog(self):
+    self.assertEqual(
+        dpb_service.ParseSparkEventLog(_SPARK_EVENT_LOG),
+        dpb_service.JobResult(
+            run_time=2.5, pending_time=2, stage_times={0: 1.5, 1: 0.2}))
+
+  def testParseSparkEventLogWithoutJobs(self):
+    self.assertIsNone(dpb_service.ParseSparkEventLog(
+        '{"Event": "SparkListenerApplicationStart", "Timestamp": 1000}\n'))
+
+  def testParseYarnApplications(self):
+    apps = [
+        {'startedTime': 1000, 'launchTime': 1500, 'finishedTime': 4000},
+        {'startedTime': 4100, 'launchTime': 4200, 'finishedTime': 9500},
+    ]
+    self.assertEqual(dpb_service.ParseYarnApplications(apps),
+                     dpb_service.JobResult(run_time=8, pending_time=0.5))
+
+
+if __name__ == '__main__':
+  unittest.main()
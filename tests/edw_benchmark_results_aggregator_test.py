@@ -557,6 +557,138 @@ class EdwBenchmarkPerformanceTest(pkb_common_test_case.PkbCommonTestCase):
     with self.assertRaises(agg.EdwPerformanceAggregationError):
       agg.geometric_mean(performance_iterable)
 
+  def test_geometric_mean_many_values(self):
+    self.assertAlmostEqual(agg.geometric_mean([1000.0] * 1000), 1000.0)
+
+  def test_throughput_aggregation(self):
+    b_p = agg.EdwBenchmarkPerformance(
+        total_iterations=2, expected_queries=[Q1_NAME, Q2_NAME])
+    b_p.add_iteration_performance(
+        _ThroughputIteration('1', [{Q1_NAME: 1.0, Q2_NAME: 2.0},
+                                   {Q1_NAME: 3.0, Q2_NAME: 4.0}]))
+    b_p.add_iteration_performance(
+        _ThroughputIteration('2', [{Q1_NAME: 5.0, Q2_NAME: 6.0},
+                                   {Q2_NAME: 8.0, Q1_NAME: 7.0}]))
+    self.assertTrue(b_p.is_successful())
+    self.assertEqual(b_p.aggregated_query_execution_time(Q1_NAME),
+                     ((1.0 + 3.0) / 2 + (5.0 + 7.0) / 2) / 2)
+    self.assertEqual(b_p.aggregated_query_execution_time(Q2_NAME),
+                     ((2.0 + 4.0) / 2 + (6.0 + 8.0) / 2) / 2)
+    self.assertAlmostEqual(
+        b_p.get_aggregated_geomean_performance_sample({}).value,
+        agg.geometric_mean([4.0, 5.0]))
+
+  def test_throughput_aggregation_failed_stream(self):
+    b_p = agg.EdwBenchmarkPerformance(
+        total_iterations=2, expected_queries=[Q1_NAME, Q2_NAME])
+    b_p.add_iteration_performance(
+        _ThroughputIteration('1', [{Q1_NAME: 1.0, Q2_NAME: 2.0}]))
+    b_p.add_iteration_performance(
+        _ThroughputIteration('2', [{Q1_NAME: 1.0, Q2_NAME: 2.0},
+                                   {Q1_NAME: 1.0, Q2_NAME: QFAIL_PERFORMANCE}]))
+    self.assertTrue(b_p.aggregated_query_status(Q1_NAME))
+    self.assertFalse(b_p.aggregated_query_status(Q2_NAME))
+    sample_q2 = b_p.get_aggregated_query_performance_sample(Q2_NAME, {})
+    self.assertEqual(sample_q2.value, -1.0)
+    self.assertEqual(sample_q2.metadata['execution_status'],
+                     agg.EdwQueryExecutionStatus.FAILED)
+
+
+def _ThroughputIteration(iteration_id, streams):
+  """Returns a throughput iteration of streams of query name to performance."""
+  return agg.EdwThroughputIterationPerformance(
+      iteration_id, 0, 1000, 1.0, {
+          str(stream_id): {
+              query: agg.EdwQueryPerformance(query, performance, {})
+              for query, performance in stream.items()
+          } for stream_id, stream in enumerate(streams)
+      })
+
+
+class EdwThroughputIterationPerformanceTest(
+    pkb_common_test_case.PkbCommonTestCase):
+
+  def test_query_performance(self):
+    i_p = _ThroughputIteration('1', [{Q1_NAME: 1.0, Q2_NAME: 2.0},
+                                     {Q1_NAME: 3.0}])
+    self.assertTrue(i_p.has_query_performance(Q2_NAME))
+    self.assertFalse(i_p.has_query_performance(QFAIL_NAME))
+    self.assertEqual(i_p.get_query_performance(Q1_NAME), 2.0)
+    self.assertEqual(i_p.get_query_performance(QFAIL_NAME), -1.0)
+
+  def test_is_query_successful(self):
+    i_p = _ThroughputIteration('1', [{Q1_NAME: 1.0, Q2_NAME: 2.0},
+                                     {Q1_NAME: 3.0, Q2_NAME: -1.0}])
+    self.assertTrue(i_p.is_query_successful(Q1_NAME))
+    self.assertFalse(i_p.is_query_successful(Q2_NAME))
+
+
+class EdwQueryResultsTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def test_add_iteration(self):
+    i_p = agg.EdwThroughputIterationPerformance.from_json(
+        '1', """{"throughput_start":1601666911596,
+        "throughput_end":1601666916139,
+        "throughput_wall_time_in_secs":4.543,
+        "all_streams_performance_array":[
+          {"stream_start":1601666911597,"stream_end":1601666916139,
+            "stream_wall_time_in_secs":4.542,
+            "stream_performance_array":[
+              {"query_wall_time_in_secs":2.238,"query_end":1601666913849,
+                "query":"1","query_start":1601666911611,
+                "details":{"job_id":"a"}},
+              {"query_wall_time_in_secs":-1,"query_end":1601666916139,
+                "query":"2","query_start":1601666913854,
+                "details":{"job_id":"b"}}]},
+          {"stream_start":1601666911597,"stream_end":1601666916018,
+            "stream_wall_time_in_secs":4.421,
+            "stream_performance_array":[
+              {"query_wall_time_in_secs":2.552,"query_end":1601666914163,
+                "query":"2","query_start":1601666911611,
+                "details":{"job_id":"c"}}]}]}""")
+    results = agg.EdwQueryResults()
+    results.add_iteration(i_p)
+    self.assertEqual(len(results), 3)
+    self.assertEqual(results.queries, ['1', '2'])
+    self.assertEqual(results.iterations, ['1'])
+    self.assertEqual(results.streams, ['0', '1'])
+    self.assertEqual(results.get_query_index('2'), 1)
+    self.assertEqual(results.get_query_index('3'), -1)
+    self.assertEqual(results.get_column('query').tolist(), [0, 1, 1])
+    self.assertEqual(results.get_column('stream').tolist(), [0, 0, 1])
+    self.assertEqual(results.get_column('start').tolist(),
+                     [1601666911611, 1601666913854, 1601666911611])
+    self.assertEqual(results.get_column('end').tolist(),
+                     [1601666913849, 1601666916139, 1601666914163])
+    self.assertEqual(results.get_column('performance').tolist(),
+                     [2.238, -1.0, 2.552])
+    self.assertEqual(results.get_column('successful').tolist(),
+                     [True, False, True])
+    self.assertEqual(
+        [results.metadata[i] for i in results.get_column('metadata_id')],
+        [{'job_id': 'a'}, {'job_id': 'b'}, {'job_id': 'c'}])
+    self.assertEqual(results.get_query_statuses().tolist(), [True, False])
+
+  def test_power_iteration_has_no_stream(self):
+    i_p = agg.EdwPowerIterationPerformance('1', 1)
+    i_p.add_query_performance(Q1_NAME, Q1_PERFORMANCE, METADATA_EMPTY)
+    results = agg.EdwQueryResults()
+    results.add_iteration(i_p)
+    self.assertEqual(results.get_column('stream').tolist(), [-1])
+    self.assertEqual(results.streams, [])
+
+  def test_get_query_statuses_missing_execution(self):
+    results = agg.EdwQueryResults()
+    i1_p = agg.EdwPowerIterationPerformance('1', 2)
+    i1_p.add_query_performance(Q1_NAME, Q1_PERFORMANCE, METADATA_EMPTY)
+    i1_p.add_query_performance(Q2_NAME, Q2_PERFORMANCE, METADATA_EMPTY)
+    i2_p = agg.EdwPowerIterationPerformance('2', 2)
+    i2_p.add_query_performance(Q1_NAME, Q1_PERFORMANCE, METADATA_EMPTY)
+    results.add_iteration(i1_p)
+    results.add_iteration(i2_p)
+    self.assertEqual(results.get_query_statuses().tolist(), [True, False])
+    self.assertEqual(results.get_query_execution_times(2).tolist(), [1.0, 1.0])
+
 
 if __name__ == '__main__':
   unittest.main()
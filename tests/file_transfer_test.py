@@ -0,0 +1,172 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.file_transfer."""
+
+import io
+import os
+import tarfile
+import unittest
+
+from absl import flags
+from absl.testing import parameterized
+import mock
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import file_transfer
+from perfkitbenchmarker import vm_util
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+def _CreateArchive(files, symlinks=None):
+  """Returns a gzipped tar archive of files, a dict of name to contents.
+
+  Args:
+    files: dict of file name to contents.
+    symlinks: dict of symlink name to target.
+  """
+  archive_bytes = io.BytesIO()
+  with tarfile.open(fileobj=archive_bytes, mode='w:gz') as archive:
+    for name, target in (symlinks or {}).items():
+      info = tarfile.TarInfo(name)
+      info.type = tarfile.SYMTYPE
+      info.linkname = target
+      archive.addfile(info)
+    for name, contents in files.items():
+      info = tarfile.TarInfo(name)
+      info.size = len(contents)
+      archive.addfile(info, io.BytesIO(contents))
+  return archive_bytes.getvalue()
+
+
+class FakeVm(object):
+  """A VM whose streamed commands send a fixed archive in interrupted chunks.
+
+  Attributes:
+    stream_commands: list of the streamed commands that were run.
+  """
+
+  def __init__(self, archive, chunk_sizes):
+    self.name = 'vm0'
+    self.archive = archive
+    self.chunk_sizes = list(chunk_sizes)
+    self.stream_commands = []
+
+  def InstallPackages(self, packages):
+    pass
+
+  def RemoteCommand(self, command):
+    if command.startswith('set -o pipefail'):
+      return '1000\n%d\n' % len(self.archive), ''
+    return '', ''
+
+  def _NextChunk(self, data):
+    """Returns the next chunk of data and whether the stream is cut short."""
+    chunk_size = self.chunk_sizes.pop(0) if self.chunk_sizes else len(data)
+    return data[:chunk_size], chunk_size < len(data)
+
+  def RemoteHostStreamCommand(self, command, stdout_path):
+    self.stream_commands.append(command)
+    offset = int(command.split()[2]) - 1
+    chunk, interrupted = self._NextChunk(self.archive[offset:])
+    with open(stdout_path, 'ab') as f:
+      f.write(chunk)
+    if interrupted:
+      raise errors.VirtualMachine.RemoteCommandError('Connection reset.')
+
+
+class FileTransferTestCase(pkb_common_test_case.PkbCommonTestCase,
+                           parameterized.TestCase):
+
+  def setUp(self):
+    super(FileTransferTestCase, self).setUp()
+    self.temp_dir = self.create_tempdir().full_path
+    self.enter_context(mock.patch.object(vm_util, 'GetTempDir',
+                                         return_value=self.temp_dir))
+    self.files = {'fio_lat.1.log': b'1, 2, 3\n' * 100,
+                  'fio_bw.1.log': b'4, 5, 6\n' * 100}
+
+  def testPullFilesResumes(self):
+    vm = FakeVm(_CreateArchive(self.files), chunk_sizes=[10, 20])
+    local_dir = self.create_tempdir().full_path
+
+    samples = file_transfer.PullFiles(vm, local_dir, ['fio*.log'])
+
+    self.assertEqual(vm.stream_commands,
+                     ['tail -c +1 /tmp/pkb/' + self._ArchiveName(),
+                      'tail -c +11 /tmp/pkb/' + self._ArchiveName(),
+                      'tail -c +31 /tmp/pkb/' + self._ArchiveName()])
+    for name, contents in self.files.items():
+      with open(os.path.join(local_dir, name), 'rb') as f:
+        self.assertEqual(f.read(), contents)
+    self.assertEqual([s.metric for s in samples],
+                     ['file_transfer_time', 'file_transfer_bytes'])
+    self.assertEqual(samples[1].value, len(vm.archive))
+    self.assertEqual(samples[1].metadata['file_transfer_attempts'], 3)
+    self.assertEqual(
+        samples[1].metadata['file_transfer_uncompressed_bytes'], 1000)
+    self.assertEqual(os.listdir(self.temp_dir), [])
+
+  def testPullFilesGivesUp(self):
+    FLAGS.file_transfer_retries = 1
+    vm = FakeVm(_CreateArchive(self.files), chunk_sizes=[1, 1, 1])
+
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      file_transfer.PullFiles(vm, self.create_tempdir().full_path,
+                              ['fio*.log'])
+    self.assertEqual(os.listdir(self.temp_dir), [])
+
+  @parameterized.parameters(
+      ({'../escaped.log': b'x'}, {}),
+      ({'link/escaped.log': b'x'}, {'link': '..'}),
+      ({}, {'passwd': '/etc/passwd'}),
+  )
+  def testPullFilesRejectsEscapingMembers(self, files, symlinks):
+    parent_dir = self.create_tempdir().full_path
+    local_dir = os.path.join(parent_dir, 'logs')
+    os.mkdir(local_dir)
+    for data_filter in (True, False):
+      if not data_filter and hasattr(tarfile, 'data_filter'):
+        self._RemoveDataFilter()
+      vm = FakeVm(_CreateArchive(files, symlinks), chunk_sizes=[])
+
+      with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+        file_transfer.PullFiles(vm, local_dir, ['fio*.log'])
+      self.assertEqual(os.listdir(parent_dir), ['logs'])
+      self.assertEqual(os.listdir(self.temp_dir), [])
+
+  def testPullFilesWithoutDataFilterKeepsLinksInside(self):
+    if hasattr(tarfile, 'data_filter'):
+      self._RemoveDataFilter()
+    vm = FakeVm(_CreateArchive(self.files, {'latest.log': 'fio_lat.1.log'}),
+                chunk_sizes=[])
+    local_dir = self.create_tempdir().full_path
+
+    file_transfer.PullFiles(vm, local_dir, ['fio*.log'])
+
+    with open(os.path.join(local_dir, 'latest.log'), 'rb') as f:
+      self.assertEqual(f.read(), self.files['fio_lat.1.log'])
+
+  def _RemoveDataFilter(self):
+    data_filter = tarfile.data_filter
+    del tarfile.data_filter
+    self.addCleanup(setattr, tarfile, 'data_filter', data_filter)
+
+  def _ArchiveName(self):
+    # pylint: disable=protected-access
+    return file_transfer._GetArchiveName(FakeVm(b'', []), ['fio*.log'])
+
+
+if __name__ == '__main__':
+  unittest.main()
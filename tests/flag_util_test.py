@@ -295,6 +295,49 @@ class OverrideFlagsTestCase(unittest.TestCase):
       self.assertEqual(flag_values_overrides['test_flag'], 1)
 
 
+class RecordFlagReadsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.flag_values = flags.FlagValues()
+    flags.DEFINE_integer('read_flag', 0, 'Test flag.',
+                         flag_values=self.flag_values)
+    flags.DEFINE_integer('checked_flag', 0, 'Test flag.',
+                         flag_values=self.flag_values)
+    flags.DEFINE_integer('unread_flag', 0, 'Test flag.',
+                         flag_values=self.flag_values)
+    self.flag_values([sys.argv[0]])
+
+  def testRecordsAttributeAndItemReads(self):
+    with flag_util.RecordFlagReads(self.flag_values) as recorder:
+      self.assertEqual(self.flag_values.read_flag, 0)
+      self.assertFalse(self.flag_values['checked_flag'].present)
+    self.assertEqual(recorder.flag_names, {'read_flag', 'checked_flag'})
+
+  def testIgnoresOverrideFlagsReads(self):
+    with flag_util.RecordFlagReads(self.flag_values) as recorder:
+      with flag_util.OverrideFlags(self.flag_values, {'unread_flag': 1}):
+        self.assertEqual(self.flag_values.read_flag, 0)
+    self.assertEqual(recorder.flag_names, {'read_flag'})
+
+  def testStopsRecordingOnExit(self):
+    with flag_util.RecordFlagReads(self.flag_values) as recorder:
+      pass
+    self.assertEqual(self.flag_values.read_flag, 0)
+    self.assertEqual(recorder.flag_names, set())
+
+  def testFingerprint(self):
+    fingerprint = flag_util.GetFlagsFingerprint(self.flag_values,
+                                                ['read_flag'])
+    with flag_util.OverrideFlags(self.flag_values, {'unread_flag': 1}):
+      self.assertEqual(
+          flag_util.GetFlagsFingerprint(self.flag_values, ['read_flag']),
+          fingerprint)
+    with flag_util.OverrideFlags(self.flag_values, {'read_flag': 1}):
+      self.assertNotEqual(
+          flag_util.GetFlagsFingerprint(self.flag_values, ['read_flag']),
+          fingerprint)
+
+
 class TestUnitsParser(unittest.TestCase):
 
   def setUp(self):
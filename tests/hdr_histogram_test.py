@@ -0,0 +1,90 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.hdr_histogram."""
+
+import base64
+import struct
+import unittest
+import zlib
+
+from perfkitbenchmarker import hdr_histogram
+
+
+def _Varint(value):
+  value = (value << 1) ^ (value >> 63)
+  encoded = bytearray()
+  while value > 0x7f:
+    encoded.append(value & 0x7f | 0x80)
+    value >>= 7
+  encoded.append(value)
+  return bytes(encoded)
+
+
+def _Encode(counts):
+  """Encodes counts by index as HdrHistogram does with 3 digits from 1."""
+  payload = b''
+  index = 0
+  for count_index, count in sorted(counts.items()):
+    if count_index > index:
+      payload += _Varint(index - count_index)
+    payload += _Varint(count)
+    index = count_index + 1
+  data = struct.pack('>iiiiqqd', 0x1c849313, len(payload), 0, 3, 1,
+                     3600000000000, 1.0) + payload
+  compressed = zlib.compress(data)
+  return base64.b64encode(
+      struct.pack('>ii', 0x1c849314, len(compressed)) + compressed).decode()
+
+
+class HdrHistogramTest(unittest.TestCase):
+
+  def testDecodeHistogram(self):
+    # Indexes below 2048 have unit resolution, the next 1024 a resolution of
+    # 2 and so on.
+    histogram = hdr_histogram.DecodeHistogram(
+        _Encode({5: 1, 2047: 2, 2049: 3, 3072: 4, 5000: 5}))
+    self.assertEqual(histogram,
+                     {5: 1, 2047: 2, 2051: 3, 4099: 4, 15431: 5})
+
+  def testDecodeUnsupportedHistogram(self):
+    with self.assertRaises(ValueError):
+      hdr_histogram.DecodeHistogram(
+          base64.b64encode(struct.pack('>ii', 0x1c849301, 0)).decode())
+
+  def testParseIntervalLog(self):
+    log = '\n'.join([
+        '#[Logged with cassandra-stress]',
+        '#[StartTime: 1650000000.500 (seconds since epoch), Fri Apr 15]',
+        '"StartTimestamp","Interval_Length","Interval_Max",'
+        '"Interval_Compressed_Histogram"',
+        'Tag=WRITE-st,0.100,1.000,0.010,' + _Encode({10: 2}),
+        '1.100,1.000,0.010,' + _Encode({20: 3}),
+    ])
+    intervals = hdr_histogram.ParseIntervalLog(log)
+    self.assertEqual(intervals, [
+        hdr_histogram.Interval('WRITE-st', 1650000000.6, 1.0, {10: 2}),
+        hdr_histogram.Interval(None, 1650000001.6, 1.0, {20: 3}),
+    ])
+
+  def testPercentilesAndMean(self):
+    histogram = hdr_histogram.MergeHistograms([{1: 2, 3: 1}, {2: 6, 10: 1}])
+    self.assertEqual(list(histogram.items()), [(1, 2), (2, 6), (3, 1), (10, 1)])
+    self.assertEqual(
+        hdr_histogram.GetPercentiles(histogram, [0, 20, 50, 80, 90, 100]),
+        [1, 1, 2, 2, 3, 10])
+    self.assertEqual(hdr_histogram.GetMean(histogram), 2.7)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,318 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.kubernetes_informer."""
+
+import json
+import queue
+import threading
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import container_service
+from perfkitbenchmarker import kubernetes_informer
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+def _Pod(name, phase='Pending', conditions=(), running=None):
+  pod = {
+      'metadata': {'name': name},
+      'status': {
+          'phase': phase,
+          'conditions': [{'type': condition, 'status': 'True'}
+                         for condition in conditions],
+      },
+  }
+  if running is not None:
+    pod['status']['containerStatuses'] = [
+        {'state': {'running': {}} if running else {'waiting': {}}}]
+  return pod
+
+
+def _PulledEvent(pod_name):
+  return {
+      'metadata': {'name': pod_name + '.16f'},
+      'involvedObject': {'kind': 'Pod', 'name': pod_name},
+      'reason': 'Pulled',
+  }
+
+
+class FakeWatchProcess(object):
+  """A kubectl watch whose output is written by the test."""
+
+  def __init__(self):
+    self._lines = queue.Queue()
+    self.returncode = None
+
+  @property
+  def stdout(self):
+    return iter(self._lines.get, None)
+
+  def Send(self, event_type, obj):
+    """Writes an event, pretty printed like kubectl does."""
+    text = json.dumps({'type': event_type, 'object': obj}, indent=4)
+    for line in text.splitlines(True):
+      self._lines.put(line)
+    self._lines.put('\n')
+
+  def poll(self):
+    return self.returncode
+
+  def kill(self):
+    self.returncode = -9
+    self._lines.put(None)
+
+  def wait(self):
+    return self.returncode
+
+
+class FakeInformer(kubernetes_informer.Informer):
+  """An Informer watching FakeWatchProcesses instead of a cluster."""
+
+  def __init__(self, kinds):
+    super(FakeInformer, self).__init__(kinds)
+    self.watches = {kind: FakeWatchProcess() for kind in kinds}
+
+  def _OpenWatch(self, kind, stderr):
+    return self.watches[kind]
+
+
+class FailingInformer(kubernetes_informer.Informer):
+  """An Informer whose watches exit with an error right away."""
+
+  def __init__(self, kinds):
+    super(FailingInformer, self).__init__(kinds)
+    self.num_watches = 0
+
+  def _OpenWatch(self, kind, stderr):
+    self.num_watches += 1
+    stderr.write('error: unknown flag: --output-watch-events\n')
+    process = FakeWatchProcess()
+    process.kill()
+    process.returncode = 1
+    return process
+
+
+class DecodeJsonStreamTest(unittest.TestCase):
+
+  def testPrettyPrintedAndSingleLine(self):
+    lines = ['{\n', '    "a": {\n', '        "b": 1\n', '    }\n', '}\n',
+             '{"c": 2}\n', '{\n', '    "d": "}"\n', '}\n']
+    self.assertEqual(list(kubernetes_informer.DecodeJsonStream(lines)),
+                     [{'a': {'b': 1}}, {'c': 2}, {'d': '}'}])
+
+
+class InformerTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(InformerTest, self).setUp()
+    self.informer = FakeInformer([kubernetes_informer.PODS])
+    self.informer.Start()
+    self.addCleanup(self.informer.Stop)
+    self.pods = self.informer.watches[kubernetes_informer.PODS]
+
+  def testWaitFor(self):
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(
+        self.informer.WaitFor(kubernetes_informer.PODS, 'pod0',
+                              lambda pod: pod['status']['phase'] == 'Running',
+                              timeout=10)))
+    waiter.start()
+    self.pods.Send('ADDED', _Pod('pod0'))
+    self.pods.Send('MODIFIED', _Pod('pod0', phase='Running'))
+    waiter.join()
+    self.assertEqual(result[0]['status']['phase'], 'Running')
+
+  def testWaitForTimeout(self):
+    self.pods.Send('ADDED', _Pod('pod0'))
+    with self.assertRaises(kubernetes_informer.WaitTimeoutError):
+      self.informer.WaitFor(kubernetes_informer.PODS, 'pod0',
+                            lambda pod: False, timeout=0.1)
+
+  def testWaitForPropagatesPredicateErrors(self):
+    self.pods.Send('ADDED', _Pod('pod0', phase='Failed'))
+
+    def _Predicate(pod):
+      if pod['status']['phase'] == 'Failed':
+        raise ValueError('Failed')
+      return False
+
+    with self.assertRaises(ValueError):
+      self.informer.WaitFor(kubernetes_informer.PODS, 'pod0', _Predicate,
+                            timeout=10)
+
+  def testDeleted(self):
+    self.pods.Send('ADDED', _Pod('pod0'))
+    self.informer.WaitFor(kubernetes_informer.PODS, 'pod0', lambda pod: True,
+                          timeout=10)
+    self.pods.Send('DELETED', _Pod('pod0'))
+    self.pods.Send('ADDED', _Pod('pod1'))
+    self.informer.WaitFor(kubernetes_informer.PODS, 'pod1', lambda pod: True,
+                          timeout=10)
+    self.assertIsNone(self.informer.Get(kubernetes_informer.PODS, 'pod0'))
+    self.assertEqual(
+        [pod['metadata']['name']
+         for pod in self.informer.List(kubernetes_informer.PODS)], ['pod1'])
+
+
+class WatchFailureTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def testGivesUpAfterRepeatedFailures(self):
+    self.enter_context(
+        mock.patch.object(kubernetes_informer, '_RESTART_DELAY', 0))
+    informer = FailingInformer([kubernetes_informer.PODS])
+    with self.assertLogs(level='WARNING') as logs:
+      informer.Start()
+      self.addCleanup(informer.Stop)
+      with self.assertRaisesRegex(kubernetes_informer.WatchError,
+                                  'unknown flag'):
+        informer.WaitFor(kubernetes_informer.PODS, 'pod0', lambda pod: True,
+                         timeout=10)
+    self.assertEqual(informer.num_watches,
+                     kubernetes_informer._MAX_WATCH_FAILURES)
+    self.assertIn('unknown flag', logs.output[0])
+
+
+class PodTimingsTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def testGetPodLatencySamples(self):
+    informer = kubernetes_informer.Informer(
+        [kubernetes_informer.PODS, kubernetes_informer.EVENTS])
+    events = [
+        (100.0, kubernetes_informer.PODS, _Pod('pod0')),
+        (100.5, kubernetes_informer.PODS,
+         _Pod('pod0', conditions=['PodScheduled'], running=False)),
+        (102.0, kubernetes_informer.EVENTS, _PulledEvent('pod0')),
+        (102.25, kubernetes_informer.PODS,
+         _Pod('pod0', 'Running', ['PodScheduled'], running=True)),
+        (103.0, kubernetes_informer.PODS,
+         _Pod('pod0', 'Running', ['PodScheduled', 'Ready'], running=True)),
+        (104.0, kubernetes_informer.PODS, _Pod('pod1')),
+    ]
+    for timestamp, kind, obj in events:
+      with mock.patch('time.time', return_value=timestamp):
+        informer._HandleEvent(kind, {'type': 'MODIFIED', 'object': obj})
+
+    self.assertEqual(
+        informer.GetPodTimings(),
+        {'pod0': kubernetes_informer.PodTimings(100.0, 100.5, 102.0, 102.25,
+                                                103.0),
+         'pod1': kubernetes_informer.PodTimings(104.0, None, None, None,
+                                                None)})
+    samples = informer.GetPodLatencySamples(metadata={'a': 1})
+    self.assertEqual(
+        [(s.metric, s.value) for s in samples],
+        [('pod_scheduling_latency', 0.5), ('pod_image_pull_latency', 1.5),
+         ('pod_container_start_latency', 0.25), ('pod_ready_latency', 0.75),
+         ('pod_startup_latency', 3.0)])
+    self.assertEqual(samples[0].metadata, {'a': 1, 'pod_name': 'pod0'})
+
+  def testUsesClusterTimestamps(self):
+    pod = _Pod('pod0', 'Running', ['PodScheduled', 'Ready'], running=True)
+    pod['metadata']['creationTimestamp'] = '2022-01-01T00:00:00Z'
+    pod['status']['conditions'][0]['lastTransitionTime'] = (
+        '2022-01-01T00:00:01Z')
+    pod['status']['conditions'][1]['lastTransitionTime'] = (
+        '2022-01-01T00:00:05Z')
+    pod['status']['containerStatuses'][0]['state']['running']['startedAt'] = (
+        '2022-01-01T00:00:04Z')
+    pulled = _PulledEvent('pod0')
+    pulled['lastTimestamp'] = '2022-01-01T00:00:03Z'
+    informer = kubernetes_informer.Informer(
+        [kubernetes_informer.PODS, kubernetes_informer.EVENTS])
+    # The Pulled event is received after the pod is already running.
+    for timestamp, kind, obj in ((2000000000.0, kubernetes_informer.PODS, pod),
+                                 (2000000001.0, kubernetes_informer.EVENTS,
+                                  pulled)):
+      with mock.patch('time.time', return_value=timestamp):
+        informer._HandleEvent(kind, {'type': 'ADDED', 'object': obj})
+
+    start = 1640995200.0
+    self.assertEqual(
+        informer.GetPodTimings(),
+        {'pod0': kubernetes_informer.PodTimings(
+            start, start + 1, start + 3, start + 4, start + 5)})
+
+  def testOutOfOrderTimestampsAreClamped(self):
+    pod = _Pod('pod0', 'Running', ['PodScheduled'], running=True)
+    pod['metadata']['creationTimestamp'] = '2022-01-01T00:00:02Z'
+    pod['status']['conditions'][0]['lastTransitionTime'] = (
+        '2022-01-01T00:00:01Z')
+    informer = kubernetes_informer.Informer([kubernetes_informer.PODS])
+    with mock.patch('time.time', return_value=1640995205.0):
+      informer._HandleEvent(kubernetes_informer.PODS,
+                            {'type': 'ADDED', 'object': pod})
+
+    with self.assertLogs(level='WARNING'):
+      timings = informer.GetPodTimings()['pod0']
+    self.assertEqual(timings.scheduled, timings.created)
+    self.assertEqual(timings.started, 1640995205.0)
+
+  def testReusedPodNameStartsOver(self):
+    informer = kubernetes_informer.Informer(
+        [kubernetes_informer.PODS, kubernetes_informer.EVENTS])
+    old_pod = _Pod('pod0', conditions=['PodScheduled'])
+    old_pod['metadata']['uid'] = 'old'
+    new_pod = _Pod('pod0')
+    new_pod['metadata']['uid'] = 'new'
+    old_pulled = _PulledEvent('pod0')
+    old_pulled['involvedObject']['uid'] = 'old'
+    for timestamp, kind, obj in ((100.0, kubernetes_informer.PODS, old_pod),
+                                 (104.0, kubernetes_informer.PODS, new_pod),
+                                 (105.0, kubernetes_informer.EVENTS,
+                                  old_pulled)):
+      with mock.patch('time.time', return_value=timestamp):
+        informer._HandleEvent(kind, {'type': 'MODIFIED', 'object': obj})
+
+    self.assertEqual(
+        informer.GetPodTimings(),
+        {'pod0': kubernetes_informer.PodTimings(104.0, None, None, None,
+                                                None)})
+
+  def testDeletedPodTimingsAreDropped(self):
+    informer = kubernetes_informer.Informer([kubernetes_informer.PODS])
+    for timestamp, event_type in ((100.0, 'ADDED'), (101.0, 'DELETED')):
+      with mock.patch('time.time', return_value=timestamp):
+        informer._HandleEvent(kubernetes_informer.PODS,
+                              {'type': event_type, 'object': _Pod('pod0')})
+    self.assertEqual(informer.GetPodTimings(), {})
+
+
+class KubernetesPodTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(KubernetesPodTest, self).setUp()
+    FLAGS.k8s_watch = True
+    self.informer = FakeInformer([kubernetes_informer.PODS])
+    self.informer.Start()
+    self.addCleanup(self.informer.Stop)
+    self.enter_context(mock.patch.object(
+        kubernetes_informer, 'GetInformer', return_value=self.informer))
+    self.pods = self.informer.watches[kubernetes_informer.PODS]
+
+  def testWaitForExit(self):
+    self.pods.Send('ADDED', _Pod('pod0', phase='Succeeded'))
+    pod = container_service.KubernetesPod('pod0').WaitForExit(timeout=10)
+    self.assertEqual(pod['status']['phase'], 'Succeeded')
+
+  def testWaitForExitFailed(self):
+    self.pods.Send('ADDED', _Pod('pod0', phase='Failed'))
+    with self.assertRaises(container_service.FatalContainerException):
+      container_service.KubernetesPod('pod0').WaitForExit(timeout=10)
+
+
+if __name__ == '__main__':
+  unittest.main()
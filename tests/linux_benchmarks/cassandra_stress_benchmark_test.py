@@ -0,0 +1,63 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for cassandra_stress_benchmark."""
+
+import unittest
+
+from perfkitbenchmarker.hdr_histogram import Interval
+from perfkitbenchmarker.linux_benchmarks import cassandra_stress_benchmark
+from tests import pkb_common_test_case
+
+_MS = 1000000
+
+
+class CassandraStressBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(CassandraStressBenchmarkTest, self).setUp()
+    # The second loader starts half a second later and is much slower.
+    self.loader_intervals = [
+        [Interval('WRITE-st', 100.0 + i, 1.0, {1 * _MS: 90, 2 * _MS: 10})
+         for i in range(4)],
+        [Interval('WRITE-st', 100.5 + i, 1.0, {10 * _MS: 10})
+         for i in range(4)],
+    ]
+
+  def testGetHdrLatencies(self):
+    latencies = cassandra_stress_benchmark.GetHdrLatencies(
+        self.loader_intervals)
+    # Averaging the medians of the loaders would give 5.5ms.
+    self.assertEqual(latencies['latency median'], 1)
+    self.assertEqual(latencies['latency 95th percentile'], 10)
+    self.assertEqual(latencies['latency max'], 10)
+    self.assertAlmostEqual(latencies['latency mean'], 840 / 440)
+
+  def testGetHdrThroughput(self):
+    samples = cassandra_stress_benchmark.GetHdrThroughput(
+        self.loader_intervals, {})
+    rates = [(s.timestamp, s.value) for s in samples
+             if s.metric == 'aggregate op rate']
+    self.assertEqual(rates, [(101, 110), (102, 110), (103, 110)])
+    self.assertEqual(samples[-2].metric, 'aggregate common window op rate')
+    self.assertEqual(samples[-2].value, 110)
+    self.assertEqual(samples[-1].value, 3)
+
+  def testGetHdrThroughputWithoutOverlap(self):
+    self.loader_intervals[1] = [Interval('WRITE-st', 200, 1, {1: 1})]
+    self.assertEqual(cassandra_stress_benchmark.GetHdrThroughput(
+        self.loader_intervals, {}), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,97 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for copy_throughput_benchmark."""
+
+import unittest
+
+import mock
+from perfkitbenchmarker import errors
+from perfkitbenchmarker.linux_benchmarks import copy_throughput_benchmark
+from tests import pkb_common_test_case
+
+_MB = 1024 * 1024
+
+
+def _Vm(name, cpu_times):
+  vm = mock.Mock(user_name='perfkit')
+  vm.name = name
+  vm.GetScratchDir.return_value = '/scratch0'
+  outputs = iter(['cpu %d 0 0 %d 0 0 0\n' % times for times in cpu_times])
+  vm.RemoteCommand.side_effect = (
+      lambda cmd, **_: (next(outputs), '') if 'proc/stat' in cmd else
+      (vm.copy_output, ''))
+  vm.copy_output = ''
+  return vm
+
+
+class CopyThroughputBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def testAssignFilesToStreams(self):
+    files = [('a', 5), ('b', 4), ('c', 3), ('d', 3)]
+    self.assertEqual(
+        copy_throughput_benchmark.AssignFilesToStreams(files, 2),
+        [[('a', 5), ('d', 3)], [('b', 4), ('c', 3)]])
+    self.assertEqual(
+        copy_throughput_benchmark.AssignFilesToStreams(files[:1], 2),
+        [[('a', 5)], [('a', 5)]])
+
+  def testMakeScpCommand(self):
+    self.assertEqual(
+        copy_throughput_benchmark.MakeStreamCommand(
+            'scp', 'aes128-ctr', 'ssh', '/src', ['a', 'b'], 'u@h:/dst'),
+        'scp -o StrictHostKeyChecking=no -i ~/.ssh/id_rsa -c aes128-ctr '
+        '-o Compression=yes /src/a /src/b u@h:/dst/')
+
+  def testMakeTarCommand(self):
+    self.assertEqual(
+        copy_throughput_benchmark.MakeStreamCommand(
+            'tar', 'aes128-ctr', 'gzip', '/src', ['a', 'b'], 'u@h:/dst'),
+        'tar -C /src -cf - a b | gzip -1 | ssh -o StrictHostKeyChecking=no '
+        '-i ~/.ssh/id_rsa -c aes128-ctr u@h "gzip -d | tar -C /dst -xf -"')
+
+  def testParseStreamTimesMissingStream(self):
+    with self.assertRaises(errors.Benchmarks.RunError):
+      copy_throughput_benchmark.ParseStreamTimes('stream 0 1.0 2.0\n', 2)
+
+  def testRunMatrixCombination(self):
+    # Busy and idle jiffies before and after the copy.
+    sending_vm = _Vm('sender', [(100, 100), (150, 150)])
+    receiving_vm = _Vm('receiver', [(0, 100), (50, 250)])
+    sending_vm.copy_output = 'stream 1 10.5 12.5\nstream 0 10.0 14.0\n'
+    files = [('a', 40 * _MB), ('b', 20 * _MB), ('c', 20 * _MB)]
+
+    samples = copy_throughput_benchmark.RunMatrixCombination(
+        sending_vm, receiving_vm, '10.0.0.2', files, 'rsync', 'aes128-ctr',
+        'none', 2, {'ip_type': 'internal'})
+
+    copy_cmd = [c[0][0] for c in sending_vm.RemoteCommand.call_args_list
+                if 'rsync' in c[0][0]][0]
+    self.assertIn('rsync -a --whole-file', copy_cmd)
+    self.assertIn('perfkit@10.0.0.2:/scratch0/matrix/stream-1/', copy_cmd)
+    self.assertTrue(copy_cmd.endswith('& wait'))
+    values = [(s.metric, s.value) for s in samples]
+    self.assertEqual(values, [
+        ('matrix aggregate throughput', 20.0),
+        ('matrix stream throughput', 10.0),
+        ('matrix stream throughput', 20.0),
+        ('matrix sending cpu utilization', 50.0),
+        ('matrix receiving cpu utilization', 25.0),
+    ])
+    self.assertEqual(samples[0].metadata['tool'], 'rsync')
+    self.assertEqual(samples[0].metadata['streams'], 2)
+    self.assertEqual(samples[1].metadata['stream_mb'], 40)
+
+
+if __name__ == '__main__':
+  unittest.main()
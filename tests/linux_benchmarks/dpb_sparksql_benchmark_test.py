@@ -0,0 +1,93 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for dpb_sparksql_benchmark."""
+
+import json
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import dpb_service
+from perfkitbenchmarker.linux_benchmarks import dpb_sparksql_benchmark
+from perfkitbenchmarker.linux_packages import spark
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+# Candidate configurations, identified by their shuffle partitions, and the
+# run time of each query with them.
+_CANDIDATES = [{}] + [{'spark.sql.shuffle.partitions': str(i)}
+                      for i in range(1, 8)]
+_QUERY_TIMES = {None: 10, '1': 12, '2': 11, '3': 9, '4': 3, '5': 20, '6': 8,
+                '7': 5}
+
+
+def _FakeRunQueries(benchmark_spec, runner_args, queries, properties=None):
+  del benchmark_spec, runner_args
+  partitions = (properties or {}).get('spark.sql.shuffle.partitions')
+  if partitions == '6':
+    raise dpb_service.JobSubmissionError()
+  return (dpb_service.JobResult(run_time=1),
+          {query: _QUERY_TIMES[partitions] for query in queries})
+
+
+class DpbSparksqlBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(DpbSparksqlBenchmarkTest, self).setUp()
+    FLAGS.dpb_sparksql_order = ['1', '2', '3', '4']
+    FLAGS.dpb_sparksql_tune = True
+    self.run_queries = self.enter_context(mock.patch.object(
+        dpb_sparksql_benchmark, '_RunQueries', side_effect=_FakeRunQueries))
+    self.enter_context(mock.patch.object(
+        spark, 'GetTuningCandidates', return_value=_CANDIDATES))
+    self.benchmark_spec = mock.Mock()
+
+  def testTuneSparkConfiguration(self):
+    properties, samples = dpb_sparksql_benchmark._TuneSparkConfiguration(
+        self.benchmark_spec, [], {})
+
+    self.assertEqual(properties, {'spark.sql.shuffle.partitions': '4'})
+    # 8 candidates on 1 query, 4 on 2 queries, 2 on all 4 and the default
+    # configuration, which was eliminated in the second round.
+    self.assertEqual(
+        [(len(c[0][2]), c[0][3]) for c in self.run_queries.call_args_list],
+        [(1, c) for c in _CANDIDATES] +
+        [(2, _CANDIDATES[i]) for i in (4, 7, 3, 0)] +
+        [(4, _CANDIDATES[i]) for i in (4, 7)] + [(4, {})])
+    values = {s.metric: s.value for s in samples}
+    self.assertEqual(values['sparksql_tuning_speedup'], 10 / 3)
+    self.assertEqual(samples[-1].metadata['spark_properties'],
+                     json.dumps(properties))
+
+  def testRunWithTunedConfiguration(self):
+    self.benchmark_spec.dpb_service.GetMetadata.return_value = {}
+    self.benchmark_spec.dpb_service.GetClusterCreateTime.return_value = None
+    self.enter_context(mock.patch.object(
+        dpb_sparksql_benchmark, '_GetRunnerArgs', return_value=[]))
+
+    samples = dpb_sparksql_benchmark.Run(self.benchmark_spec)
+
+    self.assertEqual(self.run_queries.call_args[0][2], ['1', '2', '3', '4'])
+    self.assertEqual(self.run_queries.call_args[0][3],
+                     {'spark.sql.shuffle.partitions': '4'})
+    run_times = [s for s in samples if s.metric == 'sparksql_run_time']
+    self.assertLen(run_times, 4)
+    self.assertEqual(run_times[0].value, 3)
+    self.assertEqual(run_times[0].metadata['spark_tuned_properties'],
+                     '{"spark.sql.shuffle.partitions": "4"}')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,6 +14,7 @@
 
 """Tests for fio_benchmark."""
 
+import os
 import unittest
 from absl import flags
 import mock
@@ -258,5 +259,64 @@ blocksize = 8k
                           expect_format_disk=False)
 
 
+
+class TestAddGlobalParameters(pkb_common_test_case.PkbCommonTestCase):
+
+  def testExistingGlobalSection(self):
+    job_file = '\n[global]\nioengine=libaio\n\n[job1]\nrw=read\n'
+    self.assertEqual(
+        fio_benchmark.AddGlobalParameters(
+            job_file, ['directory=/scratch', 'random_generator=lfsr']),
+        '\n[global]\ndirectory=/scratch\nrandom_generator=lfsr\n'
+        'ioengine=libaio\n\n[job1]\nrw=read\n')
+
+  def testNoGlobalSection(self):
+    self.assertEqual(
+        fio_benchmark.AddGlobalParameters('[job1]\nrw=read\n',
+                                          ['filename=/dev/sdb']),
+        '[global]\nfilename=/dev/sdb\n[job1]\nrw=read\n')
+
+  def testRunClientServer(self):
+    data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'fio',
+                             'fio-client-server-result.json')
+    with open(data_path) as f:
+      fio_output = 'connecting to 10.0.0.2\n' + f.read()
+    vms = [mock.MagicMock(internal_ip='10.0.0.2'),
+           mock.MagicMock(internal_ip='10.0.0.3')]
+    vms[0].name = 'vm0'
+    vms[1].name = 'vm1'
+    vms[0].RobustRemoteCommand.return_value = (fio_output, '')
+    fio_name = fio_benchmark.__name__
+    with mock.patch(fio_name + '.GetOrGenerateJobFileString',
+                    return_value='[global]\n[sequential_write]\n'), \
+        mock.patch(builtins.__name__ + '.open'), \
+        mock.patch(vm_util.__name__ + '.PrependTempDir',
+                   return_value='/tmp/prepend_dir'):
+      samples = fio_benchmark.RunClientServer(vms, None)
+
+    command = vms[0].RobustRemoteCommand.call_args[0][0]
+    self.assertIn('--client=10.0.0.2,8765', command)
+    self.assertIn('--client=10.0.0.3,8765', command)
+    self.assertEqual(vms[0].PushFile.call_count, 2)
+    vms[1].RobustRemoteCommand.assert_not_called()
+    machine_instances = {s.metadata.get('machine_instance') for s in samples
+                         if 'fio_client_hostname' in s.metadata}
+    self.assertEqual(machine_instances, {0, 1})
+
+  def testCleanupClientServerRemovesJobFiles(self):
+    FLAGS.fio_client_server = True
+    FLAGS.fio_target_mode = fio_benchmark.AGAINST_DEVICE_WITHOUT_FILL_MODE
+    vms = [mock.MagicMock(), mock.MagicMock()]
+    vms[0].name = 'vm0'
+    vms[1].name = 'vm1'
+    with mock.patch.object(fio_benchmark.fio, 'StopServer'):
+      fio_benchmark.Cleanup(mock.Mock(vms=vms))
+
+    removed = [c[0][0] for c in vms[0].RemoveFile.call_args_list]
+    self.assertIn('/tmp/pkb/vm0_fio.job', removed)
+    self.assertIn('/tmp/pkb/vm1_fio.job', removed)
+    self.assertIn(fio_benchmark.REMOTE_JOB_FILE_PATH, removed)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,84 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for kubernetes_pod_startup_benchmark."""
+
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import kubernetes_informer
+from perfkitbenchmarker.linux_benchmarks import kubernetes_pod_startup_benchmark
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+class KubernetesPodStartupBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(KubernetesPodStartupBenchmarkTest, self).setUp()
+    FLAGS.pod_startup_num_pods = 4
+    self.informer = mock.Mock(spec=kubernetes_informer.Informer)
+    self.enter_context(mock.patch.object(
+        kubernetes_informer, 'GetInformer', return_value=self.informer))
+    self.enter_context(mock.patch('time.sleep'))
+    self.benchmark_spec = mock.Mock()
+    self.benchmark_spec.container_specs = {
+        'pod_startup': mock.Mock(image='pause')}
+    self.benchmark_spec.container_cluster.num_nodes = 2
+
+  def _SetTimings(self, start):
+    self.informer.GetPodTimings.return_value = {
+        'pkb-pod-startup-%d' % i: kubernetes_informer.PodTimings(
+            created=start + i, scheduled=start + i + 1,
+            image_pulled=start + i + 2, started=start + i + 3,
+            ready=start + i + 4)
+        for i in range(4)}
+
+  def testRunBurst(self):
+    with mock.patch('time.time', return_value=100.0):
+      self._SetTimings(100.0)
+      samples = kubernetes_pod_startup_benchmark.Run(self.benchmark_spec)
+
+    self.benchmark_spec.container_cluster.ApplyManifest.assert_called_once_with(
+        'container/kubernetes_pod_startup/pods.yaml.j2',
+        pod_names=['pkb-pod-startup-%d' % i for i in range(4)], image='pause',
+        image_pull_policy='Always')
+    self.assertEqual(self.informer.WaitFor.call_count, 4)
+    values = {s.metric: s.value for s in samples}
+    self.assertEqual(values['pod_scheduling_latency_p50'], 1)
+    self.assertEqual(values['pod_startup_latency_p100'], 4)
+    self.assertEqual(values['pod_startup_latency_average'], 4)
+    self.assertEqual(values['all_pods_ready_time'], 7)
+    self.assertEqual(values['pod_startup_throughput'], 4 / 7)
+    self.assertEqual(samples[0].metadata['num_pods'], 4)
+    self.assertEqual(samples[0].metadata['pod_startup_mode'], 'burst')
+
+  def testRunRamp(self):
+    FLAGS.pod_startup_mode = 'ramp'
+    FLAGS.pod_startup_pods_per_second = 3
+    with mock.patch('time.time', return_value=100.0):
+      self._SetTimings(100.0)
+      samples = kubernetes_pod_startup_benchmark.Run(self.benchmark_spec)
+
+    apply_manifest = self.benchmark_spec.container_cluster.ApplyManifest
+    self.assertEqual(
+        [call[1]['pod_names'] for call in apply_manifest.call_args_list],
+        [['pkb-pod-startup-0', 'pkb-pod-startup-1', 'pkb-pod-startup-2'],
+         ['pkb-pod-startup-3']])
+    self.assertEqual(samples[0].metadata['pods_per_second'], 3)
+
+
+if __name__ == '__main__':
+  unittest.main()
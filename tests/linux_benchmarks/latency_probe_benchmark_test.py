@@ -0,0 +1,88 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for latency_probe_benchmark."""
+
+import json
+import unittest
+
+import mock
+from perfkitbenchmarker.linux_benchmarks import latency_probe_benchmark
+from tests import pkb_common_test_case
+
+_OUTPUT = json.dumps({
+    '10.0.0.2': {
+        'sent': 100,
+        'received': 99,
+        'rtt': {'min': 0.1, 'p50': 0.2, 'p90': 0.3, 'p99': 0.5, 'p99.9': 0.9,
+                'max': 0.9, 'mean': 0.22, 'stddev': 0.05},
+        'histogram': [[0.1, 10], [0.2, 80], [0.9, 9]],
+        'jitter': [[0, 0.02], [10, 0.04]],
+        'start_time': 1000.0,
+    },
+    '10.0.0.3': {'sent': 100, 'received': 0, 'start_time': 1000.0},
+})
+
+
+def _Vm(i):
+  vm = mock.Mock(internal_ip=f'10.0.0.{i}', zone=f'zone-{i}')
+  vm.name = f'vm{i}'
+  return vm
+
+
+class LatencyProbeBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def testGetAllPairs(self):
+    vms = [_Vm(i) for i in range(3)]
+    pairs = latency_probe_benchmark.GetPairs(vms)
+    self.assertEqual(list(pairs), vms)
+    self.assertEqual(pairs[vms[0]], [vms[1], vms[2]])
+    self.assertEqual(pairs[vms[2]], [vms[0], vms[1]])
+
+  def testGetSampledPairs(self):
+    vms = [_Vm(i) for i in range(10)]
+    pairs = latency_probe_benchmark.GetPairs(vms, max_pairs=20)
+    self.assertEqual(sum(len(receivers) for receivers in pairs.values()), 20)
+    for sender, receivers in pairs.items():
+      self.assertNotIn(sender, receivers)
+    self.assertEqual(pairs,
+                     latency_probe_benchmark.GetPairs(vms, max_pairs=20))
+
+  def testParseResults(self):
+    vms = [_Vm(i) for i in range(1, 4)]
+    samples = latency_probe_benchmark.ParseResults(
+        _OUTPUT, vms[0], {vm.internal_ip: vm for vm in vms[1:]},
+        {'protocol': 'udp'})
+
+    by_metric = {}
+    for s in samples:
+      by_metric.setdefault(s.metric, []).append(s)
+    self.assertEqual([s.value for s in by_metric['Loss Rate']], [1.0, 100.0])
+    self.assertEqual(by_metric['p99 Latency'][0].value, 0.5)
+    self.assertEqual(by_metric['p99 Latency'][0].metadata['receiving_vm'],
+                     'vm2')
+    self.assertEqual(by_metric['p99 Latency'][0].metadata['sending_zone'],
+                     'zone-1')
+    self.assertEqual(by_metric['p99 Latency'][0].metadata['protocol'], 'udp')
+    self.assertEqual(
+        json.loads(by_metric['Latency Histogram'][0].metadata['histogram']),
+        {'0.1': 10, '0.2': 80, '0.9': 9})
+    self.assertEqual([(s.value, s.timestamp) for s in by_metric['Jitter']],
+                     [(0.02, 1000.0), (0.04, 1010.0)])
+    self.assertAlmostEqual(by_metric['Mean Jitter'][0].value, 0.03)
+    # The unreachable VM only has a loss rate.
+    self.assertEqual(len(by_metric['p50 Latency']), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -163,6 +163,48 @@ class NetperfBenchmarkTestCase(parameterized.TestCase, unittest.TestCase):
                                            False)
     self.assertIn('Failed to parse stdout', str(e.exception))
 
+  def testParseInterimResults(self):
+    stdout = ('Interim result: 1000.00 10^6bits/s over 1.000 seconds ending at '
+              '100.000\n'
+              'Interim result:  900.50 10^6bits/s over 0.500 seconds ending at '
+              '100.500\n'
+              'MIGRATED TCP STREAM TEST from 0.0.0.0 (0.0.0.0) port 0 '
+              'AF_INET\n')
+    self.assertEqual(netperf_benchmark.ParseInterimResults(stdout),
+                     [(99.0, 100.0, 1000.0), (100.0, 100.5, 900.5)])
+
+  def testCommonWindowSamples(self):
+    # The second stream starts half a second late and stops half a second
+    # early.
+    streams = [
+        [(100.0, 101.0, 10.0), (101.0, 102.0, 20.0), (102.0, 103.0, 30.0)],
+        [(100.5, 101.5, 40.0), (101.5, 102.5, 40.0)],
+    ]
+    samples = netperf_benchmark._CommonWindowSamples(
+        'TCP_STREAM', streams, 'Mbits/sec', {'ip_type': 'internal'})
+
+    values = [(s.metric, s.value) for s in samples]
+    self.assertEqual(values[:5], [
+        ('TCP_STREAM_Start_Skew', 0.5),
+        ('TCP_STREAM_Common_Window', 2.0),
+        ('TCP_STREAM_Throughput_total_common_window', 60.0),
+        ('TCP_STREAM_Throughput_min_common_window', 20.0),
+        ('TCP_STREAM_Throughput_max_common_window', 40.0),
+    ])
+    self.assertEqual(
+        [(s.metric, s.value, s.timestamp) for s in samples[5:]],
+        [('TCP_STREAM_Interim_Throughput_total', 55.0, 100.5),
+         ('TCP_STREAM_Interim_Throughput_total', 65.0, 101.5)])
+    self.assertEqual(samples[0].metadata['ip_type'], 'internal')
+
+  def testCommonWindowSamplesWithoutOverlap(self):
+    streams = [[(100.0, 101.0, 10.0)], [(102.0, 103.0, 10.0)]]
+    samples = netperf_benchmark._CommonWindowSamples(
+        'TCP_STREAM', streams, 'Mbits/sec', {})
+    self.assertEqual([(s.metric, s.value) for s in samples],
+                     [('TCP_STREAM_Start_Skew', 2.0),
+                      ('TCP_STREAM_Common_Window', 0)])
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -17,6 +17,7 @@ import os
 import unittest
 
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import steady_state
 from perfkitbenchmarker import test_util
 from perfkitbenchmarker.linux_benchmarks import sysbench_benchmark
 
@@ -49,6 +50,38 @@ class MySQLServiceBenchmarkTestCase(unittest.TestCase,
             18689.14, 18409.68, 19155.63]})]
     self.assertSampleListsEqualUpToTimestamp(results, expected_results)
 
+  def testParseSysbenchResultMixedOutput(self):
+    output = (
+        'Threads started!\n'
+        '[ 2s ] thds: 8 tps: 10.00 qps: 200.00 (r/w/o: 140.00/40.00/20.00) '
+        'lat (ms,99%): 5.00 err/s: 0.00 reconn/s: 0.00\n'
+        'FATAL: reconnect tps: 1.00 qps: 2.00 (r/w/o: 1/1/0) lat (ms): 9.00 \n'
+        '[ 4s ] thds: 8 tps: 0.00 qps: 0.00 (r/w/o: 0.00/0.00/0.00) '
+        'lat (ms,99%): 0.00 err/s: 1.00 reconn/s: 8.00\n'
+        '[ 6s ] thds: 8 tps: 12.00 qps: 240.00 (r/w/o: 168.00/48.00/24.00) '
+        'lat (ms,99%): 7.00 err/s: 0.00 reconn/s: 0.00\n'
+        'SQL statistics:\n'
+        '    transactions: 44 (7.33 per sec.)\n')
+    # pylint: disable=protected-access
+    tps, latency, qps = sysbench_benchmark._ParseSysbenchOutput(output)
+    self.assertEqual(tps, [10, 0, 12])
+    self.assertEqual(latency, [5, 0, 7])
+    self.assertEqual(qps, [200, 0, 240])
+
+  def testParseSysbenchResultSteadyState(self):
+    results = []
+    sysbench_benchmark.AddMetricsForSysbenchOutput(
+        self.contents, results, {},
+        steady_state_criterion=steady_state.Criterion(
+            'tps', steady_state.DEVIATION, 1, True),
+        report_interval=2, steady_state_duration=6)
+    steady_state_results = {r.metric: r.value for r in results[3:]}
+    self.assertEqual(steady_state_results['steady_state_attained'], 1)
+    # 1012.86, 1006.64 and 1022.3 are all within 1% of their mean.
+    self.assertEqual(steady_state_results['time_to_steady_state'], 6)
+    self.assertAlmostEqual(steady_state_results['steady_state_tps'],
+                           1013.9333, places=3)
+
 
 if __name__ == '__main__':
   unittest.main()
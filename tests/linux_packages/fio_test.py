@@ -972,6 +972,73 @@ class FioTestCase(unittest.TestCase, test_util.SamplesTestMixin):
       for result in results:
         self.assertDictContainsSubset(BASE_METADATA, result.metadata)
 
+  def testParseSteadyState(self):
+    job = self.result_contents['jobs'][0]
+    job['job_runtime'] = 95000
+    job['steadystate'] = {
+        'ss': 'iops_slope:0.300000%',
+        'duration': 60,
+        'attained': 1,
+        'criterion': '0.12%',
+        'data': {'iops_mean': 1500, 'bw_mean': 6000},
+    }
+    with mock.patch(fio.__name__ + '.ParseJobFile',
+                    return_value={job['jobname']: {}}):
+      results = fio.ParseResults('', {'jobs': [job]})
+
+    steady_state_results = {
+        r.metric: r for r in results if 'steady_state_criterion' in r.metadata}
+    prefix = job['jobname'] + ':'
+    self.assertEqual(steady_state_results[
+        prefix + 'steady_state_attained'].value, 1)
+    self.assertEqual(steady_state_results[
+        prefix + 'time_to_steady_state'].value, 95.0)
+    self.assertEqual(steady_state_results[
+        prefix + 'steady_state_window_start'].value, 35.0)
+    self.assertEqual(steady_state_results[
+        prefix + 'steady_state_iops'].value, 1500)
+    metadata = steady_state_results[prefix + 'steady_state_iops'].metadata
+    self.assertEqual(metadata['steady_state_criterion'], 'iops_slope:0.3%')
+    self.assertEqual(metadata['steady_state_measured'], '0.12%')
+
+  def testParseClientServerResults(self):
+    result_path = os.path.join(self.data_dir,
+                               'fio-client-server-result.json')
+    fio_json_result = json.loads(_ReadFileToString(result_path))
+    job_file = '[global]\n[sequential_write]\nrw=write\n'
+
+    results = fio.ParseClientServerResults(job_file, fio_json_result,
+                                           base_metadata=BASE_METADATA)
+
+    aggregates = {r.metric: r for r in results if 'fio_clients' in r.metadata}
+    per_host = [r for r in results if 'fio_client_hostname' in r.metadata]
+    self.assertEqual(
+        {r.metadata['fio_client_hostname'] for r in per_host},
+        {'10.0.0.2', '10.0.0.3'})
+    self.assertNotIn('All clients',
+                     {r.metadata['fio_job'] for r in results})
+    self.assertEqual(
+        aggregates['sequential_write:write:bandwidth'].value, 5000)
+    self.assertEqual(aggregates['sequential_write:write:iops'].value, 1200)
+    self.assertEqual(
+        aggregates['sequential_write:write:latency'].metadata['fio_clients'],
+        2)
+    expected_latencies = {'min': 0.9, 'max': 21.0, 'mean': 3.45, 'p50': 2.0,
+                          'p90': 4.0, 'p95': 10.0, 'p99': 20.0}
+    for stat, expected in expected_latencies.items():
+      self.assertAlmostEqual(
+          aggregates['sequential_write:write:latency:' + stat].value,
+          expected)
+    for result in results:
+      self.assertDictContainsSubset(BASE_METADATA, result.metadata)
+
+  def testGetClientCommand(self):
+    self.assertEqual(
+        fio.GetClientCommand([('10.0.0.2', '/tmp/a.job'),
+                              ('10.0.0.3', '/tmp/b.job')]),
+        'sudo {0} --output-format=json+ --client=10.0.0.2,8765 /tmp/a.job '
+        '--client=10.0.0.3,8765 /tmp/b.job'.format(fio.FIO_PATH))
+
   def testFioCommandToJob(self):
     fio_parameters = (
         '--filesize=10g --directory=/scratch0 --ioengine=libaio '
@@ -0,0 +1,63 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.linux_packages.spark."""
+
+import unittest
+
+from perfkitbenchmarker.linux_packages import spark
+
+
+class SparkTuningTest(unittest.TestCase):
+
+  def setUp(self):
+    super(SparkTuningTest, self).setUp()
+    self.conf = spark.GetConfiguration(
+        driver_memory_mb=1000,
+        worker_memory_mb=8000,
+        worker_cores=4,
+        num_workers=3)
+
+  def testCandidatesKeepWorkerResources(self):
+    candidates = spark.GetTuningCandidates(self.conf, 20)
+
+    self.assertEqual(len(candidates), 20)
+    self.assertEqual(candidates[0], {})
+    for candidate in candidates[1:]:
+      executors = int(candidate[spark.SPARK_WORKER_INSTANCES])
+      executors_per_worker = executors // 3
+      self.assertIn(executors_per_worker, spark.TUNING_EXECUTORS_PER_WORKER)
+      self.assertEqual(
+          int(candidate[spark.SPARK_WORKER_VCPUS]) * executors_per_worker, 4)
+      memory_mb = (int(candidate[spark.SPARK_WORKER_MEMORY].rstrip('m')) +
+                   int(candidate['spark.memory.offHeap.size'].rstrip('m')))
+      self.assertEqual(memory_mb, 8000 // executors_per_worker)
+      self.assertIn(int(candidate['spark.sql.shuffle.partitions']),
+                    (12, 24, 48))
+      self.assertNotIn(spark.SPARK_K8S_EXECUTOR_CORES, candidate)
+    self.assertEqual(len({str(sorted(c.items())) for c in candidates}), 20)
+
+  def testCandidatesAreReproducible(self):
+    self.assertEqual(spark.GetTuningCandidates(self.conf, 5, seed=1),
+                     spark.GetTuningCandidates(self.conf, 5, seed=1))
+
+  def testKubernetesExecutorCores(self):
+    self.conf[spark.SPARK_K8S_EXECUTOR_CORES] = '3'
+    for candidate in spark.GetTuningCandidates(self.conf, 20)[1:]:
+      executors_per_worker = int(candidate[spark.SPARK_WORKER_INSTANCES]) // 3
+      self.assertEqual(candidate[spark.SPARK_K8S_EXECUTOR_CORES],
+                       str(round(3 / executors_per_worker, 2)))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -15,6 +15,9 @@
 import os
 import unittest
 
+from absl.testing import flagsaver
+import mock
+from perfkitbenchmarker import sample
 from perfkitbenchmarker.linux_packages import wrk2
 import six
 
@@ -55,6 +58,75 @@ class Wrk2Test(unittest.TestCase):
     self.assertIn(('errors', 14, ''), res)
     self.assertIn(('error_rate', 14. / 600, ''), res)
 
+  def testParseHistogram(self):
+    histogram = wrk2._ParseHistogram(_ReadOutputFile('wrk2_output.txt'))
+    self.assertEqual(sum(histogram.values()), 500)
+    self.assertEqual(list(histogram.items())[:3],
+                     [(44.223, 1), (48.671, 49), (49.855, 51)])
+    self.assertEqual(histogram[194.047], 2)
+    self.assertEqual(list(histogram.items())[-1], (244.223, 1))
+
+  def testParseTimeseries(self):
+    output = (_ReadOutputFile('wrk2_output.txt') +
+              '==TIMESERIES==\ntime,responses\n100,5\n101,10\n')
+    self.assertEqual(wrk2._ParseTimeseries(output), [(100, 5), (101, 10)])
+
+  def testAggregateClientSamples(self):
+
+    def _ClientSamples(histogram, timeseries):
+      return [sample.CreateHistogramSample(
+          histogram, 'wrk2', 'latency', 'ms', metric='latency histogram')] + [
+              sample.Sample('throughput', responses, 'requests/sec', {},
+                            timestamp=second)
+              for second, responses in timeseries]
+
+    samples = wrk2.AggregateClientSamples([
+        _ClientSamples({1.0: 99, 2.0: 1}, [(100, 1), (101, 10), (102, 10),
+                                           (103, 10), (104, 2)]),
+        _ClientSamples({1.5: 100}, [(101, 3), (102, 20), (103, 20), (104, 20),
+                                    (105, 4)]),
+    ], {'foo': 'bar'})
+
+    by_metric = {}
+    for s in samples:
+      by_metric.setdefault(s.metric, []).append(s)
+    self.assertEqual(by_metric['aggregate p50 latency'][0].value, 1.5)
+    self.assertEqual(by_metric['aggregate p99 latency'][0].value, 1.5)
+    self.assertEqual(by_metric['aggregate p99.9 latency'][0].value, 2.0)
+    # Seconds 102 and 103 are the only full seconds of both clients.
+    self.assertEqual([(s.timestamp, s.value)
+                      for s in by_metric['aggregate throughput']],
+                     [(102, 30), (103, 30)])
+    self.assertEqual(
+        by_metric['aggregate common window throughput'][0].value, 30)
+    self.assertEqual(by_metric['aggregate common window'][0].value, 2)
+    self.assertEqual(samples[0].metadata, {'foo': 'bar'})
+
+  @flagsaver.flagsaver(wrk2_corrected_latency=True,
+                       wrk2_throughput_timeseries=True)
+  def testGetRunCommand(self):
+    vm = mock.Mock()
+    vm.NumCpusForBenchmark.return_value = 4
+    cmd, metadata = wrk2.GetRunCommand(vm, 'http://10.0.0.1/', 100,
+                                       connections=8, duration=30)
+    self.assertEqual(
+        cmd, '{} --rate=100 --connections=8 --threads=4 --duration=30 '
+        '--latency --script {} http://10.0.0.1/'.format(
+            wrk2.WRK2_PATH, wrk2._LUA_SCRIPT_PATH))
+    self.assertEqual(metadata, {'connections': 8, 'threads': 4,
+                                'duration': 30, 'target_rate': 100,
+                                'corrected': False})
+
+  def testParseRunOutput(self):
+    output = (_ReadOutputFile('wrk2_output.txt') +
+              '==TIMESERIES==\ntime,responses\n100,5\n')
+    samples = list(wrk2.ParseRunOutput(output, {'threads': 1}))
+    self.assertEqual(samples[0].metric, 'p50 latency')
+    self.assertEqual(samples[-1], sample.Sample(
+        'throughput', 5, 'requests/sec', {'threads': 1}, timestamp=100))
+    self.assertEqual(
+        [s.metric for s in samples].count('latency histogram'), 1)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -15,9 +15,22 @@
 
 import os
 import unittest
+from perfkitbenchmarker import sample
 from perfkitbenchmarker.linux_packages import wrk
 import six
 
+_HISTOGRAM_OUTPUT = """\
+==HISTOGRAM==
+latency,requests
+0.1,50
+0.2,40
+0.2,0
+1.5,10
+==CSV==
+variable,value,unit
+requests,100,n
+"""
+
 
 class WrkParseOutputTestCase(unittest.TestCase):
 
@@ -46,5 +59,55 @@ class WrkParseOutputTestCase(unittest.TestCase):
       list(wrk._ParseOutput('bar'))
 
 
+class WrkHistogramTestCase(unittest.TestCase):
+
+  def _ClientSamples(self, histogram, requests):
+    metadata = {'connections': 2, 'threads': 2, 'duration': 60}
+    return [
+        sample.Sample('requests', requests, 'n', metadata),
+        sample.Sample('errors', 1, 'n', metadata),
+        sample.Sample('bytes transferred', 10 * requests, 'bytes', metadata),
+        sample.Sample('throughput', requests / 60., 'requests/sec', metadata),
+        sample.CreateHistogramSample(histogram, 'wrk', 'latency', 'ms',
+                                     metadata, metric='latency histogram'),
+    ]
+
+  def testParseHistogram(self):
+    self.assertEqual(wrk._ParseHistogram(_HISTOGRAM_OUTPUT),
+                     {0.1: 50, 0.2: 40, 1.5: 10})
+    self.assertEqual(list(wrk._ParseOutput(_HISTOGRAM_OUTPUT)),
+                     [('requests', 100, 'n')])
+    self.assertIsNone(wrk._ParseHistogram('==CSV==\n'))
+
+  def testHistogramPercentiles(self):
+    histogram = wrk.MergeHistograms([{0.1: 50, 0.2: 40}, {0.2: 5, 1.5: 5}])
+    self.assertEqual(list(histogram.items()), [(0.1, 50), (0.2, 45), (1.5, 5)])
+    self.assertEqual(wrk.HistogramPercentiles(histogram, [50, 90, 99, 100]),
+                     [0.1, 0.2, 1.5, 1.5])
+
+  def testAggregateResults(self):
+    results = wrk.AggregateResults([
+        self._ClientSamples({0.1: 60, 0.2: 40}, 100),
+        self._ClientSamples({0.2: 50, 3.0: 50}, 100),
+    ])
+
+    by_metric = {s.metric: s for s in results}
+    self.assertEqual(by_metric['requests'].value, 200)
+    self.assertEqual(by_metric['errors'].value, 2)
+    self.assertAlmostEqual(by_metric['throughput'].value, 200 / 60.)
+    self.assertEqual(by_metric['p50 latency'].value, 0.2)
+    self.assertEqual(by_metric['p90 latency'].value, 3.0)
+    self.assertEqual(by_metric['p5 latency'].value, 0.1)
+    self.assertEqual(by_metric['requests'].metadata['connections'], 4)
+    self.assertEqual(by_metric['requests'].metadata['clients'], 2)
+    self.assertTrue(
+        by_metric['p50 latency'].metadata['approximate_latency_percentiles'])
+    self.assertEqual(wrk.GetHistogram(results), {0.1: 60, 0.2: 90, 3.0: 50})
+
+  def testAggregateSingleClient(self):
+    client_samples = self._ClientSamples({0.1: 100}, 100)
+    self.assertEqual(wrk.AggregateResults([client_samples]), client_samples)
+
+
 if __name__ == '__main__':
   unittest.main()
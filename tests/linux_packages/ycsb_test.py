@@ -18,14 +18,23 @@ import copy
 import os
 import unittest
 
+from absl import flags
 from absl.testing import flagsaver
 from absl.testing import parameterized
+import mock
+from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
+from perfkitbenchmarker import object_storage_service
+from perfkitbenchmarker import providers
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import ycsb
 from tests import pkb_common_test_case
 import six
 from six.moves import range
 
+FLAGS = flags.FLAGS
 
 def open_data_file(filename):
   path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
@@ -298,5 +307,183 @@ class PrerequisitesTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(actual_version, expected_version)
 
 
+class DatasetCacheTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(DatasetCacheTestCase, self).setUp()
+    FLAGS.ycsb_dataset_cache_bucket = 'bucket/cache'
+    self.workload = data.ResourcePath('ycsb/workloada')
+    self.executor = ycsb.YCSBExecutor('mongodb')
+    self.enter_context(mock.patch.object(
+        self.executor, '_LoadThreaded', return_value=[]))
+    self.cache = mock.Mock()
+
+  def testGetDatasetKey(self):
+    key = self.executor.GetDatasetKey(self.workload, {'recordcount': 10})
+
+    self.assertTrue(key.startswith('mongodb-'))
+    self.assertEqual(
+        key, self.executor.GetDatasetKey(
+            self.workload, {'recordcount': 10, 'threads': 1}))
+    self.assertNotEqual(
+        key, self.executor.GetDatasetKey(self.workload, {'recordcount': 20}))
+    self.assertNotEqual(
+        key, self.executor.GetDatasetKey(
+            data.ResourcePath('ycsb/workloadb'), {'recordcount': 10}))
+
+  def testLoadRestoresCachedDataset(self):
+    self.cache.Restore.return_value = True
+
+    samples = self.executor.Load([], [self.workload], dataset_cache=self.cache)
+
+    self.executor._LoadThreaded.assert_not_called()
+    self.cache.Save.assert_not_called()
+    self.assertEqual([s.metric for s in samples], ['dataset_restore_time'])
+    self.assertEqual(samples[0].metadata['ycsb_dataset_key'],
+                     self.cache.Restore.call_args[0][0])
+
+  def testLoadCachesLoadedDataset(self):
+    self.cache.Restore.return_value = False
+
+    samples = self.executor.Load([], [self.workload], dataset_cache=self.cache)
+
+    self.executor._LoadThreaded.assert_called_once()
+    self.cache.Save.assert_called_once_with(
+        self.cache.Restore.call_args[0][0])
+    self.assertEqual([s.metric for s in samples],
+                     ['dataset_load_time', 'dataset_snapshot_time'])
+
+  def testLoadTimesExcludeSetupAndLookup(self):
+    clock = [100.]
+
+    def _Advance(seconds):
+      def _Call(*unused_args, **unused_kwargs):
+        clock[0] += seconds
+        return mock.DEFAULT
+      return _Call
+
+    self.enter_context(mock.patch.object(ycsb.time, 'time',
+                                         side_effect=lambda: clock[0]))
+    self.cache.Prepare.side_effect = _Advance(100)
+    self.cache.Restore.side_effect = _Advance(10)
+    self.cache.Restore.return_value = False
+    self.executor._LoadThreaded.side_effect = _Advance(1)
+
+    samples = self.executor.Load([], [self.workload], dataset_cache=self.cache)
+
+    self.cache.Prepare.assert_called_once_with()
+    self.assertEqual(samples[0].metric, 'dataset_load_time')
+    self.assertEqual(samples[0].value, 1)
+
+    self.cache.Restore.return_value = True
+    self.executor.loaded = False
+    samples = self.executor.Load([], [self.workload], dataset_cache=self.cache)
+    self.assertEqual(samples[0].metric, 'dataset_restore_time')
+    self.assertEqual(samples[0].value, 10)
+
+  def testLoadWithoutBucket(self):
+    FLAGS.ycsb_dataset_cache_bucket = None
+
+    self.assertEqual(
+        self.executor.Load([], [self.workload], dataset_cache=self.cache), [])
+
+    self.cache.Restore.assert_not_called()
+    self.executor._LoadThreaded.assert_called_once()
+
+  @flagsaver.flagsaver(cloud='GCP')
+  def testDataDirectoryCacheMiss(self):
+    self.enter_context(mock.patch.object(providers, 'LoadProvider'))
+    service = mock.Mock()
+    service.MakeRemoteCliDownloadUrl.return_value = 'gs://bucket/cache/1-of-2'
+    self.enter_context(mock.patch.object(
+        object_storage_service, 'GetObjectStorageClass',
+        return_value=mock.Mock(return_value=service)))
+    vms = [mock.Mock(), mock.Mock()]
+    for vm, retcode in zip(vms, (0, 1)):
+      vm.GetScratchDir.return_value = '/scratch'
+      vm.RemoteCommandWithReturnCode.return_value = ('', '', retcode)
+    stop = mock.Mock()
+    cache = ycsb.DataDirectoryCache(vms, lambda vm: '/scratch/data', stop,
+                                    mock.Mock())
+
+    self.assertFalse(cache.Restore('key'))
+
+    service.MakeRemoteCliDownloadUrl.assert_called_with(
+        'bucket/cache', 'key/1-of-2.tar.gz')
+    stop.assert_not_called()
+    vms[0].RemoteCommand.assert_called_once_with(
+        'rm -rf /scratch/ycsb-dataset-cache')
+
+
+
+class StaircaseCheckpointTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(StaircaseCheckpointTestCase, self).setUp()
+    self.path = os.path.join(self.create_tempdir().full_path, 'checkpoint')
+    self.enter_context(mock.patch.object(
+        vm_util, 'PrependTempDir', return_value=self.path))
+    FLAGS.ycsb_threads_per_client = ['1', '2']
+    self.workload = data.ResourcePath('ycsb/workloada')
+    self.executor = ycsb.YCSBExecutor('mongodb')
+    self.run_threaded = self.enter_context(mock.patch.object(
+        self.executor, '_RunThreaded', return_value=[{}]))
+    self.enter_context(mock.patch.object(ycsb, '_CombineResults'))
+    self.enter_context(mock.patch.object(
+        ycsb, '_CreateSamples',
+        side_effect=lambda _, **kwargs: [sample.Sample(
+            'overall Throughput', 10 * kwargs['threads'], 'ops/sec', {})]))
+
+  def testReplay(self):
+    checkpoint = ycsb.StaircaseCheckpoint(self.path)
+    checkpoint.Record({'threads': 1}, 10.0,
+                      [sample.Sample('a', 1, '', {'b': 1}, timestamp=2)])
+    checkpoint.Record({'threads': 2}, 20.0, [])
+
+    checkpoint = ycsb.StaircaseCheckpoint(self.path)
+    self.assertEqual(
+        checkpoint.Replay({'threads': 1}),
+        (10.0, [sample.Sample('a', 1, '', {'b': 1}, timestamp=2)]))
+    self.assertIsNone(checkpoint.Replay({'threads': 3}))
+    self.assertEqual(len(checkpoint.runs), 1)
+
+  def testResumesAtFirstIncompleteRun(self):
+    self.run_threaded.side_effect = [
+        [{}], errors.VirtualMachine.RemoteCommandError('failed')]
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.executor.RunStaircaseLoads([mock.Mock()], [self.workload])
+    self.assertTrue(os.path.exists(self.path))
+
+    self.run_threaded.reset_mock(side_effect=True)
+    samples = self.executor.RunStaircaseLoads([mock.Mock()], [self.workload])
+
+    self.assertEqual(self.run_threaded.call_count, 1)
+    self.assertEqual(self.run_threaded.call_args[1]['threads'], 2)
+    self.assertEqual([s.value for s in samples], [10, 20])
+    self.assertFalse(os.path.exists(self.path))
+
+  @flagsaver.flagsaver(ycsb_publish_incrementally=True)
+  def testSendsSamplesIncrementally(self):
+    ready = []
+
+    def _Collect(unused_sender, benchmark_spec, samples):
+      del benchmark_spec
+      ready.append([s.value for s in samples])
+      return True
+
+    events.samples_ready.connect(_Collect)
+    self.addCleanup(events.samples_ready.disconnect, _Collect)
+
+    samples = self.executor.RunStaircaseLoads([mock.Mock()], [self.workload])
+
+    self.assertEqual(samples, [])
+    self.assertEqual(ready, [[10], [20]])
+
+  @flagsaver.flagsaver(ycsb_publish_incrementally=True)
+  def testReturnsSamplesNotCollected(self):
+    samples = self.executor.RunStaircaseLoads([mock.Mock()], [self.workload])
+
+    self.assertEqual([s.value for s in samples], [10, 20])
+
 if __name__ == '__main__':
   unittest.main()
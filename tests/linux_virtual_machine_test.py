@@ -14,6 +14,7 @@
 
 """Tests for linux_virtual_machine.py."""
 
+import json
 import unittest
 
 from absl import flags
@@ -28,6 +29,7 @@ from perfkitbenchmarker import os_types
 from perfkitbenchmarker import pkb
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import test_util
+from perfkitbenchmarker import vm_util
 from tests import pkb_common_test_case
 
 FLAGS = flags.FLAGS
@@ -187,6 +189,36 @@ class LogDmesgTestCase(pkb_common_test_case.PkbCommonTestCase):
     remote_command.assert_called_once_with('hostname && dmesg', should_log=True)
 
 
+class TimedRemoteCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(TimedRemoteCommandTestCase, self).setUp()
+    self.vm = CreateTestLinuxVm()
+    self.vm._SetupRobustCommand = mock.Mock()
+
+  def testTimedRemoteCommand(self):
+    timing = dict(
+        wall_time=1.5, user_time=1.0, system_time=0.25, max_rss_kb=1024,
+        voluntary_context_switches=10, involuntary_context_switches=2,
+        read_bytes=4096, write_bytes=None)
+    with mock.patch.object(self.vm, 'RemoteCommand') as remote_command:
+      remote_command.return_value = (
+          'out\n', 'err\n\nPKB_COMMAND_TIMING: %s\n' % json.dumps(timing))
+      stdout, stderr, result = self.vm.TimedRemoteCommand(
+          "echo 'a b'", timeout=10)
+
+    remote_command.assert_called_once_with(
+        'python3 %s/timed_command.py \'echo \'"\'"\'a b\'"\'"\'\'' %
+        vm_util.VM_TMP_DIR, timeout=10)
+    self.assertEqual(stdout, 'out\n')
+    self.assertEqual(stderr, 'err\n')
+    self.assertEqual(result, linux_virtual_machine.CommandTiming(**timing))
+
+  def testParseCommandTimingWithoutTiming(self):
+    self.assertEqual(linux_virtual_machine.ParseCommandTiming('err'),
+                     ('err', None))
+
+
 class TestLsCpu(unittest.TestCase, test_util.SamplesTestMixin):
 
   LSCPU_DATA = {
@@ -14,6 +14,7 @@
 
 import inspect
 import logging
+import os
 import threading
 import unittest
 
@@ -136,6 +137,113 @@ class LogUtilTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertTrue(self.completed)
     self.assertEqual(self.log_record.pkb_label, '')
 
+  def testExtendShardIsCopiedToThreads(self):
+    context = log_util.ThreadLogContext()
+    with context.ExtendShard(benchmark='fio_0'):
+      with context.ExtendShard(vm='vm0'):
+        copied = log_util.ThreadLogContext(context)
+        self.assertEqual(copied.shard_keys, {'benchmark': 'fio_0', 'vm': 'vm0'})
+      self.assertEqual(context.shard_keys, {'benchmark': 'fio_0'})
+    self.assertEqual(context.shard_keys, {})
+    self.assertEqual(copied.shard_keys, {'benchmark': 'fio_0', 'vm': 'vm0'})
+
+
+class ConfigureLoggingTestCase(pkb_common_test_case.PkbCommonTestCase):
+  """Tests the handlers installed by log_util.ConfigureLogging."""
+
+  def setUp(self):
+    super(ConfigureLoggingTestCase, self).setUp()
+    logger = logging.getLogger()
+    handlers = logger.handlers[:]
+    level = logger.level
+    self.addCleanup(setattr, logger, 'handlers', handlers)
+    self.addCleanup(logger.setLevel, level)
+    self.addCleanup(log_util.StopAsyncLogging)
+    self.temp_dir = self.create_tempdir().full_path
+    self.log_path = os.path.join(self.temp_dir, 'pkb.log')
+    self.shard_dir = os.path.join(self.temp_dir, 'logs')
+
+  def _LogFromThreads(self):
+    """Logs a message in a benchmark from a thread per VM."""
+
+    def _Log(vm):
+      with log_util.GetThreadLogContext().ExtendShard(vm=vm):
+        logging.debug('Ran on %s.', vm)
+
+    context = log_util.GetThreadLogContext()
+    with context.ExtendLabel('fio(1/1)'), context.ExtendShard(
+        benchmark='fio_0'):
+      logging.info('Starting.')
+      vm_util.RunThreaded(_Log, ['vm0', 'vm1'])
+
+  def _ReadLog(self):
+    with open(self.log_path) as f:
+      return f.read()
+
+  def testAsyncLogging(self):
+    log_util.ConfigureLogging(logging.ERROR, self.log_path, 'abc',
+                              async_logging=True)
+    self._LogFromThreads()
+    log_util.StopAsyncLogging()
+
+    log = self._ReadLog()
+    self.assertRegex(log, r'abc MainThread fio\(1/1\) .*INFO +Starting.')
+    self.assertIn('Ran on vm0.', log)
+    self.assertIn('Ran on vm1.', log)
+
+  def testShards(self):
+    for compress in (False, True):
+      with self.subTest(compress=compress):
+        shard_dir = os.path.join(self.shard_dir, str(compress))
+        log_util.ConfigureLogging(logging.ERROR, self.log_path, 'abc',
+                                  async_logging=True,
+                                  shard_directory=shard_dir,
+                                  compress_shards=compress)
+        self._LogFromThreads()
+        logging.info('Done.')
+        log_util.StopAsyncLogging()
+
+        vm0_log = log_util.ReadVmLog(shard_dir, 'vm0')
+        self.assertIn('Ran on vm0.', vm0_log)
+        self.assertNotIn('vm1', vm0_log)
+        self.assertIn('Starting.', log_util.ReadVmLog(shard_dir, 'pkb'))
+        suffix = '.log.gz' if compress else '.log'
+        self.assertTrue(os.path.exists(
+            os.path.join(shard_dir, 'fio_0', 'vm1' + suffix)))
+        self.assertTrue(os.path.exists(
+            os.path.join(shard_dir, 'pkb', 'pkb' + suffix)))
+
+  def testShardsOfForkedProcess(self):
+    for compress in (False, True):
+      with self.subTest(compress=compress):
+        shard_dir = os.path.join(self.shard_dir, str(compress))
+        log_util.ConfigureLogging(logging.ERROR, self.log_path, 'abc',
+                                  async_logging=True,
+                                  shard_directory=shard_dir,
+                                  compress_shards=compress)
+        context = log_util.GetThreadLogContext()
+        with context.ExtendShard(benchmark='b_0', vm='vm0'):
+          logging.info('Parent before fork.')
+        pid = os.fork()
+        if not pid:
+          # Exits like a multiprocessing child, skipping atexit and close.
+          with context.ExtendShard(benchmark='b_1', vm='vm0'):
+            logging.info('Child.')
+          with context.ExtendShard(benchmark='b_0', vm='vm0'):
+            logging.info('Child in parent benchmark.')
+          os._exit(0)
+        os.waitpid(pid, 0)
+        with context.ExtendShard(benchmark='b_0', vm='vm0'):
+          logging.info('Parent after fork.')
+        log_util.StopAsyncLogging()
+
+        vm0_log = log_util.ReadVmLog(shard_dir, 'vm0')
+        self.assertRegex(
+            vm0_log, r'(?s)Parent before fork.*Parent after fork.*Child\..*'
+            r'Child in parent benchmark')
+        self.assertTrue(os.path.exists(
+            os.path.join(shard_dir, 'index.%d.json' % pid)))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -23,6 +23,7 @@ from absl.testing import parameterized
 import mock
 from perfkitbenchmarker import benchmark_status
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import pkb
 from perfkitbenchmarker import providers
@@ -283,6 +284,84 @@ class TestMiscFunctions(pkb_common_test_case.PkbCommonTestCase,
     vm.RemoteCommand.assert_called_with('cat /proc/meminfo')
 
 
+class TestDoRunPhase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.enter_context(flagsaver.flagsaver(
+        record_lscpu=False, record_proccpu=False, record_cpu_vuln=False,
+        record_gcc=False, record_glibc=False))
+    self.spec = mock.Mock(vms=[])
+    self.spec.name = 'test_benchmark'
+    self.spec.GetBackgroundWorkloadSamples.return_value = []
+    self.collector = mock.Mock()
+    self.ready_sample = sample.Sample('ready', 1, '', {})
+    self.returned_sample = sample.Sample('returned', 2, '', {})
+    self.collected = []
+
+    def _Run(spec):
+      self.collected = events.samples_ready.send(
+          events.RUN_PHASE, benchmark_spec=spec, samples=[self.ready_sample])
+      return [self.returned_sample]
+
+    self.spec.BenchmarkRun.side_effect = _Run
+
+  def testCollectsReadySamplesDuringRun(self):
+    pkb.DoRunPhase(self.spec, self.collector, mock.MagicMock())
+
+    self.assertTrue(any(collected for _, collected in self.collected))
+    self.assertEqual(self.collector.AddSamples.call_args_list, [
+        mock.call([self.ready_sample], 'test_benchmark', self.spec),
+        mock.call([self.returned_sample], 'test_benchmark', self.spec),
+    ])
+    self.assertEqual(self.ready_sample.metadata, {'run_number': 0})
+    self.collector.PublishSamples.assert_not_called()
+    self.assertFalse(events.samples_ready.receivers)
+
+  def testSendsSamplesCreatedOnlyForReturnedSamples(self):
+    created = []
+
+    def _OnSamplesCreated(unused_sender, benchmark_spec, samples):
+      del benchmark_spec  # Unused
+      created.append(list(samples))
+
+    events.samples_created.connect(_OnSamplesCreated, events.RUN_PHASE)
+    self.addCleanup(events.samples_created.disconnect, _OnSamplesCreated)
+    pkb.DoRunPhase(self.spec, self.collector, mock.MagicMock())
+
+    self.assertEqual(created, [[self.returned_sample]])
+
+  @flagsaver.flagsaver(publish_after_run=True)
+  def testPublishesReadySamplesAfterRun(self):
+    pkb.DoRunPhase(self.spec, self.collector, mock.MagicMock())
+
+    self.collector.PublishSamples.assert_called_once()
+
+  def testIgnoresSamplesAfterRun(self):
+    self.spec.BenchmarkRun.side_effect = None
+    self.spec.BenchmarkRun.return_value = []
+
+    pkb.DoRunPhase(self.spec, self.collector, mock.MagicMock())
+    collected = events.samples_ready.send(
+        events.RUN_PHASE, benchmark_spec=self.spec,
+        samples=[self.ready_sample])
+
+    self.assertFalse(collected)
+    self.collector.AddSamples.assert_called_once_with(
+        [], 'test_benchmark', self.spec)
+
+
+  @flagsaver.flagsaver(run_stage_retries=1)
+  def testBackgroundWorkloadFailureIsNotRetried(self):
+    self.spec.GetBackgroundWorkloadSamples.side_effect = (
+        errors.VmUtil.ThreadException())
+
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      pkb.DoRunPhase(self.spec, self.collector, mock.MagicMock())
+
+    self.spec.BenchmarkRun.assert_called_once()
+
+
 class TestRunBenchmarks(pkb_common_test_case.PkbCommonTestCase):
 
   def _MockLoadProviderUtils(self, utils_module):
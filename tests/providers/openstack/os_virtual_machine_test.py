@@ -54,6 +54,7 @@ class BaseOpenStackNetworkTest(pkb_common_test_case.PkbCommonTestCase):
     spec.background_cpu_threads = 'None'
     spec.background_network_mbits_per_sec = '1'
     spec.background_network_ip_type = 'None'
+    spec.background_loads = []
     spec.vm_metadata = {}
     return spec
 
@@ -14,6 +14,7 @@
 
 """Tests for perfkitbenchmarker.lib.regex_util."""
 
+import re
 import unittest
 
 from perfkitbenchmarker import regex_util
@@ -177,5 +178,69 @@ class SubstituteTestCase(unittest.TestCase):
                       pattern, repl, text)
 
 
+class OutputParserTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(OutputParserTestCase, self).setUp()
+    self.parser = regex_util.OutputParser([
+        regex_util.Metric('throughput', r'throughput: (\d+) (ops|req)/s',
+                          unit='ops/s'),
+        regex_util.Metric('latency', r'latency: (?P<latency>[\d.]+)ms',
+                          unit='ms', group='latency'),
+        regex_util.Metric('errors', r'errors: (\d+)', conversion=int),
+        regex_util.Metric('load', r'[\d.]+(?= load)', group=0),
+    ])
+    self.text = ('throughput: 10 ops/s latency: 1.5ms\n'
+                 'throughput: 12 req/s latency: 2.5ms errors: 3\n'
+                 '0.75 load\n')
+
+  def testParse(self):
+    self.assertEqual(self.parser.Parse(self.text), {
+        'throughput': [10.0, 12.0],
+        'latency': [1.5, 2.5],
+        'errors': [3],
+        'load': [0.75],
+    })
+
+  def testParseNoMatches(self):
+    self.assertEqual(self.parser.Parse('nothing'), {
+        'throughput': [], 'latency': [], 'errors': [], 'load': []})
+
+  def testParseSamples(self):
+    samples = self.parser.ParseSamples(self.text, {'a': 1})
+    self.assertEqual(
+        [(s.metric, s.value, s.unit) for s in samples],
+        [('throughput', 10.0, 'ops/s'), ('throughput', 12.0, 'ops/s'),
+         ('latency', 1.5, 'ms'), ('latency', 2.5, 'ms'),
+         ('errors', 3, ''), ('load', 0.75, '')])
+    self.assertEqual(samples[0].metadata, {'a': 1})
+
+  def testParseSamplesNoMatch(self):
+    self.assertRaises(regex_util.NoMatchError, self.parser.ParseSamples,
+                      'throughput: 10 ops/s')
+
+  def testSharedRegex(self):
+    regex = r'^read: (?P<read>\d+) write: (?P<write>\d+)$'
+    parser = regex_util.OutputParser([
+        regex_util.Metric('read', regex, group='read', conversion=int),
+        regex_util.Metric('write', regex, group='write', conversion=int),
+        regex_util.Metric('other', r'other: (\d+)'),
+    ], re.MULTILINE)
+
+    records = parser.ParseRecords(
+        'read: 1 write: 2\nother: 3\nread: 4\nread: x write: 5\n')
+
+    self.assertEqual(records, [{'read': 1, 'write': 2}, {'other': 3.0}])
+
+  def testMatchesDoNotOverlap(self):
+    parser = regex_util.OutputParser([
+        regex_util.Metric('a', r'a(\d)'), regex_util.Metric('b', r'\d(\d)')])
+    self.assertEqual(parser.Parse('a12 34'), {'a': [1.0], 'b': [4.0]})
+
+  def testDuplicateNames(self):
+    self.assertRaises(ValueError, regex_util.OutputParser, [
+        regex_util.Metric('a', 'a'), regex_util.Metric('a', 'b')])
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,68 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for scripts/barrier_start.py."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from perfkitbenchmarker.scripts import barrier_start
+
+
+class BarrierStartTest(unittest.TestCase):
+
+  def setUp(self):
+    super(BarrierStartTest, self).setUp()
+    tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tmp_dir)
+    self.release_file = os.path.join(tmp_dir, 'release')
+
+  def testWaitForRelease(self):
+    release_time = time.time() + 0.5
+
+    def _Release():
+      time.sleep(0.1)
+      with open(self.release_file, 'w') as f:
+        f.write('%f' % release_time)
+
+    thread = threading.Thread(target=_Release)
+    thread.start()
+    self.assertAlmostEqual(
+        barrier_start.WaitForRelease(self.release_file, 5), release_time,
+        places=5)
+    thread.join()
+
+  def testWaitForReleaseTimeout(self):
+    self.assertIsNone(barrier_start.WaitForRelease(self.release_file, 0.05))
+
+  def testRun(self):
+    release_time = time.time() + 0.2
+    status, start_time, stop_time = barrier_start.Run(
+        'sleep 0.1; exit 3', release_time)
+    self.assertEqual(status, 3)
+    self.assertGreaterEqual(start_time, release_time)
+    self.assertLess(start_time - release_time, 0.05)
+    self.assertGreaterEqual(stop_time - start_time, 0.1)
+
+  def testRunLate(self):
+    release_time = time.time() - 1
+    _, start_time, _ = barrier_start.Run('true', release_time)
+    self.assertGreaterEqual(start_time - release_time, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
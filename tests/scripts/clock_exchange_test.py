@@ -0,0 +1,38 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for scripts/clock_exchange.py."""
+
+import io
+import time
+import unittest
+
+from perfkitbenchmarker.scripts import clock_exchange
+
+
+class ClockExchangeTest(unittest.TestCase):
+
+  def testServe(self):
+    stdout = io.StringIO()
+    before = time.time()
+    clock_exchange.Serve(io.StringIO('\n\n\n'), stdout)
+    after = time.time()
+    readings = [float(line) for line in stdout.getvalue().splitlines()]
+    self.assertEqual(len(readings), 3)
+    self.assertEqual(readings, sorted(readings))
+    self.assertGreaterEqual(readings[0], before)
+    self.assertLessEqual(readings[-1], after)
+
+
+if __name__ == '__main__':
+  unittest.main()
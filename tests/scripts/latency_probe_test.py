@@ -0,0 +1,52 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for scripts/latency_probe.py."""
+
+import unittest
+
+from perfkitbenchmarker.scripts import latency_probe
+
+
+class LatencyProbeTest(unittest.TestCase):
+
+  def testSummarize(self):
+    send_times = [100 + i * 0.5 for i in range(8)]
+    # Probe 3 was lost.
+    rtts = {0: 1.0, 1: 1.2, 2: 1.0, 4: 2.0, 5: 1.5, 6: 1.5, 7: 11.5}
+
+    summary = latency_probe.Summarize(send_times, rtts, jitter_interval=2)
+
+    self.assertEqual(summary['sent'], 8)
+    self.assertEqual(summary['received'], 7)
+    self.assertEqual(summary['rtt']['min'], 1.0)
+    self.assertEqual(summary['rtt']['max'], 11.5)
+    self.assertEqual(summary['rtt']['p50'], 1.5)
+    self.assertEqual(summary['rtt']['p90'], 11.5)
+    self.assertAlmostEqual(summary['rtt']['mean'], 19.7 / 7)
+    self.assertEqual(summary['histogram'],
+                     [(1.0, 2), (1.2, 1), (1.5, 2), (2.0, 1), (12.0, 1)])
+    # Differences across the lost probe are not counted.
+    self.assertEqual(len(summary['jitter']), 2)
+    self.assertEqual(summary['jitter'][0][0], 0)
+    self.assertAlmostEqual(summary['jitter'][0][1], 0.2)
+    self.assertEqual(summary['jitter'][1][0], 2)
+    self.assertAlmostEqual(summary['jitter'][1][1], 10.5 / 3)
+
+  def testSummarizeWithoutReplies(self):
+    self.assertEqual(latency_probe.Summarize([0, 1], {}, 10),
+                     {'sent': 2, 'received': 0})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,132 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for scripts/pcap_summary.py."""
+
+import io
+import socket
+import struct
+import unittest
+
+from perfkitbenchmarker.scripts import pcap_summary
+
+_CLIENT = '10.0.0.1'
+_SERVER = '10.0.0.2'
+_SYN = 0x02
+_ACK = 0x10
+
+
+def _TcpFrame(src, dst, sport, dport, seq, ack, flags, payload_length=0,
+              window=100, window_scale=None, snaplen=96):
+  """Returns an Ethernet frame of a TCP segment, truncated to snaplen."""
+  options = b''
+  if window_scale is not None:
+    options = struct.pack('!BBBB', 1, 3, 3, window_scale)
+  tcp = struct.pack('!HHIIBBHHH', sport, dport, seq, ack,
+                    (20 + len(options)) // 4 << 4, flags, window, 0,
+                    0) + options
+  ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp) + payload_length,
+                   0, 0, 64, 6, 0, socket.inet_aton(src),
+                   socket.inet_aton(dst))
+  frame = b'\x00' * 12 + b'\x08\x00' + ip + tcp + b'x' * payload_length
+  return frame[:snaplen], len(frame)
+
+
+def _Pcap(packets):
+  """Returns a pcap file of (timestamp, (frame, length)) pairs."""
+  f = io.BytesIO()
+  f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 96, 1))
+  for timestamp, (frame, length) in packets:
+    seconds = int(timestamp)
+    f.write(struct.pack('<IIII', seconds,
+                        int(round((timestamp - seconds) * 1e6)), len(frame),
+                        length))
+    f.write(frame)
+  # tcpdump was killed while writing the last packet.
+  f.write(struct.pack('<IIII', 1000, 0, 96, 1500) + b'\x00' * 10)
+  f.seek(0)
+  return f
+
+
+class PcapSummaryTest(unittest.TestCase):
+
+  def setUp(self):
+    super(PcapSummaryTest, self).setUp()
+
+    def _Data(timestamp, seq):
+      return timestamp, _TcpFrame(_CLIENT, _SERVER, 40000, 5001, seq, 5001,
+                                  _ACK, payload_length=1000)
+
+    def _Ack(timestamp, ack):
+      return timestamp, _TcpFrame(_SERVER, _CLIENT, 5001, 40000, 5001, ack,
+                                  _ACK, window=200)
+
+    packets = [
+        (100.0, _TcpFrame(_CLIENT, _SERVER, 40000, 5001, 1000, 0, _SYN,
+                          window_scale=2)),
+        (100.002, _TcpFrame(_SERVER, _CLIENT, 5001, 40000, 5000, 1001,
+                            _SYN | _ACK, window_scale=3)),
+        _Data(100.003, 1001),
+        _Data(100.004, 2001),
+        _Ack(100.007, 3001),
+        # Lost and retransmitted.
+        _Data(100.5, 3001),
+        _Data(101.5, 3001),
+        _Ack(101.51, 4001),
+    ]
+    self.summary = pcap_summary.Summarize(_Pcap(packets), interval=1.0)
+
+  def testFlows(self):
+    self.assertEqual(self.summary['packets'], 8)
+    self.assertEqual(self.summary['flows'], 2)
+    client, server = self.summary['largest_flows']
+    self.assertEqual(
+        (client['src'], client['sport'], client['dst'], client['dport']),
+        (_CLIENT, 40000, _SERVER, 5001))
+    self.assertEqual(client['packets'], 5)
+    self.assertEqual(client['payload_bytes'], 4000)
+    self.assertEqual(client['bytes'], 58 + 4 * 1054)
+    self.assertAlmostEqual(client['throughput_bps'],
+                           client['bytes'] * 8 / 1.5)
+    self.assertEqual(client['interval_start'], 100.0)
+    self.assertEqual(client['interval_throughput_bps'],
+                     [(58 + 3 * 1054) * 8, 1054 * 8])
+    self.assertEqual(client['packet_size']['p50'], 1054)
+    self.assertEqual(client['packet_size']['min'], 58)
+    self.assertEqual(server['packets'], 3)
+
+  def testRetransmitsAndRtt(self):
+    client, server = self.summary['largest_flows']
+    self.assertEqual(client['retransmits'], 1)
+    self.assertEqual(server['retransmits'], 0)
+    # The SYN and the first two segments, measured from the last of them. The
+    # retransmitted segment's ACK is ambiguous and not used.
+    self.assertEqual(client['rtt_ms']['count'], 2)
+    self.assertAlmostEqual(client['rtt_ms']['min'], 2.0)
+    self.assertAlmostEqual(client['rtt_ms']['max'], 3.0)
+    # The SYN-ACK, acknowledged by the first segment.
+    self.assertEqual(server['rtt_ms']['count'], 1)
+    self.assertAlmostEqual(server['rtt_ms']['p50'], 1.0)
+
+  def testWindowScaling(self):
+    client, server = self.summary['largest_flows']
+    self.assertEqual(client['window']['avg'], 100 << 2)
+    self.assertEqual(server['window']['avg'], 200 << 3)
+
+  def testNotPcap(self):
+    with self.assertRaises(ValueError):
+      pcap_summary.Summarize(io.BytesIO(b'not a capture file at all'))
+
+
+if __name__ == '__main__':
+  unittest.main()
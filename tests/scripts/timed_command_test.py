@@ -0,0 +1,36 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for scripts/timed_command.py."""
+
+import unittest
+
+from perfkitbenchmarker.scripts import timed_command
+
+
+class TimedCommandTest(unittest.TestCase):
+
+  def testRun(self):
+    status, timing = timed_command.Run('sleep 0.2; exit 3')
+    self.assertEqual(status, 3)
+    self.assertGreaterEqual(timing['wall_time'], 0.2)
+    self.assertLess(timing['user_time'] + timing['system_time'], 0.2)
+    self.assertGreater(timing['max_rss_kb'], 0)
+
+  def testRunKilled(self):
+    status, _ = timed_command.Run('kill -9 $$')
+    self.assertEqual(status, 128 + 9)
+
+
+if __name__ == '__main__':
+  unittest.main()
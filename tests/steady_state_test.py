@@ -0,0 +1,128 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.steady_state."""
+
+import unittest
+
+from absl import flags
+from perfkitbenchmarker import steady_state
+
+
+class CriterionParserTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(CriterionParserTestCase, self).setUp()
+    self.parser = steady_state.CriterionParser()
+
+  def testSlopePercent(self):
+    criterion = self.parser.parse('iops_slope:0.3%')
+    self.assertEqual(criterion,
+                     steady_state.Criterion('iops', steady_state.SLOPE, 0.3,
+                                            True))
+    self.assertEqual(str(criterion), 'iops_slope:0.3%')
+
+  def testDeviationAbsolute(self):
+    criterion = self.parser.parse('tps:20')
+    self.assertEqual(criterion,
+                     steady_state.Criterion('tps', steady_state.DEVIATION,
+                                            20.0, False))
+
+  def testFioFormat(self):
+    criterion = self.parser.parse('bw_slope:0.300000%')
+    self.assertEqual(criterion.metric, 'bw')
+    self.assertEqual(criterion.threshold, 0.3)
+
+  def testInvalid(self):
+    for value in ('iops', 'iops:', 'iops:abc', ':5%', 'iops:5%%'):
+      with self.assertRaises(ValueError):
+        self.parser.parse(value)
+
+  def testFlag(self):
+    flag_values = flags.FlagValues()
+    steady_state.DEFINE_criterion('criterion', None, 'help',
+                                  flag_values=flag_values)
+    flag_values(['test', '--criterion=qps:5%'])
+    self.assertEqual(flag_values.criterion.metric, 'qps')
+    self.assertEqual(flag_values['criterion'].serialize(),
+                     '--criterion=qps:5%')
+
+
+class DetectTestCase(unittest.TestCase):
+
+  def testDeviation(self):
+    values = [100, 300, 600, 900, 1000, 1010, 990, 1005, 1000]
+    result = steady_state.Detect(
+        steady_state.Criterion('tps', steady_state.DEVIATION, 5, True),
+        values, interval=2, duration=8)
+    self.assertTrue(result.attained)
+    # Window covers values[4:8], reported at 10, 12, 14 and 16 seconds.
+    self.assertEqual(result.time_to_steady_state, 16)
+    self.assertEqual(result.window_start, 8)
+    self.assertEqual(result.window_end, 16)
+    self.assertAlmostEqual(result.mean, 1001.25)
+
+  def testSlope(self):
+    values = [10, 20, 30, 40, 41, 42, 42, 42]
+    result = steady_state.Detect(
+        steady_state.Criterion('iops', steady_state.SLOPE, 0.5, False),
+        values, interval=1, duration=3)
+    self.assertTrue(result.attained)
+    # The slope of [41, 42, 42], reported at 5, 6 and 7 seconds, is 0.5.
+    self.assertEqual(result.time_to_steady_state, 7)
+
+  def testRampTime(self):
+    values = [5, 5, 5, 10, 20, 20, 20]
+    criterion = steady_state.Criterion('tps', steady_state.DEVIATION, 0,
+                                       False)
+    self.assertEqual(
+        steady_state.Detect(criterion, values, 1, 3).time_to_steady_state, 3)
+    self.assertEqual(
+        steady_state.Detect(criterion, values, 1, 3,
+                            ramp_time=2).time_to_steady_state, 7)
+
+  def testNotAttained(self):
+    result = steady_state.Detect(
+        steady_state.Criterion('tps', steady_state.DEVIATION, 1, True),
+        [1, 2, 3, 4, 5], interval=1, duration=2)
+    self.assertFalse(result.attained)
+    self.assertIsNone(result.time_to_steady_state)
+
+
+class GetSamplesTestCase(unittest.TestCase):
+
+  def testAttained(self):
+    criterion = steady_state.Criterion('tps', steady_state.DEVIATION, 5, True)
+    samples = steady_state.GetSamples(
+        steady_state.SteadyState(True, 16, 8, 16, 1001.25), criterion,
+        metric_prefix='failover_', unit='tps', metadata={'a': 1})
+    self.assertEqual(
+        [(s.metric, s.value) for s in samples],
+        [('failover_steady_state_attained', 1),
+         ('failover_time_to_steady_state', 16),
+         ('failover_steady_state_window_start', 8),
+         ('failover_steady_state_window_end', 16),
+         ('failover_steady_state_tps', 1001.25)])
+    self.assertEqual(samples[0].metadata,
+                     {'a': 1, 'steady_state_criterion': 'tps:5%'})
+
+  def testNotAttained(self):
+    criterion = steady_state.Criterion('tps', steady_state.DEVIATION, 5, True)
+    samples = steady_state.GetSamples(
+        steady_state.SteadyState(False, None, None, None, None), criterion)
+    self.assertEqual([(s.metric, s.value) for s in samples],
+                     [('steady_state_attained', 0)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,121 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.synchronized_start."""
+
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import mock
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import synchronized_start
+from perfkitbenchmarker import vm_util
+from tests import pkb_common_test_case
+
+
+class _LocalVm(object):
+  """Runs remote commands locally with bash."""
+
+  def __init__(self, name):
+    self.name = name
+
+  def Install(self, package):
+    del package
+
+  def PushFile(self, source, destination):
+    shutil.copy(source, destination)
+
+  def RemoteCommand(self, command, timeout=None):
+    result = subprocess.run(['bash', '-c', command], capture_output=True,
+                            text=True, timeout=timeout)
+    if result.returncode:
+      raise errors.VirtualMachine.RemoteCommandError(result.stderr)
+    return result.stdout, result.stderr
+
+
+def _Run(release_time, start_time, stop_time):
+  return synchronized_start.ClientRun('', '', release_time, start_time,
+                                      stop_time)
+
+
+class SynchronizedStartTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(SynchronizedStartTest, self).setUp()
+    tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tmp_dir)
+    self.enter_context(mock.patch.object(vm_util, 'VM_TMP_DIR', tmp_dir))
+
+  def testRun(self):
+    vms = [_LocalVm('vm0'), _LocalVm('vm1')]
+    # The first VM runs two of the commands.
+    runs = synchronized_start.Run(
+        [vms[0], vms[1], vms[0]],
+        ['echo 0', 'sleep 0.5; echo 1', 'echo 2 >&2'], release_margin=0.2)
+    self.assertEqual(len(runs), 3)
+    self.assertEqual([run.stdout for run in runs], ['0\n', '1\n', ''])
+    self.assertEqual(runs[2].stderr, '2\n')
+    self.assertEqual(len({run.release_time for run in runs}), 1)
+    for run in runs:
+      self.assertGreaterEqual(run.start_time, run.release_time)
+    start, stop = synchronized_start.GetWindow(runs)
+    self.assertLess(start - runs[0].release_time, 0.1)
+    self.assertLess(stop - start, 0.1)
+    self.assertGreaterEqual(runs[1].stop_time - runs[1].start_time, 0.5)
+
+  def testRunFailed(self):
+    vms = [_LocalVm('vm0'), _LocalVm('vm1')]
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      synchronized_start.Run(vms, ['true', 'exit 3'], release_margin=0)
+
+  def testRunMismatchedCommands(self):
+    with self.assertRaises(ValueError):
+      synchronized_start.Run([_LocalVm('vm0')], ['true', 'true'])
+
+  def testParseOutput(self):
+    run = synchronized_start.ParseOutput(
+        'out', 'err\n\nPKB_BARRIER_START: {"release_time": 1.0, '
+        '"start_time": 1.5, "stop_time": 3.0}\n')
+    self.assertEqual(run, synchronized_start.ClientRun('out', 'err\n', 1.0,
+                                                       1.5, 3.0))
+    with self.assertRaises(ValueError):
+      synchronized_start.ParseOutput('out', 'err')
+
+  def testGetSamples(self):
+    runs = [_Run(10., 10.1, 20.), _Run(10., 10.4, 21.)]
+    samples = synchronized_start.GetSamples(runs, {'duration': 10})
+    metadata = {'duration': 10, 'num_clients': 2}
+    expected = [
+        sample.Sample('start skew', 0.3, 'seconds', metadata),
+        sample.Sample('stop skew', 1., 'seconds', metadata),
+        sample.Sample('release delay', 0.4, 'seconds', metadata),
+        sample.Sample('common window', 9.6, 'seconds', metadata),
+    ]
+    for actual, wanted in zip(samples, expected):
+      self.assertEqual(actual.metric, wanted.metric)
+      self.assertAlmostEqual(actual.value, wanted.value)
+      self.assertEqual(actual.metadata, wanted.metadata)
+    self.assertEqual(len(samples), len(expected))
+
+  def testNoCommonWindow(self):
+    runs = [_Run(10., 10., 11.), _Run(10., 12., 13.)]
+    self.assertEqual(synchronized_start.GetWindow(runs), (12., 11.))
+    self.assertEqual(
+        synchronized_start.GetSamples(runs, {})[-1].value, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,178 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.clock_offset."""
+
+import collections
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from absl import flags
+import mock
+import numpy as np
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import os_types
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.traces import clock_offset
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+class _LocalVm(object):
+  """Runs the clock exchange locally instead of over SSH."""
+
+  OS_TYPE = os_types.DEBIAN11
+
+  def __init__(self, name, command_prefix=''):
+    self.name = name
+    self.command_prefix = command_prefix
+
+  def Install(self, package):
+    del package
+
+  def PushFile(self, source, destination):
+    shutil.copy(source, destination)
+
+  def StartRemoteHostCommand(self, command):
+    command = command.replace('python3', sys.executable)
+    return subprocess.Popen(['bash', '-c', self.command_prefix + command],
+                            bufsize=0, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+
+
+def _Vm(name):
+  vm = mock.Mock()
+  vm.name = name
+  return vm
+
+
+class ClockOffsetTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(ClockOffsetTestCase, self).setUp()
+    self.enter_context(mock.patch.object(
+        clock_offset, '_offsets', collections.defaultdict(list)))
+    tmp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tmp_dir)
+    self.enter_context(mock.patch.object(vm_util, 'VM_TMP_DIR', tmp_dir))
+    FLAGS.clock_offset_exchanges = 16
+
+  def testComputeOffset(self):
+    # The VM clock is 5 seconds ahead; the second exchange was the fastest.
+    offset = clock_offset.ComputeOffset([
+        (100., 105.3, 100.4),
+        (101., 106.01, 101.02),
+        (102., 107.5, 103.),
+    ])
+    self.assertAlmostEqual(offset.timestamp, 101.01)
+    self.assertAlmostEqual(offset.offset, 5.)
+    self.assertAlmostEqual(offset.delay, 0.02)
+
+  def testMeasure(self):
+    offset = clock_offset.Measure(_LocalVm('vm0'), 8)
+    # The local clock has no offset from itself.
+    self.assertLessEqual(abs(offset.offset), offset.delay / 2)
+    self.assertLess(offset.delay, 1)
+
+  def testMeasureClosed(self):
+    vm = _LocalVm('vm0', command_prefix='exit 1; ')
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      clock_offset.Measure(vm, 8)
+
+  def testNoOffsets(self):
+    vm = _Vm('vm0')
+    self.assertEqual(clock_offset.GetOffset(vm, 1000.), 0.)
+    self.assertIsNone(clock_offset.GetDrift(vm))
+    self.assertEqual(clock_offset.ToRunnerTime(vm, 1000.), 1000.)
+    np.testing.assert_array_equal(
+        clock_offset.ToRunnerTime(vm, np.array([1., 2.])), [1., 2.])
+    self.assertEqual(clock_offset.GetSamples(vm), [])
+
+  def testSingleOffset(self):
+    vm = _Vm('vm0')
+    clock_offset.Record(vm, clock_offset.ClockOffset(1000., 0.5, 0.002))
+    self.assertIsNone(clock_offset.GetDrift(vm))
+    self.assertEqual(clock_offset.ToRunnerTime(vm, 2000.), 1999.5)
+
+  def testDrift(self):
+    vm = _Vm('vm0')
+    clock_offset.Record(vm, clock_offset.ClockOffset(1000., 0.010, 0.002))
+    clock_offset.Record(vm, clock_offset.ClockOffset(1100., 0.012, 0.004))
+    self.assertAlmostEqual(clock_offset.GetDrift(vm), 2e-5)
+    self.assertAlmostEqual(clock_offset.GetOffset(vm, 1050.), 0.011)
+    np.testing.assert_allclose(
+        clock_offset.ToRunnerTime(vm, np.array([1000., 1200.])),
+        [999.990, 1199.986])
+    # Offsets of other VMs are kept separately.
+    self.assertEqual(clock_offset.GetOffset(_Vm('vm1'), 1050.), 0.)
+
+    samples = clock_offset.GetSamples(vm)
+    self.assertEqual([s.metric for s in samples],
+                     ['Clock Offset', 'Clock Offset', 'Clock Drift'])
+    self.assertAlmostEqual(samples[1].value, 12.)
+    self.assertEqual(samples[1].unit, 'ms')
+    self.assertEqual(samples[1].timestamp, 1100.)
+    self.assertEqual(samples[1].metadata['measurement'], 1)
+    self.assertAlmostEqual(samples[1].metadata['round_trip_delay_ms'], 4.)
+    self.assertAlmostEqual(samples[2].value, 20.)
+    self.assertEqual(samples[2].unit, 'ppm')
+    self.assertEqual(samples[2].metadata['drift_interval'], 100.)
+
+  def testMeasureAll(self):
+    windows_vm = _LocalVm('windows')
+    windows_vm.OS_TYPE = os_types.WINDOWS2019_CORE
+    failing_vm = _LocalVm('failing', command_prefix='exit 1; ')
+    spec = mock.Mock(vms=[_LocalVm('vm0'), windows_vm, failing_vm])
+    clock_offset.MeasureAll('run', spec)
+    clock_offset.MeasureAll('run', spec)
+    self.assertEqual(len(clock_offset.GetOffsets(spec.vms[0])), 2)
+    self.assertEqual(clock_offset.GetOffsets(windows_vm), [])
+    self.assertEqual(clock_offset.GetOffsets(failing_vm), [])
+    samples = []
+    clock_offset.AddSamples('run', spec, samples)
+    self.assertEqual([s.metric for s in samples],
+                     ['Clock Offset', 'Clock Offset', 'Clock Drift'])
+
+  def testMeasureAllAtStartForgetsPreviousRun(self):
+    spec = mock.Mock(vms=[_LocalVm('vm0')])
+    clock_offset.MeasureAllAtStart('run', spec)
+    clock_offset.MeasureAll('run', spec)
+    first_run = clock_offset.GetOffsets(spec.vms[0])
+    clock_offset.MeasureAllAtStart('run', spec)
+    offsets = clock_offset.GetOffsets(spec.vms[0])
+    self.assertEqual(len(offsets), 1)
+    self.assertGreater(offsets[0].timestamp, first_run[-1].timestamp)
+
+  @mock.patch.object(clock_offset.events.before_phase, 'connect')
+  @mock.patch.object(clock_offset.events.after_phase, 'connect')
+  @mock.patch.object(clock_offset.events.samples_created, 'connect')
+  def testRegister(self, samples_created, after_phase, before_phase):
+    clock_offset.Register(mock.Mock(measure_clock_offsets=False))
+    self.assertFalse(before_phase.called)
+    clock_offset.Register(mock.Mock(measure_clock_offsets=True))
+    before_phase.assert_called_once_with(
+        clock_offset.MeasureAllAtStart, clock_offset.events.RUN_PHASE,
+        weak=False)
+    after_phase.assert_called_once_with(
+        clock_offset.MeasureAll, clock_offset.events.RUN_PHASE, weak=False)
+    samples_created.assert_called_once_with(
+        clock_offset.AddSamples, clock_offset.events.RUN_PHASE, weak=False)
+
+
+if __name__ == '__main__':
+  unittest.main()
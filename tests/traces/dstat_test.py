@@ -13,13 +13,16 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.traces.dstat."""
 
+import collections
 import os
 import unittest
 from absl import flags
+import mock
 
 from perfkitbenchmarker import events
 from perfkitbenchmarker.sample import Sample
 from tests import pkb_common_test_case
+from perfkitbenchmarker.traces import clock_offset
 from perfkitbenchmarker.traces import dstat
 
 FLAGS = flags.FLAGS
@@ -65,6 +68,21 @@ class DstatTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(
         expected.metadata, self.samples[0].metadata)
 
+  def testAnalyzeCorrectsClockOffset(self):
+    # The clock of the VM was 10 seconds ahead, so the first row was recorded
+    # at 1475708683 on the clock of PKB.
+    vm = mock.Mock()
+    vm.name = 'vm0'
+    self.collector._role_vms['test_vm0'] = vm
+    offsets = collections.defaultdict(
+        list, vm0=[clock_offset.ClockOffset(1475708000, 10., 0.001)])
+    events.AddEvent('sender', 'event', 1475708683, 1475708684,
+                    {'label1': 123})
+    with mock.patch.object(clock_offset, '_offsets', offsets):
+      self.collector.Analyze('testSender', None, self.samples)
+    self.assertEqual(self.samples[0].metric, 'usr__total cpu usage')
+    self.assertAlmostEqual(self.samples[0].value, 6.4)
+
   def testAnalyzeValidEventTwoRows(self):
     events.AddEvent('sender', 'event', 1475708693, 1475708695,
                     {'label1': 123})
@@ -19,6 +19,7 @@ import unittest
 
 from absl.testing import parameterized
 import freezegun
+from perfkitbenchmarker import events
 from perfkitbenchmarker import sample
 from perfkitbenchmarker.traces import mpstat
 
@@ -160,6 +161,49 @@ class MpstatTestCase(parameterized.TestCase):
             f'\n{actual_samples}')
         raise Exception(sample_not_found_message)
 
+  def testMpstatParseDownsampled(self):
+    actual_samples = mpstat._MpstatResults(
+        MPSTAT_METADATA,
+        self.contents,
+        per_interval_samples=True,
+        interval=60,
+        per_interval_downsample=2)
+
+    per_interval_samples = [
+        s for s in actual_samples if 'ordinal' in s.metadata]
+    self.assertEqual(len(per_interval_samples), 30)
+    idle = [s for s in per_interval_samples
+            if s.metric == 'mpstat_avg_idle' and
+            s.metadata['mpstat_cpu_id'] == -1]
+    self.assertEqual(len(idle), 1)
+    self.assertAlmostEqual(idle[0].value, 49.98)
+    self.assertEqual(idle[0].timestamp, 1621447265.0)
+    self.assertEqual(idle[0].metadata['mpstat_per_interval_downsample'], 2)
+
+  def testMpstatParseTracingEvents(self):
+    tracing_events = [
+        events.TracingEvent('sender', 'second_report', 1621447300,
+                            1621447400, {'foo': 'bar'}),
+        events.TracingEvent('sender', 'no_reports', 1621447400, 1621447500,
+                            {}),
+    ]
+    actual_samples = mpstat._MpstatResults(
+        MPSTAT_METADATA,
+        self.contents,
+        interval=60,
+        tracing_events=tracing_events)
+
+    event_samples = [
+        s for s in actual_samples if s.metadata['event'] == 'second_report']
+    self.assertEqual(len(actual_samples), 66)
+    self.assertEqual(len(event_samples), 33)
+    intr = [s for s in event_samples if s.metric == 'mpstat_avg_intr' and
+            s.metadata['mpstat_cpu_id'] == -1]
+    self.assertEqual(intr[0].value, 273.75)
+    self.assertEqual(intr[0].metadata['sender'], 'sender')
+    self.assertEqual(intr[0].metadata['foo'], 'bar')
+    self.assertEqual(intr[0].timestamp, 1621447300)
+
 
 if __name__ == '__main__':
   unittest.main()
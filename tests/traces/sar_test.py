@@ -16,8 +16,22 @@ import os
 import unittest
 
 
+from perfkitbenchmarker import events
 from perfkitbenchmarker.traces import sar
 
+# sar -u 60 3 run with S_TIME_FORMAT=ISO across midnight.
+_ISO_SAR_OUTPUT = """\
+Linux 5.15.0-1021-gcp (instance-1) 	2022-10-11 	_x86_64_	(2 CPU)
+
+23:59:00        CPU     %user     %nice   %system   %iowait    %steal     %idle
+00:00:00        all     10.00      0.00      1.00      0.00      2.00     87.00
+00:01:00        all     20.00      0.00      1.00      0.00      4.00     75.00
+00:02:00        all     30.00      0.00      1.00      0.00      6.00     63.00
+Average:        all     20.00      0.00      1.00      0.00      4.00     75.00
+"""
+# 2022-10-12 00:00:00 UTC
+_MIDNIGHT = 1665532800
+
 
 class SarTestCase(unittest.TestCase):
 
@@ -55,6 +69,68 @@ class SarTestCase(unittest.TestCase):
 
     last_sample = samples[-1]
     self.assertEqual('average_steal', last_sample.metric)
+    self.assertEqual(99.82, samples[-2].metadata['user_percent'])
+    # 2019-05-21 18:42:39 UTC
+    self.assertEqual(1558464159, samples[0].timestamp)
+
+  def testParseIsoSarResult(self):
+    samples = []
+    sar._AddStealResults({'event': 'sar'}, _ISO_SAR_OUTPUT, samples)
+
+    self.assertEqual([(s.metric, s.value) for s in samples],
+                     [('steal', 2), ('steal', 4), ('steal', 6),
+                      ('average_steal', 4)])
+    self.assertEqual([s.timestamp for s in samples[:3]],
+                     [_MIDNIGHT, _MIDNIGHT + 60, _MIDNIGHT + 120])
+    self.assertEqual(samples[1].metadata['user_percent'], 20)
+
+  def testDownsample(self):
+    samples = []
+    sar._AddStealResults({'event': 'sar'}, _ISO_SAR_OUTPUT, samples,
+                         per_interval_downsample=2)
+
+    self.assertEqual([(s.metric, s.value) for s in samples],
+                     [('steal', 3), ('steal', 6), ('average_steal', 4)])
+    self.assertEqual(samples[1].timestamp, _MIDNIGHT + 120)
+    self.assertEqual(samples[0].metadata['sar_per_interval_downsample'], 2)
+
+  def testTracingEvents(self):
+    tracing_events = [
+        events.TracingEvent('sender', 'last_two', _MIDNIGHT + 30,
+                            _MIDNIGHT + 150, {'foo': 'bar'}),
+        events.TracingEvent('sender', 'no_reports', _MIDNIGHT + 300,
+                            _MIDNIGHT + 400, {}),
+    ]
+    samples = []
+    sar._AddStealResults({'event': 'sar'}, _ISO_SAR_OUTPUT, samples,
+                         per_interval_samples=False,
+                         tracing_events=tracing_events)
+
+    self.assertEqual(len(samples), 2)
+    event_sample = samples[1]
+    self.assertEqual(event_sample.metric, 'average_steal')
+    self.assertEqual(event_sample.value, 5)
+    self.assertEqual(event_sample.metadata['user_percent'], 25)
+    self.assertEqual(event_sample.metadata['event'], 'last_two')
+    self.assertEqual(event_sample.metadata['foo'], 'bar')
+    self.assertEqual(event_sample.timestamp, _MIDNIGHT + 30)
+
+  def testToRunnerTime(self):
+    # The VM clock is 60 seconds ahead, so the reports it timestamped 0:01 and
+    # 0:02 were made at 0:00 and 0:01 on the clock of PKB.
+    tracing_events = [
+        events.TracingEvent('sender', 'first', _MIDNIGHT - 30, _MIDNIGHT + 30,
+                            {}),
+    ]
+    samples = []
+    sar._AddStealResults({'event': 'sar'}, _ISO_SAR_OUTPUT, samples,
+                         tracing_events=tracing_events,
+                         to_runner_time=lambda t: t - 60)
+
+    self.assertEqual([s.timestamp for s in samples[:3]],
+                     [_MIDNIGHT - 60, _MIDNIGHT, _MIDNIGHT + 60])
+    self.assertEqual(samples[-1].value, 4)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -13,6 +13,7 @@
 # limitations under the License.
 """Tests for tcpdump utility."""
 
+import json
 import unittest
 from absl import flags
 from absl.testing import flagsaver
@@ -78,6 +79,46 @@ class TcpdumpTestCase(pkb_common_test_case.PkbCommonTestCase):
     vm.RemoteCommand.assert_called_with(
         'sudo kill -s INT pid1234; sleep 3', ignore_failure=True)
 
+  @flagsaver.flagsaver(tcpdump_summary='vm')
+  def testSummaryOnVm(self):
+    summary = {
+        'interval': 1.0,
+        'largest_flows': [{
+            'protocol': 'tcp', 'src': '10.0.0.1', 'sport': 40000,
+            'dst': '10.0.0.2', 'dport': 5001, 'packets': 10, 'bytes': 2000,
+            'throughput_bps': 16000.0, 'retransmits': 1,
+            'packet_size': {'p50': 100, 'p90': 1500, 'p99': 1500,
+                            'avg': 200.0},
+            'window': {'min': 100, 'avg': 150.0, 'max': 200},
+            'interval_start': 100.0,
+            'interval_throughput_bps': [8000.0, 8000.0],
+        }],
+    }
+    collector = tcpdump._CreateCollector(FLAGS)
+    vm = mock.Mock()
+    vm.name = 'vm0'
+    vm.RemoteCommand.return_value = ('pid1234', '')
+    collector._StartOnVm(vm)
+    vm.RemoteCommand.side_effect = [('', ''), (json.dumps(summary), '')]
+    with mock.patch.object(tcpdump, 'open', mock.mock_open(), create=True):
+      collector._StopOnVm(vm, 'roleA')
+    vm.PullFile.assert_not_called()
+    self.assertRegex(vm.RemoteCommand.call_args[0][0],
+                     r'^python3 /tmp/pkb/pcap_summary.py --interval 1.0 '
+                     r'--max_flows 10 /tmp/pkb/vm0-tcpdump.stdout$')
+
+    samples = []
+    collector.Analyze(None, None, samples)
+    values = {(s.metric, s.timestamp if 'interval' in s.metric else None):
+              s.value for s in samples}
+    self.assertEqual(values[('tcpdump_flow_throughput', None)], 0.016)
+    self.assertEqual(values[('tcpdump_flow_retransmits', None)], 1)
+    self.assertEqual(values[('tcpdump_flow_window_max', None)], 200)
+    self.assertEqual(values[('tcpdump_flow_interval_throughput', 101.0)],
+                     0.008)
+    self.assertEqual(samples[0].metadata['role'], 'roleA')
+    self.assertEqual(samples[0].metadata['dport'], 5001)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -207,6 +207,16 @@ class IssueCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertIn('cat: non_existent_file: No such file or directory',
                   str(cm.exception))
 
+  def testLogCommandOutputMaxLength(self):
+    FLAGS.log_command_output_max_length = 10
+    output = '\n'.join(str(i) for i in range(1000, 1101)) + '\n'
+    # pylint: disable=protected-access
+    self.assertEqual(
+        vm_util._TruncateForLog(output),
+        '1000\n\n[... %d characters not logged ...]\n1100\n' %
+        (len(output) - 10))
+    self.assertEqual(vm_util._TruncateForLog('short'), 'short')
+
 
 class VmUtilTest(pkb_common_test_case.PkbCommonTestCase):
 
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Times benchmark config spec construction for a large flag matrix.
+
+Mirrors what pkb._CreateBenchmarkSpecs does for every point of a flag matrix
+(GetConfig followed by decoding a BenchmarkConfigSpec) with and without the
+YAML and config spec caches.
+
+Run from the root of the repository:
+  PYTHONPATH=. python tools/config_spec_timing.py --points=1000
+"""
+
+import itertools
+import time
+
+from absl import app
+from absl import flags
+from perfkitbenchmarker import configs
+from perfkitbenchmarker import flag_util
+from perfkitbenchmarker import pkb  # pylint: disable=unused-import
+from perfkitbenchmarker.configs import benchmark_config_spec
+from perfkitbenchmarker.linux_benchmarks import fio_benchmark
+
+FLAGS = flags.FLAGS
+
+_POINTS = flags.DEFINE_integer(
+    'points', 1000, 'Number of flag matrix points to construct specs for.')
+
+
+def _GetMatrixUserConfigs(points):
+  """Returns one user config per point of a fio flag matrix."""
+  axes = itertools.product(range(1, 1001), (1, 2, 4, 8), ('4KiB', '64KiB'))
+  return [{'flags': {'fio_runtime': runtime,
+                     'fio_io_depths': str(io_depth),
+                     'fio_blocksize': blocksize}}
+          for runtime, io_depth, blocksize in itertools.islice(axes, points)]
+
+
+def _CreateSpecs(user_configs, cached):
+  """Constructs a spec for every user config and returns the elapsed time."""
+  if not cached:
+    # pylint: disable=protected-access
+    configs._LoadMinimalConfigJson.cache_clear()
+    benchmark_config_spec._config_spec_cache.clear()
+  start = time.time()
+  for user_config in user_configs:
+    if not cached:
+      configs._LoadMinimalConfigJson.cache_clear()
+    with flag_util.OverrideFlags(FLAGS, user_config['flags']):
+      config_dict = fio_benchmark.GetConfig(user_config)
+    if cached:
+      benchmark_config_spec.CreateBenchmarkConfigSpec(
+          benchmark_config_spec.BenchmarkConfigSpec,
+          fio_benchmark.BENCHMARK_NAME, FLAGS, **config_dict)
+    else:
+      benchmark_config_spec.BenchmarkConfigSpec(
+          fio_benchmark.BENCHMARK_NAME, flag_values=FLAGS, **config_dict)
+  return time.time() - start
+
+
+def main(unused_argv):
+  if not FLAGS.run_uri:
+    FLAGS.run_uri = 'timing'
+  user_configs = _GetMatrixUserConfigs(_POINTS.value)
+  uncached = _CreateSpecs(user_configs, cached=False)
+  cached = _CreateSpecs(user_configs, cached=True)
+  print('Constructed %d specs.' % len(user_configs))
+  print('Uncached: %.3fs (%.2fms per spec)' %
+        (uncached, 1000 * uncached / len(user_configs)))
+  print('Cached:   %.3fs (%.2fms per spec)' %
+        (cached, 1000 * cached / len(user_configs)))
+  print('Speedup:  %.1fx' % (uncached / cached))
+
+
+if __name__ == '__main__':
+  app.run(main)
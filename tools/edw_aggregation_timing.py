@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Times aggregation of edw benchmark results with many query executions.
+
+Builds throughput iterations of --streams streams of --queries queries until
+there are at least each of --executions query executions, then aggregates the
+execution time and status of every query and the geomean across iterations
+with EdwBenchmarkPerformance and with the scans of every stream of every
+iteration per query it used before.
+
+Run from the root of the repository:
+  PYTHONPATH=. python tools/edw_aggregation_timing.py \
+      --executions=10000,100000,1000000
+"""
+
+import random
+import time
+
+from absl import app
+from absl import flags
+from perfkitbenchmarker import edw_benchmark_results_aggregator as agg
+
+FLAGS = flags.FLAGS
+
+_EXECUTIONS = flags.DEFINE_list(
+    'executions', ['10000', '100000', '1000000'],
+    'Numbers of query executions to aggregate.')
+_QUERIES = flags.DEFINE_integer('queries', 99, 'Number of queries per stream.')
+_STREAMS = flags.DEFINE_integer('streams', 10,
+                                'Number of streams per iteration.')
+
+
+def _BuildBenchmark(executions, num_queries, num_streams):
+  """Returns an EdwBenchmarkPerformance of random query executions."""
+  queries = [str(query) for query in range(1, num_queries + 1)]
+  num_iterations = -(-executions // (num_queries * num_streams))
+  rand = random.Random(0)
+  benchmark = agg.EdwBenchmarkPerformance(num_iterations, queries)
+  for iteration in range(num_iterations):
+    streams = {}
+    for stream in range(num_streams):
+      streams[str(stream)] = {
+          query: agg.EdwQueryPerformance(query, rand.uniform(0.1, 10.0),
+                                         {'job_id': '%d_%d_%s' %
+                                                    (iteration, stream, query)})
+          for query in queries
+      }
+    benchmark.add_iteration_performance(
+        agg.EdwThroughputIterationPerformance(str(iteration), 0, 0, 0.0,
+                                              streams))
+  return benchmark
+
+
+def _AggregatePerQuery(benchmark):
+  """Aggregates by scanning every stream of every iteration per query."""
+  times = []
+  for query in benchmark.expected_queries:
+    performances = []
+    for iteration in benchmark.iteration_performances.values():
+      stream_performances = [
+          stream[query].performance
+          for stream in iteration.performance.values()
+          if query in stream
+      ]
+      if not stream_performances or -1.0 in stream_performances:
+        raise agg.EdwPerformanceAggregationError('Failed query ' + query)
+      performances.append(sum(stream_performances) / len(stream_performances))
+    times.append(sum(performances) / benchmark.total_iterations)
+  return times, agg.geometric_mean(times)
+
+
+def _AggregateColumnar(benchmark):
+  """Aggregates with the vectorized EdwBenchmarkPerformance methods."""
+  times = [benchmark.aggregated_query_execution_time(query)
+           for query in benchmark.expected_queries]
+  return times, benchmark.get_aggregated_geomean_performance_sample({}).value
+
+
+def main(unused_argv):
+  print('%12s %12s %12s %12s %8s' % ('executions', 'build', 'per query',
+                                     'columnar', 'speedup'))
+  for executions in _EXECUTIONS.value:
+    start = time.time()
+    benchmark = _BuildBenchmark(int(executions), _QUERIES.value,
+                                _STREAMS.value)
+    build = time.time() - start
+    start = time.time()
+    expected_times, expected_geomean = _AggregatePerQuery(benchmark)
+    per_query = time.time() - start
+    # Includes converting the columns appended to as iterations were added to
+    # arrays.
+    start = time.time()
+    times, geomean = _AggregateColumnar(benchmark)
+    columnar = time.time() - start
+    assert all(abs(a - b) < 1e-9 for a, b in zip(times, expected_times)), (
+        'Aggregations disagree.')
+    assert abs(geomean - expected_geomean) < 1e-9, 'Geomeans disagree.'
+    print('%12d %11.3fs %11.3fs %11.3fs %7.1fx' % (
+        len(benchmark.get_query_results()), build, per_query, columnar,
+        per_query / columnar))
+
+
+if __name__ == '__main__':
+  app.run(main)
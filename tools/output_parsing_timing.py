@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Times parsing of large benchmark outputs.
+
+Builds a large output by repeating the interval reports of a recorded sysbench
+run and parses it with sysbench_benchmark's OutputParser and with the per line
+regex searches it used before.
+
+Run from the root of the repository:
+  PYTHONPATH=. python tools/output_parsing_timing.py --repeats=10000
+"""
+
+import os
+import re
+import time
+
+from absl import app
+from absl import flags
+from perfkitbenchmarker.linux_benchmarks import sysbench_benchmark
+
+FLAGS = flags.FLAGS
+
+_REPEATS = flags.DEFINE_integer(
+    'repeats', 10000, 'Number of times to repeat the recorded output.')
+_OUTPUT_PATH = flags.DEFINE_string(
+    'output_path',
+    os.path.join(os.path.dirname(__file__), '..', 'tests', 'data',
+                 'sysbench-output-sample.txt'),
+    'Recorded sysbench output to repeat.')
+
+
+def _ParsePerLine(sysbench_output):
+  """Parses the interval reports with a regex search per metric and line."""
+  tps_numbers = []
+  latency_numbers = []
+  qps_numbers = []
+  for line in sysbench_output.splitlines():
+    if re.match(r'^\[', line):
+      tps_numbers.append(float(re.search('tps: (.*?) ', line).group(1)))
+      latency_numbers.append(
+          float(re.search(r'lat \(.*?\): (.*?) ', line).group(1)))
+      qps_numbers.append(float(re.search(r'qps: (.*?) \(.*?\) ',
+                                         line).group(1)))
+  return tps_numbers, latency_numbers, qps_numbers
+
+
+def _Time(parse, text):
+  start = time.time()
+  result = parse(text)
+  return time.time() - start, result
+
+
+def main(unused_argv):
+  with open(_OUTPUT_PATH.value) as f:
+    lines = f.read().splitlines()
+  reports = [line for line in lines if line.startswith('[')]
+  text = '\n'.join(lines[:12] + reports * _REPEATS.value + lines[12:])
+  per_line, expected = _Time(_ParsePerLine, text)
+  # pylint: disable=protected-access
+  output_parser, result = _Time(sysbench_benchmark._ParseSysbenchOutput, text)
+  assert result == expected, 'Parsers disagree.'
+  print('Parsed %d interval reports (%.1f MB).' %
+        (len(expected[0]), len(text) / 1e6))
+  print('Per line:      %.3fs' % per_line)
+  print('OutputParser:  %.3fs' % output_parser)
+  print('Speedup:       %.1fx' % (per_line / output_parser))
+
+
+if __name__ == '__main__':
+  app.run(main)